@@ -1,4 +1,5 @@
 """App Factory para Flask + SocketIO"""
+import hmac
 import logging
 import time
 from typing import Any
@@ -6,7 +7,22 @@ from typing import Any
 from flask import Flask, g, request
 from flask_socketio import SocketIO
 
-socketio = SocketIO()
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO que mide cada handler registrado con @socketio.on"""
+
+    def on(self, message, namespace=None):
+        register = super().on(message, namespace)
+
+        def decorator(handler):
+            from app.utils.metrics import instrument_handler
+
+            register(instrument_handler(message, handler))
+            return handler
+        return decorator
+
+
+socketio = InstrumentedSocketIO()
 
 
 def _configure_logging(app: Flask, debug_enabled: bool) -> logging.Logger:
@@ -33,6 +49,20 @@ def _sanitize_headers(headers: dict[str, Any]) -> dict[str, Any]:
     }
 
 
+def _metrics_authorized(config) -> bool:
+    """
+    Acceso a /metrics: Bearer METRICS_TOKEN si está configurado
+
+    Sin token, /metrics solo es público en desarrollo; con
+    FLASK_ENV=production se rechaza (las métricas exponen rutas,
+    volumen de tráfico y latencias internas).
+    """
+    if config.METRICS_TOKEN:
+        provided = request.headers.get("Authorization", "")
+        return hmac.compare_digest(provided.encode(), f"Bearer {config.METRICS_TOKEN}".encode())
+    return config.ENV != "production"
+
+
 def create_app():
     """Crea y configura la aplicación Flask."""
     app = Flask(__name__)
@@ -48,13 +78,23 @@ def create_app():
 
     init_extensions(app, socketio)
 
+    # X-Forwarded-For solo de proxies de confianza (también para el environ de Socket.IO)
+    if Config.TRUSTED_PROXY_COUNT:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=Config.TRUSTED_PROXY_COUNT, x_proto=Config.TRUSTED_PROXY_COUNT
+        )
+
     # Registrar blueprints (API HTTP)
-    from app.api.v1 import auth_routes, question_routes, session_routes, payment_routes
+    from app.api.v1 import auth_routes, question_routes, session_routes, payment_routes, progress_routes, canvas_routes
 
     app.register_blueprint(auth_routes.bp)
     app.register_blueprint(question_routes.bp)
     app.register_blueprint(session_routes.bp)
     app.register_blueprint(payment_routes.bp)
+    app.register_blueprint(progress_routes.bp)
+    app.register_blueprint(canvas_routes.bp)
 
     # Inicializar Swagger UI
     from app.api.swagger import init_swagger
@@ -99,6 +139,28 @@ def create_app():
     # Health check
     @app.route("/health")
     def health():
-        return {"status": "ok", "service": "guiaipn-backend"}
+        from app.utils.write_behind import write_behind_stats
+        from app.services.event_service import event_service
+
+        return {
+            "status": "ok",
+            "service": "guiaipn-backend",
+            "write_behind": write_behind_stats(),
+            "events": event_service.snapshot()
+        }
+
+    # Métricas Prometheus (totales de todos los workers del host)
+    if Config.ENV == "production" and not Config.METRICS_TOKEN:
+        logger.warning("METRICS_TOKEN no configurado: /metrics deshabilitado en producción")
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        from app.utils.metrics import metrics
+
+        if not _metrics_authorized(Config):
+            return {"error": "No autorizado"}, 401
+        if not metrics.enabled:
+            return {"error": "Métricas deshabilitadas"}, 404
+        return metrics.render_latest(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
     return app
@@ -4,11 +4,13 @@ Rutas de autenticación
 from flask import Blueprint, request, jsonify
 from app.auth import verify_token, require_auth
 from app.auth.supabase import get_user_profile, create_user_profile, initialize_user_progress
+from app.utils.rate_limiter import rate_limit_http
 
 bp = Blueprint("auth", __name__, url_prefix="/api/v1/auth")
 
 
 @bp.route("/verify", methods=["POST"])
+@rate_limit_http()
 def verify():
     """
     Verifica un token de Supabase
@@ -50,6 +52,7 @@ def get_profile():
 
 
 @bp.route("/initialize", methods=["POST"])
+@rate_limit_http()
 def initialize_profile():
     """
     Inicializa el perfil de un nuevo usuario después del registro con Google OAuth.
@@ -0,0 +1,77 @@
+"""
+Rutas de la biblioteca de canvas
+
+Las respuestas generadas referencian plantillas con
+{"command": "library", "parameters": {"id": <id>}}; el cliente descarga la
+biblioteca una vez (cacheable por ETag) y expande las referencias.
+"""
+from flask import Blueprint, Response, request, jsonify
+from app.auth import require_admin
+from app.config import Config
+from app.services.canvas_library_service import canvas_library
+from app.utils.rate_limiter import rate_limit_http
+
+bp = Blueprint("canvas", __name__, url_prefix="/api/v1/canvas")
+
+
+@bp.route("/library", methods=["GET"])
+@rate_limit_http()
+def get_library():
+    """
+    Biblioteca completa de plantillas (público, cacheable)
+
+    Respuesta: {"templates": [{id, name, category, subject, description, commands}]}
+    con los puntos de las gráficas ya calculados. El ETag cambia solo
+    cuando cambia el contenido de la biblioteca.
+    """
+    try:
+        payload, version = canvas_library.library_payload()
+        etag = f'"{version}"'
+        cache_headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={Config.CANVAS_LIBRARY_TTL}"
+        }
+
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers=cache_headers)
+
+        return Response(payload, mimetype="application/json", headers=cache_headers)
+
+    except Exception as e:
+        print(f"Error obteniendo biblioteca de canvas: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+
+@bp.route("/library/<template_id>", methods=["GET"])
+@rate_limit_http()
+def get_library_template(template_id):
+    """
+    Una plantilla de la biblioteca por id (slug)
+    """
+    try:
+        template = canvas_library.get_template(template_id)
+
+        if not template:
+            return jsonify({"error": "Plantilla no encontrada"}), 404
+
+        response = jsonify(template.to_dict())
+        response.headers["Cache-Control"] = f"public, max-age={Config.CANVAS_LIBRARY_TTL}"
+        return response, 200
+
+    except Exception as e:
+        print(f"Error obteniendo plantilla de canvas: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+
+@bp.route("/stats", methods=["GET"])
+@require_admin
+def get_library_stats():
+    """
+    Métricas de reuso de la biblioteca (solo administradores)
+    """
+    try:
+        return jsonify(canvas_library.stats()), 200
+
+    except Exception as e:
+        print(f"Error obteniendo métricas de la biblioteca de canvas: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
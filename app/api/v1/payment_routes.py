@@ -3,11 +3,13 @@ from flask import Blueprint, jsonify, request
 
 from app.auth.decorators import require_auth
 from app.services.payment_service import PaymentService
+from app.utils.rate_limiter import rate_limit_http
 
 bp = Blueprint("payments", __name__, url_prefix="/api/v1/payments")
 
 
 @bp.route("/checkout-session", methods=["POST"])
+@rate_limit_http()
 @require_auth
 def create_checkout_session():
     """Crea una sesión de checkout en Stripe."""
@@ -0,0 +1,50 @@
+"""
+Rutas de progreso del usuario por materia
+"""
+from flask import Blueprint, request, jsonify
+from app.auth import require_auth
+from app.services.progress_service import ProgressService
+from app.utils.rate_limiter import rate_limit_http
+
+bp = Blueprint("progress", __name__, url_prefix="/api/v1/progress")
+
+
+@bp.route("/", methods=["GET"])
+@rate_limit_http()
+@require_auth
+def get_progress():
+    """
+    Obtiene el progreso del usuario en todas sus materias
+
+    Se responde desde el agregado incremental (no recorre el historial).
+    """
+    try:
+        progress_service = ProgressService()
+        progress = progress_service.get_progress(request.user["id"])
+
+        return jsonify({"progress": progress}), 200
+
+    except Exception as e:
+        print(f"Error obteniendo progreso: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+
+@bp.route("/<subject>", methods=["GET"])
+@rate_limit_http()
+@require_auth
+def get_subject_progress(subject):
+    """
+    Obtiene el progreso del usuario en una materia
+    """
+    try:
+        progress_service = ProgressService()
+        progress = progress_service.get_progress(request.user["id"], subject)
+
+        if not progress:
+            return jsonify({"error": "Sin progreso registrado para esta materia"}), 404
+
+        return jsonify(progress[0]), 200
+
+    except Exception as e:
+        print(f"Error obteniendo progreso de {subject}: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
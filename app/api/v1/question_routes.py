@@ -1,18 +1,35 @@
 """
 Rutas de preguntas de examen
 """
-from flask import Blueprint, request, jsonify
+import hashlib
+import hmac
+import time
+from flask import Blueprint, Response, request, jsonify, url_for
 from app.auth import require_auth
+from app.config import Config
+from app.models.answer import Answer
+from app.repositories.ai_answers_repo import AIAnswersRepository
+from app.services.ai_service import AIService, AIResponseError, JSONParseError
+from app.services.credit_service import CreditService, InsufficientCreditsError
+from app.services.event_service import event_service
 from app.services.exam_service import ExamService
+from app.services.question_service import QuestionService, QuestionValidationError
+from app.services.search_service import search_service
+from app.services.stream_transport import HTTP_TRANSPORTS, NDJSONTransport
+from app.services.streaming_service import StreamingService
+from app.utils.rate_limiter import rate_limit_http
 
 bp = Blueprint("questions", __name__, url_prefix="/api/v1/questions")
 
+WAITING_MESSAGE = "Analizando tu pregunta..."
+
 
 @bp.route("/random", methods=["GET"])
+@rate_limit_http()
 @require_auth
-def get_random_question(current_user):
+def get_random_question():
     """
-    Obtiene una pregunta aleatoria por materia
+    Obtiene la siguiente pregunta de una materia (adaptada al progreso del usuario)
     
     Query params:
         - subject: string (required) - matematicas, fisica, quimica, etc
@@ -26,7 +43,7 @@ def get_random_question(current_user):
             return jsonify({"error": "El parámetro 'subject' es requerido"}), 400
         
         exam_service = ExamService()
-        question = exam_service.get_random_question(subject, difficulty)
+        question = exam_service.get_random_question(subject, difficulty, user_id=request.user["id"])
         
         if not question:
             return jsonify({"error": "No se encontraron preguntas para esta materia"}), 404
@@ -38,9 +55,318 @@ def get_random_question(current_user):
         return jsonify({"error": "Error interno del servidor"}), 500
 
 
+@bp.route("/search", methods=["GET"])
+@rate_limit_http()
+@require_auth
+def search_questions():
+    """
+    Búsqueda de texto completo en el banco de preguntas
+    
+    Requiere autenticación: source=answers expone respuestas generadas,
+    que solo se entregan a usuarios autenticados (y con cobro en /stream).
+    
+    Query params:
+        - q: string (required) - Texto a buscar (sin importar acentos; el último término por prefijo)
+        - subject: string (optional) - Filtrar por materia
+        - limit: int (optional) - Máximo de resultados (default: 20, máx. 50)
+        - mode: string (optional) - full (default, base de datos) o autocomplete (índice local)
+        - source: string (optional) - questions (default) o answers (respuestas generadas)
+    """
+    try:
+        query = (request.args.get("q") or "").strip()
+        subject = request.args.get("subject")
+        mode = request.args.get("mode", "full")
+        source = request.args.get("source", "questions")
+        
+        if not query:
+            return jsonify({"error": "El parámetro 'q' es requerido"}), 400
+        
+        if source not in search_service.SOURCES:
+            return jsonify({"error": "El parámetro 'source' debe ser questions o answers"}), 400
+        
+        try:
+            limit = min(max(int(request.args.get("limit", 20)), 1), 50)
+        except ValueError:
+            return jsonify({"error": "El parámetro 'limit' debe ser un entero"}), 400
+        
+        if mode == "autocomplete" and source == "questions":
+            results = search_service.autocomplete(query, subject, limit)
+        else:
+            results = search_service.search(query, subject, limit, source)
+        
+        return jsonify({
+            "results": results,
+            "total": len(results),
+            "query": query,
+            "mode": mode
+        }), 200
+        
+    except Exception as e:
+        print(f"Error buscando preguntas: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+
+def _stream_format() -> str:
+    """Formato de streaming: ?format=sse|ndjson o header Accept (SSE por defecto)"""
+    requested = request.args.get("format")
+    if requested in HTTP_TRANSPORTS:
+        return requested
+    if NDJSONTransport.mimetype in request.headers.get("Accept", ""):
+        return "ndjson"
+    return "sse"
+
+
+def _event_stream(load_answer, stream_format: str, waiting_message: str = None) -> Response:
+    """
+    Respuesta HTTP chunked con los eventos del motor de streaming
+    
+    Args:
+        load_answer: Función (transport) -> Answer; si devuelve None ya envió el error
+        stream_format: sse o ndjson
+        waiting_message: Mensaje de waiting_phrase antes de cargar la respuesta (opcional)
+    """
+    transport = HTTP_TRANSPORTS[stream_format]()
+    
+    def generate():
+        if waiting_message:
+            transport.send("waiting_phrase", {"message": waiting_message})
+            yield transport.drain()
+        
+        try:
+            answer = load_answer(transport)
+        except Exception as e:
+            # Los headers ya se enviaron: el error viaja como evento
+            print(f"❌ Error procesando pregunta: {e}")
+            transport.send("error", {
+                "code": "PROCESSING_ERROR",
+                "message": str(e)
+            })
+            answer = None
+        
+        if answer is None:
+            yield transport.drain()
+            return
+        
+        for _ in StreamingService.iter_answer(answer, transport):
+            yield transport.drain()
+    
+    response = Response(generate(), mimetype=transport.mimetype)
+    # Sin buffering en proxies (nginx) para que cada paso llegue al cliente
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _answer_signature(question_hash: str, stream_format: str, expires: int) -> str:
+    """HMAC-SHA256 (SECRET_KEY) de hash, formato y expiración de una URL de reproducción"""
+    message = f"{question_hash}:{stream_format}:{expires}".encode()
+    return hmac.new(Config.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _signed_answer_url(question_hash: str, stream_format: str) -> str:
+    """
+    URL firmada de GET /answers/<hash>/stream, válida entre ANSWER_URL_TTL
+    y 2 * ANSWER_URL_TTL segundos
+
+    La expiración se alinea a ventanas de ANSWER_URL_TTL y la firma no
+    incluye al usuario: todos los que piden la misma respuesta en la misma
+    ventana reciben la misma URL, y el CDN la sirve desde cache.
+    """
+    ttl = Config.ANSWER_URL_TTL
+    expires = (int(time.time()) // ttl + 2) * ttl
+    return url_for(
+        "questions.stream_cached_answer",
+        question_hash=question_hash,
+        format=stream_format,
+        expires=expires,
+        signature=_answer_signature(question_hash, stream_format, expires)
+    )
+
+
+def _track_question(user_id, question_text, result, reservation, received_at, completed=True):
+    """Registra la pregunta en el pipeline de eventos (mismos eventos que Socket.IO)"""
+    cached = result["cached"]
+    event_service.track("cache_hit" if cached else "cache_miss", user_id=user_id,
+                        question_hash=result["question_hash"])
+    event_service.track(
+        "question_asked",
+        user_id=user_id,
+        question_text=question_text,
+        question_hash=result["question_hash"],
+        cached=cached,
+        response_time_ms=int((time.monotonic() - received_at) * 1000),
+        credits_used=reservation.credits if completed else 0,
+        completed=completed
+    )
+
+
+@bp.route("/stream", methods=["POST"])
+@rate_limit_http()
+@require_auth
+def stream_question():
+    """
+    Responde una pregunta libre por HTTP chunked (alternativa ligera a Socket.IO)
+    
+    Mismo flujo que el evento ask_question: QuestionService, reserva de
+    créditos, generación con IA y motor de streaming. Sin sesión: no hay
+    pause/resume y los eventos llegan sin retardos (el cliente marca el ritmo).
+    
+    Si la respuesta ya está en cache, tras cobrar los créditos responde
+    303 hacia una URL firmada de GET /answers/<question_hash>/stream.
+    
+    Query params:
+        - format: string (optional) - sse (default) o ndjson (también por header Accept)
+    
+    Body:
+        - question: string (required)
+        - context: object (optional) - subject, difficulty
+    """
+    try:
+        received_at = time.monotonic()
+        data = request.get_json(silent=True) or {}
+        question_text = data.get("question")
+        context = data.get("context") or {}
+        user_id = request.user["id"]
+        
+        if not question_text:
+            return jsonify({"error": "El campo 'question' es requerido"}), 400
+        
+        try:
+            result = QuestionService().process_question(user_id, question_text)
+        except QuestionValidationError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if result["cached"] and Config.insecure_secret_key():
+            # No se emiten URLs firmadas con una clave conocida
+            return jsonify({"error": "Reproducción de respuestas no disponible"}), 503
+        
+        credit_service = CreditService()
+        
+        try:
+            reservation = credit_service.reserve(user_id, cached=result["cached"])
+        except InsufficientCreditsError as e:
+            return jsonify({"error": str(e), "reason": e.reason}), 402
+        
+        question_hash = result["question_hash"]
+        stream_format = _stream_format()
+        
+        if result["cached"]:
+            credit_service.commit(reservation, {"question_hash": question_hash})
+            _track_question(user_id, question_text, result, reservation, received_at)
+            
+            response = jsonify({"question_hash": question_hash})
+            response.status_code = 303
+            response.headers["Location"] = _signed_answer_url(question_hash, stream_format)
+            return response
+        
+        def generate_answer(transport):
+            try:
+                ai_response = AIService().generate_answer(question_text, context)
+                
+                # Validar una sola vez: el mismo modelo se guarda y se transmite
+                answer = Answer.from_dict({
+                    "question_hash": question_hash,
+                    "question_text": question_text,
+                    "answer_steps": ai_response["steps"],
+                    "total_duration": ai_response["total_duration"],
+                    "generated_by": "gpt-4"
+                })
+            except Exception as e:
+                # Sin una respuesta válida no se cobra: cualquier fallo devuelve la reserva
+                credit_service.refund(reservation)
+                _track_question(user_id, question_text, result, reservation, received_at,
+                                completed=False)
+                if isinstance(e, (AIResponseError, JSONParseError)):
+                    code, message = "AI_GENERATION_ERROR", f"Error generando respuesta: {str(e)}"
+                else:
+                    code, message = "PROCESSING_ERROR", str(e)
+                transport.send("error", {
+                    "code": code,
+                    "message": message
+                })
+                return None
+            
+            credit_service.commit(reservation, {"question_hash": question_hash})
+            _track_question(user_id, question_text, result, reservation, received_at)
+            
+            try:
+                AIAnswersRepository().create(answer)
+            except Exception as e:
+                print(f"⚠ Error guardando en DB: {e}")
+                # Continuar con streaming aunque falle el guardado
+            
+            return answer
+        
+        return _event_stream(generate_answer, stream_format, WAITING_MESSAGE)
+    
+    except Exception as e:
+        print(f"Error en streaming HTTP de pregunta: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+
+@bp.route("/answers/<question_hash>/stream", methods=["GET"])
+@rate_limit_http()
+def stream_cached_answer(question_hash):
+    """
+    Reproduce una respuesta ya generada por HTTP chunked
+    
+    Solo con la URL firmada que emite POST /stream después de cobrar los
+    créditos: la firma (HMAC de hash, formato y expiración) impide pedir
+    respuestas calculando el hash de la pregunta. La URL no depende del
+    usuario, así que la respuesta es cacheable en proxies y CDN (public)
+    hasta que expira. Con el SECRET_KEY de desarrollo en producción las
+    firmas serían falsificables y responde 503.
+    
+    Query params:
+        - format: string - sse o ndjson (parte de la firma)
+        - expires: int - Timestamp de expiración
+        - signature: string - Firma de la URL
+    """
+    try:
+        if Config.insecure_secret_key():
+            return jsonify({"error": "Reproducción de respuestas no disponible"}), 503
+        
+        stream_format = request.args.get("format", "sse")
+        if stream_format not in HTTP_TRANSPORTS:
+            return jsonify({"error": "El parámetro 'format' debe ser sse o ndjson"}), 400
+        
+        try:
+            expires = int(request.args.get("expires", ""))
+        except ValueError:
+            return jsonify({"error": "URL de reproducción inválida o expirada"}), 403
+        
+        remaining = expires - int(time.time())
+        signature = request.args.get("signature", "")
+        expected = _answer_signature(question_hash, stream_format, expires)
+        if remaining <= 0 or not hmac.compare_digest(signature, expected):
+            return jsonify({"error": "URL de reproducción inválida o expirada"}), 403
+        
+        etag = f'"{question_hash}-{stream_format}"'
+        cache_headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={remaining}"
+        }
+        
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers=cache_headers)
+        
+        answer = AIAnswersRepository().get_answer(question_hash)
+        
+        if not answer:
+            return jsonify({"error": "Respuesta no encontrada"}), 404
+        
+        response = _event_stream(lambda transport: answer, stream_format)
+        response.headers.update(cache_headers)
+        return response
+    
+    except Exception as e:
+        print(f"Error reproduciendo respuesta: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+
 @bp.route("/<question_id>/answer", methods=["POST"])
+@rate_limit_http()
 @require_auth
-def submit_answer(current_user, question_id):
+def submit_answer(question_id):
     """
     Valida la respuesta del usuario a una pregunta
     
@@ -59,7 +385,7 @@ def submit_answer(current_user, question_id):
             return jsonify({"error": "La respuesta debe ser a, b, c o d"}), 400
         
         exam_service = ExamService()
-        result = exam_service.validate_answer(question_id, user_answer)
+        result = exam_service.validate_answer(question_id, user_answer, user_id=request.user["id"])
         
         return jsonify(result), 200
         
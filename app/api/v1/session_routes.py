@@ -2,59 +2,78 @@
 Rutas de sesiones de estudio
 """
 from flask import Blueprint, request, jsonify
-from app.auth import require_auth
+from app.auth import require_admin, require_auth
 
 bp = Blueprint("sessions", __name__, url_prefix="/api/v1/sessions")
 
 
 @bp.route("/", methods=["GET"])
 @require_auth
-def list_sessions(current_user):
+def list_sessions():
     """
-    Lista las sesiones del usuario (activas en Redis)
-    
+    Lista las sesiones activas del usuario (índice sessions:user:{id} en Redis)
+
     Nota: Las sesiones en Redis son temporales (TTL 30 min).
-    Para historial persistente, consultar tabla 'interactions' en Supabase.
+    Para historial persistente, consultar tabla 'study_sessions' en Supabase.
     """
     try:
         from app.services.session_service import SessionService
-        
-        # Las sesiones Redis son efímeras, solo retornamos info básica
-        # En producción, esto podría consultar Supabase para historial
+
+        user_id = request.user["id"]
+        sessions = SessionService().get_user_sessions(user_id)
+
         return jsonify({
-            "message": "Las sesiones activas se gestionan vía Socket.IO",
-            "info": "Conéctate vía WebSocket para crear una sesión activa",
-            "user_id": current_user["id"]
+            "user_id": user_id,
+            "sessions": sessions,
+            "count": len(sessions)
         }), 200
-        
+
     except Exception as e:
         print(f"Error listando sesiones: {e}")
         return jsonify({"error": "Error interno del servidor"}), 500
 
 
+@bp.route("/stats", methods=["GET"])
+@require_admin
+def session_stats():
+    """
+    Métricas de sesiones activas (solo administradores)
+
+    Usa el índice sessions:active (ZCOUNT), nunca KEYS.
+    """
+    try:
+        from app.services.session_service import SessionService
+
+        return jsonify(SessionService().get_stats()), 200
+
+    except Exception as e:
+        print(f"Error obteniendo métricas de sesiones: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+
 @bp.route("/<session_id>", methods=["GET"])
 @require_auth
-def get_session(current_user, session_id):
+def get_session(session_id):
     """
     Obtiene una sesión específica de Redis
     """
     try:
         from app.services.session_service import SessionService, SessionExpiredError
-        
+
         session_service = SessionService()
-        
+
         try:
             session = session_service.get_session(session_id)
-            
+
             # Verificar que la sesión pertenece al usuario
-            if session.get("user_id") != current_user["id"]:
+            if session.get("user_id") != request.user["id"]:
                 return jsonify({"error": "No autorizado"}), 403
-            
+
             return jsonify(session), 200
-            
+
         except SessionExpiredError:
             return jsonify({"error": "Sesión expirada o no encontrada"}), 404
-        
+
     except Exception as e:
         print(f"Error obteniendo sesión: {e}")
         return jsonify({"error": "Error interno del servidor"}), 500
@@ -2,6 +2,6 @@
 Módulo de autenticación con Supabase
 """
 from app.auth.supabase import verify_token
-from app.auth.decorators import require_auth
+from app.auth.decorators import require_admin, require_auth
 
-__all__ = ["verify_token", "require_auth"]
+__all__ = ["verify_token", "require_auth", "require_admin"]
@@ -5,6 +5,18 @@ from functools import wraps
 from flask import request, jsonify
 from flask_socketio import disconnect, emit
 from app.auth.supabase import verify_token
+from app.config import Config
+
+
+class VerifiedUser(dict):
+    """
+    Usuario verificado por require_auth_socket
+
+    Un payload JSON del cliente nunca produce esta clase, así que
+    distingue al usuario verificado de un "user" enviado por el cliente
+    en handlers sin autenticación.
+    """
+    pass
 
 
 def require_auth(f):
@@ -32,6 +44,22 @@ def require_auth(f):
     return decorated_function
 
 
+def require_admin(f):
+    """
+    Decorador para rutas HTTP de administración/monitoreo
+    
+    Requiere autenticación y que el usuario esté en Config.ADMIN_USER_IDS
+    """
+    @require_auth
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.user.get("id") not in Config.ADMIN_USER_IDS:
+            return jsonify({"error": "No autorizado"}), 403
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
+
 def require_auth_socket(f):
     """
     Decorador para proteger handlers de Socket.IO que requieren autenticación
@@ -66,7 +94,7 @@ def require_auth_socket(f):
         try:
             user = verify_token(token)
             # Inyectar usuario en el payload
-            data["user"] = user
+            data["user"] = VerifiedUser(user)
             return f(*args, **kwargs)
             
         except Exception as e:
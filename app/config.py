@@ -11,7 +11,10 @@ class Config:
     """Configuración base de la aplicación"""
     
     # Flask
-    SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
+    DEFAULT_SECRET_KEY = "dev-secret-key-change-in-production"
+    SECRET_KEY = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
+    # Segundos de validez de las URLs firmadas de reproducción (GET /questions/answers/<hash>/stream)
+    ANSWER_URL_TTL = int(os.getenv("ANSWER_URL_TTL", 300))
     DEBUG = os.getenv("FLASK_DEBUG", "True") == "True"
     ENV = os.getenv("FLASK_ENV", "development")
     
@@ -40,13 +43,92 @@ class Config:
     # CORS
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
     
+    # Administración (UUIDs de usuarios con acceso a endpoints de monitoreo)
+    ADMIN_USER_IDS = [uid.strip() for uid in os.getenv("ADMIN_USER_IDS", "").split(",") if uid.strip()]
+    
     # Rate Limiting
     MAX_CONNECTIONS_PER_IP = int(os.getenv("MAX_CONNECTIONS_PER_IP", 5))
     RATE_LIMIT_QUESTIONS = int(os.getenv("RATE_LIMIT_QUESTIONS", 10))
+    RATE_LIMIT_CLARIFICATIONS = int(os.getenv("RATE_LIMIT_CLARIFICATIONS", 20))
+    RATE_LIMIT_FOLLOW_UPS = int(os.getenv("RATE_LIMIT_FOLLOW_UPS", 10))
+    RATE_LIMIT_API = int(os.getenv("RATE_LIMIT_API", 60))
     RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", 60))
+    # Proxies de confianza delante de la app (ProxyFix); 0 = ignorar X-Forwarded-For
+    TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+    
+    # Créditos
+    CREDIT_COST_AI_QUESTION = int(os.getenv("CREDIT_COST_AI_QUESTION", 1))
+    CREDIT_COST_CACHED_QUESTION = int(os.getenv("CREDIT_COST_CACHED_QUESTION", 0))
+    CREDIT_SETTLE_BATCH_SIZE = int(os.getenv("CREDIT_SETTLE_BATCH_SIZE", 50))
+    CREDIT_SETTLE_INTERVAL = int(os.getenv("CREDIT_SETTLE_INTERVAL", 30))
+    CREDIT_LEDGER_SYNC_INTERVAL = int(os.getenv("CREDIT_LEDGER_SYNC_INTERVAL", 60))
+    
+    # Persistencia write-behind (ai_answers, ai_brief_answers, exam_question_explanations)
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 50))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.5))
+    WRITE_BEHIND_SPOOL_DIR = os.getenv("WRITE_BEHIND_SPOOL_DIR")  # Default: <tmp>/write_behind_spool
+    
+    # Pipeline de eventos (interactions, study_sessions)
+    EVENTS_BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", 200))
+    EVENTS_FLUSH_INTERVAL = float(os.getenv("EVENTS_FLUSH_INTERVAL", 1.0))
+    EVENTS_STREAM_MAXLEN = int(os.getenv("EVENTS_STREAM_MAXLEN", 100000))
+    EVENTS_CONSUMER_ENABLED = os.getenv("EVENTS_CONSUMER_ENABLED", "True") == "True"
+    EVENTS_MAX_DELIVERIES = int(os.getenv("EVENTS_MAX_DELIVERIES", 5))
+    
+    # Progreso por materia (user_progress)
+    PROGRESS_FLUSH_BATCH_SIZE = int(os.getenv("PROGRESS_FLUSH_BATCH_SIZE", 100))
+    PROGRESS_FLUSH_INTERVAL = int(os.getenv("PROGRESS_FLUSH_INTERVAL", 60))
+    PROGRESS_MASTERY_ALPHA = float(os.getenv("PROGRESS_MASTERY_ALPHA", 0.1))
+    
+    # Selección adaptativa de preguntas
+    QUESTION_INDEX_TTL = int(os.getenv("QUESTION_INDEX_TTL", 300))
+    QUESTION_RECENT_WINDOW = int(os.getenv("QUESTION_RECENT_WINDOW", 50))
+    
+    # Búsqueda de preguntas (índice invertido local para autocompletado)
+    SEARCH_LOCAL_INDEX_ENABLED = os.getenv("SEARCH_LOCAL_INDEX_ENABLED", "True") == "True"
+    SEARCH_INDEX_TTL = int(os.getenv("SEARCH_INDEX_TTL", 600))
+    
+    # Serialización en Redis: orjson (JSON rápido), json o msgpack (binario compacto)
+    REDIS_CODEC = os.getenv("REDIS_CODEC", "orjson")
+    # Compresión de respuestas con pasos (caches y snapshots): zstd, zlib o none
+    ANSWER_COMPRESSION = os.getenv("ANSWER_COMPRESSION", "zstd")
+    ANSWER_COMPRESSION_MIN_BYTES = int(os.getenv("ANSWER_COMPRESSION_MIN_BYTES", 1024))
+    # Frames precomprimidos de respuestas en memoria (por worker)
+    ANSWER_FRAME_CACHE_SIZE = int(os.getenv("ANSWER_FRAME_CACHE_SIZE", 256))
+    # Puntos precalculados por función en draw_graph / plot_function
+    CANVAS_PLOT_SAMPLES = int(os.getenv("CANVAS_PLOT_SAMPLES", 201))
+    # Biblioteca de canvas: plantillas reutilizables que las respuestas referencian por id
+    CANVAS_LIBRARY_ENABLED = os.getenv("CANVAS_LIBRARY_ENABLED", "True") == "True"
+    CANVAS_LIBRARY_TTL = int(os.getenv("CANVAS_LIBRARY_TTL", 600))
+    CANVAS_LIBRARY_PROMPT_LIMIT = int(os.getenv("CANVAS_LIBRARY_PROMPT_LIMIT", 5))
+    
+    # Voz: audio pcm_s16le mono por voice_chunk, transcrito con ASR local (whisper o fake)
+    VOICE_ASR_BACKEND = os.getenv("VOICE_ASR_BACKEND", "whisper")
+    VOICE_WHISPER_MODEL = os.getenv("VOICE_WHISPER_MODEL", "base")
+    VOICE_ASR_WORKERS = int(os.getenv("VOICE_ASR_WORKERS", 2))
+    VOICE_ASR_TIMEOUT = int(os.getenv("VOICE_ASR_TIMEOUT", 30))
+    VOICE_SAMPLE_RATE = int(os.getenv("VOICE_SAMPLE_RATE", 16000))
+    VOICE_MAX_SECONDS = int(os.getenv("VOICE_MAX_SECONDS", 60))
+    # Audio nuevo (ms) entre transcripciones parciales
+    VOICE_PARTIAL_INTERVAL_MS = int(os.getenv("VOICE_PARTIAL_INTERVAL_MS", 1500))
+    VOICE_MAX_STREAMS = int(os.getenv("VOICE_MAX_STREAMS", 200))
+    # Enviar la transcripción final directamente a ask_question
+    VOICE_AUTO_ASK = os.getenv("VOICE_AUTO_ASK", "True") == "True"
+    
+    # Métricas Prometheus (/metrics): cada worker publica su snapshot en Redis y se suman por host
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+    METRICS_PUBLISH_INTERVAL = int(os.getenv("METRICS_PUBLISH_INTERVAL", 15))
+    # Segundos sin publicar tras los que un worker se da por terminado
+    METRICS_WORKER_TTL = int(os.getenv("METRICS_WORKER_TTL", 120))
+    # Bearer token para /metrics (obligatorio con FLASK_ENV=production; vacío = público solo en desarrollo)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
     
     # Session
     SESSION_TTL = 1800  # 30 minutos
+    # Segundos que una sesión desconectada espera a ser reclamada (0 = cerrar al desconectar)
+    SESSION_RECONNECT_GRACE = int(os.getenv("SESSION_RECONNECT_GRACE", 300))
+    # Segundos entre barridos de sessions:active (sesiones vencidas por TTL)
+    SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", 60))
     CACHE_TTL = 86400   # 24 horas
     
     @staticmethod
@@ -60,3 +142,10 @@ class Config:
         missing = [var for var in required if not os.getenv(var)]
         if missing:
             raise ValueError(f"Faltan variables de entorno: {', '.join(missing)}")
+        if Config.insecure_secret_key():
+            raise ValueError("SECRET_KEY por defecto en producción: configura SECRET_KEY")
+
+    @staticmethod
+    def insecure_secret_key() -> bool:
+        """True si producción corre con el SECRET_KEY de desarrollo (firmas falsificables)"""
+        return Config.ENV == "production" and Config.SECRET_KEY == Config.DEFAULT_SECRET_KEY
@@ -32,8 +32,9 @@ def init_extensions(app, socketio: SocketIO):
         }
     })
     
-    # Redis
-    redis_client = redis.from_url(
+    # Redis (cada comando se mide en /metrics)
+    from app.utils.metrics import InstrumentedRedis
+    redis_client = InstrumentedRedis.from_url(
         Config.REDIS_URL,
         decode_responses=True,
         socket_connect_timeout=5,
@@ -1,6 +1,7 @@
 """
 Modelos de datos (esquemas)
 """
-from .answer import Answer, AnswerStep
+from .answer import Answer, AnswerStep, InvalidStepError
 from .explanation import ExamExplanation, ExplanationStep
-from .session import Session
+from .session import Session, SessionData, StreamCursor
+from .voice import Transcript, VoiceInteraction
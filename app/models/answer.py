@@ -1,11 +1,30 @@
 """
 Esquema de respuestas IA
+
+Los modelos usan __slots__ (dataclass(slots=True)): sin __dict__ por
+instancia, menos memoria por paso y acceso a atributos más rápido que
+dict.get() en los loops de streaming. from_dict() es el único punto de
+entrada desde JSON (fila de Supabase, respuesta del modelo o snapshot en
+Redis) y valida los tipos una sola vez.
 """
-from typing import List, Optional
+from typing import Any, Iterable, List, Optional
 from dataclasses import dataclass
 
 
-@dataclass
+class InvalidStepError(ValueError):
+    """Excepción cuando un paso o una respuesta no tienen la estructura esperada"""
+    pass
+
+
+def _commands(value: Any, field: str, index: int) -> Optional[list]:
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        raise InvalidStepError(f"Step {index}: '{field}' debe ser un array")
+    return value or None
+
+
+@dataclass(slots=True, frozen=True)
 class AnswerStep:
     """Paso individual de una respuesta"""
     step_number: int
@@ -14,39 +33,176 @@ class AnswerStep:
     content_type: str = "text"
     has_visual: bool = False
     canvas_commands: Optional[List[dict]] = None
+    component_commands: Optional[List[dict]] = None
+
+    @classmethod
+    def from_dict(cls, data: Any, index: int = 0) -> "AnswerStep":
+        """
+        Crea un paso desde JSON validando tipos
+
+        Acepta "type" (formato del modelo) como alias de "content_type".
+        Una instancia ya construida se devuelve tal cual.
+
+        Args:
+            data: Paso como dict (o instancia)
+            index: Posición del paso (step_number por defecto: index + 1)
+
+        Returns:
+            AnswerStep: Paso validado
+
+        Raises:
+            InvalidStepError: Si el paso no tiene la estructura esperada
+        """
+        if isinstance(data, cls):
+            return data
+        if isinstance(data, AnswerStep):
+            data = data.to_dict()
+        if not isinstance(data, dict):
+            raise InvalidStepError(f"Step {index} no es un objeto")
+
+        title = data.get("title") or ""
+        content = data.get("content") or ""
+        if not isinstance(title, str) or not isinstance(content, str):
+            raise InvalidStepError(f"Step {index}: 'title' y 'content' deben ser texto")
+
+        step_number = data.get("step_number")
+        if not isinstance(step_number, int) or isinstance(step_number, bool):
+            step_number = index + 1
+
+        return cls(
+            step_number=step_number,
+            title=title,
+            content=content,
+            content_type=str(data.get("content_type") or data.get("type") or "text"),
+            has_visual=bool(data.get("has_visual", False)),
+            canvas_commands=_commands(data.get("canvas_commands"), "canvas_commands", index),
+            component_commands=_commands(data.get("component_commands"), "component_commands", index)
+        )
+
+    @classmethod
+    def parse_many(cls, items: Optional[Iterable]) -> List["AnswerStep"]:
+        """
+        Crea la lista de pasos desde JSON
+
+        Args:
+            items: Lista de pasos (dicts o instancias), None equivale a vacía
+
+        Returns:
+            list: Pasos validados
+
+        Raises:
+            InvalidStepError: Si items no es una lista o algún paso es inválido
+        """
+        if items is None:
+            return []
+        if not isinstance(items, (list, tuple)):
+            raise InvalidStepError("Los pasos deben ser un array")
+        return [cls.from_dict(item, index) for index, item in enumerate(items)]
+
+    def to_dict(self) -> dict:
+        """Convierte a diccionario (formato JSON de la DB)"""
+        return {
+            "step_number": self.step_number,
+            "title": self.title,
+            "content": self.content,
+            "content_type": self.content_type,
+            "has_visual": self.has_visual,
+            "canvas_commands": self.canvas_commands,
+            "component_commands": self.component_commands
+        }
+
+
+def parse_duration(value: Any, default: int = 60) -> int:
+    """
+    Duración total en segundos desde JSON
+
+    Args:
+        value: Valor crudo (int, float o texto numérico)
+        default: Valor si falta o no es numérico
+
+    Returns:
+        int: Duración
+    """
+    if isinstance(value, bool):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
 
 
-@dataclass
+@dataclass(slots=True)
 class Answer:
     """Respuesta completa estructurada (para preguntas libres y follow-ups)"""
-    question_hash: str
+    question_hash: Optional[str]
     question_text: str
     steps: List[AnswerStep]
     total_duration: int
     generated_by: str = "manual"
     related_question_id: Optional[str] = None  # Para follow-up questions
-    
+    id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "Answer":
+        """
+        Crea una respuesta desde JSON validando tipos
+
+        Acepta filas de ai_answers ("answer_steps"), la salida de
+        generate_answer y snapshots de streaming ("steps"). Una instancia ya
+        construida se devuelve tal cual.
+
+        Args:
+            data: Respuesta como dict (o instancia)
+
+        Returns:
+            Answer: Respuesta validada
+
+        Raises:
+            InvalidStepError: Si la respuesta no tiene la estructura esperada
+        """
+        if isinstance(data, cls):
+            return data
+        if not isinstance(data, dict):
+            raise InvalidStepError("La respuesta no es un objeto")
+
+        steps = data.get("answer_steps")
+        if steps is None:
+            steps = data.get("steps")
+
+        return cls(
+            question_hash=data.get("question_hash"),
+            question_text=data.get("question_text") or "",
+            steps=AnswerStep.parse_many(steps),
+            total_duration=parse_duration(data.get("total_duration")),
+            generated_by=data.get("generated_by") or "manual",
+            related_question_id=data.get("related_question_id"),
+            id=data.get("id")
+        )
+
+    def to_snapshot(self) -> dict:
+        """
+        Datos de streaming (snapshot de sesión y frames)
+
+        Los pasos se pasan como instancias: el codec de Redis y orjson los
+        serializan sin construir dicts intermedios.
+        """
+        return {
+            "steps": self.steps,
+            "total_duration": self.total_duration,
+            "question_hash": self.question_hash
+        }
+
     def to_dict(self) -> dict:
         """Convierte a diccionario"""
         data = {
             "question_hash": self.question_hash,
             "question_text": self.question_text,
-            "answer_steps": [
-                {
-                    "step_number": step.step_number,
-                    "title": step.title,
-                    "content": step.content,
-                    "content_type": step.content_type,
-                    "has_visual": step.has_visual,
-                    "canvas_commands": step.canvas_commands
-                }
-                for step in self.steps
-            ],
+            "answer_steps": [step.to_dict() for step in self.steps],
             "total_duration": self.total_duration,
             "generated_by": self.generated_by
         }
-        
+
         if self.related_question_id:
             data["related_question_id"] = self.related_question_id
-            
+
         return data
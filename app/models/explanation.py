@@ -1,23 +1,19 @@
 """
 Modelo para explicaciones de preguntas de examen
 """
-from typing import List, Optional
+from typing import Any, List, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
+from .answer import AnswerStep, InvalidStepError, parse_duration
 
-@dataclass
-class ExplanationStep:
-    """Paso individual de una explicación"""
-    step_number: int
-    title: str
-    content: str
-    content_type: str = "text"
-    has_visual: bool = False
-    canvas_commands: Optional[List[dict]] = None
 
+@dataclass(slots=True, frozen=True)
+class ExplanationStep(AnswerStep):
+    """Paso individual de una explicación (mismos campos que AnswerStep)"""
 
-@dataclass
+
+@dataclass(slots=True)
 class ExamExplanation:
     """Explicación completa de pregunta de examen"""
     id: Optional[str]
@@ -37,22 +33,12 @@ class ExamExplanation:
     prompt_version: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
-    
+
     def to_dict(self) -> dict:
         """Convierte a diccionario para guardar en DB"""
         return {
             "question_id": self.question_id,
-            "explanation_steps": [
-                {
-                    "step_number": step.step_number,
-                    "title": step.title,
-                    "content": step.content,
-                    "content_type": step.content_type,
-                    "has_visual": step.has_visual,
-                    "canvas_commands": step.canvas_commands
-                }
-                for step in self.steps
-            ],
+            "explanation_steps": [step.to_dict() for step in self.steps],
             "total_duration": self.total_duration,
             "quality_score": self.quality_score,
             "is_verified": self.is_verified,
@@ -66,21 +52,26 @@ class ExamExplanation:
             "ai_model": self.ai_model,
             "prompt_version": self.prompt_version
         }
-    
+
     @classmethod
-    def from_dict(cls, data: dict) -> 'ExamExplanation':
-        """Crea instancia desde diccionario de DB"""
-        steps = [
-            ExplanationStep(**step_data)
-            for step_data in data.get("explanation_steps", [])
-        ]
-        
+    def from_dict(cls, data: Any) -> 'ExamExplanation':
+        """
+        Crea instancia desde diccionario de DB
+
+        Raises:
+            InvalidStepError: Si la explicación no tiene la estructura esperada
+        """
+        if isinstance(data, cls):
+            return data
+        if not isinstance(data, dict):
+            raise InvalidStepError("La explicación no es un objeto")
+
         return cls(
             id=data.get("id"),
             question_id=data["question_id"],
-            steps=steps,
-            total_duration=data.get("total_duration", 60),
-            quality_score=float(data.get("quality_score", 0.00)),
+            steps=ExplanationStep.parse_many(data.get("explanation_steps")),
+            total_duration=parse_duration(data.get("total_duration")),
+            quality_score=float(data.get("quality_score") or 0.00),
             is_verified=data.get("is_verified", False),
             is_flagged=data.get("is_flagged", False),
             flag_reason=data.get("flag_reason"),
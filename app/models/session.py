@@ -2,10 +2,32 @@
 Esquema de sesiones
 """
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterator, Optional, Tuple, TypedDict
 from datetime import datetime
 
 
+class SessionData(TypedDict, total=False):
+    """
+    Registro de sesión tal como se guarda en Redis (HASH session:{id})
+    
+    Las fechas se guardan en ISO 8601 (UTC, sin zona).
+    """
+    user_id: str
+    connection_id: Optional[str]
+    current_question: Optional[str]
+    current_step: int
+    pause_position: int
+    is_paused: bool
+    is_streaming: bool
+    was_streaming: bool
+    stream_answer_id: Optional[str]
+    conversation_context: dict
+    reconnect_token: str
+    disconnected_at: Optional[str]
+    created_at: str
+    last_activity: str
+
+
 @dataclass
 class Session:
     """Sesión de usuario"""
@@ -42,3 +64,75 @@ class Session:
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "last_activity": self.last_activity.isoformat() if self.last_activity else None
         }
+
+
+@dataclass
+class StreamCursor:
+    """
+    Posición de streaming dentro de una respuesta
+    
+    offset es absoluto dentro del contenido del paso, así que pausar y
+    reanudar cualquier número de veces no desplaza el texto. Los chunks
+    se recorren por índices sobre el contenido completo, sin copiar el
+    resto del paso en cada reanudación.
+    """
+    answer_id: Optional[str] = None  # question_hash de la respuesta
+    step: int = 0
+    offset: int = 0
+    
+    @classmethod
+    def from_session(cls, session: dict, answer_id: Optional[str] = None) -> "StreamCursor":
+        """
+        Cursor guardado en la sesión
+        
+        Si la sesión apunta a otra respuesta, el cursor empieza desde el inicio.
+        
+        Args:
+            session: Datos de la sesión (current_step, pause_position, stream_answer_id)
+            answer_id: Respuesta que se va a transmitir (opcional)
+            
+        Returns:
+            StreamCursor: Cursor de la sesión
+        """
+        stored_answer = session.get("stream_answer_id")
+        if answer_id is not None and stored_answer is not None and stored_answer != answer_id:
+            return cls(answer_id=answer_id)
+        return cls(
+            answer_id=answer_id if answer_id is not None else stored_answer,
+            step=max(int(session.get("current_step") or 0), 0),
+            offset=max(int(session.get("pause_position") or 0), 0)
+        )
+    
+    def to_session(self) -> dict:
+        """Campos de sesión que guardan el cursor"""
+        return {
+            "stream_answer_id": self.answer_id,
+            "current_step": self.step,
+            "pause_position": self.offset
+        }
+    
+    def spans(self, length: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        """
+        Rangos [inicio, fin) de los chunks pendientes del paso actual
+        
+        El cursor avanza al consumir cada rango (offset = fin), de modo
+        que al interrumpir la iteración queda en el primer carácter no
+        enviado.
+        
+        Args:
+            length: Longitud del contenido del paso
+            chunk_size: Caracteres por chunk
+            
+        Yields:
+            tuple: (inicio, fin) absolutos dentro del contenido
+        """
+        self.offset = min(self.offset, length)
+        while self.offset < length:
+            end = min(self.offset + chunk_size, length)
+            yield self.offset, end
+            self.offset = end
+    
+    def next_step(self) -> None:
+        """Avanza al inicio del siguiente paso"""
+        self.step += 1
+        self.offset = 0
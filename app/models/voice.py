@@ -24,3 +24,23 @@ class VoiceInteraction:
             "confidence": self.confidence,
             "language": self.language
         }
+
+
+@dataclass(slots=True, frozen=True)
+class Transcript:
+    """Resultado de una transcripción (parcial o final)"""
+    text: str
+    confidence: float
+    language: str = "es"
+    duration_ms: int = 0
+    is_final: bool = False
+    
+    def to_dict(self) -> dict:
+        """Convierte a diccionario (payload de los eventos de voz)"""
+        return {
+            "transcription": self.text,
+            "confidence": round(self.confidence, 3),
+            "language": self.language,
+            "duration_ms": self.duration_ms,
+            "is_final": self.is_final
+        }
@@ -2,14 +2,19 @@
 Prompts modulares para IA
 Organiza todos los prompts del sistema en un solo lugar
 """
-from .exam_prompts import get_exam_question_prompt
-from .clarification_prompts import get_clarification_prompt
-from .follow_up_prompts import get_follow_up_prompt
+from .assembly import prompt_assembler
+from .exam_prompts import get_exam_question_prompt, get_exam_question_messages
+from .clarification_prompts import get_clarification_prompt, get_clarification_messages
+from .follow_up_prompts import get_follow_up_prompt, get_follow_up_messages
 from .question_prompts import get_free_question_prompt
 
 __all__ = [
+    'prompt_assembler',
     'get_exam_question_prompt',
+    'get_exam_question_messages',
     'get_clarification_prompt',
+    'get_clarification_messages',
     'get_follow_up_prompt',
+    'get_follow_up_messages',
     'get_free_question_prompt'
 ]
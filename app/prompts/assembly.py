@@ -0,0 +1,169 @@
+"""
+Ensamblado de prompts con prefijo estático cacheable
+
+Cada plantilla compila sus instrucciones estáticas (esquemas JSON,
+catálogos de canvas/component commands, tareas) una sola vez al
+importarse. Los mensajes se arman siempre como:
+
+    [system: prefijo estático idéntico] + [user: solo datos de la petición]
+
+Así el prefijo es byte a byte igual entre peticiones y el prompt caching
+del proveedor puede reutilizarlo.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.utils.tokens import count_tokens
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """Plantilla compilada: prefijo estático y su tamaño en tokens"""
+    name: str
+    system: str
+    system_tokens: int
+
+
+class PromptTemplateStats:
+    """Contadores de tokens por plantilla"""
+
+    def __init__(self):
+        self.requests = 0
+        self.suffix_tokens = 0
+        self.provider_prompt_tokens = 0
+        self.provider_cached_tokens = 0
+        self.provider_completion_tokens = 0
+
+    def to_dict(self, system_tokens: int) -> dict:
+        avg_suffix = self.suffix_tokens / self.requests if self.requests else 0.0
+        cached_ratio = (
+            self.provider_cached_tokens / self.provider_prompt_tokens
+            if self.provider_prompt_tokens else 0.0
+        )
+        return {
+            "requests": self.requests,
+            "prefix_tokens": system_tokens,
+            "avg_suffix_tokens": round(avg_suffix, 1),
+            "provider_prompt_tokens": self.provider_prompt_tokens,
+            "provider_cached_tokens": self.provider_cached_tokens,
+            "provider_completion_tokens": self.provider_completion_tokens,
+            "cached_token_ratio": round(cached_ratio, 4)
+        }
+
+
+class PromptAssembler:
+    """
+    Registro de plantillas compiladas
+
+    Responsabilidades:
+    - Compilar el prefijo estático de cada plantilla una sola vez
+    - Armar la lista de mensajes prefijo + sufijo
+    - Medir tokens locales del sufijo y tokens reportados por el proveedor
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        self.model = model
+        self._templates: Dict[str, CompiledPrompt] = {}
+        self._stats: Dict[str, PromptTemplateStats] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, system: str) -> CompiledPrompt:
+        """
+        Compila y registra una plantilla
+
+        Args:
+            name: Identificador de la plantilla
+            system: Instrucciones estáticas (sin datos de la petición)
+
+        Returns:
+            CompiledPrompt: Plantilla compilada
+        """
+        compiled = CompiledPrompt(
+            name=name,
+            system=system.strip(),
+            system_tokens=count_tokens(system.strip(), self.model)
+        )
+        with self._lock:
+            self._templates[name] = compiled
+            self._stats.setdefault(name, PromptTemplateStats())
+        return compiled
+
+    def get(self, name: str) -> CompiledPrompt:
+        """
+        Obtiene una plantilla compilada
+
+        Raises:
+            KeyError: Si la plantilla no está registrada
+        """
+        return self._templates[name]
+
+    def build_messages(self, name: str, user_content: str) -> List[dict]:
+        """
+        Arma los mensajes de chat para una plantilla
+
+        Args:
+            name: Identificador de la plantilla
+            user_content: Datos propios de la petición
+
+        Returns:
+            list: [{"role": "system", ...}, {"role": "user", ...}]
+        """
+        compiled = self.get(name)
+        suffix_tokens = count_tokens(user_content, self.model)
+
+        with self._lock:
+            stats = self._stats[name]
+            stats.requests += 1
+            stats.suffix_tokens += suffix_tokens
+
+        return [
+            {"role": "system", "content": compiled.system},
+            {"role": "user", "content": user_content}
+        ]
+
+    def record_usage(self, name: str, usage) -> None:
+        """
+        Registra el uso de tokens reportado por OpenAI para una plantilla
+
+        Args:
+            name: Identificador de la plantilla
+            usage: Objeto `usage` de la respuesta (puede ser None)
+        """
+        if usage is None or name not in self._stats:
+            return
+
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+
+        if not isinstance(prompt_tokens, int):
+            return
+
+        with self._lock:
+            stats = self._stats[name]
+            stats.provider_prompt_tokens += prompt_tokens
+            stats.provider_completion_tokens += int(completion_tokens or 0)
+            stats.provider_cached_tokens += int(cached_tokens or 0)
+
+    def stats(self, name: Optional[str] = None) -> dict:
+        """
+        Métricas de tokens por plantilla
+
+        Args:
+            name: Plantilla concreta (opcional, todas si no se indica)
+
+        Returns:
+            dict: {template_name: {...}} o las métricas de una plantilla
+        """
+        with self._lock:
+            if name is not None:
+                return self._stats[name].to_dict(self._templates[name].system_tokens)
+            return {
+                template: stats.to_dict(self._templates[template].system_tokens)
+                for template, stats in self._stats.items()
+            }
+
+
+prompt_assembler = PromptAssembler()
@@ -1,31 +1,17 @@
 """
 Prompts para aclaraciones rápidas durante explicaciones
 """
+from typing import Optional
 
+from app.prompts.assembly import prompt_assembler
 
-def get_clarification_prompt(
-    clarification_question: str,
-    current_context: dict,
-    response_mode: str = "brief"
-) -> str:
-    """
-    Genera prompt para responder una interrupción/aclaración según el modo solicitado
-    
-    Args:
-        clarification_question: Pregunta del usuario
-        current_context: Contexto actual (pregunta original, paso actual, etc)
-        response_mode: "brief" para respuesta corta o "detailed" para explicación en pasos
-        
-    Returns:
-        str: Prompt completo para la IA
-    """
-    
-    normalized_mode = (response_mode or "brief").strip().lower()
-    if normalized_mode not in {"brief", "detailed"}:
-        normalized_mode = "brief"
-    
-    if normalized_mode == "brief":
-        system_prompt = """Eres un profesor paciente que responde dudas rápidas durante una explicación.
+
+CLARIFICATION_TEMPLATES = {
+    "brief": "clarification_brief",
+    "detailed": "clarification_detailed"
+}
+
+CLARIFICATION_BRIEF_SYSTEM_PROMPT = """Eres un profesor paciente que responde dudas rápidas durante una explicación.
 
 MODO ACTUAL: BRIEF (respuesta corta)
 
@@ -48,9 +34,12 @@ REGLAS DEL FORMATO:
 - "message" debe contener la explicación directa.
 - Si necesitas diferir la respuesta, coloca "is_deferred" en true y usa el campo "reason" para explicar brevemente por qué.
 - No agregues campos adicionales.
-"""
-    else:
-        system_prompt = """Eres un profesor paciente que responde dudas detalladas durante una explicación.
+
+TAREA:
+Genera la respuesta a la duda del estudiante siguiendo exactamente el formato JSON indicado para el modo BRIEF.
+Asegúrate de que el JSON sea válido y no incluya comentarios ni texto adicional."""
+
+CLARIFICATION_DETAILED_SYSTEM_PROMPT = """Eres un profesor paciente que responde dudas detalladas durante una explicación.
 
 MODO ACTUAL: DETAILED (respuesta en pasos)
 
@@ -82,27 +71,87 @@ REGLAS DEL FORMATO:
 - Mantén "content_type" en "text" salvo que realmente se requiera otra variante.
 - Si agregas comandos, respeta las convenciones del proyecto (draw_equation, draw_image, etc.).
 - No agregues campos adicionales.
-"""
 
-    # Contexto de la explicación actual
-    context_info = f"""
-CONTEXTO ACTUAL:
+TAREA:
+Genera la respuesta a la duda del estudiante siguiendo exactamente el formato JSON indicado para el modo DETAILED.
+Asegúrate de que el JSON sea válido y no incluya comentarios ni texto adicional."""
+
+prompt_assembler.register(CLARIFICATION_TEMPLATES["brief"], CLARIFICATION_BRIEF_SYSTEM_PROMPT)
+prompt_assembler.register(CLARIFICATION_TEMPLATES["detailed"], CLARIFICATION_DETAILED_SYSTEM_PROMPT)
+
+
+def normalize_clarification_mode(response_mode: Optional[str]) -> str:
+    """Normaliza el modo de respuesta: "brief" o "detailed" (brief por defecto)"""
+    normalized_mode = (response_mode or "brief").strip().lower()
+    if normalized_mode not in CLARIFICATION_TEMPLATES:
+        normalized_mode = "brief"
+    return normalized_mode
+
+
+def get_clarification_user_prompt(clarification_question: str, current_context: dict) -> str:
+    """
+    Genera solo la parte variable del prompt (contexto y duda del estudiante)
+    
+    Args:
+        clarification_question: Pregunta del usuario
+        current_context: Contexto actual (pregunta original, paso actual, etc)
+        
+    Returns:
+        str: Sufijo del prompt con los datos de la petición
+    """
+    current_context = current_context or {}
+    return f"""CONTEXTO ACTUAL:
 Pregunta original: {current_context.get('original_question', 'N/A')}
 Paso actual: {current_context.get('current_step', 'N/A')}
 Tema: {current_context.get('topic', 'N/A')}
-"""
-
-    user_prompt = f"""{context_info}
-
-MODO SOLICITADO: {normalized_mode.upper()}
 
 DUDA DEL ESTUDIANTE:
 "{clarification_question}"
+"""
 
-TAREA:
-Genera la respuesta siguiendo exactamente el formato JSON indicado para el modo {normalized_mode.upper()}.
-Asegúrate de que el JSON sea válido y no incluya comentarios ni texto adicional."""
 
+def get_clarification_messages(
+    clarification_question: str,
+    current_context: dict,
+    response_mode: str = "brief"
+) -> list:
+    """
+    Genera los mensajes de chat (prefijo estático del modo + datos de la petición)
+    
+    Args:
+        clarification_question: Pregunta del usuario
+        current_context: Contexto actual de la explicación
+        response_mode: "brief" o "detailed"
+        
+    Returns:
+        list: Mensajes system + user para OpenAI
+    """
+    template = CLARIFICATION_TEMPLATES[normalize_clarification_mode(response_mode)]
+    return prompt_assembler.build_messages(
+        template,
+        get_clarification_user_prompt(clarification_question, current_context).strip()
+    )
+
+
+def get_clarification_prompt(
+    clarification_question: str,
+    current_context: dict,
+    response_mode: str = "brief"
+) -> str:
+    """
+    Genera prompt para responder una interrupción/aclaración según el modo solicitado
+    
+    Args:
+        clarification_question: Pregunta del usuario
+        current_context: Contexto actual (pregunta original, paso actual, etc)
+        response_mode: "brief" para respuesta corta o "detailed" para explicación en pasos
+        
+    Returns:
+        str: Prompt completo para la IA
+    """
+    template = CLARIFICATION_TEMPLATES[normalize_clarification_mode(response_mode)]
+    system_prompt = prompt_assembler.get(template).system
+    user_prompt = get_clarification_user_prompt(clarification_question, current_context)
     return f"{system_prompt}\n\n{user_prompt}"
 
 
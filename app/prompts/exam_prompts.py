@@ -1,21 +1,12 @@
 """
 Prompts para explicaciones de preguntas de examen
 """
+from app.prompts.assembly import prompt_assembler
 
 
-def get_exam_question_prompt(question: dict, user_answer: str = None) -> str:
-    """
-    Genera prompt para explicar una pregunta de examen
-    
-    Args:
-        question: Diccionario con datos de la pregunta
-        user_answer: Respuesta del usuario (opcional)
-        
-    Returns:
-        str: Prompt completo para la IA
-    """
-    
-    system_prompt = """Eres un profesor experto en preparación para exámenes de admisión (IPN).
+EXAM_QUESTION_TEMPLATE = "exam_explanation"
+
+EXAM_QUESTION_SYSTEM_PROMPT = """Eres un profesor experto en preparación para exámenes de admisión (IPN).
 Tu objetivo es explicar preguntas de examen de manera clara, paso a paso, usando un enfoque pedagógico.
 
 IMPORTANTE:
@@ -60,6 +51,9 @@ CANVAS COMMANDS - TIPOS SOPORTADOS:
 6. highlight - Resaltar elementos:
    {"command": "highlight", "parameters": {"text": "Texto importante", "color": "yellow", "description": "Punto clave"}}
 
+7. library - Plantilla de la "Biblioteca de canvas" (solo ids listados en el mensaje):
+   {"library": "parabola"}
+
 COMPONENT COMMANDS - COMPONENTES INTERACTIVOS SVELTE:
 
 Permiten abrir componentes reactivos que son interactivos y pueden cerrarse automáticamente.
@@ -115,8 +109,33 @@ REGLAS:
 - auto_close + duration: cierre automático en milisegundos
 - Siempre incluye "description" en cada comando
 - Si no hay: "canvas_commands": null, "component_commands": null
-"""
 
+TAREA:
+Genera una explicación paso a paso de la pregunta de examen que te envíe el estudiante. Explica:
+1. Qué conceptos se necesitan entender
+2. Cómo abordar el problema
+3. El proceso de solución paso a paso
+4. Por qué la respuesta correcta es la correcta
+5. Por qué las otras opciones son incorrectas (errores comunes)
+
+Genera la respuesta en formato JSON como se especificó arriba.
+Usa entre 3-5 pasos. Duración total estimada: 60-180 segundos."""
+
+prompt_assembler.register(EXAM_QUESTION_TEMPLATE, EXAM_QUESTION_SYSTEM_PROMPT)
+
+
+def get_exam_question_user_prompt(question: dict, user_answer: str = None, library_catalog: str = "") -> str:
+    """
+    Genera solo la parte variable del prompt (datos de la pregunta)
+    
+    Args:
+        question: Diccionario con datos de la pregunta
+        user_answer: Respuesta del usuario (opcional)
+        library_catalog: Plantillas de canvas referenciables (opcional)
+        
+    Returns:
+        str: Sufijo del prompt con los datos de la petición
+    """
     # Construir contexto de la pregunta
     question_context = f"""
 PREGUNTA DE EXAMEN:
@@ -146,20 +165,42 @@ Opciones:
         else:
             question_context += f"\n\nEl estudiante respondió: {user_answer.upper()} ✗ (INCORRECTO)"
     
-    user_prompt = f"""{question_context}
+    if library_catalog:
+        question_context += f"\n\n{library_catalog}"
+    
+    return question_context.strip()
 
-TAREA:
-Genera una explicación paso a paso de esta pregunta. Explica:
-1. Qué conceptos se necesitan entender
-2. Cómo abordar el problema
-3. El proceso de solución paso a paso
-4. Por qué la respuesta correcta es la correcta
-5. Por qué las otras opciones son incorrectas (errores comunes)
 
-Genera la respuesta en formato JSON como se especificó arriba.
-Usa entre 3-5 pasos. Duración total estimada: 60-180 segundos."""
+def get_exam_question_messages(question: dict, user_answer: str = None, library_catalog: str = "") -> list:
+    """
+    Genera los mensajes de chat (prefijo estático + datos de la pregunta)
+    
+    Args:
+        question: Diccionario con datos de la pregunta
+        user_answer: Respuesta del usuario (opcional)
+        library_catalog: Plantillas de canvas referenciables (opcional)
+        
+    Returns:
+        list: Mensajes system + user para OpenAI
+    """
+    return prompt_assembler.build_messages(
+        EXAM_QUESTION_TEMPLATE,
+        get_exam_question_user_prompt(question, user_answer, library_catalog)
+    )
 
-    return f"{system_prompt}\n\n{user_prompt}"
+
+def get_exam_question_prompt(question: dict, user_answer: str = None) -> str:
+    """
+    Genera prompt para explicar una pregunta de examen
+    
+    Args:
+        question: Diccionario con datos de la pregunta
+        user_answer: Respuesta del usuario (opcional)
+        
+    Returns:
+        str: Prompt completo para la IA
+    """
+    return f"{EXAM_QUESTION_SYSTEM_PROMPT}\n\n{get_exam_question_user_prompt(question, user_answer)}"
 
 
 def get_exam_question_system_prompt() -> str:
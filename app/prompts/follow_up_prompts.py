@@ -1,26 +1,12 @@
 """
 Prompts para preguntas adicionales (follow-up) después de explicaciones
 """
+from app.prompts.assembly import prompt_assembler
 
 
-def get_follow_up_prompt(
-    follow_up_question: str,
-    original_question: dict,
-    previous_explanation: dict = None
-) -> str:
-    """
-    Genera prompt para responder una pregunta adicional
-    
-    Args:
-        follow_up_question: Pregunta adicional del usuario
-        original_question: Pregunta de examen original
-        previous_explanation: Explicación previa (opcional)
-        
-    Returns:
-        str: Prompt completo para la IA
-    """
-    
-    system_prompt = """Eres un profesor experto que profundiza en temas después de explicar una pregunta de examen.
+FOLLOW_UP_TEMPLATE = "follow_up"
+
+FOLLOW_UP_SYSTEM_PROMPT = """Eres un profesor experto que profundiza en temas después de explicar una pregunta de examen.
 
 IMPORTANTE:
 - Esta es una pregunta ADICIONAL después de la explicación principal
@@ -65,8 +51,35 @@ EJEMPLO:
 }
 
 REGLAS: canvas_commands (visualizaciones estáticas), component_commands (componentes interactivos Svelte). Ambos pueden usarse juntos. auto_close + duration en ms. Siempre "description"
-"""
 
+TAREA:
+Responde la pregunta adicional del estudiante de manera completa y detallada.
+- Usa 3-5 pasos
+- Relaciona con la pregunta de examen original
+- Incluye visualizaciones si ayudan a entender mejor
+- Duración estimada: 60-120 segundos
+
+Genera la respuesta en formato JSON como se especificó arriba."""
+
+prompt_assembler.register(FOLLOW_UP_TEMPLATE, FOLLOW_UP_SYSTEM_PROMPT)
+
+
+def get_follow_up_user_prompt(
+    follow_up_question: str,
+    original_question: dict,
+    previous_explanation: dict = None
+) -> str:
+    """
+    Genera solo la parte variable del prompt (contexto y pregunta adicional)
+    
+    Args:
+        follow_up_question: Pregunta adicional del usuario
+        original_question: Pregunta de examen original
+        previous_explanation: Explicación previa (opcional)
+        
+    Returns:
+        str: Sufijo del prompt con los datos de la petición
+    """
     # Contexto de la pregunta original
     context_info = f"""
 PREGUNTA DE EXAMEN ORIGINAL:
@@ -87,17 +100,55 @@ Respuesta correcta: {original_question.get('correct_answer', '').upper()}
 
 PREGUNTA ADICIONAL DEL ESTUDIANTE:
 "{follow_up_question}"
+"""
 
-TAREA:
-Responde esta pregunta adicional de manera completa y detallada.
-- Usa 3-5 pasos
-- Relaciona con la pregunta de examen original
-- Incluye visualizaciones si ayudan a entender mejor
-- Duración estimada: 60-120 segundos
+    return user_prompt.strip()
 
-Genera la respuesta en formato JSON como se especificó arriba."""
 
-    return f"{system_prompt}\n\n{user_prompt}"
+def get_follow_up_messages(
+    follow_up_question: str,
+    original_question: dict,
+    previous_explanation: dict = None
+) -> list:
+    """
+    Genera los mensajes de chat (prefijo estático + datos de la petición)
+    
+    Args:
+        follow_up_question: Pregunta adicional del usuario
+        original_question: Pregunta de examen original
+        previous_explanation: Explicación previa (opcional)
+        
+    Returns:
+        list: Mensajes system + user para OpenAI
+    """
+    return prompt_assembler.build_messages(
+        FOLLOW_UP_TEMPLATE,
+        get_follow_up_user_prompt(follow_up_question, original_question, previous_explanation)
+    )
+
+
+def get_follow_up_prompt(
+    follow_up_question: str,
+    original_question: dict,
+    previous_explanation: dict = None
+) -> str:
+    """
+    Genera prompt para responder una pregunta adicional
+    
+    Args:
+        follow_up_question: Pregunta adicional del usuario
+        original_question: Pregunta de examen original
+        previous_explanation: Explicación previa (opcional)
+        
+    Returns:
+        str: Prompt completo para la IA
+    """
+    user_prompt = get_follow_up_user_prompt(
+        follow_up_question,
+        original_question,
+        previous_explanation
+    )
+    return f"{FOLLOW_UP_SYSTEM_PROMPT}\n\n{user_prompt}"
 
 
 def get_follow_up_system_prompt() -> str:
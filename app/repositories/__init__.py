@@ -2,5 +2,6 @@
 Repositorios de acceso a datos
 """
 from .ai_answers_repo import AIAnswersRepository
+from .canvas_library_repo import CanvasLibraryRepository
 from .exam_explanation_repo import ExamExplanationRepository
 from .question_repo import QuestionRepository
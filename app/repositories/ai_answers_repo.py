@@ -1,26 +1,72 @@
 """
 Repositorio de respuestas IA
 """
+import uuid
+from datetime import datetime
+from typing import Optional, Union
+
 from app.extensions import get_supabase
+from app.models.answer import Answer, InvalidStepError
+from app.utils.cache import TieredCache, answers_cache
+from app.utils.metrics import instrument_repository
+from app.utils.write_behind import get_write_buffer
 
 
+@instrument_repository
 class AIAnswersRepository:
     """Acceso a datos de respuestas IA"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[TieredCache] = None):
+        """
+        Inicializa el repositorio
+        
+        Args:
+            cache: Cache de respuestas (opcional, usa answers_cache si no se provee)
+        """
         self.supabase = get_supabase()
         self.table = "ai_answers"
+        self.write_buffer = get_write_buffer(self.table, ("question_hash",))
+        self.cache = cache if cache is not None else answers_cache
     
     def get_by_hash(self, question_hash: str) -> dict:
         """
         Busca una respuesta por hash de pregunta
         
+        Las respuestas con pasos se cachean (comprimidas en Redis): una
+        pregunta repetida no vuelve a traer el mismo answer_steps de Supabase.
+        
         Args:
             question_hash: SHA256 de la pregunta normalizada
             
         Returns:
             dict: Respuesta o None
         """
+        pending = self.write_buffer.get_pending(question_hash)
+        if pending:
+            return pending
+        
+        return self.cache.get_or_load(question_hash, lambda: self._fetch_by_hash(question_hash))
+    
+    def get_answer(self, question_hash: str) -> Optional[Answer]:
+        """
+        Busca una respuesta por hash y la devuelve como modelo validado
+        
+        Args:
+            question_hash: SHA256 de la pregunta normalizada
+            
+        Returns:
+            Answer | None: Respuesta o None (también si la fila está corrupta)
+        """
+        row = self.get_by_hash(question_hash)
+        if not row:
+            return None
+        try:
+            return Answer.from_dict(row)
+        except InvalidStepError as e:
+            print(f"⚠ Respuesta {question_hash[:12]} con pasos inválidos: {e}")
+            return None
+    
+    def _fetch_by_hash(self, question_hash: str) -> Optional[dict]:
         try:
             response = self.supabase.table(self.table)\
                 .select("*")\
@@ -39,26 +85,30 @@ class AIAnswersRepository:
             print(f"Error buscando respuesta: {e}")
             return None
     
-    def create(self, data: dict) -> dict:
+    def create(self, data: Union[dict, Answer]) -> dict:
         """
-        Crea una nueva respuesta IA
+        Crea una nueva respuesta IA (escritura diferida en lote)
+        
+        El id se genera aquí para poder devolver el registro sin esperar
+        a la base de datos; el upsert por question_hash conserva la
+        primera respuesta si dos workers generan la misma pregunta.
         
         Args:
-            data: Datos de la respuesta
+            data: Datos de la respuesta (dict o Answer)
             
         Returns:
             dict: Respuesta creada
         """
-        try:
-            response = self.supabase.table(self.table)\
-                .insert(data)\
-                .execute()
-            
-            return response.data[0] if response.data else None
-            
-        except Exception as e:
-            print(f"Error creando respuesta: {e}")
-            return None
+        if isinstance(data, Answer):
+            data = data.to_dict()
+        record = {
+            "id": str(uuid.uuid4()),
+            "usage_count": 0,
+            "created_at": datetime.utcnow().isoformat(),
+            **data
+        }
+        self.write_buffer.enqueue(record)
+        return record
     
     def increment_usage(self, answer_id: str):
         """
@@ -122,3 +172,26 @@ class AIAnswersRepository:
                     
         except Exception as e:
             print(f"Error actualizando votos: {e}")
+    
+    def search(self, tsquery: str, limit: int = 20):
+        """
+        Búsqueda de texto completo en respuestas generadas (función search_ai_answers)
+        
+        Args:
+            tsquery: Expresión to_tsquery (ver build_tsquery)
+            limit: Número de resultados
+            
+        Returns:
+            list | None: Respuestas con su rank, o None si hubo error
+        """
+        try:
+            response = self.supabase.rpc("search_ai_answers", {
+                "p_query": tsquery,
+                "p_limit": limit
+            }).execute()
+            
+            return response.data if response.data else []
+            
+        except Exception as e:
+            print(f"Error buscando respuestas: {e}")
+            return None
@@ -1,27 +1,39 @@
 """Repositorio de respuestas breves de IA."""
+import uuid
+from datetime import datetime
 from typing import Optional
 
 from app.extensions import get_supabase
+from app.utils.metrics import instrument_repository
+from app.utils.write_behind import get_write_buffer
 
 
+@instrument_repository
 class AIBriefAnswersRepository:
     """Acceso a datos para respuestas breves de aclaraciones"""
 
     def __init__(self):
         self.supabase = get_supabase()
         self.table = "ai_brief_answers"
+        self.write_buffer = get_write_buffer(self.table, ("question_hash", "context_hash"))
+
+    def get_by_hash(self, question_hash: str, context_hash: Optional[str] = None) -> Optional[dict]:
+        """Busca una respuesta breve por hash de aclaración y, si se indica, de contexto."""
+        if context_hash is not None:
+            pending = self.write_buffer.get_pending(question_hash, context_hash)
+            if pending:
+                return pending
 
-    def get_by_hash(self, question_hash: str) -> Optional[dict]:
-        """Busca una respuesta breve por hash normalizado de aclaración."""
         try:
-            response = (
+            query = (
                 self.supabase.table(self.table)
                 .select("*")
                 .eq("question_hash", question_hash)
-                .single()
-                .execute()
             )
-            return response.data if response.data else None
+            if context_hash is not None:
+                query = query.eq("context_hash", context_hash)
+            response = query.limit(1).execute()
+            return response.data[0] if response.data else None
         except Exception as exc:  # pylint: disable=broad-except
             error_str = str(exc)
             if "PGRST116" in error_str or "0 rows" in error_str:
@@ -30,13 +42,14 @@ class AIBriefAnswersRepository:
             return None
 
     def create(self, data: dict) -> Optional[dict]:
-        """Inserta una nueva respuesta breve cacheada."""
-        try:
-            response = self.supabase.table(self.table).insert(data).execute()
-            return response.data[0] if response.data else None
-        except Exception as exc:  # pylint: disable=broad-except
-            print(f"Error creando respuesta breve: {exc}")
-            return None
+        """Encola una nueva respuesta breve (upsert diferido por question_hash + context_hash)."""
+        record = {
+            "id": str(uuid.uuid4()),
+            "created_at": datetime.utcnow().isoformat(),
+            **data
+        }
+        self.write_buffer.enqueue(record)
+        return record
 
     def increment_usage(self, record_id: str):
         """Incrementa contador de uso para métricas."""
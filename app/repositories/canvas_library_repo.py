@@ -0,0 +1,72 @@
+"""
+Repositorio de la biblioteca de canvas (plantillas de comandos reutilizables)
+"""
+from typing import Dict
+
+from app.extensions import get_supabase
+from app.utils.metrics import instrument_repository
+
+
+@instrument_repository
+class CanvasLibraryRepository:
+    """Acceso a datos de canvas_library"""
+
+    FIELDS = "id, slug, name, category, subject, description, commands, tags"
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self.table = "canvas_library"
+
+    def get_all(self) -> list:
+        """
+        Obtiene todas las plantillas (la biblioteca es pequeña y se carga completa)
+
+        Returns:
+            list: [{id, slug, name, category, subject, description, commands, tags}]
+        """
+        try:
+            response = self.supabase.table(self.table)\
+                .select(self.FIELDS)\
+                .execute()
+
+            return response.data if response.data else []
+
+        except Exception as e:
+            print(f"Error obteniendo biblioteca de canvas: {e}")
+            return []
+
+    def increment_usage(self, counts: Dict[str, int]):
+        """
+        Suma referencias al contador de uso de varias plantillas
+
+        Args:
+            counts: {slug: referencias}
+        """
+        if not counts:
+            return
+
+        slugs = list(counts)
+        try:
+            # Usar RPC de Supabase para incrementar atómicamente en una llamada
+            self.supabase.rpc(
+                "increment_canvas_usage",
+                {"p_slugs": slugs, "p_counts": [counts[slug] for slug in slugs]}
+            ).execute()
+
+        except Exception as e:
+            # Si la función RPC no existe, hacerlo manualmente
+            print(f"increment_canvas_usage no disponible, actualizando por fila: {e}")
+            try:
+                rows = self.supabase.table(self.table)\
+                    .select("slug, usage_count")\
+                    .in_("slug", slugs)\
+                    .execute()
+
+                for row in rows.data or []:
+                    self.supabase.table(self.table)\
+                        .update({"usage_count": (row.get("usage_count") or 0) + counts[row["slug"]]})\
+                        .eq("slug", row["slug"])\
+                        .execute()
+
+            except Exception as inner_e:
+                print(f"Error incrementando uso de biblioteca de canvas: {inner_e}")
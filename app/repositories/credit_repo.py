@@ -0,0 +1,75 @@
+"""Repositorio de créditos (profiles y credit_usage) en Supabase."""
+from typing import List, Optional
+
+from app.extensions import get_supabase
+from app.utils.metrics import instrument_repository
+
+
+@instrument_repository
+class CreditRepository:
+    """Acceso a datos de saldo y uso de créditos"""
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self.profiles_table = "profiles"
+        self.usage_table = "credit_usage"
+
+    def get_profile_credits(self, user_id: str) -> Optional[dict]:
+        """Obtiene saldo, límite diario y versión de créditos del perfil."""
+        try:
+            response = (
+                self.supabase.table(self.profiles_table)
+                .select(
+                    "credits_remaining, daily_limit, daily_used, last_reset_date, credits_version"
+                )
+                .eq("id", user_id)
+                .single()
+                .execute()
+            )
+            return response.data
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error obteniendo créditos del perfil: {exc}")
+            return None
+
+    def settle_usage_batch(self, rows: List[dict]) -> bool:
+        """
+        Liquida un lote de credit_usage con la función settle_credit_usage.
+
+        La función inserta los movimientos (ignorando reservation_id ya
+        liquidados) y descuenta de profiles solo los insertados, como
+        incrementos: reintentar un lote no cobra dos veces y no pisa
+        cambios de saldo hechos fuera del ledger (compras, ajustes).
+        """
+        if not rows:
+            return True
+        try:
+            self.supabase.rpc("settle_credit_usage", {"p_rows": rows}).execute()
+            return True
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error liquidando uso de créditos: {exc}")
+            return False
+
+    def check_credits(self, user_id: str, credits_needed: int) -> bool:
+        """Llama a la función check_credits (fallback sin Redis)."""
+        try:
+            response = self.supabase.rpc("check_credits", {
+                "p_user_id": user_id,
+                "p_credits_needed": credits_needed
+            }).execute()
+            return bool(response.data)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error verificando créditos: {exc}")
+            return True
+
+    def consume_credits(self, user_id: str, credits: int, action_type: str) -> bool:
+        """Llama a la función consume_credits (fallback sin Redis)."""
+        try:
+            response = self.supabase.rpc("consume_credits", {
+                "p_user_id": user_id,
+                "p_credits": credits,
+                "p_action_type": action_type
+            }).execute()
+            return bool(response.data)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error consumiendo créditos: {exc}")
+            return False
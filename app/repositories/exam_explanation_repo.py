@@ -1,20 +1,36 @@
 """
 Repositorio para explicaciones de preguntas de examen
 """
-from typing import Optional
+import uuid
+from datetime import datetime
+from typing import Optional, Union
 from app.extensions import get_supabase
+from app.models.answer import InvalidStepError
+from app.models.explanation import ExamExplanation
+from app.utils.cache import TieredCache, explanations_cache
+from app.utils.metrics import instrument_repository
+from app.utils.write_behind import get_write_buffer
 
 
+@instrument_repository
 class ExamExplanationRepository:
     """Acceso a datos de explicaciones de examen"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[TieredCache] = None):
+        """
+        Inicializa el repositorio
+        
+        Args:
+            cache: Cache de explicaciones (opcional, usa explanations_cache si no se provee)
+        """
         self.supabase = get_supabase()
         self.table = "exam_question_explanations"
+        self.write_buffer = get_write_buffer(self.table, ("question_id",))
+        self.cache = cache if cache is not None else explanations_cache
     
     def get_by_question_id(self, question_id: str) -> Optional[dict]:
         """
-        Busca explicación por ID de pregunta
+        Busca explicación por ID de pregunta (cacheada, comprimida en Redis)
         
         Args:
             question_id: UUID de la pregunta
@@ -22,6 +38,32 @@ class ExamExplanationRepository:
         Returns:
             dict: Explicación o None
         """
+        pending = self.write_buffer.get_pending(question_id)
+        if pending:
+            return pending
+        
+        return self.cache.get_or_load(question_id, lambda: self._fetch_by_question_id(question_id))
+    
+    def get_explanation(self, question_id: str) -> Optional[ExamExplanation]:
+        """
+        Busca explicación por ID de pregunta como modelo validado
+        
+        Args:
+            question_id: UUID de la pregunta
+            
+        Returns:
+            ExamExplanation | None: Explicación o None (también si la fila está corrupta)
+        """
+        row = self.get_by_question_id(question_id)
+        if not row:
+            return None
+        try:
+            return ExamExplanation.from_dict(row)
+        except (InvalidStepError, KeyError) as e:
+            print(f"⚠ Explicación de {question_id} inválida: {e}")
+            return None
+    
+    def _fetch_by_question_id(self, question_id: str) -> Optional[dict]:
         try:
             response = self.supabase.table(self.table)\
                 .select("*")\
@@ -58,26 +100,25 @@ class ExamExplanationRepository:
             print(f"Error obteniendo explicación: {e}")
             return None
     
-    def create(self, data: dict) -> Optional[dict]:
+    def create(self, data: Union[dict, ExamExplanation]) -> Optional[dict]:
         """
-        Crea una nueva explicación
+        Crea una nueva explicación (escritura diferida en lote)
         
         Args:
-            data: Datos de la explicación
+            data: Datos de la explicación (dict o ExamExplanation)
             
         Returns:
-            dict: Explicación creada
-        """
-        try:
-            response = self.supabase.table(self.table)\
-                .insert(data)\
-                .execute()
-            
-            return response.data[0] if response.data else None
-            
-        except Exception as e:
-            print(f"Error creando explicación: {e}")
-            return None
+            dict: Explicación creada (con id generado localmente)
+        """
+        if isinstance(data, ExamExplanation):
+            data = data.to_dict()
+        record = {
+            "id": str(uuid.uuid4()),
+            "created_at": datetime.utcnow().isoformat(),
+            **data
+        }
+        self.write_buffer.enqueue(record)
+        return record
     
     def increment_usage(self, explanation_id: str):
         """
@@ -0,0 +1,45 @@
+"""Repositorio de interacciones y sesiones de estudio en Supabase."""
+from typing import List
+
+from app.extensions import get_supabase
+from app.utils.metrics import instrument_repository
+
+
+@instrument_repository
+class InteractionRepository:
+    """Inserciones por lote en interactions y study_sessions"""
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self.interactions_table = "interactions"
+        self.study_sessions_table = "study_sessions"
+
+    def insert_interactions(self, rows: List[dict]) -> bool:
+        """
+        Inserta varias interacciones en una sola petición.
+
+        Las filas traen un id estable: si el lote se reprocesa,
+        las que ya existen se ignoran.
+        """
+        return self._upsert_batch(self.interactions_table, rows)
+
+    def insert_study_sessions(self, rows: List[dict]) -> bool:
+        """
+        Inserta resúmenes de sesión (id = session_id) en una sola petición.
+
+        Una sesión reclamada tras reconectar vuelve a cerrarse más tarde:
+        el resumen existente se reemplaza por el acumulado.
+        """
+        return self._upsert_batch(self.study_sessions_table, rows, ignore_duplicates=False)
+
+    def _upsert_batch(self, table: str, rows: List[dict], ignore_duplicates: bool = True) -> bool:
+        if not rows:
+            return True
+        try:
+            self.supabase.table(table).upsert(
+                rows, on_conflict="id", ignore_duplicates=ignore_duplicates
+            ).execute()
+            return True
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error insertando lote en {table}: {exc}")
+            return False
@@ -0,0 +1,57 @@
+"""Repositorio de progreso por materia (user_progress) en Supabase."""
+from typing import List, Optional
+
+from app.extensions import get_supabase
+from app.utils.metrics import instrument_repository
+
+
+@instrument_repository
+class ProgressRepository:
+    """Acceso a datos de user_progress"""
+
+    COLUMNS = "subject, total_practiced, total_correct, mastery_level, streak_days, last_practice_at"
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self.table = "user_progress"
+
+    def get_by_user(self, user_id: str) -> List[dict]:
+        """Obtiene el progreso de todas las materias del usuario."""
+        try:
+            response = (
+                self.supabase.table(self.table)
+                .select(self.COLUMNS)
+                .eq("user_id", user_id)
+                .execute()
+            )
+            return response.data or []
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error obteniendo progreso: {exc}")
+            return []
+
+    def get(self, user_id: str, subject: str) -> Optional[dict]:
+        """Obtiene el progreso de una materia."""
+        try:
+            response = (
+                self.supabase.table(self.table)
+                .select(self.COLUMNS)
+                .eq("user_id", user_id)
+                .eq("subject", subject)
+                .limit(1)
+                .execute()
+            )
+            return response.data[0] if response.data else None
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error obteniendo progreso de {subject}: {exc}")
+            return None
+
+    def upsert_batch(self, rows: List[dict]) -> bool:
+        """Escribe varios agregados en una sola petición (ON CONFLICT user_id, subject)."""
+        if not rows:
+            return True
+        try:
+            self.supabase.table(self.table).upsert(rows, on_conflict="user_id,subject").execute()
+            return True
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Error guardando progreso: {exc}")
+            return False
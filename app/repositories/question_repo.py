@@ -2,8 +2,10 @@
 Repositorio de preguntas del banco
 """
 from app.extensions import get_supabase
+from app.utils.metrics import instrument_repository
 
 
+@instrument_repository
 class QuestionRepository:
     """Acceso a datos de preguntas"""
     
@@ -113,6 +115,94 @@ class QuestionRepository:
             print(f"Error obteniendo pregunta aleatoria: {e}")
             return None
     
+    def get_stats_by_subject(self, subject: str, page_size: int = 1000) -> list:
+        """
+        Obtiene las columnas de selección de todas las preguntas de una materia
+        
+        Pagina con range() para no quedar limitado por el máximo de filas
+        por respuesta de PostgREST.
+        
+        Args:
+            subject: Nombre de la materia
+            page_size: Filas por petición
+            
+        Returns:
+            list: [{id, difficulty, times_seen, times_correct, exam_probability}]
+        """
+        rows = []
+        try:
+            while True:
+                response = self.supabase.table(self.table)\
+                    .select("id, difficulty, times_seen, times_correct, exam_probability")\
+                    .eq("subject", subject)\
+                    .order("id")\
+                    .range(len(rows), len(rows) + page_size - 1)\
+                    .execute()
+                
+                page = response.data or []
+                rows.extend(page)
+                
+                if len(page) < page_size:
+                    return rows
+                    
+        except Exception as e:
+            print(f"Error obteniendo estadísticas por materia: {e}")
+            return rows
+    
+    def search(self, tsquery: str, subject: str = None, limit: int = 20):
+        """
+        Búsqueda de texto completo (función search_questions, índices GIN)
+        
+        Args:
+            tsquery: Expresión to_tsquery (ver build_tsquery)
+            subject: Filtrar por materia (opcional)
+            limit: Número de resultados
+            
+        Returns:
+            list | None: Preguntas con su rank, o None si hubo error
+        """
+        try:
+            response = self.supabase.rpc("search_questions", {
+                "p_query": tsquery,
+                "p_subject": subject,
+                "p_limit": limit
+            }).execute()
+            
+            return response.data if response.data else []
+            
+        except Exception as e:
+            print(f"Error buscando preguntas: {e}")
+            return None
+    
+    def get_search_corpus(self, page_size: int = 1000) -> list:
+        """
+        Obtiene los campos de búsqueda de todo el banco (índice local)
+        
+        Args:
+            page_size: Filas por petición
+            
+        Returns:
+            list: [{id, code, subject, topic, difficulty, question}]
+        """
+        rows = []
+        try:
+            while True:
+                response = self.supabase.table(self.table)\
+                    .select("id, code, subject, topic, difficulty, question")\
+                    .order("id")\
+                    .range(len(rows), len(rows) + page_size - 1)\
+                    .execute()
+                
+                page = response.data or []
+                rows.extend(page)
+                
+                if len(page) < page_size:
+                    return rows
+                    
+        except Exception as e:
+            print(f"Error obteniendo banco para búsqueda: {e}")
+            return rows
+    
     def increment_stats(self, question_id: str, correct: bool = False):
         """
         Incrementa estadísticas de una pregunta
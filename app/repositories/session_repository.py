@@ -1,17 +1,46 @@
 """
-Repositorio para operaciones CRUD de sesiones en Redis
+Almacén de sesiones en Redis (único punto de acceso a session:{id})
+
+Cada sesión es un HASH con un campo por atributo (valores en JSON), así
+que actualizar campos es un HSET pipelinado con la renovación del TTL y
+del índice, sin leer y reescribir el documento completo.
+
+Los valores pasan por app.utils.codec: los campos del HASH usan siempre
+JSON (orjson si está disponible) y la respuesta guardada usa REDIS_CODEC
+(msgpack va por un cliente sin decode_responses).
 """
-import json
+import time
 from typing import Optional
 from redis import Redis
+from redis.exceptions import ResponseError
+from app.models.session import SessionData
+from app.utils.codec import CodecError, binary_client, decode, get_codec
+from app.utils.metrics import instrument_repository
+
 
+class SessionNotFoundError(Exception):
+    """Excepción cuando se actualiza una sesión que no existe"""
+    pass
 
+
+@instrument_repository
 class SessionRepository:
     """
     Maneja operaciones directas con Redis para sesiones
-    Formato: session:{session_id}
+    Formato: session:{session_id} (HASH)
+    (más session_answer:{session_id} y reconnect:{token} para reconexión)
+    
+    Índice de sesiones activas (se mantiene en la misma transacción que
+    cada escritura, sin KEYS):
+    - sessions:active       ZSET session_id -> vencimiento (última actividad + TTL)
+    - sessions:user:{id}    SET de session_ids del usuario
+    
+    Las sesiones escritas como JSON (formato anterior) se convierten a
+    HASH la primera vez que se leen o actualizan.
     """
     
+    USER_INDEX_TTL = 86400  # 24 horas
+    
     def __init__(self, redis_client: Redis):
         """
         Inicializa el repositorio con cliente Redis
@@ -21,11 +50,72 @@ class SessionRepository:
         """
         self.redis = redis_client
         self.key_prefix = "session:"
+        self.answer_prefix = "session_answer:"
+        self.reconnect_prefix = "reconnect:"
+        self.index_key = "sessions:active"
+        self.user_index_prefix = "sessions:user:"
+        self.field_codec = get_codec(binary=False)
+        self.answer_codec = get_codec(compressed=True)
+        self._answer_redis = None
+    
+    @property
+    def answer_redis(self):
+        """Cliente para session_answer:* (sin decode_responses: puede estar comprimida)"""
+        if self._answer_redis is None:
+            self._answer_redis = binary_client(self.redis)
+        return self._answer_redis
+    
+    def _index(self, pipe, session_id: str, ttl: int, user_id: Optional[str] = None) -> None:
+        """Agrega al pipeline la actualización del índice de sesiones activas"""
+        pipe.zadd(self.index_key, {session_id: time.time() + ttl})
+        if user_id:
+            user_key = f"{self.user_index_prefix}{user_id}"
+            pipe.sadd(user_key, session_id)
+            # Los miembros vencidos se limpian al consultar (get_user_sessions)
+            pipe.expire(user_key, self.USER_INDEX_TTL)
     
     def _get_key(self, session_id: str) -> str:
         """Genera la key completa para Redis"""
         return f"{self.key_prefix}{session_id}"
     
+    def _encode(self, data: dict) -> dict:
+        encode = self.field_codec.encode
+        return {field: encode(value) for field, value in data.items()}
+    
+    @staticmethod
+    def _decode(raw: dict) -> SessionData:
+        record = {}
+        for field, value in raw.items():
+            try:
+                record[field] = decode(value)
+            except CodecError:
+                record[field] = value
+        return record
+    
+    @staticmethod
+    def _is_wrong_type(error: Exception) -> bool:
+        return isinstance(error, ResponseError) and "WRONGTYPE" in str(error)
+    
+    def _migrate_legacy(self, session_id: str) -> Optional[SessionData]:
+        """Convierte una sesión JSON (string) al formato HASH conservando su TTL"""
+        key = self._get_key(session_id)
+        pipe = self.redis.pipeline()
+        pipe.get(key)
+        pipe.ttl(key)
+        data, ttl = pipe.execute()
+        if data is None:
+            return None
+        
+        record = decode(data)
+        pipe = self.redis.pipeline()
+        pipe.delete(key)
+        if record:
+            pipe.hset(key, mapping=self._encode(record))
+            if ttl and ttl > 0:
+                pipe.expire(key, ttl)
+        pipe.execute()
+        return record
+    
     def create(self, session_id: str, data: dict, ttl: int = 1800) -> bool:
         """
         Crea una nueva sesión en Redis con TTL
@@ -43,12 +133,18 @@ class SessionRepository:
         """
         try:
             key = self._get_key(session_id)
-            json_data = json.dumps(data, default=str)
-            return self.redis.setex(key, ttl, json_data)
+            pipe = self.redis.pipeline()
+            pipe.delete(key)
+            if data:
+                pipe.hset(key, mapping=self._encode(data))
+            pipe.expire(key, ttl)
+            self._index(pipe, session_id, ttl, data.get("user_id"))
+            pipe.execute()
+            return bool(data)
         except Exception as e:
             raise Exception(f"Error creando sesión en Redis: {str(e)}")
     
-    def get(self, session_id: str) -> Optional[dict]:
+    def get(self, session_id: str) -> Optional[SessionData]:
         """
         Obtiene una sesión de Redis
         
@@ -59,23 +155,52 @@ class SessionRepository:
             dict | None: Datos de la sesión o None si no existe/expiró
         """
         try:
-            key = self._get_key(session_id)
-            data = self.redis.get(key)
-            
-            if data is None:
-                return None
-            
-            return json.loads(data)
-        except json.JSONDecodeError as e:
-            print(f"Error decodificando sesión {session_id}: {e}")
+            raw = self.redis.hgetall(self._get_key(session_id))
+            return self._decode(raw) if raw else None
+        except Exception as e:
+            if self._is_wrong_type(e):
+                return self._migrate_legacy(session_id)
+            print(f"Error obteniendo sesión {session_id}: {e}")
             return None
+    
+    def get_and_touch(self, session_id: str, fields: dict, ttl: int = 1800) -> Optional[SessionData]:
+        """
+        Lee la sesión y actualiza campos (p. ej. last_activity) en un solo round-trip
+        
+        Args:
+            session_id: ID de la sesión
+            fields: Campos a escribir
+            ttl: Nuevo TTL en segundos
+            
+        Returns:
+            dict | None: Sesión con los campos aplicados, o None si no existe
+        """
+        key = self._get_key(session_id)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hgetall(key)
+            pipe.hset(key, mapping=self._encode(fields))
+            pipe.expire(key, ttl)
+            self._index(pipe, session_id, ttl)
+            raw = pipe.execute()[0]
         except Exception as e:
+            if self._is_wrong_type(e) and self._migrate_legacy(session_id) is not None:
+                return self.get_and_touch(session_id, fields, ttl)
             print(f"Error obteniendo sesión {session_id}: {e}")
             return None
+        
+        if not raw:
+            # No existía: deshacer la escritura parcial
+            self._discard(session_id)
+            return None
+        
+        record = self._decode(raw)
+        record.update(fields)
+        return record
     
     def update(self, session_id: str, data: dict, ttl: int = 1800) -> bool:
         """
-        Actualiza una sesión existente (merge con datos actuales)
+        Actualiza campos de una sesión existente (HSET, sin leer el documento)
         
         Args:
             session_id: ID de la sesión
@@ -86,25 +211,34 @@ class SessionRepository:
             bool: True si se actualizó exitosamente
             
         Raises:
-            Exception: Si la sesión no existe o hay error
+            SessionNotFoundError: Si la sesión no existe
+            Exception: Si hay error en Redis
         """
+        key = self._get_key(session_id)
         try:
-            # Obtener sesión actual
-            current_data = self.get(session_id)
-            
-            if current_data is None:
-                raise Exception(f"Sesión {session_id} no existe")
-            
-            # Merge datos
-            current_data.update(data)
-            
-            # Guardar con TTL renovado
-            key = self._get_key(session_id)
-            json_data = json.dumps(current_data, default=str)
-            return self.redis.setex(key, ttl, json_data)
-            
+            pipe = self.redis.pipeline()
+            pipe.exists(key)
+            if data:
+                pipe.hset(key, mapping=self._encode(data))
+            pipe.expire(key, ttl)
+            self._index(pipe, session_id, ttl)
+            existed = pipe.execute()[0]
         except Exception as e:
+            if self._is_wrong_type(e) and self._migrate_legacy(session_id) is not None:
+                return self.update(session_id, data, ttl)
             raise Exception(f"Error actualizando sesión: {str(e)}")
+        
+        if not existed:
+            self._discard(session_id)
+            raise SessionNotFoundError(f"Sesión {session_id} no existe")
+        
+        return True
+    
+    def _discard(self, session_id: str) -> None:
+        pipe = self.redis.pipeline()
+        pipe.delete(self._get_key(session_id))
+        pipe.zrem(self.index_key, session_id)
+        pipe.execute()
     
     def delete(self, session_id: str) -> bool:
         """
@@ -117,8 +251,10 @@ class SessionRepository:
             bool: True si se eliminó (o no existía)
         """
         try:
-            key = self._get_key(session_id)
-            self.redis.delete(key)
+            pipe = self.redis.pipeline()
+            pipe.delete(self._get_key(session_id), f"{self.answer_prefix}{session_id}")
+            pipe.zrem(self.index_key, session_id)
+            pipe.execute()
             return True
         except Exception as e:
             print(f"Error eliminando sesión {session_id}: {e}")
@@ -137,7 +273,10 @@ class SessionRepository:
         """
         try:
             key = self._get_key(session_id)
-            return self.redis.expire(key, ttl)
+            pipe = self.redis.pipeline()
+            pipe.expire(key, ttl)
+            pipe.zadd(self.index_key, {session_id: time.time() + ttl}, xx=True)
+            return bool(pipe.execute()[0])
         except Exception as e:
             print(f"Error renovando TTL de sesión {session_id}: {e}")
             return False
@@ -176,18 +315,225 @@ class SessionRepository:
             print(f"Error obteniendo TTL de sesión {session_id}: {e}")
             return -2
     
+    # ==================== SNAPSHOT / RECONEXIÓN ====================
+    
+    def save_answer(self, session_id: str, answer_data: dict, ttl: int = 1800) -> bool:
+        """
+        Guarda la respuesta que se está transmitiendo (para reanudar sin DB ni IA)
+        Formato: session_answer:{session_id}
+        
+        Args:
+            session_id: ID de la sesión
+            answer_data: {steps, total_duration, question_hash}
+            ttl: Tiempo de vida en segundos
+            
+        Returns:
+            bool: True si se guardó
+        """
+        try:
+            key = f"{self.answer_prefix}{session_id}"
+            return bool(self.answer_redis.setex(key, ttl, self.answer_codec.encode(answer_data)))
+        except Exception as e:
+            print(f"Error guardando respuesta de sesión {session_id}: {e}")
+            return False
+    
+    def get_answer(self, session_id: str) -> Optional[dict]:
+        """
+        Obtiene la respuesta guardada de una sesión
+        
+        Args:
+            session_id: ID de la sesión
+            
+        Returns:
+            dict | None: answer_data o None si no existe
+        """
+        try:
+            return decode(self.answer_redis.get(f"{self.answer_prefix}{session_id}"))
+        except Exception as e:
+            print(f"Error obteniendo respuesta de sesión {session_id}: {e}")
+            return None
+    
+    def set_snapshot_ttl(self, session_id: str, ttl: int) -> bool:
+        """
+        Aplica el mismo TTL a la sesión y a su respuesta guardada
+        
+        Args:
+            session_id: ID de la sesión
+            ttl: Tiempo de vida en segundos
+            
+        Returns:
+            bool: True si la sesión existe
+        """
+        try:
+            pipe = self.redis.pipeline()
+            pipe.expire(self._get_key(session_id), ttl)
+            pipe.expire(f"{self.answer_prefix}{session_id}", ttl)
+            pipe.zadd(self.index_key, {session_id: time.time() + ttl}, xx=True)
+            session_renewed, *_ = pipe.execute()
+            return bool(session_renewed)
+        except Exception as e:
+            print(f"Error renovando snapshot de sesión {session_id}: {e}")
+            return False
+    
+    def save_reconnect_token(self, token: str, session_id: str, ttl: int) -> bool:
+        """
+        Asocia un token de reconexión a una sesión suspendida
+        Formato: reconnect:{token} -> session_id
+        
+        Args:
+            token: Token de reconexión
+            session_id: ID de la sesión
+            ttl: Periodo de gracia en segundos
+            
+        Returns:
+            bool: True si se guardó
+        """
+        try:
+            return bool(self.redis.setex(f"{self.reconnect_prefix}{token}", ttl, session_id))
+        except Exception as e:
+            print(f"Error guardando token de reconexión: {e}")
+            return False
+    
+    def pop_reconnect_token(self, token: str) -> Optional[str]:
+        """
+        Consume un token de reconexión (GETDEL: solo un socket puede usarlo)
+        
+        Args:
+            token: Token de reconexión
+            
+        Returns:
+            str | None: session_id o None si no existe o expiró
+        """
+        try:
+            return self.redis.getdel(f"{self.reconnect_prefix}{token}")
+        except Exception as e:
+            print(f"Error consumiendo token de reconexión: {e}")
+            return None
+    
+    # ==================== ÍNDICE DE SESIONES ACTIVAS ====================
+    
     def get_all_sessions(self) -> list[str]:
         """
-        Obtiene todos los IDs de sesiones activas (para debugging)
+        Obtiene todos los IDs de sesiones activas (índice, sin KEYS)
         
         Returns:
-            list[str]: Lista de session_ids
+            list[str]: Lista de session_ids no vencidos
         """
         try:
-            pattern = f"{self.key_prefix}*"
-            keys = self.redis.keys(pattern)
-            # Remover el prefijo de cada key
-            return [key.replace(self.key_prefix, "") for key in keys]
+            return self.redis.zrangebyscore(self.index_key, time.time(), "+inf")
         except Exception as e:
             print(f"Error obteniendo todas las sesiones: {e}")
             return []
+    
+    def count_active(self, within: Optional[int] = None) -> int:
+        """
+        Cuenta las sesiones activas en O(log N)
+        
+        Args:
+            within: Si se indica, solo las que vencen en los próximos N segundos
+            
+        Returns:
+            int: Número de sesiones
+        """
+        try:
+            now = time.time()
+            return self.redis.zcount(self.index_key, now, now + within if within is not None else "+inf")
+        except Exception as e:
+            print(f"Error contando sesiones activas: {e}")
+            return 0
+    
+    def get_user_sessions(self, user_id: str) -> list[str]:
+        """
+        Obtiene las sesiones activas de un usuario
+        
+        Los miembros vencidos del índice por usuario se eliminan al consultar.
+        
+        Args:
+            user_id: UUID del usuario
+            
+        Returns:
+            list[str]: session_ids activos del usuario
+        """
+        try:
+            user_key = f"{self.user_index_prefix}{user_id}"
+            session_ids = list(self.redis.smembers(user_key))
+            if not session_ids:
+                return []
+            
+            now = time.time()
+            scores = self.redis.zmscore(self.index_key, session_ids)
+            active = [sid for sid, score in zip(session_ids, scores) if score is not None and score > now]
+            stale = [sid for sid, score in zip(session_ids, scores) if score is None or score <= now]
+            if stale:
+                self.redis.srem(user_key, *stale)
+            return active
+        except Exception as e:
+            print(f"Error obteniendo sesiones del usuario {user_id}: {e}")
+            return []
+    
+    def sweep_expired(self) -> int:
+        """
+        Elimina del índice las sesiones vencidas
+        
+        O(log N + M) con M sesiones eliminadas. Las keys session:* ya
+        expiraron por TTL; esto solo mantiene el índice.
+        
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        try:
+            return self.redis.zremrangebyscore(self.index_key, "-inf", time.time())
+        except Exception as e:
+            print(f"Error limpiando índice de sesiones: {e}")
+            return 0
+    
+    def rebuild_index(self, batch_size: int = 500) -> int:
+        """
+        Reconstruye el índice recorriendo session:* con SCAN
+        
+        Alternativa incremental a KEYS (no bloquea Redis): para sesiones
+        creadas antes de existir el índice o si el índice se perdió.
+        
+        Args:
+            batch_size: Keys por iteración de SCAN
+            
+        Returns:
+            int: Número de sesiones indexadas
+        """
+        indexed = 0
+        try:
+            batch = []
+            for key in self.redis.scan_iter(match=f"{self.key_prefix}*", count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    indexed += self._index_keys(batch)
+                    batch = []
+            if batch:
+                indexed += self._index_keys(batch)
+        except Exception as e:
+            print(f"Error reconstruyendo índice de sesiones: {e}")
+        return indexed
+    
+    def _index_keys(self, keys: list) -> int:
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+            pipe.hget(key, "user_id")
+        results = pipe.execute(raise_on_error=False)
+        
+        pipe = self.redis.pipeline(transaction=False)
+        indexed = 0
+        for key, ttl, user_id in zip(keys, results[::2], results[1::2]):
+            if not isinstance(ttl, int) or ttl <= 0:
+                continue
+            session_id = key[len(self.key_prefix):]
+            if isinstance(user_id, Exception):
+                # Formato anterior (JSON): convertir y leer el usuario
+                record = self._migrate_legacy(session_id) or {}
+                user_id = record.get("user_id")
+            elif user_id is not None:
+                user_id = decode(user_id)
+            self._index(pipe, session_id, ttl, user_id)
+            indexed += 1
+        pipe.execute()
+        return indexed
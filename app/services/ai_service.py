@@ -4,17 +4,99 @@ Genera respuestas estructuradas en formato JSON
 """
 import json
 import os
-from typing import Optional, Dict
+import time
+from typing import Optional, Dict, Iterator, List, Tuple
 
 from openai import OpenAI
 from app.config import Config
 from app.prompts import (
-    get_exam_question_prompt,
-    get_clarification_prompt,
-    get_follow_up_prompt
+    get_exam_question_messages,
+    get_clarification_messages,
+    get_follow_up_messages
 )
+from app.prompts.assembly import prompt_assembler
+from app.prompts.clarification_prompts import CLARIFICATION_TEMPLATES, normalize_clarification_mode
+from app.prompts.exam_prompts import EXAM_QUESTION_TEMPLATE
+from app.prompts.follow_up_prompts import FOLLOW_UP_TEMPLATE
 from app.repositories.ai_brief_answers_repo import AIBriefAnswersRepository
-from app.utils.text_processing import normalize_text, generate_hash
+from app.services.canvas_library_service import canvas_library
+from app.services.token_budget_service import TokenBudgetService, token_budget_service
+from app.utils.cache import brief_answers_cache
+from app.utils.canvas_commands import prepare_steps
+from app.utils.json_repair import RepairStats, loads_tolerant
+from app.utils.json_stream import StreamingJSONParser
+from app.utils.metrics import instrument_ai, record_tokens
+from app.utils.text_processing import normalize_text, generate_hash, canonical_json
+
+
+ANSWER_TEMPLATE = "free_answer"
+
+ANSWER_SYSTEM_PROMPT = """Eres un tutor experto del IPN/UNAM que explica conceptos académicos paso a paso.
+
+IMPORTANTE: Debes responder ÚNICAMENTE con un objeto JSON válido, sin texto adicional antes o después.
+
+El JSON debe tener esta estructura EXACTA:
+{
+    "steps": [
+        {
+            "title": "Título descriptivo del paso",
+            "type": "text",
+            "content": "Explicación detallada del paso",
+            "canvas_commands": []
+        }
+    ],
+    "total_duration": 120
+}
+
+Tipos de paso disponibles:
+- "text": Explicación textual
+- "math": Fórmulas o ecuaciones matemáticas (usa LaTeX)
+- "image": Descripción de diagrama o imagen necesaria
+
+Para canvas_commands, usa comandos como:
+- {"command": "draw_equation", "parameters": {"equation": "E = mc^2"}}
+- {"command": "draw_graph", "parameters": {"function": "y = x^2", "x_range": [-5, 5]}}
+- {"command": "draw_diagram", "parameters": {"type": "flowchart", "data": {"nodes": ["A", "B"], "connections": [[0, 1]]}}}
+- {"command": "draw_table", "parameters": {"headers": ["x", "y"], "rows": [["1", "2"]]}}
+- {"command": "highlight", "parameters": {"text": "Punto clave"}}
+
+Si el mensaje incluye una "Biblioteca de canvas", usa {"library": "<id>"} para esos diagramas en lugar de describirlos con comandos.
+
+Calcula total_duration como: (número de pasos * 30) segundos.
+
+Responde SOLO con el JSON, sin explicaciones adicionales."""
+
+prompt_assembler.register(ANSWER_TEMPLATE, ANSWER_SYSTEM_PROMPT)
+
+JSON_FIX_TEMPLATE = "json_fix"
+
+JSON_FIX_SYSTEM_PROMPT = """Eres un corrector de JSON. Recibirás una salida que debía ser un objeto JSON con esta estructura:
+{
+    "steps": [
+        {"title": "...", "type": "text|math|image", "content": "...", "canvas_commands": []}
+    ],
+    "total_duration": 120
+}
+
+Corrige ÚNICAMENTE la sintaxis y la estructura indicada en el error. No cambies ni resumas el contenido de los pasos.
+
+Responde SOLO con el JSON corregido, sin explicaciones adicionales."""
+
+prompt_assembler.register(JSON_FIX_TEMPLATE, JSON_FIX_SYSTEM_PROMPT)
+
+# Métricas de parseo/reparación de generate_answer (compartidas entre instancias)
+answer_repair_stats = RepairStats()
+
+
+def _prepare_steps(steps) -> int:
+    """
+    Valida los comandos de los pasos generados y las referencias a la biblioteca de canvas
+
+    Returns:
+        int: Comandos descartados
+    """
+    dropped = prepare_steps(steps)
+    return dropped + canvas_library.resolve_steps(steps)
 
 
 class AIResponseError(Exception):
@@ -46,16 +128,41 @@ class AIService:
     """
     
     DEFAULT_MODEL = "gpt-4o-mini"  # Soporta response_format json_object
-    MAX_TOKENS = 3000
+    MAX_TOKENS = 3000  # Techo; el presupuesto real lo calcula TokenBudgetService
     TEMPERATURE = 0.7
-    MAX_RETRY_ATTEMPTS = 2
+    MAX_RETRY_ATTEMPTS = 2  # Llamadas de corrección de JSON, no regeneraciones
+    
+    VALID_STEP_TYPES = ["text", "image", "math"]
+    STEP_DURATION_SECONDS = 30
+    
+    # Tipos que el modelo devuelve a veces en lugar de los válidos (normalizados)
+    STEP_TYPE_ALIASES = {
+        "equation": "math",
+        "ecuacion": "math",
+        "formula": "math",
+        "latex": "math",
+        "diagram": "image",
+        "diagrama": "image",
+        "imagen": "image",
+        "graph": "image",
+        "grafica": "image",
+        "canvas": "image"
+    }
+    
+    # Campos del contexto que realmente cambian una aclaración breve
+    CLARIFICATION_CONTEXT_FIELDS = ("original_question", "current_step", "topic")
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        budget_service: Optional[TokenBudgetService] = None
+    ):
         """
         Inicializa el servicio de IA
         
         Args:
             api_key: API key de OpenAI (opcional, usa env si no se provee)
+            budget_service: Presupuesto de tokens (opcional, usa el compartido)
         """
         if api_key is None:
             api_key = os.getenv('OPENAI_API_KEY') or Config.OPENAI_API_KEY
@@ -64,11 +171,16 @@ class AIService:
             raise ValueError("OPENAI_API_KEY no está configurada")
         
         self.client = OpenAI(api_key=api_key)
+        self.budget = budget_service or token_budget_service
     
     def build_prompt(self, question: str, context: Optional[Dict] = None) -> Dict[str, str]:
         """
         Construye el prompt system + user para OpenAI
         
+        El system es el prefijo estático compilado (cacheable por el proveedor);
+        el user contiene solo la pregunta, su contexto y las plantillas
+        relevantes de la biblioteca de canvas.
+        
         Args:
             question: Pregunta del usuario
             context: Contexto adicional (opcional)
@@ -76,37 +188,6 @@ class AIService:
         Returns:
             dict: {"system": "...", "user": "..."}
         """
-        system_prompt = """Eres un tutor experto del IPN/UNAM que explica conceptos académicos paso a paso.
-
-IMPORTANTE: Debes responder ÚNICAMENTE con un objeto JSON válido, sin texto adicional antes o después.
-
-El JSON debe tener esta estructura EXACTA:
-{
-    "steps": [
-        {
-            "title": "Título descriptivo del paso",
-            "type": "text",
-            "content": "Explicación detallada del paso",
-            "canvas_commands": []
-        }
-    ],
-    "total_duration": 120
-}
-
-Tipos de paso disponibles:
-- "text": Explicación textual
-- "math": Fórmulas o ecuaciones matemáticas (usa LaTeX)
-- "image": Descripción de diagrama o imagen necesaria
-
-Para canvas_commands, usa comandos como:
-- {"type": "draw_axis", "x": 50, "y": 200}
-- {"type": "plot_function", "function": "x^2", "color": "#3498db"}
-- {"type": "draw_triangle", "points": [[100,100], [200,100], [150,50]]}
-
-Calcula total_duration como: (número de pasos * 30) segundos.
-
-Responde SOLO con el JSON, sin explicaciones adicionales."""
-
         user_prompt = f"""Pregunta: {question}"""
         
         if context:
@@ -116,14 +197,19 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
                 user_prompt += f"\nNivel: {context['difficulty']}"
             if context.get("previous_questions"):
                 user_prompt += f"\nPreguntas previas: {context['previous_questions']}"
-        
-        user_prompt += "\n\nGenera la respuesta en formato JSON como se especificó."
+
+        library_catalog = canvas_library.catalog(question, (context or {}).get("subject"))
+        if library_catalog:
+            user_prompt += f"\n\n{library_catalog}"
+
+        system_message, user_message = prompt_assembler.build_messages(ANSWER_TEMPLATE, user_prompt)
         
         return {
-            "system": system_prompt,
-            "user": user_prompt
+            "system": system_message["content"],
+            "user": user_message["content"]
         }
     
+    @instrument_ai("generate_answer")
     def generate_answer(self, question: str, context: Optional[Dict] = None) -> Dict:
         """
         Genera una respuesta estructurada usando OpenAI
@@ -131,8 +217,9 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
         Flujo:
         1. Construye prompt con build_prompt()
         2. Llama a OpenAI ChatCompletions
-        3. Parsea JSON de forma segura
-        4. Si falla, reintenta hasta 2 veces
+        3. Parsea JSON de forma tolerante y repara defectos recuperables
+           (texto extra, arrays sin cerrar, type inválido, total_duration faltante)
+        4. Si no es recuperable, pide una corrección barata del JSON (hasta 2 veces)
         5. Si sigue fallando, lanza excepción
         
         Args:
@@ -150,45 +237,69 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
             JSONParseError: Si no se puede parsear JSON después de reintentos
         """
         prompts = self.build_prompt(question, context)
+        context = context or {}
+        max_tokens = self.budget.estimate(
+            "answer",
+            question,
+            subject=context.get("subject"),
+            difficulty=context.get("difficulty")
+        )
+        
+        try:
+            # Llamar a OpenAI
+            response = self._call_openai(prompts["system"], prompts["user"], max_tokens)
+        except AIResponseError as e:
+            print(f"❌ Error de OpenAI: {e}")
+            raise
         
         for attempt in range(self.MAX_RETRY_ATTEMPTS + 1):
             try:
-                # Llamar a OpenAI
-                response = self._call_openai(prompts["system"], prompts["user"])
-                
-                # Parsear JSON
-                parsed_response = self._parse_json_response(response)
+                # Parsear JSON y reparar localmente lo recuperable
+                parsed_response, repairs = self._parse_answer(response)
                 
                 # Validar estructura
                 self._validate_response_structure(parsed_response)
                 
+                # Validar comandos y precalcular gráficas una sola vez
+                if _prepare_steps(parsed_response["steps"]):
+                    repairs.append("canvas_commands")
+                
+                answer_repair_stats.record_response(repairs, fixed_by_call=attempt > 0)
                 return parsed_response
                 
             except JSONParseError as e:
-                if attempt < self.MAX_RETRY_ATTEMPTS:
-                    print(f"⚠ Intento {attempt + 1} falló al parsear JSON: {e}")
-                    print(f"🔄 Reintentando... ({attempt + 2}/{self.MAX_RETRY_ATTEMPTS + 1})")
-                    continue
-                else:
+                if attempt >= self.MAX_RETRY_ATTEMPTS:
+                    answer_repair_stats.record_failure()
                     print(f"❌ Falló después de {self.MAX_RETRY_ATTEMPTS + 1} intentos")
                     raise JSONParseError(
                         f"No se pudo parsear JSON después de {self.MAX_RETRY_ATTEMPTS + 1} intentos: {e}"
                     )
-            
-            except AIResponseError as e:
-                print(f"❌ Error de OpenAI: {e}")
-                raise
+                
+                print(f"⚠ Intento {attempt + 1} no recuperable localmente: {e}")
+                print(f"🔧 Pidiendo corrección del JSON... ({attempt + 2}/{self.MAX_RETRY_ATTEMPTS + 1})")
+                
+                try:
+                    response = self._request_json_fix(response, str(e))
+                except AIResponseError as fix_error:
+                    print(f"❌ Error de OpenAI: {fix_error}")
+                    raise
         
         # No debería llegar aquí, pero por seguridad
         raise AIResponseError("Error inesperado generando respuesta")
     
-    def _call_openai(self, system_prompt: str, user_prompt: str) -> str:
+    def _call_openai(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: Optional[int] = None
+    ) -> str:
         """
         Llama a la API de OpenAI
         
         Args:
             system_prompt: Prompt del sistema
             user_prompt: Prompt del usuario
+            max_tokens: Presupuesto de salida (opcional, default MAX_TOKENS)
             
         Returns:
             str: Respuesta de OpenAI
@@ -197,19 +308,16 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
             AIResponseError: Si la llamada falla
         """
         try:
-            response = self.client.chat.completions.create(
-                model=self.DEFAULT_MODEL,
+            content = self._create_completion(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=self.TEMPERATURE,
-                max_tokens=self.MAX_TOKENS,
-                response_format={"type": "json_object"}  # Forzar JSON en GPT-4
+                template=ANSWER_TEMPLATE,
+                request_type="answer",
+                max_tokens=max_tokens or self.MAX_TOKENS
             )
             
-            content = response.choices[0].message.content
-            
             if not content:
                 raise AIResponseError("OpenAI retornó respuesta vacía")
             
@@ -218,53 +326,181 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
         except Exception as e:
             raise AIResponseError(f"Error llamando a OpenAI: {str(e)}")
     
-    def _parse_json_response(self, response: str) -> Dict:
+    def _request_json_fix(self, broken_response: str, error: str) -> str:
         """
-        Parsea la respuesta JSON de forma segura
+        Pide al modelo que corrija un JSON irrecuperable localmente
+        
+        Es mucho más barato que regenerar: el prompt es corto, la temperatura
+        es 0 y el presupuesto depende solo del tamaño del JSON a corregir.
         
         Args:
-            response: String de respuesta de OpenAI
+            broken_response: Salida que no se pudo reparar
+            error: Motivo del fallo (parseo o validación)
             
         Returns:
-            dict: JSON parseado
+            str: JSON corregido por el modelo
             
         Raises:
-            JSONParseError: Si no se puede parsear
+            AIResponseError: Si la llamada falla
         """
+        started = time.monotonic()
         try:
-            # Intentar parsear directamente
-            return json.loads(response)
+            messages = prompt_assembler.build_messages(
+                JSON_FIX_TEMPLATE,
+                f"Error: {error}\n\nJSON a corregir:\n{broken_response}"
+            )
+            return self._create_completion(
+                messages,
+                template=JSON_FIX_TEMPLATE,
+                request_type="json_fix",
+                max_tokens=self.budget.estimate("json_fix", broken_response),
+                temperature=0
+            )
+        except Exception as e:
+            raise AIResponseError(f"Error llamando a OpenAI: {str(e)}")
+        finally:
+            answer_repair_stats.record_fix_call((time.monotonic() - started) * 1000)
+    
+    def _create_completion(
+        self,
+        messages: list,
+        template: str,
+        request_type: str,
+        max_tokens: int,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None
+    ) -> str:
+        """
+        Ejecuta una completion JSON y continúa las respuestas truncadas
+        
+        Si OpenAI corta la respuesta por longitud (finish_reason == "length"),
+        en lugar de descartarla se pide una continuación reutilizando el mismo
+        prefijo de mensajes y se concatena el texto.
+        
+        Args:
+            messages: Mensajes de chat (system + user)
+            template: Plantilla de prompt (para métricas de tokens)
+            request_type: Tipo de petición (para métricas de presupuesto)
+            max_tokens: Presupuesto inicial de salida
+            model: Modelo de OpenAI (opcional)
+            temperature: Temperatura (opcional, default TEMPERATURE)
             
-        except json.JSONDecodeError as e:
-            # Intentar reparación básica
-            try:
-                repaired = self._attempt_json_repair(response)
-                return json.loads(repaired)
-            except:
-                raise JSONParseError(f"No se pudo parsear JSON: {e}")
+        Returns:
+            str: Contenido completo generado
+        """
+        model = model or self.DEFAULT_MODEL
+        temperature = self.TEMPERATURE if temperature is None else temperature
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}  # Forzar JSON en GPT-4
+        )
+        usage = getattr(response, "usage", None)
+        prompt_assembler.record_usage(template, usage)
+        record_tokens(request_type, usage)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        
+        choice = response.choices[0]
+        content = choice.message.content or ""
+        continuations = 0
+        
+        while (
+            getattr(choice, "finish_reason", None) == "length"
+            and continuations < self.budget.MAX_CONTINUATIONS
+        ):
+            continuations += 1
+            print(f"✂ Respuesta truncada ({request_type}), continuación {continuations}")
+            
+            # Sin response_format: la continuación es un fragmento, no un JSON completo
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages + [
+                    {"role": "assistant", "content": content},
+                    {"role": "user", "content": TokenBudgetService.CONTINUATION_PROMPT}
+                ],
+                temperature=temperature,
+                max_tokens=self.budget.continuation_budget(request_type)
+            )
+            usage = getattr(response, "usage", None)
+            prompt_assembler.record_usage(template, usage)
+            record_tokens(request_type, usage)
+            if isinstance(completion_tokens, int) and isinstance(
+                getattr(usage, "completion_tokens", None), int
+            ):
+                completion_tokens += usage.completion_tokens
+            
+            choice = response.choices[0]
+            content += choice.message.content or ""
+        
+        self.budget.record_result(
+            request_type,
+            budget=max_tokens,
+            continuations=continuations,
+            completed=getattr(choice, "finish_reason", None) != "length",
+            completion_tokens=completion_tokens
+        )
+        
+        return content
+    
+    def _parse_answer(self, response: str) -> Tuple[Dict, List[str]]:
+        """
+        Parsea una respuesta de generate_answer reparando defectos recuperables
+        
+        Args:
+            response: String de respuesta de OpenAI
+            
+        Returns:
+            tuple: (respuesta parseada, lista de reparaciones aplicadas)
+            
+        Raises:
+            JSONParseError: Si el texto no contiene JSON recuperable
+        """
+        try:
+            parsed, syntax_repaired = loads_tolerant(response)
+        except (json.JSONDecodeError, TypeError) as e:
+            raise JSONParseError(f"No se pudo parsear JSON: {e}")
+        
+        repairs = ["syntax"] if syntax_repaired else []
+        repairs.extend(self._normalize_response_structure(parsed))
+        
+        return parsed, repairs
     
-    def _attempt_json_repair(self, response: str) -> str:
+    def _normalize_response_structure(self, response: Dict) -> List[str]:
         """
-        Intenta reparar JSON malformado
+        Corrige en sitio defectos de estructura que no requieren al modelo
+        
+        - type de un paso inválido o faltante: alias conocido o "text"
+        - total_duration faltante o no numérico: número de pasos * 30
         
         Args:
-            response: String con JSON potencialmente malformado
+            response: Respuesta parseada (se modifica en sitio)
             
         Returns:
-            str: JSON reparado
+            list: Reparaciones aplicadas
         """
-        # Quitar texto antes del primer {
-        if '{' in response:
-            response = response[response.index('{'):]
+        repairs = []
+        if not isinstance(response, dict) or not isinstance(response.get("steps"), list):
+            return repairs
         
-        # Quitar texto después del último }
-        if '}' in response:
-            response = response[:response.rindex('}') + 1]
+        steps = response["steps"]
+        for step in steps:
+            if not isinstance(step, dict) or step.get("type") in self.VALID_STEP_TYPES:
+                continue
+            alias = normalize_text(str(step.get("type") or ""))
+            step["type"] = self.STEP_TYPE_ALIASES.get(alias, "text")
+            repairs.append("step_type")
         
-        # Quitar markdown code blocks si existen
-        response = response.replace('```json', '').replace('```', '')
+        duration = response.get("total_duration")
+        if not isinstance(duration, (int, float)) or isinstance(duration, bool):
+            try:
+                response["total_duration"] = int(float(duration))
+            except (TypeError, ValueError):
+                response["total_duration"] = len(steps) * self.STEP_DURATION_SECONDS
+            repairs.append("total_duration")
         
-        return response.strip()
+        return repairs
     
     def _validate_response_structure(self, response: Dict) -> None:
         """
@@ -298,11 +534,10 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
                 if field not in step:
                     raise JSONParseError(f"Step {i} no tiene campo '{field}'")
             
-            valid_types = ["text", "image", "math"]
-            if step["type"] not in valid_types:
+            if step["type"] not in self.VALID_STEP_TYPES:
                 raise JSONParseError(
                     f"Step {i} tiene type inválido: {step['type']}. "
-                    f"Debe ser uno de: {valid_types}"
+                    f"Debe ser uno de: {self.VALID_STEP_TYPES}"
                 )
         
         if "total_duration" not in response:
@@ -311,6 +546,7 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
         if not isinstance(response["total_duration"], (int, float)):
             raise JSONParseError("'total_duration' debe ser un número")
     
+    @instrument_ai("generate_exam_explanation")
     def generate_exam_explanation(
         self,
         question: dict,
@@ -331,22 +567,29 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
                 "total_duration": int
             }
         """
-        prompt = get_exam_question_prompt(question, user_answer)
-        model = model or self.DEFAULT_MODEL
+        library_catalog = canvas_library.catalog(
+            f"{question.get('topic') or ''} {question.get('question') or ''}",
+            question.get('subject')
+        )
+        messages = get_exam_question_messages(question, user_answer, library_catalog)
+        options_text = " ".join(str(value) for value in (question.get('options') or {}).values())
+        max_tokens = self.budget.estimate(
+            "exam_explanation",
+            f"{question.get('question', '')} {options_text}",
+            subject=question.get('subject'),
+            difficulty=question.get('difficulty')
+        )
         
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.MAX_TOKENS,
-                temperature=self.TEMPERATURE,
-                response_format={"type": "json_object"}
+            content = self._create_completion(
+                messages,
+                template=EXAM_QUESTION_TEMPLATE,
+                request_type="exam_explanation",
+                max_tokens=max_tokens,
+                model=model
             )
-            
-            content = response.choices[0].message.content
-            parsed = json.loads(content)
+            parsed, _ = loads_tolerant(content)
+            _prepare_steps(parsed.get("explanation_steps"))
             
             return parsed
             
@@ -354,6 +597,7 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
             print(f"Error generando explicación de examen: {e}")
             raise AIResponseError(f"Error al generar explicación: {str(e)}")
     
+    @instrument_ai("generate_clarification")
     def generate_clarification(
         self,
         clarification_question: str,
@@ -375,83 +619,351 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
                 - brief: {"mode": "brief", "message": str, "is_deferred": bool, "reason": Optional[str]}
                 - detailed: {"mode": "detailed", "clarification_steps": [...], "total_duration": int}
         """
-        prompt = get_clarification_prompt(
+        response_mode = normalize_clarification_mode(response_mode)
+        cache_repo: Optional[AIBriefAnswersRepository] = None
+        cache_meta = None
+
+        if response_mode == "brief":
+            cache_repo, cache_meta, cached = self._lookup_brief_clarification(
+                clarification_question,
+                current_context
+            )
+            if cached:
+                return cached
+
+        messages, template, request_type, max_tokens = self._prepare_clarification_request(
             clarification_question,
             current_context,
-            response_mode=response_mode
+            response_mode
         )
-        model = model or self.DEFAULT_MODEL
 
+        try:
+            content = self._create_completion(
+                messages,
+                template=template,
+                request_type=request_type,
+                max_tokens=max_tokens,
+                model=model
+            )
+            parsed, _ = loads_tolerant(content)
+
+            if response_mode == "brief":
+                self._store_brief_clarification(cache_repo, cache_meta, parsed)
+            else:
+                _prepare_steps(parsed.get("clarification_steps"))
+
+            return parsed
+            
+        except Exception as e:
+            print(f"Error generando aclaración: {e}")
+            raise AIResponseError(f"Error al generar aclaración: {str(e)}")
+    
+    @instrument_ai("stream_clarification", streaming=True)
+    def stream_clarification(
+        self,
+        clarification_question: str,
+        current_context: dict,
+        response_mode: str = "brief",
+        model: str = None
+    ) -> Iterator[Dict]:
+        """
+        Genera una aclaración consumiendo el stream de tokens de OpenAI
+        
+        Los pasos (detailed) y el texto del mensaje (brief) se entregan en cuanto
+        el modelo los termina de escribir, sin esperar al JSON completo.
+        
+        Args:
+            clarification_question: Pregunta del usuario
+            current_context: Contexto actual de la explicación
+            response_mode: "brief" o "detailed"
+            model: Modelo de OpenAI a usar (opcional)
+            
+        Yields:
+            dict: Eventos en orden de llegada
+                - {"type": "message_delta", "text": str} (brief)
+                - {"type": "step", "step": dict} (detailed)
+                - {"type": "complete", "response": dict} (siempre al final)
+                
+        Raises:
+            AIResponseError: Si OpenAI falla o la respuesta no es JSON válido
+        """
+        response_mode = normalize_clarification_mode(response_mode)
         cache_repo: Optional[AIBriefAnswersRepository] = None
-        cache_entry = None
         cache_meta = None
 
         if response_mode == "brief":
-            cache_repo = AIBriefAnswersRepository()
-            cache_meta = self._build_clarification_cache_meta(
+            cache_repo, cache_meta, cached = self._lookup_brief_clarification(
                 clarification_question,
                 current_context
             )
-            cache_entry = cache_repo.get_by_hash(cache_meta["question_hash"])
+            if cached:
+                yield {"type": "message_delta", "text": cached.get("message") or ""}
+                yield {"type": "complete", "response": cached}
+                return
 
-            if cache_entry:
-                cache_repo.increment_usage(cache_entry["id"])
-                return {
-                    "mode": "brief",
-                    "message": cache_entry.get("message"),
-                    "is_deferred": cache_entry.get("is_deferred", False),
-                    "reason": cache_entry.get("reason")
-                }
+        messages, template, request_type, max_tokens = self._prepare_clarification_request(
+            clarification_question,
+            current_context,
+            response_mode
+        )
+        parser = StreamingJSONParser(
+            stream_strings=("message",),
+            stream_arrays=("clarification_steps",)
+        )
+        streamed_steps = 0
+        finish_reason = None
 
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,  # Más corto para aclaraciones
+            stream = self.client.chat.completions.create(
+                model=model or self.DEFAULT_MODEL,
+                messages=messages,
+                max_tokens=max_tokens,
                 temperature=self.TEMPERATURE,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                stream=True,
+                stream_options={"include_usage": True}
             )
 
-            content = response.choices[0].message.content
-            parsed = json.loads(content)
-
-            if response_mode == "brief" and parsed.get("mode", "brief") == "brief":
-                message = parsed.get("message")
-                if message and cache_repo and cache_meta:
-                    cache_repo.create({
-                        "question_hash": cache_meta["question_hash"],
-                        "normalized_question": cache_meta["normalized_question"],
-                        "context_hash": cache_meta["context_hash"],
-                        "context_data": cache_meta["context_data"],
-                        "message": message,
-                        "is_deferred": parsed.get("is_deferred", False),
-                        "reason": parsed.get("reason"),
-                        "usage_count": 1
-                    })
+            for chunk in stream:
+                if not chunk.choices:
+                    # Último chunk (include_usage): solo trae el uso de tokens
+                    usage = getattr(chunk, "usage", None)
+                    prompt_assembler.record_usage(template, usage)
+                    record_tokens(request_type, usage)
+                    continue
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
 
-            return parsed
-            
+                for kind, _, value in parser.feed(choice.delta.content or ""):
+                    if kind == "string_delta":
+                        yield {"type": "message_delta", "text": value}
+                    else:
+                        streamed_steps += 1
+                        _prepare_steps([value])
+                        yield {"type": "step", "step": value}
+
+            parsed, _ = loads_tolerant(parser.text)
         except Exception as e:
-            print(f"Error generando aclaración: {e}")
+            print(f"Error generando aclaración en streaming: {e}")
             raise AIResponseError(f"Error al generar aclaración: {str(e)}")
+        finally:
+            self.budget.record_result(
+                request_type,
+                budget=max_tokens,
+                continuations=0,
+                completed=finish_reason != "length"
+            )
+
+        # Pasos que el parser incremental no pudo entregar (p. ej. JSON reparado al final)
+        for step in (parsed.get("clarification_steps") or [])[streamed_steps:]:
+            _prepare_steps([step])
+            yield {"type": "step", "step": step}
+
+        if response_mode == "brief":
+            self._store_brief_clarification(cache_repo, cache_meta, parsed)
+
+        yield {"type": "complete", "response": parsed}
+    
+    def _prepare_clarification_request(
+        self,
+        clarification_question: str,
+        current_context: dict,
+        response_mode: str
+    ) -> Tuple[list, str, str, int]:
+        """
+        Arma mensajes, plantilla, tipo de petición y presupuesto de una aclaración
+        
+        Args:
+            response_mode: Modo ya normalizado con normalize_clarification_mode()
+        
+        Returns:
+            tuple: (messages, template, request_type, max_tokens)
+        """
+        messages = get_clarification_messages(
+            clarification_question,
+            current_context,
+            response_mode=response_mode
+        )
+        request_type = f"clarification_{response_mode}"
+        max_tokens = self.budget.estimate(
+            request_type,
+            clarification_question,
+            subject=(current_context or {}).get('subject') or (current_context or {}).get('topic'),
+            difficulty=(current_context or {}).get('difficulty')
+        )
+        return messages, CLARIFICATION_TEMPLATES[response_mode], request_type, max_tokens
+    
+    def _lookup_brief_clarification(
+        self,
+        clarification_question: str,
+        current_context: dict
+    ) -> Tuple[AIBriefAnswersRepository, Dict, Optional[Dict]]:
+        """
+        Busca una aclaración breve en cache (memoria → Redis → DB)
+        
+        Returns:
+            tuple: (repositorio, metadata de cache, respuesta cacheada o None)
+        """
+        cache_repo = AIBriefAnswersRepository()
+        cache_meta = self._build_clarification_cache_meta(
+            clarification_question,
+            current_context
+        )
+        cache_entry = brief_answers_cache.get_or_load(
+            cache_meta["cache_key"],
+            lambda: cache_repo.get_by_hash(
+                cache_meta["question_hash"],
+                cache_meta["context_hash"]
+            )
+        )
+
+        if not cache_entry:
+            return cache_repo, cache_meta, None
+
+        if cache_entry.get("id"):
+            cache_repo.increment_usage(cache_entry["id"])
+        return cache_repo, cache_meta, {
+            "mode": "brief",
+            "message": cache_entry.get("message"),
+            "is_deferred": cache_entry.get("is_deferred", False),
+            "reason": cache_entry.get("reason")
+        }
+    
+    def _store_brief_clarification(
+        self,
+        cache_repo: Optional[AIBriefAnswersRepository],
+        cache_meta: Optional[Dict],
+        parsed: Dict
+    ) -> None:
+        """Guarda una aclaración breve generada en DB y en el cache"""
+        if parsed.get("mode", "brief") != "brief":
+            return
+
+        message = parsed.get("message")
+        if not (message and cache_repo and cache_meta):
+            return
+
+        record = {
+            "question_hash": cache_meta["question_hash"],
+            "normalized_question": cache_meta["normalized_question"],
+            "context_hash": cache_meta["context_hash"],
+            "context_data": cache_meta["context_data"],
+            "message": message,
+            "is_deferred": parsed.get("is_deferred", False),
+            "reason": parsed.get("reason"),
+            "usage_count": 1
+        }
+        saved = cache_repo.create(record)
+        brief_answers_cache.set(cache_meta["cache_key"], {
+            "id": saved.get("id") if saved else None,
+            "message": message,
+            "is_deferred": record["is_deferred"],
+            "reason": record["reason"]
+        })
     
     def _build_clarification_cache_meta(
         self,
         clarification_question: str,
         current_context: dict
     ) -> Dict:
+        """
+        Construye las claves de cache de una aclaración breve
+        
+        La clave combina el hash de la pregunta normalizada con una huella
+        canónica del contexto, de modo que aclaraciones de explicaciones
+        distintas no colisionan y contextos equivalentes sí coinciden.
+        
+        Args:
+            clarification_question: Pregunta del usuario
+            current_context: Contexto actual de la explicación
+            
+        Returns:
+            dict: question_hash, context_hash, cache_key y datos normalizados
+        """
         normalized_question = normalize_text(clarification_question)
         question_hash = generate_hash(normalized_question)
-        context_hash = generate_hash(str(current_context))
+        context_data = self._canonical_clarification_context(current_context)
+        context_hash = generate_hash(canonical_json(context_data))
         return {
             "question_hash": question_hash,
             "normalized_question": normalized_question,
             "context_hash": context_hash,
-            "context_data": current_context
+            "context_data": context_data,
+            "cache_key": f"{question_hash}:{context_hash}"
         }
     
+    def _canonical_clarification_context(self, current_context: Optional[dict]) -> Dict:
+        """
+        Extrae solo los campos del contexto que afectan la respuesta y los normaliza
+        
+        Args:
+            current_context: Contexto enviado por el cliente
+            
+        Returns:
+            dict: Contexto canónico (texto normalizado, sin campos vacíos)
+        """
+        canonical = {}
+        for field in self.CLARIFICATION_CONTEXT_FIELDS:
+            value = (current_context or {}).get(field)
+            if value is None:
+                continue
+            if isinstance(value, (str, int, float)):
+                value = normalize_text(str(value))
+                if not value:
+                    continue
+            canonical[field] = value
+        return canonical
+    
+    def get_budget_stats(self) -> Dict:
+        """
+        Métricas de presupuesto de tokens y truncamientos
+        
+        Returns:
+            dict: {request_type: {requests, truncated, continuations, avg_budget, ...}}
+        """
+        return self.budget.stats()
+    
+    @staticmethod
+    def get_repair_stats() -> Dict:
+        """
+        Métricas de reparación de JSON de generate_answer
+        
+        Returns:
+            dict: {responses, clean, repaired, repairs_by_kind, fix_calls, avg_fix_call_ms, ...}
+        """
+        return answer_repair_stats.snapshot()
+    
+    @staticmethod
+    def get_prompt_stats() -> Dict:
+        """
+        Métricas de tokens por plantilla de prompt
+        
+        Returns:
+            dict: {template: {prefix_tokens, avg_suffix_tokens, provider_cached_tokens, ...}}
+        """
+        return prompt_assembler.stats()
+    
+    @staticmethod
+    def get_canvas_library_stats() -> Dict:
+        """
+        Métricas de reuso de la biblioteca de canvas
+        
+        Returns:
+            dict: {templates, prompts_with_catalog, references, reuse_by_template, bytes_saved, ...}
+        """
+        return canvas_library.stats()
+    
+    @staticmethod
+    def get_clarification_cache_stats() -> Dict:
+        """
+        Métricas del cache de aclaraciones breves
+        
+        Returns:
+            dict: Aciertos por nivel, fallos y hit_rate
+        """
+        return brief_answers_cache.stats.snapshot()
+    
+    @instrument_ai("generate_follow_up")
     def generate_follow_up(
         self,
         follow_up_question: str,
@@ -474,26 +986,28 @@ Responde SOLO con el JSON, sin explicaciones adicionales."""
                 "total_duration": int
             }
         """
-        prompt = get_follow_up_prompt(
+        messages = get_follow_up_messages(
             follow_up_question,
             original_question,
             previous_explanation
         )
-        model = model or self.DEFAULT_MODEL
+        max_tokens = self.budget.estimate(
+            "follow_up",
+            follow_up_question,
+            subject=original_question.get('subject'),
+            difficulty=original_question.get('difficulty')
+        )
         
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.MAX_TOKENS,
-                temperature=self.TEMPERATURE,
-                response_format={"type": "json_object"}
+            content = self._create_completion(
+                messages,
+                template=FOLLOW_UP_TEMPLATE,
+                request_type="follow_up",
+                max_tokens=max_tokens,
+                model=model
             )
-            
-            content = response.choices[0].message.content
-            parsed = json.loads(content)
+            parsed, _ = loads_tolerant(content)
+            _prepare_steps(parsed.get("answer_steps"))
             
             return parsed
             
@@ -0,0 +1,217 @@
+"""
+Backends de reconocimiento de voz (ASR) locales
+
+VoiceService transcribe el audio del buffer de cada grabación con un
+backend intercambiable (VOICE_ASR_BACKEND):
+
+- whisper: faster-whisper (CTranslate2) en CPU, int8; el modelo se carga
+  una vez por proceso al primer uso
+- fake: texto fijo revelado según la duración del audio (tests y
+  desarrollo sin modelo)
+
+El audio es PCM de 16 bits little-endian mono (pcm_s16le) a la frecuencia
+de muestreo de la grabación.
+"""
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.config import Config
+from app.models.voice import Transcript
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # pragma: no cover - dependencia opcional
+    WhisperModel = None
+
+
+AudioBytes = Union[bytes, bytearray, memoryview]
+
+BYTES_PER_SAMPLE = 2        # pcm_s16le
+WHISPER_SAMPLE_RATE = 16000
+
+
+class ASRUnavailableError(Exception):
+    """Excepción cuando el backend de ASR no puede usarse (p. ej. falta el modelo)"""
+    pass
+
+
+def duration_ms(audio: AudioBytes, sample_rate: int) -> int:
+    """Duración en milisegundos de audio pcm_s16le"""
+    return int(len(audio) // BYTES_PER_SAMPLE * 1000 / sample_rate)
+
+
+def pcm16_to_float32(audio: AudioBytes, sample_rate: int, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Convierte pcm_s16le a muestras float32 en [-1, 1] a target_rate
+
+    np.frombuffer lee el buffer sin copiarlo; la única copia es la
+    conversión a float32 (que el modelo necesita de todos modos).
+
+    Args:
+        audio: Bytes de audio
+        sample_rate: Frecuencia de muestreo del audio
+        target_rate: Frecuencia que espera el modelo
+
+    Returns:
+        np.ndarray: Muestras float32
+    """
+    samples = np.frombuffer(audio, dtype="<i2", count=len(audio) // BYTES_PER_SAMPLE)
+    samples = samples.astype(np.float32) / 32768.0
+    if sample_rate == target_rate or not len(samples):
+        return samples
+    target_length = int(len(samples) * target_rate / sample_rate)
+    positions = np.linspace(0, len(samples) - 1, target_length, dtype=np.float32)
+    return np.interp(positions, np.arange(len(samples), dtype=np.float32), samples).astype(np.float32)
+
+
+class ASRBackend:
+    """Interfaz de los backends de ASR"""
+
+    name = "base"
+
+    def transcribe(self, audio: AudioBytes, sample_rate: int, language: str = "es",
+                   final: bool = True) -> Transcript:
+        """
+        Transcribe audio pcm_s16le
+
+        Args:
+            audio: Bytes de audio (bytes o memoryview sin copiar)
+            sample_rate: Frecuencia de muestreo
+            language: Idioma esperado
+            final: False para transcripciones parciales (más rápidas, menos precisas)
+
+        Returns:
+            Transcript: Texto y confianza
+
+        Raises:
+            ASRUnavailableError: Si el backend no está disponible
+        """
+        raise NotImplementedError
+
+
+class FakeASRBackend(ASRBackend):
+    """Revela un texto fijo palabra por palabra según la duración del audio"""
+
+    name = "fake"
+    WORDS_PER_SECOND = 2.5
+
+    def __init__(self, text: str = "¿Qué es la energía cinética?", confidence: float = 0.9, delay: float = 0.0):
+        """
+        Args:
+            text: Transcripción completa
+            confidence: Confianza reportada
+            delay: Segundos de "inferencia" simulada por llamada
+        """
+        self.text = text
+        self.confidence = confidence
+        self.delay = delay
+        self.calls: List[Tuple[int, bool]] = []
+
+    def transcribe(self, audio: AudioBytes, sample_rate: int, language: str = "es",
+                   final: bool = True) -> Transcript:
+        self.calls.append((len(audio), final))
+        if self.delay:
+            time.sleep(self.delay)
+
+        duration = duration_ms(audio, sample_rate)
+        words = self.text.split() if duration else []
+        if not final:
+            words = words[:math.ceil(duration / 1000 * self.WORDS_PER_SECOND)]
+
+        return Transcript(
+            text=" ".join(words),
+            confidence=self.confidence if words else 0.0,
+            language=language,
+            duration_ms=duration,
+            is_final=final
+        )
+
+
+class WhisperBackend(ASRBackend):
+    """faster-whisper en CPU (modelo cargado una vez por proceso)"""
+
+    name = "whisper"
+
+    def __init__(self, model_size: Optional[str] = None, compute_type: str = "int8", beam_size: int = 5):
+        """
+        Args:
+            model_size: tiny, base, small, ... (default: Config.VOICE_WHISPER_MODEL)
+            compute_type: Precisión de CTranslate2 (int8 es la más rápida en CPU)
+            beam_size: Beam search de la transcripción final (las parciales usan greedy)
+        """
+        self.model_size = model_size or Config.VOICE_WHISPER_MODEL
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            if WhisperModel is None:
+                raise ASRUnavailableError("faster-whisper no está instalado")
+            with self._lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = WhisperModel(self.model_size, device="cpu", compute_type=self.compute_type)
+                    print(f"✓ Modelo Whisper '{self.model_size}' cargado "
+                          f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+        return self._model
+
+    def transcribe(self, audio: AudioBytes, sample_rate: int, language: str = "es",
+                   final: bool = True) -> Transcript:
+        duration = duration_ms(audio, sample_rate)
+        if not duration:
+            return Transcript(text="", confidence=0.0, language=language, is_final=final)
+
+        segments, info = self.model.transcribe(
+            pcm16_to_float32(audio, sample_rate),
+            language=language,
+            beam_size=self.beam_size if final else 1,
+            vad_filter=final,
+            condition_on_previous_text=False
+        )
+        segments = list(segments)  # La inferencia ocurre al consumir el generador
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        confidence = (
+            sum(math.exp(segment.avg_logprob) for segment in segments) / len(segments) if segments else 0.0
+        )
+
+        return Transcript(
+            text=text,
+            confidence=min(max(confidence, 0.0), 1.0),
+            language=getattr(info, "language", None) or language,
+            duration_ms=duration,
+            is_final=final
+        )
+
+
+ASR_BACKENDS = {
+    "fake": FakeASRBackend,
+    "whisper": WhisperBackend
+}
+
+
+@lru_cache(maxsize=4)
+def get_asr_backend(name: Optional[str] = None) -> ASRBackend:
+    """
+    Backend de ASR compartido por proceso
+
+    Args:
+        name: "whisper" o "fake" (default: Config.VOICE_ASR_BACKEND)
+
+    Returns:
+        ASRBackend: Instancia (el modelo se carga al primer uso)
+
+    Raises:
+        ValueError: Si el backend no existe
+    """
+    name = name or Config.VOICE_ASR_BACKEND
+    if name not in ASR_BACKENDS:
+        raise ValueError(f"Backend de ASR desconocido: {name}")
+    return ASR_BACKENDS[name]()
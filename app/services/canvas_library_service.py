@@ -0,0 +1,379 @@
+"""
+Servicio de la biblioteca de canvas
+
+Carga en memoria las plantillas de canvas_library (ejes, parábola, diagrama
+de cuerpo libre, ...) y las indexa por concepto (nombre, tags y slug
+normalizados) y por materia. Así el modelo no vuelve a describir los
+diagramas comunes:
+
+- catalog(): líneas cortas "- <id>: <nombre>" con las plantillas que
+  coinciden con la pregunta, para el mensaje user (el system sigue siendo
+  el prefijo estático cacheable)
+- resolve_steps(): valida las referencias {"command": "library",
+  "parameters": {"id": <id>}} de los pasos generados y descarta las
+  desconocidas; la respuesta se guarda y se transmite con la referencia
+- library_payload(): la biblioteca serializada (con los puntos de las
+  gráficas ya calculados) para que el cliente expanda las referencias;
+  se sirve en GET /api/v1/canvas/library con ETag
+
+Las plantillas se validan con el mismo esquema que los comandos generados
+(prepare_commands); una plantilla con algún comando inválido se omite.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from app.config import Config
+from app.repositories.canvas_library_repo import CanvasLibraryRepository
+from app.utils.canvas_commands import CANVAS_SCHEMA, LIBRARY_COMMAND, CanvasCommandError, prepare_command
+from app.utils.codec import get_codec
+from app.utils.search_index import tokenize
+from app.utils.text_processing import normalize_text
+from app.utils.tokens import count_tokens
+
+
+def concept_key(token: str) -> str:
+    """
+    Forma base de un término para el índice de conceptos (singular aproximado)
+
+    Args:
+        token: Término ya normalizado
+
+    Returns:
+        str: "fuerzas" -> "fuerza", "ecuaciones" -> "ecuacion"
+    """
+    if len(token) > 5 and token.endswith("es") and token[-3] in "dlnr":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def concept_keys(text: str) -> FrozenSet[str]:
+    """Términos de concepto de un texto (sin stop words ni términos de 1-2 letras)"""
+    return frozenset(concept_key(token) for token in tokenize(text) if len(token) > 2)
+
+
+@dataclass(slots=True, frozen=True)
+class CanvasTemplate:
+    """Plantilla de la biblioteca ya validada"""
+    slug: str
+    name: str
+    category: str
+    subject: Optional[str]        # Normalizada; None = genérica
+    description: str
+    commands: List[dict]          # Preparados (con puntos de las gráficas)
+    concepts: FrozenSet[str]
+    inline_bytes: int             # Bytes de los comandos en el payload
+    inline_tokens: int            # Tokens que el modelo escribiría en lugar de la referencia
+
+    def to_dict(self) -> dict:
+        """Formato público (endpoint de la biblioteca)"""
+        return {
+            "id": self.slug,
+            "name": self.name,
+            "category": self.category,
+            "subject": self.subject,
+            "description": self.description,
+            "commands": self.commands
+        }
+
+
+class CanvasLibraryIndex:
+    """Plantillas por id, por concepto y por materia"""
+
+    def __init__(self, templates: Iterable[CanvasTemplate]):
+        self.templates: Dict[str, CanvasTemplate] = {}
+        self.by_concept: Dict[str, List[str]] = {}
+        self.by_subject: Dict[Optional[str], List[str]] = {}
+
+        for template in templates:
+            self.templates[template.slug] = template
+            self.by_subject.setdefault(template.subject, []).append(template.slug)
+            for concept in template.concepts:
+                self.by_concept.setdefault(concept, []).append(template.slug)
+
+        codec = get_codec(binary=False)
+        self.payload: bytes = codec.encode({"templates": [template.to_dict() for template in self.templates.values()]})
+        self.version = hashlib.sha256(self.payload).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def get(self, slug: str) -> Optional[CanvasTemplate]:
+        return self.templates.get(slug)
+
+    def find(self, text: str, subject: Optional[str] = None, limit: int = 5) -> List[CanvasTemplate]:
+        """
+        Plantillas cuyos conceptos aparecen en el texto
+
+        Ordena por conceptos coincidentes; a igualdad, primero las de la
+        materia indicada. Una plantilla de otra materia no se excluye
+        (una parábola sirve igual en cálculo que en física).
+
+        Args:
+            text: Pregunta o tema
+            subject: Materia de la pregunta (opcional)
+            limit: Máximo de plantillas
+
+        Returns:
+            list: Plantillas ordenadas por relevancia
+        """
+        matches = Counter()
+        for concept in concept_keys(text):
+            matches.update(self.by_concept.get(concept, ()))
+        if not matches:
+            return []
+
+        subject = normalize_text(subject) if subject else None
+        ranked = sorted(
+            matches,
+            key=lambda slug: (-matches[slug], self.templates[slug].subject != subject, slug)
+        )
+        return [self.templates[slug] for slug in ranked[:limit]]
+
+
+class CanvasLibraryService:
+    """Biblioteca de plantillas de canvas en memoria"""
+
+    def __init__(
+        self,
+        repo: Optional[CanvasLibraryRepository] = None,
+        ttl: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        Inicializa el servicio
+
+        Args:
+            repo: Repositorio de canvas_library (opcional, se crea al usarse)
+            ttl: Segundos antes de recargar la biblioteca (opcional, usa Config)
+            enabled: Ofrecer y aceptar referencias (opcional, usa Config)
+        """
+        self._repo = repo
+        self.ttl = ttl if ttl is not None else Config.CANVAS_LIBRARY_TTL
+        self.enabled = Config.CANVAS_LIBRARY_ENABLED if enabled is None else enabled
+        self._index: Optional[CanvasLibraryIndex] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pending_usage: Counter = Counter()
+        self.reset_stats()
+
+    @property
+    def repo(self) -> CanvasLibraryRepository:
+        if self._repo is None:
+            self._repo = CanvasLibraryRepository()
+        return self._repo
+
+    def get_index(self) -> CanvasLibraryIndex:
+        """
+        Índice de la biblioteca (se carga o recarga si expiró)
+
+        Al recargar se envían a la base de datos los usos acumulados.
+
+        Returns:
+            CanvasLibraryIndex: Índice en memoria
+        """
+        if self._index is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._index
+
+        with self._lock:
+            if self._index is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self.flush_usage()
+                self._index = CanvasLibraryIndex(self._load_templates())
+                self._loaded_at = time.monotonic()
+                print(f"✓ Biblioteca de canvas cargada: {len(self._index)} plantillas")
+        return self._index
+
+    def invalidate(self) -> None:
+        """Fuerza la recarga de la biblioteca en el siguiente uso"""
+        with self._lock:
+            self._index = None
+
+    def get_template(self, slug: str) -> Optional[CanvasTemplate]:
+        """Plantilla por id (None si no existe)"""
+        return self.get_index().get(slug)
+
+    def find(self, text: str, subject: Optional[str] = None, limit: Optional[int] = None) -> List[CanvasTemplate]:
+        """Plantillas relevantes para un texto (ver CanvasLibraryIndex.find)"""
+        return self.get_index().find(text, subject, limit or Config.CANVAS_LIBRARY_PROMPT_LIMIT)
+
+    def catalog(self, text: str, subject: Optional[str] = None) -> str:
+        """
+        Bloque del prompt con las plantillas que el modelo puede referenciar
+
+        Args:
+            text: Pregunta o tema
+            subject: Materia (opcional)
+
+        Returns:
+            str: Líneas "- <id>: <nombre> (<descripción>)" con encabezado,
+                 o "" si no hay plantillas relevantes
+        """
+        if not self.enabled:
+            return ""
+
+        templates = self.find(text, subject)
+        with self._stats_lock:
+            self.prompts += 1
+            if templates:
+                self.prompts_with_catalog += 1
+                self.catalog_entries += len(templates)
+        if not templates:
+            return ""
+
+        lines = [
+            f"- {template.slug}: {template.name}" + (f" ({template.description})" if template.description else "")
+            for template in templates
+        ]
+        return 'Biblioteca de canvas (usa {"library": "<id>"} en lugar de dibujarlo):\n' + "\n".join(lines)
+
+    def resolve_steps(self, steps: Optional[Iterable]) -> int:
+        """
+        Valida en sitio las referencias a la biblioteca de los pasos
+
+        Se llama después de prepare_steps (comandos ya normalizados). Las
+        referencias conocidas se conservan y cuentan como reuso; las
+        desconocidas (o todas, si la biblioteca está deshabilitada) se
+        descartan como cualquier comando inválido.
+
+        Args:
+            steps: Pasos (dicts) con canvas_commands
+
+        Returns:
+            int: Referencias descartadas
+        """
+        index = self.get_index() if self.enabled else None
+        used: List[CanvasTemplate] = []
+        dropped = 0
+
+        for step in steps or ():
+            if not isinstance(step, dict) or not step.get("canvas_commands"):
+                continue
+            commands = []
+            for command in step["canvas_commands"]:
+                if command.get("command") != LIBRARY_COMMAND:
+                    commands.append(command)
+                    continue
+                template = index.get(command["parameters"]["id"]) if index else None
+                if template is None:
+                    dropped += 1
+                    print(f"⚠ Referencia a biblioteca de canvas descartada: {command['parameters']['id']}")
+                    continue
+                used.append(template)
+                commands.append(command)
+            step["canvas_commands"] = commands or None
+
+        if used or dropped:
+            self._record(used, dropped)
+        return dropped
+
+    def library_payload(self) -> Tuple[bytes, str]:
+        """
+        Biblioteca serializada para el cliente
+
+        Returns:
+            tuple: (JSON {"templates": [...]}, versión para ETag)
+        """
+        index = self.get_index()
+        return index.payload, index.version
+
+    def flush_usage(self) -> None:
+        """Envía a canvas_library.usage_count las referencias acumuladas"""
+        with self._stats_lock:
+            pending = dict(self._pending_usage)
+            self._pending_usage.clear()
+        if pending:
+            self.repo.increment_usage(pending)
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.prompts = 0
+            self.prompts_with_catalog = 0
+            self.catalog_entries = 0
+            self.references = 0
+            self.unknown_references = 0
+            self.reuse_by_template = Counter()
+            self.bytes_saved = 0
+            self.output_tokens_saved = 0
+
+    def stats(self) -> Dict:
+        """
+        Métricas de reuso de la biblioteca
+
+        Returns:
+            dict: {templates, templates_by_subject, prompts_with_catalog, references, reuse_by_template,
+                   bytes_saved, output_tokens_saved, ...}
+        """
+        index = self._index
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "templates": len(index) if index is not None else 0,
+                "templates_by_subject": {
+                    subject or "general": len(slugs) for subject, slugs in index.by_subject.items()
+                } if index is not None else {},
+                "prompts": self.prompts,
+                "prompts_with_catalog": self.prompts_with_catalog,
+                "avg_catalog_entries": (
+                    round(self.catalog_entries / self.prompts_with_catalog, 2) if self.prompts_with_catalog else 0.0
+                ),
+                "references": self.references,
+                "unknown_references": self.unknown_references,
+                "reuse_by_template": dict(self.reuse_by_template.most_common()),
+                "bytes_saved": self.bytes_saved,
+                "output_tokens_saved": self.output_tokens_saved
+            }
+
+    def _record(self, used: List[CanvasTemplate], dropped: int) -> None:
+        codec = get_codec(binary=False)
+        with self._stats_lock:
+            self.unknown_references += dropped
+            for template in used:
+                reference = {"command": LIBRARY_COMMAND, "parameters": {"id": template.slug}}
+                self.references += 1
+                self.reuse_by_template[template.slug] += 1
+                self._pending_usage[template.slug] += 1
+                self.bytes_saved += template.inline_bytes - len(codec.encode(reference))
+                self.output_tokens_saved += template.inline_tokens - count_tokens(f'{{"library": "{template.slug}"}}')
+
+    def _load_templates(self) -> List[CanvasTemplate]:
+        codec = get_codec(binary=False)
+        templates = []
+
+        for row in self.repo.get_all():
+            slug = row.get("slug") or normalize_text(row.get("name") or "").replace(" ", "_")
+            raw_commands = row.get("commands")
+            if not slug or not isinstance(raw_commands, list) or not raw_commands:
+                print(f"⚠ Plantilla de canvas sin id o sin comandos: {row.get('id')}")
+                continue
+
+            try:
+                commands = [prepare_command(command, CANVAS_SCHEMA) for command in raw_commands]
+                if any(command["command"] == LIBRARY_COMMAND for command in commands):
+                    raise CanvasCommandError("una plantilla no puede referenciar otra")
+            except CanvasCommandError as e:
+                print(f"⚠ Plantilla de canvas '{slug}' omitida: {e}")
+                continue
+
+            name = row.get("name") or slug
+            tags = row.get("tags") or []
+            templates.append(CanvasTemplate(
+                slug=slug,
+                name=name,
+                category=row.get("category") or "",
+                subject=normalize_text(row["subject"]) if row.get("subject") else None,
+                description=row.get("description") or "",
+                commands=commands,
+                concepts=concept_keys(" ".join([name, slug.replace("_", " "), *map(str, tags)])),
+                inline_bytes=len(codec.encode(commands)),
+                inline_tokens=count_tokens(codec.encode(raw_commands).decode())
+            ))
+        return templates
+
+
+canvas_library = CanvasLibraryService()
@@ -0,0 +1,395 @@
+"""
+Servicio de créditos con ledger en Redis y liquidación por lotes a Supabase
+
+El saldo de cada usuario vive en Redis mientras está activo:
+    credits:{user_id} -> {balance, daily_used, daily_limit, day,
+                          pending, version, checked_at}
+
+Flujo por pregunta:
+1. reserve(): descuenta atómicamente (WATCH/MULTI, con el reset diario
+   en la misma transacción) antes de generar
+2. commit(): confirma y encola el movimiento para credit_usage
+   refund(): devuelve la reserva si la generación falló
+3. settle(): en un hilo en segundo plano (nunca en el request) inserta
+   los movimientos pendientes en lote y los descuenta de profiles como
+   incrementos (settle_credit_usage), sin escribir saldos absolutos
+
+Los cambios hechos directamente en profiles (compras, reset_monthly_credits)
+incrementan profiles.credits_version. Cada CREDIT_LEDGER_SYNC_INTERVAL
+segundos el ledger compara su versión y, si cambió, rebasa el saldo:
+credits_remaining de profiles menos los créditos aún no liquidados (pending).
+"""
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from app.config import Config
+from app.extensions import get_redis
+from app.repositories.credit_repo import CreditRepository
+from app.utils.background import PeriodicTask, get_periodic_task
+
+
+class InsufficientCreditsError(Exception):
+    """Excepción cuando el usuario no tiene créditos o agotó su límite diario"""
+
+    def __init__(self, message: str, reason: str = "credits"):
+        super().__init__(message)
+        self.reason = reason
+
+
+@dataclass
+class CreditReservation:
+    """Reserva de créditos pendiente de confirmar o devolver"""
+    id: str
+    user_id: str
+    action_type: str
+    credits: int
+    credits_before: Optional[int] = None
+    credits_after: Optional[int] = None
+    in_ledger: bool = True
+    day: Optional[str] = None
+    closed: bool = field(default=False, compare=False)
+
+
+class CreditService:
+    """
+    Gestiona reservas, confirmaciones y liquidación de créditos
+
+    Las respuestas en cache (result["cached"]) se cobran con
+    CREDIT_COST_CACHED_QUESTION; las generadas por IA con
+    CREDIT_COST_AI_QUESTION. Ambas cuentan para daily_limit.
+    """
+
+    KEY_PREFIX = "credits:"
+    SETTLEMENT_KEY = "credits:settlement"
+    LEDGER_TTL = 86400  # 24 horas sin actividad
+
+    # Valores por defecto de create_user_profile
+    DEFAULT_BALANCE = 10
+    DEFAULT_DAILY_LIMIT = 5
+
+    def __init__(self, redis_client=None, credit_repo: Optional[CreditRepository] = None,
+                 settler: Optional[PeriodicTask] = None):
+        """
+        Inicializa el servicio
+
+        Args:
+            redis_client: Cliente Redis (opcional, usa get_redis() si no se provee)
+            credit_repo: Repositorio de créditos (opcional, se crea si no se provee)
+            settler: Tarea de liquidación (opcional, usa la compartida del proceso)
+        """
+        self.redis = redis_client if redis_client is not None else get_redis()
+        self.repo = credit_repo or CreditRepository()
+        self.batch_size = Config.CREDIT_SETTLE_BATCH_SIZE
+        self.sync_interval = Config.CREDIT_LEDGER_SYNC_INTERVAL
+        self.settler = settler or get_periodic_task(
+            "credit-settlement", settle_pending, Config.CREDIT_SETTLE_INTERVAL
+        )
+
+    def _get_key(self, user_id: str) -> str:
+        """Genera la key del ledger del usuario"""
+        return f"{self.KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.utcnow().date().isoformat()
+
+    def get_cost(self, cached: bool) -> tuple:
+        """
+        Costo de una pregunta según su origen
+
+        Returns:
+            tuple: (action_type, credits)
+        """
+        if cached:
+            return "cached_question", Config.CREDIT_COST_CACHED_QUESTION
+        return "ai_question", Config.CREDIT_COST_AI_QUESTION
+
+    def reserve(self, user_id: str, cached: bool = False) -> CreditReservation:
+        """
+        Reserva créditos antes de responder una pregunta
+
+        Args:
+            user_id: UUID del usuario
+            cached: True si la respuesta sale del cache
+
+        Returns:
+            CreditReservation: Reserva a confirmar con commit() o devolver con refund()
+
+        Raises:
+            InsufficientCreditsError: Si no hay saldo o se alcanzó el límite diario
+        """
+        action_type, credits = self.get_cost(cached)
+        reservation_id = str(uuid.uuid4())
+
+        if self.redis is None:
+            # Sin Redis: validación directa en Supabase
+            if not self.repo.check_credits(user_id, credits):
+                raise InsufficientCreditsError("No tienes créditos suficientes")
+            return CreditReservation(reservation_id, user_id, action_type, credits, in_ledger=False)
+
+        key = self._ensure_ledger(user_id)
+        today = self._today()
+
+        def reserve_in_ledger(pipe):
+            balance, daily_used, daily_limit, day = pipe.hmget(
+                key, "balance", "daily_used", "daily_limit", "day"
+            )
+            balance = int(balance or 0)
+            # Nuevo día: el contador diario se reinicia dentro de la misma transacción
+            daily_used = int(daily_used or 0) if day == today else 0
+
+            if balance < credits:
+                raise InsufficientCreditsError("No tienes créditos suficientes", "credits")
+            if daily_used >= int(daily_limit or self.DEFAULT_DAILY_LIMIT):
+                raise InsufficientCreditsError("Alcanzaste tu límite diario de preguntas", "daily_limit")
+
+            pipe.multi()
+            pipe.hset(key, mapping={
+                "balance": balance - credits,
+                "daily_used": daily_used + 1,
+                "day": today
+            })
+            pipe.hincrby(key, "pending", credits)
+            pipe.expire(key, self.LEDGER_TTL)
+            return balance
+
+        balance = self.redis.transaction(reserve_in_ledger, key, value_from_callable=True)
+
+        return CreditReservation(
+            id=reservation_id,
+            user_id=user_id,
+            action_type=action_type,
+            credits=credits,
+            credits_before=balance,
+            credits_after=balance - credits,
+            day=today
+        )
+
+    def commit(self, reservation: CreditReservation, details: Optional[dict] = None) -> None:
+        """
+        Confirma una reserva y la encola para liquidación
+
+        No escribe en Supabase: el hilo de liquidación procesa la cola
+        cada CREDIT_SETTLE_INTERVAL segundos o en cuanto se llena un lote.
+
+        Args:
+            reservation: Reserva obtenida con reserve()
+            details: Contexto adicional para credit_usage.details (opcional)
+        """
+        if reservation.closed:
+            return
+        reservation.closed = True
+
+        if not reservation.in_ledger:
+            self.repo.consume_credits(reservation.user_id, reservation.credits, reservation.action_type)
+            return
+
+        entry = {
+            "user_id": reservation.user_id,
+            "action_type": reservation.action_type,
+            "credits_used": reservation.credits,
+            "credits_before": reservation.credits_before,
+            "credits_after": reservation.credits_after,
+            "details": {"reservation_id": reservation.id, **(details or {})},
+            "created_at": datetime.utcnow().isoformat() + "Z"
+        }
+        pending = self.redis.rpush(self.SETTLEMENT_KEY, json.dumps(entry, default=str))
+
+        if pending >= self.batch_size:
+            self.settler.wake()
+        else:
+            self.settler.start()
+
+    def refund(self, reservation: CreditReservation) -> None:
+        """
+        Devuelve una reserva (p. ej. si la generación con IA falló)
+
+        Args:
+            reservation: Reserva obtenida con reserve()
+        """
+        if reservation.closed:
+            return
+        reservation.closed = True
+
+        if reservation.in_ledger:
+            self._release(self._get_key(reservation.user_id), reservation)
+
+    def settle(self) -> int:
+        """
+        Liquida un lote de movimientos pendientes en Supabase
+
+        Inserta los registros de credit_usage y descuenta de profiles los
+        créditos y preguntas del lote en una sola llamada (settle_credit_usage).
+        Los movimientos se identifican por reservation_id, así que si la
+        llamada falla el lote vuelve a la cola y reintentarlo no cobra dos veces.
+
+        Returns:
+            int: Número de movimientos liquidados
+        """
+        if self.redis is None:
+            return 0
+
+        pipe = self.redis.pipeline()
+        pipe.lrange(self.SETTLEMENT_KEY, 0, self.batch_size - 1)
+        pipe.ltrim(self.SETTLEMENT_KEY, self.batch_size, -1)
+        raw_entries, _ = pipe.execute()
+
+        if not raw_entries:
+            return 0
+
+        rows = [json.loads(raw) for raw in raw_entries]
+
+        if not self.repo.settle_usage_batch(rows):
+            # Devolver el lote al inicio de la cola conservando el orden
+            self.redis.lpush(self.SETTLEMENT_KEY, *reversed(raw_entries))
+            return 0
+
+        self._clear_pending(rows)
+        print(f"✓ Créditos liquidados: {len(rows)} movimientos")
+        return len(rows)
+
+    def get_balance(self, user_id: str) -> Optional[dict]:
+        """
+        Saldo actual del ledger
+
+        Returns:
+            dict | None: {credits_remaining, daily_used, daily_limit, day}
+        """
+        if self.redis is None:
+            return None
+
+        balance, daily_used, daily_limit, day = self.redis.hmget(
+            self._get_key(user_id), "balance", "daily_used", "daily_limit", "day"
+        )
+        if day is None:
+            return None
+
+        return {
+            "credits_remaining": int(balance),
+            "daily_used": int(daily_used),
+            "daily_limit": int(daily_limit),
+            "day": day
+        }
+
+    def _ensure_ledger(self, user_id: str) -> str:
+        """
+        Carga el saldo desde profiles si no está en Redis y, cada
+        sync_interval segundos, lo resincroniza si profiles cambió fuera
+        del ledger (credits_version distinta)
+        """
+        key = self._get_key(user_id)
+        now = time.time()
+        day, version, checked_at = self.redis.hmget(key, "day", "version", "checked_at")
+
+        if day is not None and now - float(checked_at or 0) < self.sync_interval:
+            return key
+
+        profile = self.repo.get_profile_credits(user_id)
+
+        if day is None:
+            self._load_ledger(key, profile or {}, now)
+        elif profile is not None and int(profile.get("credits_version") or 0) != int(version or 0):
+            self._rebase_ledger(key, profile, now)
+        else:
+            self.redis.hset(key, "checked_at", now)
+
+        return key
+
+    def _load_ledger(self, key: str, profile: dict, now: float) -> None:
+        """Crea el ledger a partir del perfil"""
+        today = self._today()
+        daily_used = profile.get("daily_used") or 0
+        if str(profile.get("last_reset_date") or "") < today:
+            daily_used = 0
+
+        balance = profile.get("credits_remaining")
+        daily_limit = profile.get("daily_limit")
+
+        pipe = self.redis.pipeline()
+        # HSETNX: si otro worker cargó el ledger primero, se respeta su saldo
+        pipe.hsetnx(key, "balance", self.DEFAULT_BALANCE if balance is None else balance)
+        pipe.hsetnx(key, "daily_used", daily_used)
+        pipe.hsetnx(key, "daily_limit", self.DEFAULT_DAILY_LIMIT if daily_limit is None else daily_limit)
+        pipe.hsetnx(key, "day", today)
+        pipe.hsetnx(key, "pending", 0)
+        pipe.hsetnx(key, "version", profile.get("credits_version") or 0)
+        pipe.hset(key, "checked_at", now)
+        pipe.expire(key, self.LEDGER_TTL)
+        pipe.execute()
+
+    def _rebase_ledger(self, key: str, profile: dict, now: float) -> None:
+        """
+        Rebasa el saldo sobre profiles tras un cambio externo
+
+        profiles.credits_remaining ya descuenta lo liquidado; lo reservado
+        o confirmado que aún no se liquidó (pending) se descuenta aquí.
+        """
+        balance = profile.get("credits_remaining")
+        balance = self.DEFAULT_BALANCE if balance is None else balance
+        daily_limit = profile.get("daily_limit")
+
+        def rebase(pipe):
+            pending = max(int(pipe.hget(key, "pending") or 0), 0)
+            pipe.multi()
+            pipe.hset(key, mapping={
+                "balance": max(balance - pending, 0),
+                "daily_limit": self.DEFAULT_DAILY_LIMIT if daily_limit is None else daily_limit,
+                "version": profile.get("credits_version") or 0,
+                "checked_at": now
+            })
+
+        self.redis.transaction(rebase, key)
+        print(f"↻ Ledger de créditos resincronizado con profiles: {key}")
+
+    def _release(self, key: str, reservation: CreditReservation) -> None:
+        """Revierte el efecto de una reserva en el ledger"""
+        def release(pipe):
+            day = pipe.hget(key, "day")
+            pipe.multi()
+            pipe.hincrby(key, "balance", reservation.credits)
+            pipe.hincrby(key, "pending", -reservation.credits)
+            # Si el día cambió, la reserva ya no cuenta en daily_used
+            if day == reservation.day:
+                pipe.hincrby(key, "daily_used", -1)
+
+        self.redis.transaction(release, key)
+
+    def _clear_pending(self, rows: list) -> None:
+        """Descuenta de pending los créditos ya liquidados en profiles"""
+        credits_by_user = {}
+        for row in rows:
+            user_id = row["user_id"]
+            credits_by_user[user_id] = credits_by_user.get(user_id, 0) + int(row["credits_used"] or 0)
+
+        keys = [self._get_key(user_id) for user_id in credits_by_user]
+        pipe = self.redis.pipeline()
+        for key in keys:
+            pipe.exists(key)
+        exists = pipe.execute()
+
+        # Solo ledgers vivos: HINCRBY sobre uno expirado crearía una key sin TTL
+        pipe = self.redis.pipeline()
+        for key, credits, alive in zip(keys, credits_by_user.values(), exists):
+            if alive and credits:
+                pipe.hincrby(key, "pending", -credits)
+        pipe.execute()
+
+
+def settle_pending() -> int:
+    """
+    Liquida toda la cola pendiente (tarea periódica del proceso)
+
+    Returns:
+        int: Número de movimientos liquidados
+    """
+    service = CreditService()
+    settled = 0
+    while True:
+        count = service.settle()
+        settled += count
+        if count < service.batch_size:
+            return settled
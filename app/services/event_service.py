@@ -0,0 +1,557 @@
+"""
+Pipeline de eventos de interacción (append-only)
+
+Los handlers registran eventos compactos con track(), que solo los
+agrega a una cola en memoria. Un hilo en segundo plano:
+1. publish(): los escribe en el stream de Redis events:interactions
+   (XADD en pipeline, MAXLEN aproximado)
+2. consume(): los lee con un consumer group y los inserta por lote:
+   - question_asked -> una fila en interactions
+   - el resto de eventos -> contadores por sesión en Redis
+   - session_ended  -> resumen en study_sessions
+   Un lote fallido queda sin ACK y se reintenta entrada por entrada con
+   backoff; la entrada que falla EVENTS_MAX_DELIVERIES veces pasa al
+   stream events:interactions:dead (con XACK) para no bloquear la cola.
+
+Formato de cada entrada del stream:
+    t: tipo, s: session_id, u: user_id, ts: epoch ms, d: JSON con datos
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.extensions import get_redis
+from app.repositories.interaction_repo import InteractionRepository
+
+
+class EventService:
+    """Productor y consumidor del stream de eventos de interacción"""
+
+    STREAM_KEY = "events:interactions"
+    DEAD_LETTER_KEY = "events:interactions:dead"
+    ATTEMPTS_KEY = "events:interactions:attempts"
+    GROUP = "interactions-writer"
+    CLAIM_IDLE_MS = 60000  # Entradas de un consumidor caído se reclaman tras 1 min
+    MAX_RETRY_DELAY = 60.0
+    SESSION_STATS_PREFIX = "events:session:"
+    SESSION_STATS_TTL = 86400  # 24 horas
+    MAX_LOCAL_QUEUE = 10000
+
+    EVENT_TYPES = (
+        "question_asked",
+        "cache_hit",
+        "cache_miss",
+        "step_reached",
+        "pause",
+        "clarification",
+        "feedback",
+        "session_ended"
+    )
+
+    # Contador de la sesión que incrementa cada tipo de evento
+    SESSION_COUNTERS = {
+        "question_asked": "questions_asked",
+        "cache_hit": "cache_hits",
+        "cache_miss": "cache_misses",
+        "step_reached": "steps_reached",
+        "pause": "pauses",
+        "clarification": "clarifications"
+    }
+
+    def __init__(
+        self,
+        redis_client=None,
+        interaction_repo: Optional[InteractionRepository] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        maxlen: Optional[int] = None,
+        consumer_enabled: Optional[bool] = None,
+        max_deliveries: Optional[int] = None,
+        autostart: bool = True
+    ):
+        """
+        Inicializa el servicio
+
+        Args:
+            redis_client: Cliente Redis (opcional, usa get_redis() si no se provee)
+            interaction_repo: Repositorio de interacciones (opcional, se crea al consumir)
+            batch_size: Máximo de eventos por lectura e inserción (opcional, usa Config)
+            flush_interval: Segundos entre publicaciones/lecturas (opcional, usa Config)
+            maxlen: Longitud aproximada máxima del stream (opcional, usa Config)
+            consumer_enabled: Consumir en este proceso (opcional, usa Config)
+            max_deliveries: Intentos antes de mover una entrada al dead-letter (opcional, usa Config)
+            autostart: Iniciar el hilo en segundo plano con el primer evento
+        """
+        self._redis = redis_client
+        self._repo = interaction_repo
+        self.batch_size = batch_size or Config.EVENTS_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.EVENTS_FLUSH_INTERVAL
+        self.maxlen = maxlen or Config.EVENTS_STREAM_MAXLEN
+        self.consumer_enabled = (
+            Config.EVENTS_CONSUMER_ENABLED if consumer_enabled is None else consumer_enabled
+        )
+        self.max_deliveries = max_deliveries or Config.EVENTS_MAX_DELIVERIES
+        self.autostart = autostart
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}"
+
+        self.stats = {
+            "tracked": 0, "dropped": 0, "published": 0, "consumed": 0, "failures": 0, "dead_lettered": 0
+        }
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._group_ready = False
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def redis(self):
+        """Cliente Redis (resuelto en cada uso: get_redis() es None hasta init_extensions)"""
+        return self._redis if self._redis is not None else get_redis()
+
+    @property
+    def repo(self) -> InteractionRepository:
+        if self._repo is None:
+            self._repo = InteractionRepository()
+        return self._repo
+
+    # ==================== PRODUCTOR ====================
+
+    def track(self, event_type: str, session_id: Optional[str] = None,
+              user_id: Optional[str] = None, **data) -> None:
+        """
+        Registra un evento sin hacer I/O en el handler
+
+        Args:
+            event_type: Uno de EVENT_TYPES
+            session_id: ID de la sesión (opcional)
+            user_id: UUID del usuario (opcional)
+            **data: Datos del evento (serializables a JSON)
+        """
+        if event_type not in self.EVENT_TYPES:
+            print(f"⚠ Tipo de evento desconocido: {event_type}")
+            return
+
+        if self.redis is None:
+            self.stats["dropped"] += 1
+            return
+
+        event = (event_type, session_id or "", user_id or "", int(time.time() * 1000), data)
+
+        with self._lock:
+            if len(self._queue) >= self.MAX_LOCAL_QUEUE:
+                self._queue.popleft()
+                self.stats["dropped"] += 1
+            self._queue.append(event)
+            self.stats["tracked"] += 1
+            depth = len(self._queue)
+
+        if self.autostart:
+            self._ensure_thread()
+        if depth >= self.batch_size:
+            self._wakeup.set()
+
+    def publish(self) -> int:
+        """
+        Escribe los eventos en cola en el stream de Redis
+
+        Returns:
+            int: Eventos publicados
+        """
+        with self._lock:
+            events = list(self._queue)
+            self._queue.clear()
+
+        if not events:
+            return 0
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for event_type, session_id, user_id, timestamp, data in events:
+                pipe.xadd(
+                    self.STREAM_KEY,
+                    {
+                        "t": event_type,
+                        "s": session_id,
+                        "u": user_id,
+                        "ts": timestamp,
+                        "d": json.dumps(data, default=str, separators=(",", ":"))
+                    },
+                    maxlen=self.maxlen,
+                    approximate=True
+                )
+            pipe.execute()
+        except Exception as e:  # pylint: disable=broad-except
+            # Devolver los eventos al inicio de la cola para el siguiente intento
+            with self._lock:
+                self._queue.extendleft(reversed(events))
+            self.stats["failures"] += 1
+            print(f"✗ Error publicando eventos: {e}")
+            return 0
+
+        self.stats["published"] += len(events)
+        return len(events)
+
+    # ==================== CONSUMIDOR ====================
+
+    def consume(self) -> int:
+        """
+        Lee un lote del stream y lo persiste en Supabase
+
+        Primero reintenta las entradas sin ACK (propias, o de un consumidor
+        caído tras CLAIM_IDLE_MS) y después lee entradas nuevas. Los
+        reintentos se procesan entrada por entrada: una entrada inválida no
+        bloquea a las demás y, tras max_deliveries fallos, pasa al
+        dead-letter. Tras un fallo se espera con backoff exponencial.
+
+        Returns:
+            int: Eventos procesados y confirmados
+        """
+        redis_client = self.redis
+        if redis_client is None or time.monotonic() < self._retry_at:
+            return 0
+
+        self._ensure_group(redis_client)
+
+        entries = self._read_pending(redis_client) or self._claim_idle(redis_client)
+        retry = bool(entries)
+        if retry:
+            entries = self._dead_letter_exhausted(redis_client, entries)
+        else:
+            entries = self._read(redis_client, ">")
+        if not entries:
+            return 0
+
+        if self._process(redis_client, entries):
+            done, failed = entries, []
+        elif retry and len(entries) > 1:
+            done, failed = [], []
+            for entry in entries:
+                (done if self._process(redis_client, [entry]) else failed).append(entry)
+        else:
+            done, failed = [], entries
+
+        if done:
+            entry_ids = [entry_id for entry_id, _ in done]
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.xack(self.STREAM_KEY, self.GROUP, *entry_ids)
+            pipe.hdel(self.ATTEMPTS_KEY, *entry_ids)
+            pipe.execute()
+            self.stats["consumed"] += len(done)
+
+        if failed:
+            pipe = redis_client.pipeline(transaction=False)
+            for entry_id, _ in failed:
+                pipe.hincrby(self.ATTEMPTS_KEY, entry_id, 1)
+            pipe.execute()
+            self.stats["failures"] += 1
+            self._consecutive_failures += 1
+            delay = min(self.flush_interval * 2 ** self._consecutive_failures, self.MAX_RETRY_DELAY)
+            self._retry_at = time.monotonic() + delay
+        else:
+            self._consecutive_failures = 0
+
+        return len(done)
+
+    def requeue_dead_letters(self, count: int = 100) -> int:
+        """
+        Devuelve entradas del dead-letter al stream principal (tras corregir la causa)
+
+        Args:
+            count: Máximo de entradas a reencolar
+
+        Returns:
+            int: Entradas reencoladas
+        """
+        redis_client = self.redis
+        if redis_client is None:
+            return 0
+
+        entries = redis_client.xrange(self.DEAD_LETTER_KEY, count=count)
+        if not entries:
+            return 0
+
+        pipe = redis_client.pipeline(transaction=False)
+        for entry_id, fields in entries:
+            fields = {self._text(k): v for k, v in fields.items()}
+            fields.pop("source_id", None)
+            fields.pop("attempts", None)
+            pipe.xadd(self.STREAM_KEY, fields, maxlen=self.maxlen, approximate=True)
+            pipe.xdel(self.DEAD_LETTER_KEY, entry_id)
+        pipe.execute()
+        return len(entries)
+
+    def _read(self, redis_client, start: str) -> List[Tuple[str, dict]]:
+        response = redis_client.xreadgroup(
+            self.GROUP, self.consumer_name, {self.STREAM_KEY: start}, count=self.batch_size
+        )
+        if not response:
+            return []
+        return [(self._text(entry_id), fields) for entry_id, fields in response[0][1] if fields]
+
+    def _read_pending(self, redis_client) -> List[Tuple[str, dict]]:
+        """Entradas propias sin ACK (lotes que fallaron), vía XPENDING + XCLAIM"""
+        pending = redis_client.xpending_range(
+            self.STREAM_KEY, self.GROUP, "-", "+", self.batch_size, consumername=self.consumer_name
+        )
+        if not pending:
+            return []
+
+        entry_ids = [self._text(item["message_id"]) for item in pending]
+        entries = [
+            (self._text(entry_id), fields)
+            for entry_id, fields in redis_client.xclaim(
+                self.STREAM_KEY, self.GROUP, self.consumer_name, 0, entry_ids
+            )
+            if fields
+        ]
+        # Entradas recortadas por MAXLEN: ya no existen, solo se confirman
+        missing = set(entry_ids) - {entry_id for entry_id, _ in entries}
+        if missing:
+            redis_client.xack(self.STREAM_KEY, self.GROUP, *missing)
+        return entries
+
+    def _claim_idle(self, redis_client) -> List[Tuple[str, dict]]:
+        """Reclama entradas sin ACK de consumidores que dejaron de procesar"""
+        try:
+            response = redis_client.xautoclaim(
+                self.STREAM_KEY, self.GROUP, self.consumer_name,
+                min_idle_time=self.CLAIM_IDLE_MS, start_id="0-0", count=self.batch_size
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # XAUTOCLAIM requiere Redis >= 6.2
+            print(f"⚠ No se pudieron reclamar eventos pendientes: {e}")
+            return []
+        return [(self._text(entry_id), fields) for entry_id, fields in response[1] if fields]
+
+    def _dead_letter_exhausted(self, redis_client, entries: List[Tuple[str, dict]]) -> List[Tuple[str, dict]]:
+        """
+        Mueve al dead-letter las entradas que agotaron sus intentos
+
+        Returns:
+            list: Entradas que aún se pueden reintentar
+        """
+        attempts = redis_client.hmget(self.ATTEMPTS_KEY, [entry_id for entry_id, _ in entries])
+        exhausted = [
+            (entry_id, fields, int(count))
+            for (entry_id, fields), count in zip(entries, attempts)
+            if count is not None and int(count) >= self.max_deliveries
+        ]
+        if not exhausted:
+            return entries
+
+        pipe = redis_client.pipeline(transaction=False)
+        for entry_id, fields, count in exhausted:
+            pipe.xadd(
+                self.DEAD_LETTER_KEY,
+                {**fields, "source_id": entry_id, "attempts": count},
+                maxlen=self.maxlen,
+                approximate=True
+            )
+        exhausted_ids = [entry_id for entry_id, _, _ in exhausted]
+        pipe.xack(self.STREAM_KEY, self.GROUP, *exhausted_ids)
+        pipe.hdel(self.ATTEMPTS_KEY, *exhausted_ids)
+        pipe.execute()
+
+        self.stats["dead_lettered"] += len(exhausted)
+        print(f"⚠ {len(exhausted)} eventos movidos a {self.DEAD_LETTER_KEY} tras {self.max_deliveries} intentos")
+        return [entry for entry in entries if entry[0] not in exhausted_ids]
+
+    def _process(self, redis_client, entries: List[Tuple[str, dict]]) -> bool:
+        """
+        Convierte un lote de eventos en filas y contadores
+
+        Las inserciones usan ids estables, así que reprocesar un lote
+        fallido no duplica filas. Los contadores se escriben al final,
+        solo si las inserciones tuvieron éxito.
+        """
+        interactions = []
+        increments: Dict[str, Dict[str, int]] = {}
+        ended = []
+
+        for entry_id, fields in entries:
+            event_type, session_id, user_id, timestamp, data = self._decode(fields)
+
+            if event_type == "question_asked":
+                interactions.append(self._interaction_row(entry_id, session_id, user_id, timestamp, data))
+
+            if event_type == "session_ended":
+                if session_id:
+                    ended.append((session_id, user_id, timestamp, data))
+                continue
+
+            if not session_id:
+                continue
+
+            counters = increments.setdefault(session_id, {})
+            counter = self.SESSION_COUNTERS.get(event_type)
+            if counter:
+                counters[counter] = counters.get(counter, 0) + 1
+            if event_type == "question_asked" and data.get("completed", True):
+                counters["questions_answered"] = counters.get("questions_answered", 0) + 1
+            if event_type == "feedback":
+                counter = "feedback_positive" if data.get("helpful") else "feedback_negative"
+                counters[counter] = counters.get(counter, 0) + 1
+
+        if not self.repo.insert_interactions(interactions):
+            return False
+
+        summaries = [
+            self._study_session_row(
+                self._session_totals(redis_client, session_id, increments.get(session_id, {})),
+                session_id, user_id, timestamp, data
+            )
+            for session_id, user_id, timestamp, data in ended
+        ]
+        if not self.repo.insert_study_sessions(summaries):
+            return False
+
+        pipe = redis_client.pipeline(transaction=False)
+        for session_id, counters in increments.items():
+            key = f"{self.SESSION_STATS_PREFIX}{session_id}"
+            for counter, amount in counters.items():
+                pipe.hincrby(key, counter, amount)
+            pipe.expire(key, self.SESSION_STATS_TTL)
+        # Los contadores de sesiones cerradas se conservan (hasta su TTL): una
+        # sesión reclamada tras reconectar sigue acumulando sobre ellos
+        pipe.execute()
+
+        return True
+
+    def _session_totals(self, redis_client, session_id: str, pending: Dict[str, int]) -> Dict[str, int]:
+        """Contadores acumulados de la sesión más los del lote actual"""
+        stored = redis_client.hgetall(f"{self.SESSION_STATS_PREFIX}{session_id}") or {}
+        totals = {self._text(k): int(v) for k, v in stored.items()}
+        for counter, amount in pending.items():
+            totals[counter] = totals.get(counter, 0) + amount
+        return totals
+
+    @staticmethod
+    def _interaction_row(entry_id: str, session_id: str, user_id: str,
+                         timestamp: int, data: dict) -> dict:
+        # id derivado de la entrada del stream: estable entre reintentos
+        interaction_id = data.get("interaction_id") or str(
+            uuid.uuid5(uuid.NAMESPACE_URL, f"{EventService.STREAM_KEY}/{entry_id}")
+        )
+        return {
+            "id": interaction_id,
+            "user_id": user_id or None,
+            "session_id": session_id or None,
+            "question_text": data.get("question_text") or "",
+            "question_type": data.get("question_type", "text"),
+            "question_id": data.get("question_id"),
+            "explanation_id": data.get("explanation_id"),
+            "response_time_ms": data.get("response_time_ms"),
+            "credits_used": data.get("credits_used", 1),
+            "completed": data.get("completed", True),
+            "created_at": _iso(timestamp)
+        }
+
+    @staticmethod
+    def _study_session_row(totals: Dict[str, int], session_id: str, user_id: str,
+                           timestamp: int, data: dict) -> dict:
+        metadata = {
+            counter: totals.get(counter, 0)
+            for counter in ("cache_hits", "cache_misses", "steps_reached", "pauses",
+                            "clarifications", "feedback_positive", "feedback_negative")
+        }
+        return {
+            "id": session_id,
+            "user_id": user_id or None,
+            "session_type": data.get("session_type", "practice"),
+            "status": data.get("status", "completed"),
+            "questions_asked": totals.get("questions_asked", 0),
+            "questions_answered": totals.get("questions_answered", 0),
+            "correct_answers": totals.get("correct_answers", 0),
+            "total_duration_seconds": int(data.get("duration_seconds") or 0),
+            "started_at": data.get("started_at") or _iso(timestamp),
+            "ended_at": _iso(timestamp),
+            "metadata": metadata
+        }
+
+    def _decode(self, fields: dict) -> tuple:
+        fields = {self._text(k): self._text(v) for k, v in fields.items()}
+        try:
+            data = json.loads(fields.get("d") or "{}")
+        except json.JSONDecodeError:
+            data = {}
+        return (
+            fields.get("t", ""),
+            fields.get("s", ""),
+            fields.get("u", ""),
+            int(fields.get("ts") or 0),
+            data
+        )
+
+    @staticmethod
+    def _text(value) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def _ensure_group(self, redis_client) -> None:
+        if self._group_ready:
+            return
+        try:
+            redis_client.xgroup_create(self.STREAM_KEY, self.GROUP, id="0", mkstream=True)
+        except Exception as e:  # pylint: disable=broad-except
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    # ==================== HILO EN SEGUNDO PLANO ====================
+
+    def flush(self) -> int:
+        """
+        Publica la cola local y, si este proceso consume, procesa el stream
+
+        Returns:
+            int: Eventos persistidos en este ciclo
+        """
+        self.publish()
+        if not self.consumer_enabled:
+            return 0
+
+        processed = 0
+        while True:
+            count = self.consume()
+            processed += count
+            if count < self.batch_size:
+                return processed
+
+    def snapshot(self) -> dict:
+        """Métricas del pipeline"""
+        with self._lock:
+            queue_depth = len(self._queue)
+        return {"queue_depth": queue_depth, **self.stats}
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="event-pipeline", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"✗ Error en pipeline de eventos: {e}")
+
+
+def _iso(timestamp_ms: int) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).isoformat()
+
+
+event_service = EventService()
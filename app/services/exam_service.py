@@ -4,6 +4,9 @@ Servicio para gestionar explicaciones de preguntas de examen
 from typing import Optional
 from app.repositories.question_repo import QuestionRepository
 from app.repositories.exam_explanation_repo import ExamExplanationRepository
+from app.services.progress_service import ProgressService
+from app.services.question_selector import QuestionSelector, question_selector
+from app.models.answer import parse_duration
 from app.models.explanation import ExamExplanation, ExplanationStep
 
 
@@ -12,16 +15,18 @@ class ExamService:
     Gestiona el flujo de preguntas de examen y sus explicaciones
     
     Responsabilidades:
-    - Obtener preguntas aleatorias por materia
+    - Elegir la siguiente pregunta por materia (adaptativa por usuario)
     - Validar respuestas del usuario
     - Obtener o crear explicaciones
-    - Actualizar estadísticas
+    - Actualizar estadísticas (de la pregunta y progreso del usuario)
     """
     
     def __init__(
         self,
         question_repo: Optional[QuestionRepository] = None,
-        explanation_repo: Optional[ExamExplanationRepository] = None
+        explanation_repo: Optional[ExamExplanationRepository] = None,
+        progress_service: Optional[ProgressService] = None,
+        selector: Optional[QuestionSelector] = None
     ):
         """
         Inicializa el servicio
@@ -29,30 +34,63 @@ class ExamService:
         Args:
             question_repo: Repositorio de preguntas
             explanation_repo: Repositorio de explicaciones
+            progress_service: Servicio de progreso por materia
+            selector: Selector adaptativo (opcional, usa el índice compartido del proceso)
         """
         self.question_repo = question_repo or QuestionRepository()
         self.explanation_repo = explanation_repo or ExamExplanationRepository()
+        self.progress_service = progress_service or ProgressService()
+        self.selector = selector or question_selector
     
-    def get_random_question(self, subject: str, difficulty: str = None) -> Optional[dict]:
+    def get_random_question(self, subject: str, difficulty: str = None,
+                            user_id: Optional[str] = None) -> Optional[dict]:
         """
-        Obtiene una pregunta aleatoria por materia
+        Obtiene la siguiente pregunta de una materia
+        
+        Con user_id la elige el selector adaptativo (mastery del usuario,
+        preguntas recientes y estadísticas de cada pregunta); sin user_id,
+        o si el índice de la materia está vacío, es un sorteo uniforme.
         
         Args:
             subject: Materia (matematicas, fisica, etc)
             difficulty: Dificultad opcional (easy, medium, hard)
+            user_id: UUID del usuario (opcional)
             
         Returns:
             dict: Pregunta o None
         """
+        if user_id:
+            try:
+                progress = self.progress_service.get_progress(user_id, subject)
+                mastery = progress[0]["mastery_level"] if progress else 0.0
+                
+                question_id = self.selector.select(
+                    subject,
+                    mastery=mastery,
+                    exclude=self.selector.get_recent(user_id, subject),
+                    difficulty=difficulty
+                )
+                
+                if question_id:
+                    question = self.question_repo.get_by_id(question_id)
+                    if question:
+                        self.selector.mark_served(user_id, subject, question_id)
+                        return question
+                        
+            except Exception as e:
+                print(f"⚠ Error en selección adaptativa, usando sorteo uniforme: {e}")
+        
         return self.question_repo.get_random_by_subject(subject, difficulty)
     
-    def validate_answer(self, question_id: str, user_answer: str) -> dict:
+    def validate_answer(self, question_id: str, user_answer: str,
+                        user_id: Optional[str] = None) -> dict:
         """
         Valida la respuesta del usuario
         
         Args:
             question_id: UUID de la pregunta
             user_answer: Respuesta del usuario (a, b, c, d)
+            user_id: UUID del usuario (opcional, actualiza su progreso)
             
         Returns:
             dict: {
@@ -75,6 +113,13 @@ class ExamService:
         # Actualizar estadísticas
         self.question_repo.increment_stats(question_id, is_correct)
         
+        if user_id and question.get("subject"):
+            try:
+                self.progress_service.record_answer(user_id, question["subject"], is_correct)
+            except Exception as e:
+                # El progreso no debe impedir responder
+                print(f"⚠ Error actualizando progreso: {e}")
+        
         if is_correct:
             return {
                 "correct": True,
@@ -136,18 +181,22 @@ class ExamService:
             
         Returns:
             dict: Explicación creada
+            
+        Raises:
+            InvalidStepError: Si los pasos generados no tienen la estructura esperada
         """
-        data = {
-            "question_id": question_id,
-            "explanation_steps": explanation_steps,
-            "total_duration": total_duration,
-            "ai_model": ai_model,
-            "prompt_version": prompt_version,
-            "generated_by": "ai",
-            "usage_count": 1
-        }
+        explanation = ExamExplanation(
+            id=None,
+            question_id=question_id,
+            steps=ExplanationStep.parse_many(explanation_steps),
+            total_duration=parse_duration(total_duration),
+            ai_model=ai_model,
+            prompt_version=prompt_version,
+            generated_by="ai",
+            usage_count=1
+        )
         
-        return self.explanation_repo.create(data)
+        return self.explanation_repo.create(explanation)
     
     def record_feedback(
         self,
@@ -0,0 +1,315 @@
+"""
+Agregación incremental del progreso por materia (user_progress)
+
+Cada usuario activo tiene un hash en Redis con un agregado por materia:
+    progress:{user_id} -> {subject: JSON, "_loaded": "1"}
+
+El agregado se carga una vez desde user_progress y después cada
+respuesta lo actualiza en O(1):
+- total_practiced / total_correct: contadores
+- mastery_level: media móvil exponencial de los aciertos
+  (peso 1/n mientras hay pocas respuestas, después MASTERY_ALPHA)
+- streak_days: días consecutivos con práctica en la materia
+
+Los agregados modificados se marcan en progress:dirty y flush() los
+escribe por lote con un upsert (ON CONFLICT user_id, subject) desde un
+hilo en segundo plano, nunca dentro del request.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.config import Config
+from app.extensions import get_redis
+from app.repositories.progress_repo import ProgressRepository
+from app.utils.background import PeriodicTask, get_periodic_task
+
+
+class ProgressService:
+    """Mantiene y consulta el progreso agregado de cada usuario"""
+
+    KEY_PREFIX = "progress:"
+    DIRTY_KEY = "progress:dirty"
+    LOADED_FIELD = "_loaded"
+    AGGREGATE_TTL = 7 * 86400  # 7 días sin actividad
+
+    def __init__(self, redis_client=None, progress_repo: Optional[ProgressRepository] = None,
+                 flusher: Optional[PeriodicTask] = None):
+        """
+        Inicializa el servicio
+
+        Args:
+            redis_client: Cliente Redis (opcional, usa get_redis() si no se provee)
+            progress_repo: Repositorio de progreso (opcional, se crea si no se provee)
+            flusher: Tarea de flush (opcional, usa la compartida del proceso)
+        """
+        self._redis = redis_client
+        self.repo = progress_repo or ProgressRepository()
+        self.batch_size = Config.PROGRESS_FLUSH_BATCH_SIZE
+        self.flusher = flusher or get_periodic_task(
+            "progress-flush", flush_pending, Config.PROGRESS_FLUSH_INTERVAL
+        )
+        self.mastery_alpha = Config.PROGRESS_MASTERY_ALPHA
+
+    @property
+    def redis(self):
+        """Cliente Redis (resuelto en cada uso: get_redis() es None hasta init_extensions)"""
+        return self._redis if self._redis is not None else get_redis()
+
+    def _get_key(self, user_id: str) -> str:
+        """Genera la key del agregado del usuario"""
+        return f"{self.KEY_PREFIX}{user_id}"
+
+    # ==================== ESCRITURA ====================
+
+    def record_answer(self, user_id: str, subject: str, correct: bool,
+                      answered_at: Optional[datetime] = None) -> dict:
+        """
+        Aplica el resultado de una respuesta al agregado de la materia
+
+        Args:
+            user_id: UUID del usuario
+            subject: Materia de la pregunta
+            correct: Si la respuesta fue correcta
+            answered_at: Momento de la respuesta (opcional, UTC actual)
+
+        Returns:
+            dict: Progreso actualizado de la materia
+        """
+        answered_at = answered_at or datetime.utcnow()
+        redis_client = self.redis
+
+        if redis_client is None:
+            # Sin Redis: leer, actualizar y escribir la fila directamente
+            updated = self.apply_outcome(self._from_row(self.repo.get(user_id, subject)), correct, answered_at)
+            self.repo.upsert_batch([self._to_row(user_id, subject, updated)])
+            return self._public(subject, updated, answered_at)
+
+        key = self._ensure_loaded(redis_client, user_id)
+
+        def update(pipe):
+            raw = pipe.hget(key, subject)
+            updated = self.apply_outcome(self._decode(raw), correct, answered_at)
+            pipe.multi()
+            pipe.hset(key, subject, json.dumps(updated))
+            pipe.expire(key, self.AGGREGATE_TTL)
+            pipe.sadd(self.DIRTY_KEY, f"{user_id}|{subject}")
+            return updated
+
+        # WATCH/MULTI: si otro worker modifica el agregado, se reintenta
+        updated = redis_client.transaction(update, key, value_from_callable=True)
+
+        self._schedule_flush(redis_client)
+        return self._public(subject, updated, answered_at)
+
+    def apply_outcome(self, aggregate: dict, correct: bool, answered_at: datetime) -> dict:
+        """
+        Calcula el nuevo agregado a partir del anterior y una respuesta
+
+        Args:
+            aggregate: Agregado actual (ver _empty())
+            correct: Si la respuesta fue correcta
+            answered_at: Momento de la respuesta
+
+        Returns:
+            dict: Agregado actualizado
+        """
+        total_practiced = aggregate["total_practiced"] + 1
+        total_correct = aggregate["total_correct"] + (1 if correct else 0)
+
+        alpha = max(1.0 / total_practiced, self.mastery_alpha)
+        mastery = aggregate["mastery"] + alpha * ((1.0 if correct else 0.0) - aggregate["mastery"])
+
+        today = answered_at.date()
+        last_day = self._parse_day(aggregate["last_practice_at"])
+        if last_day == today:
+            streak_days = max(aggregate["streak_days"], 1)
+        elif last_day == today - timedelta(days=1):
+            streak_days = aggregate["streak_days"] + 1
+        else:
+            streak_days = 1
+
+        return {
+            "total_practiced": total_practiced,
+            "total_correct": total_correct,
+            "mastery": min(max(mastery, 0.0), 1.0),
+            "streak_days": streak_days,
+            "last_practice_at": answered_at.isoformat()
+        }
+
+    def flush(self) -> int:
+        """
+        Escribe por lote los agregados modificados en user_progress
+
+        Si el upsert falla, las materias vuelven a marcarse como pendientes.
+
+        Returns:
+            int: Filas escritas
+        """
+        redis_client = self.redis
+        if redis_client is None:
+            return 0
+
+        members = redis_client.spop(self.DIRTY_KEY, self.batch_size)
+        if not members:
+            return 0
+
+        pairs = [member.split("|", 1) for member in members]
+
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, subject in pairs:
+            pipe.hget(self._get_key(user_id), subject)
+        raw_aggregates = pipe.execute()
+
+        rows = [
+            self._to_row(user_id, subject, self._decode(raw))
+            for (user_id, subject), raw in zip(pairs, raw_aggregates)
+            if raw is not None
+        ]
+
+        if not self.repo.upsert_batch(rows):
+            redis_client.sadd(self.DIRTY_KEY, *members)
+            return 0
+
+        print(f"✓ Progreso guardado: {len(rows)} materias")
+        return len(rows)
+
+    # ==================== LECTURA ====================
+
+    def get_progress(self, user_id: str, subject: Optional[str] = None) -> List[dict]:
+        """
+        Progreso del usuario leído del agregado (sin recorrer el historial)
+
+        Args:
+            user_id: UUID del usuario
+            subject: Materia específica (opcional, todas si se omite)
+
+        Returns:
+            list: [{subject, total_practiced, total_correct, accuracy,
+                    mastery_level, streak_days, last_practice_at}]
+        """
+        now = datetime.utcnow()
+        redis_client = self.redis
+
+        if redis_client is None:
+            aggregates = {row["subject"]: self._from_row(row) for row in self.repo.get_by_user(user_id)}
+        else:
+            key = self._ensure_loaded(redis_client, user_id)
+            aggregates = {
+                field: self._decode(raw)
+                for field, raw in redis_client.hgetall(key).items()
+                if field != self.LOADED_FIELD
+            }
+
+        if subject is not None:
+            aggregates = {subject: aggregates[subject]} if subject in aggregates else {}
+
+        return [self._public(name, aggregate, now) for name, aggregate in sorted(aggregates.items())]
+
+    # ==================== INTERNOS ====================
+
+    def _ensure_loaded(self, redis_client, user_id: str) -> str:
+        """Carga el progreso del usuario desde user_progress si no está en Redis"""
+        key = self._get_key(user_id)
+
+        if redis_client.hexists(key, self.LOADED_FIELD):
+            return key
+
+        rows = self.repo.get_by_user(user_id)
+
+        pipe = redis_client.pipeline()
+        # HSETNX: no pisar agregados que otro worker ya actualizó
+        for row in rows:
+            pipe.hsetnx(key, row["subject"], json.dumps(self._from_row(row)))
+        pipe.hset(key, self.LOADED_FIELD, "1")
+        pipe.expire(key, self.AGGREGATE_TTL)
+        pipe.execute()
+
+        return key
+
+    def _schedule_flush(self, redis_client) -> None:
+        """Adelanta el flush en segundo plano si ya hay un lote completo"""
+        if redis_client.scard(self.DIRTY_KEY) >= self.batch_size:
+            self.flusher.wake()
+        else:
+            self.flusher.start()
+
+    @staticmethod
+    def _empty() -> dict:
+        return {
+            "total_practiced": 0,
+            "total_correct": 0,
+            "mastery": 0.0,
+            "streak_days": 0,
+            "last_practice_at": None
+        }
+
+    def _decode(self, raw) -> dict:
+        if not raw:
+            return self._empty()
+        return {**self._empty(), **json.loads(raw)}
+
+    def _from_row(self, row: Optional[dict]) -> dict:
+        if not row:
+            return self._empty()
+        return {
+            "total_practiced": row.get("total_practiced") or 0,
+            "total_correct": row.get("total_correct") or 0,
+            "mastery": float(row.get("mastery_level") or 0),
+            "streak_days": row.get("streak_days") or 0,
+            "last_practice_at": row.get("last_practice_at")
+        }
+
+    @staticmethod
+    def _to_row(user_id: str, subject: str, aggregate: dict) -> dict:
+        return {
+            "user_id": user_id,
+            "subject": subject,
+            "total_practiced": aggregate["total_practiced"],
+            "total_correct": aggregate["total_correct"],
+            "mastery_level": round(aggregate["mastery"], 2),
+            "streak_days": aggregate["streak_days"],
+            "last_practice_at": aggregate["last_practice_at"]
+        }
+
+    def _public(self, subject: str, aggregate: dict, now: datetime) -> dict:
+        total = aggregate["total_practiced"]
+
+        # La racha sigue vigente si la última práctica fue hoy o ayer
+        last_day = self._parse_day(aggregate["last_practice_at"])
+        active = last_day is not None and (now.date() - last_day).days <= 1
+
+        return {
+            "subject": subject,
+            "total_practiced": total,
+            "total_correct": aggregate["total_correct"],
+            "accuracy": round(aggregate["total_correct"] / total, 2) if total else 0.0,
+            "mastery_level": round(aggregate["mastery"], 2),
+            "streak_days": aggregate["streak_days"] if active else 0,
+            "last_practice_at": aggregate["last_practice_at"]
+        }
+
+    @staticmethod
+    def _parse_day(value):
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(str(value).replace("Z", "+00:00")).date()
+        except ValueError:
+            return None
+
+
+def flush_pending() -> int:
+    """
+    Escribe todos los agregados pendientes (tarea periódica del proceso)
+
+    Returns:
+        int: Filas escritas
+    """
+    service = ProgressService()
+    written = 0
+    while True:
+        count = service.flush()
+        written += count
+        if count < service.batch_size:
+            return written
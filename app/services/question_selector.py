@@ -0,0 +1,220 @@
+"""
+Selección adaptativa de preguntas de examen
+
+Cada materia tiene un índice en memoria con arreglos NumPy alineados
+(una posición por pregunta). La dificultad estimada y el bono de cada
+pregunta se precalculan al construir el índice, así que elegir la
+siguiente pregunta son unas pocas operaciones vectorizadas:
+
+    score = bonus - DIFFICULTY_WEIGHT * |dificultad - mastery del usuario|
+
+Las preguntas vistas recientemente (lista en Redis por usuario y
+materia) y las que no cumplen el filtro de dificultad se descartan;
+la pregunta final se sortea entre las TOP_K mejores con pesos softmax
+para no repetir siempre la misma.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.config import Config
+from app.extensions import get_redis
+from app.repositories.question_repo import QuestionRepository
+
+
+DIFFICULTY_LEVELS = {"easy": 0, "medium": 1, "hard": 2}
+
+
+class SubjectIndex:
+    """Arreglos de selección de las preguntas de una materia"""
+
+    __slots__ = ("subject", "ids", "positions", "levels", "difficulty", "bonus", "loaded_at")
+
+    # Dificultad nominal de cada nivel en la escala 0-1
+    LEVEL_DIFFICULTY = np.array([0.25, 0.5, 0.75])
+    # Prior Beta(2, 2) para la tasa de acierto: 0.5 sin datos
+    PRIOR_CORRECT = 2.0
+    PRIOR_SEEN = 4.0
+    # Respuestas a partir de las cuales se confía en la tasa observada
+    CONFIDENCE_SEEN = 20.0
+    EXAM_WEIGHT = 0.3
+    EXPLORATION_WEIGHT = 0.1
+
+    def __init__(self, subject: str, rows: List[dict]):
+        """
+        Construye el índice
+
+        Args:
+            subject: Materia
+            rows: Filas de QuestionRepository.get_stats_by_subject()
+        """
+        self.subject = subject
+        self.ids = [row["id"] for row in rows]
+        self.positions = {question_id: position for position, question_id in enumerate(self.ids)}
+        self.loaded_at = time.monotonic()
+
+        self.levels = np.array(
+            [DIFFICULTY_LEVELS.get(row.get("difficulty") or "medium", 1) for row in rows],
+            dtype=np.int8
+        )
+        seen = np.array([row.get("times_seen") or 0 for row in rows], dtype=np.float64)
+        correct = np.array([row.get("times_correct") or 0 for row in rows], dtype=np.float64)
+        # 0.0 es una probabilidad válida: solo un valor ausente toma el neutro 0.5
+        exam_probability = np.array(
+            [0.5 if row.get("exam_probability") is None else float(row["exam_probability"]) for row in rows],
+            dtype=np.float64
+        )
+
+        # Dificultad: mezcla del nivel etiquetado y la tasa de error observada,
+        # pesando más la observada conforme la pregunta acumula respuestas
+        success_rate = (correct + self.PRIOR_CORRECT) / (seen + self.PRIOR_SEEN)
+        confidence = np.minimum(seen / self.CONFIDENCE_SEEN, 1.0)
+        nominal = self.LEVEL_DIFFICULTY[self.levels]
+        self.difficulty = (1 - confidence) * nominal + confidence * (1 - success_rate)
+
+        # Bono: probabilidad de aparecer en el examen y exploración de preguntas poco vistas
+        self.bonus = self.EXAM_WEIGHT * exam_probability + self.EXPLORATION_WEIGHT / np.sqrt(seen + 1)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class QuestionSelector:
+    """Elige la siguiente pregunta de una materia para un usuario"""
+
+    RECENT_PREFIX = "recent_questions:"
+    RECENT_TTL = 7 * 86400  # 7 días
+    DIFFICULTY_WEIGHT = 1.0
+    TOP_K = 8
+    TEMPERATURE = 0.05
+
+    def __init__(self, question_repo: Optional[QuestionRepository] = None, redis_client=None,
+                 index_ttl: Optional[int] = None, recent_window: Optional[int] = None, seed=None):
+        """
+        Inicializa el selector
+
+        Args:
+            question_repo: Repositorio de preguntas (opcional, se crea al cargar un índice)
+            redis_client: Cliente Redis (opcional, usa get_redis() si no se provee)
+            index_ttl: Segundos antes de recargar el índice de una materia (opcional, usa Config)
+            recent_window: Preguntas recientes excluidas por usuario y materia (opcional, usa Config)
+            seed: Semilla del generador aleatorio (opcional, para tests)
+        """
+        self._repo = question_repo
+        self._redis = redis_client
+        self.index_ttl = index_ttl if index_ttl is not None else Config.QUESTION_INDEX_TTL
+        self.recent_window = recent_window or Config.QUESTION_RECENT_WINDOW
+        self._rng = np.random.default_rng(seed)
+        self._indexes: Dict[str, SubjectIndex] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        """Cliente Redis (resuelto en cada uso: get_redis() es None hasta init_extensions)"""
+        return self._redis if self._redis is not None else get_redis()
+
+    @property
+    def repo(self) -> QuestionRepository:
+        if self._repo is None:
+            self._repo = QuestionRepository()
+        return self._repo
+
+    def get_index(self, subject: str) -> SubjectIndex:
+        """
+        Índice de la materia (se construye o recarga si expiró)
+
+        Args:
+            subject: Materia
+
+        Returns:
+            SubjectIndex: Índice en memoria
+        """
+        index = self._indexes.get(subject)
+        if index is not None and time.monotonic() - index.loaded_at < self.index_ttl:
+            return index
+
+        with self._lock:
+            index = self._indexes.get(subject)
+            if index is None or time.monotonic() - index.loaded_at >= self.index_ttl:
+                index = SubjectIndex(subject, self.repo.get_stats_by_subject(subject))
+                self._indexes[subject] = index
+                print(f"✓ Índice de preguntas cargado: {subject} ({len(index)} preguntas)")
+        return index
+
+    def invalidate(self, subject: Optional[str] = None) -> None:
+        """Descarta el índice de una materia (o todos) para recargarlo en el siguiente uso"""
+        with self._lock:
+            if subject is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(subject, None)
+
+    def select(self, subject: str, mastery: float = 0.0, exclude: Iterable[str] = (),
+               difficulty: Optional[str] = None) -> Optional[str]:
+        """
+        Elige una pregunta según el dominio del usuario
+
+        Args:
+            subject: Materia
+            mastery: mastery_level del usuario en la materia (0-1)
+            exclude: IDs de preguntas a descartar (vistas recientemente)
+            difficulty: Filtro de dificultad opcional (easy, medium, hard)
+
+        Returns:
+            str | None: ID de la pregunta o None si no hay candidatas
+        """
+        index = self.get_index(subject)
+        if not len(index):
+            return None
+
+        # Pedir preguntas un poco por encima del nivel actual
+        target = min(max(mastery, 0.0), 1.0) * 0.8 + 0.15
+        scores = index.bonus - self.DIFFICULTY_WEIGHT * np.abs(index.difficulty - target)
+
+        if difficulty in DIFFICULTY_LEVELS:
+            scores[index.levels != DIFFICULTY_LEVELS[difficulty]] = -np.inf
+
+        excluded = [index.positions[q] for q in exclude if q in index.positions]
+        if excluded:
+            masked = scores.copy()
+            masked[excluded] = -np.inf
+            # Si ya vio todas, se permite repetir
+            if np.isfinite(masked).any():
+                scores = masked
+
+        top_k = min(self.TOP_K, len(scores))
+        candidates = np.argpartition(scores, -top_k)[-top_k:]
+        candidates = candidates[np.isfinite(scores[candidates])]
+        if not len(candidates):
+            return None
+
+        weights = np.exp((scores[candidates] - scores[candidates].max()) / self.TEMPERATURE)
+        choice = self._rng.choice(candidates, p=weights / weights.sum())
+        return index.ids[int(choice)]
+
+    def get_recent(self, user_id: str, subject: str) -> List[str]:
+        """IDs servidos recientemente al usuario en la materia"""
+        redis_client = self.redis
+        if redis_client is None:
+            return []
+        return redis_client.lrange(self._recent_key(user_id, subject), 0, self.recent_window - 1)
+
+    def mark_served(self, user_id: str, subject: str, question_id: str) -> None:
+        """Agrega una pregunta a la lista de recientes del usuario"""
+        redis_client = self.redis
+        if redis_client is None:
+            return
+        key = self._recent_key(user_id, subject)
+        pipe = redis_client.pipeline()
+        pipe.lpush(key, question_id)
+        pipe.ltrim(key, 0, self.recent_window - 1)
+        pipe.expire(key, self.RECENT_TTL)
+        pipe.execute()
+
+    def _recent_key(self, user_id: str, subject: str) -> str:
+        return f"{self.RECENT_PREFIX}{user_id}:{subject}"
+
+
+question_selector = QuestionSelector()
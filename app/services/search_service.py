@@ -0,0 +1,148 @@
+"""
+Servicio de búsqueda de preguntas
+
+- search(): texto completo en Supabase (search_questions / search_ai_answers,
+  índices GIN sobre tsvector en español) con ranking ts_rank
+- autocomplete(): índice invertido en memoria sobre el banco de preguntas,
+  sin round-trip a la base de datos
+
+Ambos normalizan la consulta con normalize_text (sin acentos) y completan
+por prefijo: el último término en la base de datos, todos en el índice local.
+"""
+import threading
+import time
+from typing import List, Optional
+
+from app.config import Config
+from app.repositories.ai_answers_repo import AIAnswersRepository
+from app.repositories.question_repo import QuestionRepository
+from app.utils.search_index import InvertedIndex, build_tsquery
+
+
+class SearchService:
+    """Búsqueda de texto completo y autocompletado"""
+
+    SOURCES = ("questions", "answers")
+    RESULT_FIELDS = ("id", "code", "subject", "topic", "difficulty", "question")
+
+    def __init__(
+        self,
+        question_repo: Optional[QuestionRepository] = None,
+        answers_repo: Optional[AIAnswersRepository] = None,
+        index_ttl: Optional[int] = None,
+        local_index_enabled: Optional[bool] = None
+    ):
+        """
+        Inicializa el servicio
+
+        Args:
+            question_repo: Repositorio de preguntas (opcional, se crea al usarse)
+            answers_repo: Repositorio de respuestas IA (opcional, se crea al usarse)
+            index_ttl: Segundos antes de reconstruir el índice local (opcional, usa Config)
+            local_index_enabled: Usar el índice en memoria (opcional, usa Config)
+        """
+        self._question_repo = question_repo
+        self._answers_repo = answers_repo
+        self.index_ttl = index_ttl if index_ttl is not None else Config.SEARCH_INDEX_TTL
+        self.local_index_enabled = (
+            Config.SEARCH_LOCAL_INDEX_ENABLED if local_index_enabled is None else local_index_enabled
+        )
+        self._index: Optional[InvertedIndex] = None
+        self._index_loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def question_repo(self) -> QuestionRepository:
+        if self._question_repo is None:
+            self._question_repo = QuestionRepository()
+        return self._question_repo
+
+    @property
+    def answers_repo(self) -> AIAnswersRepository:
+        if self._answers_repo is None:
+            self._answers_repo = AIAnswersRepository()
+        return self._answers_repo
+
+    def search(self, query: str, subject: Optional[str] = None, limit: int = 20,
+               source: str = "questions") -> List[dict]:
+        """
+        Búsqueda de texto completo con ranking
+
+        Si la base de datos falla, las preguntas se buscan en el índice local.
+
+        Args:
+            query: Texto de búsqueda
+            subject: Filtrar por materia (solo questions)
+            limit: Máximo de resultados
+            source: "questions" (banco) o "answers" (respuestas generadas)
+
+        Returns:
+            list: Resultados con campo rank, ordenados por relevancia
+        """
+        tsquery = build_tsquery(query)
+        if tsquery is None:
+            return []
+
+        if source == "answers":
+            return self.answers_repo.search(tsquery, limit) or []
+
+        results = self.question_repo.search(tsquery, subject, limit)
+        if results is None:
+            if not self.local_index_enabled:
+                return []
+            print("⚠ Búsqueda en base de datos falló, usando índice local")
+            return self._search_local(query, subject, limit)
+
+        return results
+
+    def autocomplete(self, query: str, subject: Optional[str] = None, limit: int = 8) -> List[dict]:
+        """
+        Sugerencias mientras el usuario escribe
+
+        Args:
+            query: Texto parcial
+            subject: Filtrar por materia (opcional)
+            limit: Máximo de sugerencias
+
+        Returns:
+            list: Preguntas con campo rank
+        """
+        if not self.local_index_enabled:
+            return self.search(query, subject, limit)
+        return self._search_local(query, subject, limit)
+
+    def get_index(self) -> InvertedIndex:
+        """
+        Índice local del banco (se construye o reconstruye si expiró)
+
+        Returns:
+            InvertedIndex: Índice en memoria
+        """
+        if self._index is not None and time.monotonic() - self._index_loaded_at < self.index_ttl:
+            return self._index
+
+        with self._lock:
+            if self._index is None or time.monotonic() - self._index_loaded_at >= self.index_ttl:
+                documents = [
+                    {field: row.get(field) for field in self.RESULT_FIELDS}
+                    for row in self.question_repo.get_search_corpus()
+                ]
+                self._index = InvertedIndex(documents)
+                self._index_loaded_at = time.monotonic()
+                print(f"✓ Índice de búsqueda construido: {len(self._index)} preguntas")
+        return self._index
+
+    def invalidate(self) -> None:
+        """Fuerza la reconstrucción del índice local en el siguiente uso"""
+        with self._lock:
+            self._index = None
+
+    def _search_local(self, query: str, subject: Optional[str], limit: int) -> List[dict]:
+        predicate = (lambda document: document.get("subject") == subject) if subject else None
+        return [
+            {**document, "rank": score}
+            for document, score in self.get_index().search(query, limit, predicate=predicate)
+        ]
+
+
+search_service = SearchService()
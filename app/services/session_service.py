@@ -2,11 +2,16 @@
 Servicio de gestión de sesiones de Socket.IO con Redis
 Maneja la lógica de negocio, validaciones y orquestación
 """
+import secrets
 import uuid
 from datetime import datetime
 from typing import Optional
-from app.repositories.session_repository import SessionRepository
+from app.config import Config
+from app.models.session import SessionData
+from app.repositories.session_repository import SessionNotFoundError, SessionRepository
+from app.services.event_service import event_service
 from app.extensions import get_redis
+from app.utils.background import PeriodicTask, get_periodic_task
 
 
 class SessionExpiredError(Exception):
@@ -24,22 +29,29 @@ class SessionService:
     - Posición de streaming (pause/resume)
     - Contexto de conversación
     - Metadata de conexión
+    - Token de reconexión (la sesión sobrevive RECONNECT_GRACE tras desconectar)
     """
     
     DEFAULT_TTL = 1800  # 30 minutos
+    RECONNECT_GRACE = Config.SESSION_RECONNECT_GRACE
     
-    def __init__(self, session_repo: Optional[SessionRepository] = None):
+    def __init__(self, session_repo: Optional[SessionRepository] = None,
+                 sweeper: Optional[PeriodicTask] = None):
         """
         Inicializa el servicio con repositorio
         
         Args:
             session_repo: Repositorio de sesiones (opcional, se crea si no se provee)
+            sweeper: Tarea de barrido del índice (opcional, usa la compartida del proceso)
         """
         if session_repo is None:
             redis_client = get_redis()
             session_repo = SessionRepository(redis_client)
         
         self.repo = session_repo
+        self.sweeper = sweeper or get_periodic_task(
+            "session-sweep", sweep_expired_sessions, Config.SESSION_SWEEP_INTERVAL, run_at_exit=False
+        )
     
     def create_session(self, user_id: str, connection_id: str = None) -> str:
         """
@@ -66,17 +78,20 @@ class SessionService:
             "is_paused": False,
             "is_streaming": False,
             "conversation_context": {},
+            "reconnect_token": secrets.token_urlsafe(24),
             "created_at": datetime.utcnow().isoformat(),
             "last_activity": datetime.utcnow().isoformat()
         }
         
         self.repo.create(session_id, session_data, ttl=self.DEFAULT_TTL)
+        # El índice sessions:active se barre cada SESSION_SWEEP_INTERVAL segundos
+        self.sweeper.start()
         
         print(f"✓ Sesión creada: {session_id} para usuario: {user_id}")
         
         return session_id
     
-    def get_session(self, session_id: str) -> dict:
+    def get_session(self, session_id: str) -> SessionData:
         """
         Obtiene una sesión y actualiza su actividad
         
@@ -89,15 +104,16 @@ class SessionService:
         Raises:
             SessionExpiredError: Si la sesión no existe o expiró
         """
-        session = self.repo.get(session_id)
+        # Leer, actualizar last_activity y renovar TTL en un solo round-trip
+        session = self.repo.get_and_touch(
+            session_id,
+            {"last_activity": datetime.utcnow().isoformat()},
+            ttl=self.DEFAULT_TTL
+        )
         
         if session is None:
             raise SessionExpiredError(f"Sesión {session_id} no existe o expiró")
         
-        # Actualizar last_activity y renovar TTL
-        session["last_activity"] = datetime.utcnow().isoformat()
-        self.repo.update(session_id, {"last_activity": session["last_activity"]})
-        
         return session
     
     def update_session(self, session_id: str, data: dict) -> bool:
@@ -114,15 +130,14 @@ class SessionService:
         Raises:
             SessionExpiredError: Si la sesión no existe
         """
-        # Validar que la sesión existe
-        if not self.repo.exists(session_id):
-            raise SessionExpiredError(f"Sesión {session_id} no existe")
-        
         # Agregar timestamp de última actividad
         data["last_activity"] = datetime.utcnow().isoformat()
         
-        # Actualizar y renovar TTL
-        self.repo.update(session_id, data, ttl=self.DEFAULT_TTL)
+        # Actualizar y renovar TTL (falla si la sesión no existe)
+        try:
+            self.repo.update(session_id, data, ttl=self.DEFAULT_TTL)
+        except SessionNotFoundError:
+            raise SessionExpiredError(f"Sesión {session_id} no existe")
         
         return True
     
@@ -143,22 +158,165 @@ class SessionService:
         """
         Finaliza una sesión (disconnect limpio)
         
+        Registra un evento session_ended; el consumidor del pipeline de
+        eventos lo convierte en el resumen de study_sessions.
+        
         Args:
             session_id: ID de la sesión
             
         Returns:
             bool: True si se eliminó exitosamente
         """
-        # Opcional: Aquí podrías guardar estadísticas en Supabase
-        # antes de eliminar la sesión
-        
+        session = self.repo.get(session_id)
         success = self.repo.delete(session_id)
         
+        if session:
+            self._track_ended(session_id, session)
+        
         if success:
             print(f"✓ Sesión finalizada: {session_id}")
         
         return success
     
+    def _track_ended(self, session_id: str, session: dict) -> None:
+        """Registra session_ended con la duración acumulada de la sesión"""
+        ended_at = datetime.utcnow()
+        started_at = session.get("created_at")
+        try:
+            duration = (ended_at - datetime.fromisoformat(started_at)).total_seconds()
+        except (TypeError, ValueError):
+            duration = 0
+        
+        event_service.track(
+            "session_ended",
+            session_id=session_id,
+            user_id=session.get("user_id"),
+            started_at=f"{started_at}+00:00" if started_at else None,
+            duration_seconds=int(max(duration, 0)),
+            # Desconexión a mitad de una explicación = sesión abandonada
+            status="abandoned" if session.get("is_streaming") or session.get("was_streaming") else "completed"
+        )
+    
+    def suspend_session(self, session_id: str) -> Optional[str]:
+        """
+        Suspende una sesión al desconectarse el socket
+        
+        La sesión (y la respuesta guardada) se conserva RECONNECT_GRACE
+        segundos bajo su token de reconexión; si nadie la reclama, expira
+        sola. Si estaba en streaming queda pausada en el paso y posición
+        actuales.
+        
+        Registra session_ended con el estado al desconectar; si la sesión
+        se reclama, el cierre definitivo actualiza ese resumen.
+        
+        Args:
+            session_id: ID de la sesión
+            
+        Returns:
+            str | None: Token de reconexión, o None si la sesión no existe
+        """
+        session = self.repo.get(session_id)
+        if session is None:
+            return None
+        
+        token = session.get("reconnect_token") or secrets.token_urlsafe(24)
+        was_streaming = bool(session.get("is_streaming"))
+        
+        self.repo.update(session_id, {
+            "connection_id": None,
+            "reconnect_token": token,
+            "is_streaming": False,
+            "is_paused": session.get("is_paused") or was_streaming,
+            "was_streaming": was_streaming,
+            "disconnected_at": datetime.utcnow().isoformat()
+        }, ttl=self.RECONNECT_GRACE)
+        self.repo.set_snapshot_ttl(session_id, self.RECONNECT_GRACE)
+        self.repo.save_reconnect_token(token, session_id, self.RECONNECT_GRACE)
+        
+        self._track_ended(session_id, session)
+        
+        print(f"⏸ Sesión suspendida: {session_id} ({self.RECONNECT_GRACE}s para reconectar)")
+        
+        return token
+    
+    def reclaim_session(self, reconnect_token: str, user_id: str,
+                        connection_id: str = None) -> Optional[dict]:
+        """
+        Reclama una sesión suspendida desde un socket nuevo
+        
+        El token es de un solo uso: se consume y se emite uno nuevo.
+        
+        Args:
+            reconnect_token: Token entregado en connection_established
+            user_id: UUID del usuario autenticado en el socket nuevo
+            connection_id: ID del socket nuevo
+            
+        Returns:
+            dict | None: Sesión (con session_id y el nuevo reconnect_token),
+                         o None si el token no existe, expiró o es de otro usuario
+        """
+        if not reconnect_token:
+            return None
+        
+        session_id = self.repo.pop_reconnect_token(reconnect_token)
+        if not session_id:
+            return None
+        
+        session = self.repo.get(session_id)
+        if session is None:
+            return None
+        
+        if session.get("user_id") != user_id:
+            print(f"⚠ Token de reconexión de otro usuario para sesión: {session_id}")
+            # Devolver el token: el dueño legítimo aún puede usarlo
+            self.repo.save_reconnect_token(
+                reconnect_token, session_id, max(self.repo.get_ttl(session_id), 1)
+            )
+            return None
+        
+        updates = {
+            "connection_id": connection_id,
+            "reconnect_token": secrets.token_urlsafe(24),
+            "disconnected_at": None,
+            "last_activity": datetime.utcnow().isoformat()
+        }
+        self.repo.update(session_id, updates, ttl=self.DEFAULT_TTL)
+        self.repo.set_snapshot_ttl(session_id, self.DEFAULT_TTL)
+        
+        session.update(updates)
+        session["session_id"] = session_id
+        
+        print(f"✓ Sesión reclamada: {session_id} para usuario: {user_id}")
+        
+        return session
+    
+    def save_answer_snapshot(self, session_id: str, answer_data: dict) -> bool:
+        """
+        Guarda la respuesta en streaming junto a la sesión
+        
+        Permite reanudar tras reconectar sin consultar la base de datos ni la IA.
+        
+        Args:
+            session_id: ID de la sesión
+            answer_data: {steps, total_duration, question_hash}
+            
+        Returns:
+            bool: True si se guardó
+        """
+        return self.repo.save_answer(session_id, answer_data, ttl=self.DEFAULT_TTL)
+    
+    def get_answer_snapshot(self, session_id: str) -> Optional[dict]:
+        """
+        Obtiene la respuesta guardada de una sesión
+        
+        Args:
+            session_id: ID de la sesión
+            
+        Returns:
+            dict | None: answer_data o None si no hay
+        """
+        return self.repo.get_answer(session_id)
+    
     def session_exists(self, session_id: str) -> bool:
         """
         Verifica si una sesión existe
@@ -185,15 +343,56 @@ class SessionService:
     
     def cleanup_expired_sessions(self) -> int:
         """
-        Limpieza manual de sesiones expiradas
-        (Redis TTL hace esto automáticamente, esto es para debugging/monitoring)
+        Limpia del índice las sesiones vencidas
+        (Redis TTL elimina las sesiones; esto mantiene sessions:active al día)
         
         Returns:
-            int: Número de sesiones activas encontradas
+            int: Número de sesiones activas tras la limpieza
         """
-        active_sessions = self.repo.get_all_sessions()
-        print(f"ℹ Sesiones activas: {len(active_sessions)}")
-        return len(active_sessions)
+        removed = self.repo.sweep_expired()
+        active = self.repo.count_active()
+        if removed:
+            print(f"ℹ Sesiones activas: {active} (vencidas eliminadas del índice: {removed})")
+        return active
+    
+    def get_user_sessions(self, user_id: str) -> list:
+        """
+        Obtiene las sesiones activas de un usuario
+        
+        Args:
+            user_id: UUID del usuario
+            
+        Returns:
+            list: [{session_id, ttl, is_streaming, is_paused, current_question, last_activity}]
+        """
+        sessions = []
+        for session_id in self.repo.get_user_sessions(user_id):
+            session = self.repo.get(session_id)
+            if session is None:
+                continue
+            sessions.append({
+                "session_id": session_id,
+                "ttl": self.repo.get_ttl(session_id),
+                "is_streaming": session.get("is_streaming", False),
+                "is_paused": session.get("is_paused", False),
+                "current_question": session.get("current_question"),
+                "last_activity": session.get("last_activity")
+            })
+        return sessions
+    
+    def get_stats(self) -> dict:
+        """
+        Métricas de sesiones activas (para monitoreo)
+        
+        Returns:
+            dict: active_sessions, expiring_next_minute, swept
+        """
+        swept = self.repo.sweep_expired()
+        return {
+            "active_sessions": self.repo.count_active(),
+            "expiring_next_minute": self.repo.count_active(within=60),
+            "swept": swept
+        }
     
     def update_streaming_state(self, session_id: str, is_streaming: bool, 
                                current_step: int = 0) -> bool:
@@ -213,22 +412,27 @@ class SessionService:
             "current_step": current_step
         })
     
-    def pause_streaming(self, session_id: str, pause_position: int) -> bool:
+    def pause_streaming(self, session_id: str, pause_position: int,
+                        current_step: Optional[int] = None) -> bool:
         """
         Pausa el streaming en una posición específica
         
         Args:
             session_id: ID de la sesión
-            pause_position: Posición donde se pausó (caracteres procesados)
+            pause_position: Posición donde se pausó (caracteres del paso ya enviados)
+            current_step: Paso donde se pausó (opcional, se conserva el actual)
             
         Returns:
             bool: True si se pausó
         """
-        return self.update_session(session_id, {
+        data = {
             "is_paused": True,
             "pause_position": pause_position,
             "is_streaming": False
-        })
+        }
+        if current_step is not None:
+            data["current_step"] = current_step
+        return self.update_session(session_id, data)
     
     def resume_streaming(self, session_id: str) -> dict:
         """
@@ -246,10 +450,23 @@ class SessionService:
         # Actualizar estado
         self.update_session(session_id, {
             "is_paused": False,
-            "is_streaming": True
+            "is_streaming": True,
+            "was_streaming": False
         })
         
         # Obtener sesión actualizada
         session = self.get_session(session_id)
         
         return session
+
+
+def sweep_expired_sessions() -> int:
+    """
+    Barre el índice de sesiones vencidas (tarea periódica del proceso)
+    
+    Returns:
+        int: Número de sesiones activas tras la limpieza
+    """
+    if get_redis() is None:
+        return 0
+    return SessionService().cleanup_expired_sessions()
@@ -0,0 +1,105 @@
+"""
+Transportes de eventos para el motor de streaming
+
+StreamingService produce una única secuencia de eventos (explanation_start,
+step_start, step_commands, content_chunk, step_complete,
+explanation_complete, ...). El transporte decide cómo llegan al cliente:
+
+- CallbackTransport: cualquier función emit(event, data) (Socket.IO)
+- RecordingTransport: guarda los eventos en memoria (tests y benchmarks)
+- SSETransport / NDJSONTransport: serializan a texto para respuestas HTTP
+  chunked (/api/v1/questions/stream); el handler vacía el buffer con drain()
+"""
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from app.utils.codec import get_codec
+
+
+class CallbackTransport:
+    """Envía cada evento con una función emit(event, data)"""
+
+    def __init__(self, emit_func: Callable[[str, dict], None]):
+        """
+        Args:
+            emit_func: Función emit (p. ej. flask_socketio.emit)
+        """
+        self.emit_func = emit_func
+
+    def send(self, event: str, data: dict) -> None:
+        self.emit_func(event, data)
+
+
+class RecordingTransport:
+    """Guarda los eventos emitidos en orden"""
+
+    def __init__(self):
+        self.events: List[Tuple[str, dict]] = []
+        self._lock = threading.Lock()
+
+    def send(self, event: str, data: dict) -> None:
+        with self._lock:
+            self.events.append((event, data))
+
+    def names(self) -> List[str]:
+        """Nombres de los eventos en orden"""
+        return [event for event, _ in self.events]
+
+    def of(self, event: str) -> List[dict]:
+        """Payloads de un tipo de evento"""
+        return [data for name, data in self.events if name == event]
+
+    def last(self) -> Optional[Tuple[str, dict]]:
+        """Último evento (None si no hubo)"""
+        return self.events[-1] if self.events else None
+
+
+class BufferedTransport:
+    """
+    Serializa cada evento a bytes y los acumula hasta drain()
+
+    Las subclases definen el framing (format_event). El payload se codifica
+    como JSON de texto con el codec configurado (orjson si está instalado).
+    """
+
+    mimetype = "application/octet-stream"
+
+    def __init__(self):
+        self._codec = get_codec(binary=False)
+        self._buffer: List[bytes] = []
+
+    def send(self, event: str, data: dict) -> None:
+        self._buffer.append(self.format_event(event, self._codec.encode(data)))
+
+    def format_event(self, event: str, payload: bytes) -> bytes:
+        raise NotImplementedError
+
+    def drain(self) -> bytes:
+        """Devuelve y vacía los bytes acumulados"""
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class SSETransport(BufferedTransport):
+    """Server-Sent Events: "event: <nombre>" + "data: <json>" por evento"""
+
+    mimetype = "text/event-stream"
+
+    def format_event(self, event: str, payload: bytes) -> bytes:
+        return b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+
+
+class NDJSONTransport(BufferedTransport):
+    """JSON por línea: {"event": <nombre>, "data": {...}}"""
+
+    mimetype = "application/x-ndjson"
+
+    def format_event(self, event: str, payload: bytes) -> bytes:
+        return b'{"event":"' + event.encode() + b'","data":' + payload + b"}\n"
+
+
+HTTP_TRANSPORTS = {
+    "sse": SSETransport,
+    "ndjson": NDJSONTransport
+}
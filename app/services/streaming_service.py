@@ -1,11 +1,216 @@
 """
 Servicio de streaming de respuestas en tiempo real
 Maneja el envío progresivo de respuestas al cliente via Socket.IO
+
+Todas las fuentes (respuestas de preguntas libres, explicaciones de examen,
+follow-ups y snapshots de sesión) se normalizan una vez a pasos tipados
+(AnswerStep) y las transmite un único motor (StepEngine): mismo orden de
+eventos, mismos payloads, mismo ritmo. El transporte es intercambiable
+(Socket.IO, grabación en memoria para tests, SSE/NDJSON por HTTP).
 """
 import time
-from typing import Optional, Dict, List
+from typing import Iterator, Optional, Dict, List, Union
 from flask_socketio import emit
+from app.models.answer import Answer, AnswerStep
+from app.models.explanation import ExplanationStep
+from app.models.session import StreamCursor
 from app.services.session_service import SessionService
+from app.services.event_service import event_service
+from app.services.stream_transport import CallbackTransport
+from app.utils.answer_frames import answer_frames
+from app.utils.metrics import metrics
+
+
+STREAMS_ACTIVE = metrics.gauge("streams_active", "Respuestas transmitiéndose ahora (Socket.IO y HTTP)")
+
+
+def socketio_transport() -> CallbackTransport:
+    """Transporte por defecto: emit de Flask-SocketIO en el contexto del evento"""
+    return CallbackTransport(lambda event, data: emit(event, data))
+
+
+class StepEngine:
+    """
+    Motor único de streaming de pasos
+    
+    Recorre los pasos desde un StreamCursor y, por cada paso, emite
+    step_start, step_commands (todos los comandos de canvas y componentes
+    del paso en un solo evento), content_chunk y step_complete con el
+    mismo ritmo para cualquier fuente.
+    
+    Con session_id, antes de cada paso y de cada chunk consulta la sesión:
+    si está pausada guarda paso y posición y se detiene. Sin session_id
+    (explicaciones de examen, follow-ups) transmite de corrido.
+    """
+    
+    def __init__(
+        self,
+        transport,
+        session_service: Optional[SessionService] = None,
+        session_id: Optional[str] = None,
+        chunk_size: int = 50,
+        chunk_delay: float = 0.05,
+        command_delay: float = 0.1
+    ):
+        """
+        Args:
+            transport: Transporte con send(event, data)
+            session_service: Servicio de sesiones (requerido con session_id)
+            session_id: Sesión para pause/resume (opcional)
+            chunk_size: Caracteres por chunk
+            chunk_delay: Segundos entre chunks
+            command_delay: Segundos después de los comandos de un paso (antes del texto)
+        """
+        self.transport = transport
+        self.session_service = session_service
+        self.session_id = session_id
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.command_delay = command_delay
+    
+    def run(self, steps: List[AnswerStep], cursor: StreamCursor) -> bool:
+        """
+        Transmite los pasos desde la posición del cursor
+        
+        Si el cursor está a mitad de un paso (offset > 0), primero envía
+        solo el contenido pendiente de ese paso.
+        
+        Returns:
+            bool: True si se enviaron todos, False si se pausó
+        """
+        for completed in self.iter_steps(steps, cursor):
+            if not completed:
+                return False
+        return True
+    
+    def iter_steps(self, steps: List[AnswerStep], cursor: StreamCursor) -> Iterator[bool]:
+        """
+        Igual que run(), pero cede el control al terminar cada paso
+        
+        Permite a transportes con buffer (HTTP) enviar lo acumulado paso a paso.
+        
+        Yields:
+            bool: True por cada paso completado, False si se pausó (y termina)
+        """
+        STREAMS_ACTIVE.inc()
+        try:
+            yield from self._iter_steps(steps, cursor)
+        finally:
+            STREAMS_ACTIVE.dec()
+    
+    def _iter_steps(self, steps: List[AnswerStep], cursor: StreamCursor) -> Iterator[bool]:
+        if cursor.offset > 0 and cursor.step < len(steps):
+            if not self._stream_content(steps[cursor.step].content, cursor):
+                yield False
+                return
+            self._complete_step(steps[cursor.step], cursor.step)
+            cursor.next_step()
+            yield True
+        
+        while cursor.step < len(steps):
+            if self._paused(cursor, cursor.offset):
+                yield False
+                return
+            
+            # Actualizar paso actual
+            if self.session_id:
+                self.session_service.update_streaming_state(
+                    session_id=self.session_id,
+                    is_streaming=True,
+                    current_step=cursor.step
+                )
+            
+            if not self._stream_step(steps[cursor.step], cursor):
+                yield False
+                return
+            cursor.next_step()
+            yield True
+    
+    def _paused(self, cursor: StreamCursor, position: int) -> bool:
+        """Consulta la sesión; si está pausada guarda paso y posición"""
+        if not self.session_id:
+            return False
+        session = self.session_service.get_session(self.session_id)
+        if not (session and session.get("is_paused")):
+            return False
+        
+        # Posición del primer carácter no enviado
+        self.session_service.pause_streaming(self.session_id, position, current_step=cursor.step)
+        self.transport.send("streaming_paused", {
+            "step": cursor.step,
+            "position": position,
+            "message": "Streaming pausado por el usuario"
+        })
+        return True
+    
+    def _stream_step(self, step: AnswerStep, cursor: StreamCursor) -> bool:
+        """
+        Transmite un paso completo (comandos y contenido)
+        
+        Returns:
+            bool: True si el paso se completó, False si se pausó
+        """
+        step_index = cursor.step
+        
+        self.transport.send("step_start", {
+            "step": step_index,
+            "step_number": step.step_number,
+            "title": step.title,
+            "type": step.content_type,
+            "has_visual": step.has_visual
+        })
+        
+        # Comandos ya validados al generar la respuesta: un solo evento por paso
+        if step.canvas_commands or step.component_commands:
+            self.transport.send("step_commands", {
+                "step": step_index,
+                "canvas_commands": step.canvas_commands or [],
+                "component_commands": step.component_commands or []
+            })
+            if self.command_delay:
+                time.sleep(self.command_delay)
+        
+        if not self._stream_content(step.content, cursor):
+            return False
+        
+        self._complete_step(step, step_index)
+        return True
+    
+    def _complete_step(self, step: AnswerStep, step_index: int) -> None:
+        self.transport.send("step_complete", {
+            "step": step_index
+        })
+        if self.session_id:
+            event_service.track("step_reached", session_id=self.session_id, step=step_index)
+    
+    def _stream_content(self, content: str, cursor: StreamCursor) -> bool:
+        """
+        Transmite el contenido en chunks desde cursor.offset
+        
+        Las posiciones emitidas y la guardada al pausar son absolutas dentro
+        del contenido del paso; solo se copia el texto de cada chunk.
+        
+        Returns:
+            bool: True si se envió todo el contenido, False si se pausó
+        """
+        total_length = len(content)
+        
+        for start, end in cursor.spans(total_length, self.chunk_size):
+            if self._paused(cursor, start):
+                return False
+            
+            self.transport.send("content_chunk", {
+                "step": cursor.step,
+                "chunk": content[start:end],
+                "position": start,
+                "is_final": end >= total_length
+            })
+            
+            # Delay para efecto typewriter
+            if end < total_length and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+        
+        return True
 
 
 class StreamingService:
@@ -14,256 +219,197 @@ class StreamingService:
     
     Características:
     - Streaming progresivo de contenido (efecto typewriter)
-    - Soporte para pause/resume
+    - Soporte para pause/resume (StreamCursor: paso y offset absoluto)
     - Manejo de canvas commands
     - Integración con Redis sessions
     - Tipos de contenido: text, math, image
+    - Pasos como modelos con __slots__ (AnswerStep), validados una vez al inicio
+    - Un solo motor (StepEngine) con transporte intercambiable
     """
     
     CHUNK_SIZE = 50  # Caracteres por chunk
     CHUNK_DELAY = 0.05  # Segundos entre chunks
+    COMMAND_DELAY = 0.1  # Segundos después de los comandos de un paso
     
-    def __init__(self, session_service: Optional[SessionService] = None):
+    def __init__(self, session_service: Optional[SessionService] = None, transport=None):
         """
         Inicializa el servicio de streaming
         
         Args:
             session_service: Servicio de sesiones (opcional)
+            transport: Transporte de eventos (opcional, Socket.IO por defecto)
         """
         if session_service is None:
             session_service = SessionService()
         
         self.session_service = session_service
+        self.transport = transport if transport is not None else socketio_transport()
+    
+    def _engine(self, session_id: Optional[str] = None, transport=None) -> StepEngine:
+        return StepEngine(
+            transport or self.transport,
+            session_service=self.session_service,
+            session_id=session_id,
+            chunk_size=self.CHUNK_SIZE,
+            chunk_delay=self.CHUNK_DELAY,
+            command_delay=self.COMMAND_DELAY
+        )
     
-    def start_streaming(self, answer_data: Dict, session_id: str) -> None:
+    def start_streaming(self, answer_data: Union[Answer, Dict], session_id: str) -> None:
         """
         Inicia el streaming de una respuesta
         
+        La respuesta se guarda junto a la sesión: si el socket se desconecta,
+        el nuevo socket reanuda desde el mismo paso y posición sin volver a
+        consultar la base de datos ni la IA.
+        
         Args:
-            answer_data: Datos de la respuesta con steps
+            answer_data: Respuesta (Answer o dict con steps/answer_steps)
             session_id: ID de la sesión
             
         Emite:
             - explanation_start: Metadata inicial
             - step_start: Inicio de cada paso
+            - step_commands: Comandos de canvas y componentes del paso
             - content_chunk: Chunks de contenido
-            - canvas_command: Comandos de visualización
             - step_complete: Fin de cada paso
             - explanation_complete: Fin de la explicación
+            - streaming_paused: Si la sesión se pausa
         """
         try:
-            steps = answer_data.get("steps", [])
-            total_duration = answer_data.get("total_duration", 60)
+            answer = Answer.from_dict(answer_data)
+            
+            self.session_service.save_answer_snapshot(session_id, answer.to_snapshot())
+            
+            cursor = StreamCursor(answer_id=answer.question_hash)
             
             # Actualizar sesión: iniciar streaming
-            self.session_service.update_streaming_state(
-                session_id=session_id,
-                is_streaming=True,
-                current_step=0
-            )
+            self.session_service.update_session(session_id, {
+                "is_streaming": True,
+                "is_paused": False,
+                **cursor.to_session()
+            })
             
             # Enviar metadata inicial
-            emit("explanation_start", {
-                "total_steps": len(steps),
-                "estimated_duration": total_duration,
-                "question_hash": answer_data.get("question_hash")
+            self.transport.send("explanation_start", {
+                "total_steps": len(answer.steps),
+                "estimated_duration": answer.total_duration,
+                "question_hash": answer.question_hash
             })
             
-            # Streaming de cada paso
-            for step_index, step in enumerate(steps):
-                # Verificar si está pausado
-                session = self.session_service.get_session(session_id)
-                if session and session.get("is_paused"):
-                    emit("streaming_paused", {
-                        "step": step_index,
-                        "message": "Streaming pausado por el usuario"
-                    })
-                    break
-                
-                # Actualizar paso actual
-                self.session_service.update_streaming_state(
-                    session_id=session_id,
-                    is_streaming=True,
-                    current_step=step_index
-                )
-                
-                # Stream del paso
-                self._stream_step(step, step_index, session_id)
-            
-            # Finalizar
-            self.session_service.update_streaming_state(
-                session_id=session_id,
-                is_streaming=False,
-                current_step=len(steps)
-            )
-            
-            emit("explanation_complete", {
-                "total_duration": total_duration,
-                "steps_completed": len(steps)
-            })
+            if self._engine(session_id).run(answer.steps, cursor):
+                self._finish(session_id, answer.steps, answer.total_duration)
             
         except Exception as e:
             print(f"❌ Error en streaming: {e}")
-            emit("error", {
+            self.transport.send("error", {
                 "code": "STREAMING_ERROR",
                 "message": str(e)
             })
     
-    def _stream_step(self, step: Dict, step_index: int, session_id: str) -> None:
-        """
-        Hace streaming de un paso individual
-        
-        Args:
-            step: Datos del paso
-            step_index: Índice del paso (0-based)
-            session_id: ID de la sesión
+    def send_frame(self, answer_data: Union[Answer, Dict], session_id: str, encoding: str) -> None:
         """
-        title = step.get("title", "")
-        content = step.get("content", "")
-        step_type = step.get("type", "text")
-        canvas_commands = step.get("canvas_commands", [])
-        component_commands = step.get("component_commands", [])
+        Envía la respuesta completa en un único frame precomprimido
         
-        # Enviar inicio del paso
-        emit("step_start", {
-            "step": step_index,
-            "title": title,
-            "type": step_type
-        })
-        
-        # Enviar canvas commands si existen
-        if canvas_commands:
-            for command in canvas_commands:
-                emit("canvas_command", {
-                    "step": step_index,
-                    "command": command
-                })
-                time.sleep(0.1)
-        
-        # Enviar component commands si existen
-        if component_commands:
-            for command in component_commands:
-                emit("component_command", {
-                    "step": step_index,
-                    "command": command
-                })
-                time.sleep(0.1)
-        
-        # Streaming de contenido en chunks
-        self._stream_content(content, step_index, session_id)
-        
-        # Finalizar paso
-        emit("step_complete", {
-            "step": step_index
-        })
-    
-    def _stream_content(self, content: str, step_index: int, session_id: str) -> None:
-        """
-        Hace streaming del contenido en chunks
+        Para clientes que renderizan la respuesta localmente: el frame se
+        serializa y comprime una vez por respuesta y codificación
+        (answer_frames) y se reutiliza para todos los clientes.
         
         Args:
-            content: Contenido a enviar
-            step_index: Índice del paso
+            answer_data: Respuesta (Answer o dict con steps/answer_steps)
             session_id: ID de la sesión
-        """
-        total_length = len(content)
-        position = 0
-        
-        while position < total_length:
-            # Verificar si está pausado
-            session = self.session_service.get_session(session_id)
-            if session and session.get("is_paused"):
-                # Guardar posición de pausa
-                self.session_service.pause_streaming(session_id, position)
-                break
+            encoding: Codificación negociada (ver answer_frames.negotiate)
             
-            # Calcular chunk
-            chunk_end = min(position + self.CHUNK_SIZE, total_length)
-            chunk = content[position:chunk_end]
+        Emite:
+            - answer_frame: Metadata y frame (bytes) con la respuesta completa
+            - explanation_complete: Fin de la explicación
+        """
+        try:
+            answer = Answer.from_dict(answer_data)
+            frame = answer_frames.get(answer.to_snapshot(), encoding)
             
-            # Enviar chunk
-            emit("content_chunk", {
-                "step": step_index,
-                "chunk": chunk,
-                "position": position,
-                "is_final": chunk_end >= total_length
+            self.transport.send("answer_frame", {
+                "question_hash": answer.question_hash,
+                "encoding": encoding,
+                "total_steps": len(answer.steps),
+                "estimated_duration": answer.total_duration,
+                "frame": frame
             })
             
-            position = chunk_end
+            self._finish(session_id, answer.steps, answer.total_duration)
             
-            # Delay para efecto typewriter
-            if position < total_length:
-                time.sleep(self.CHUNK_DELAY)
+        except Exception as e:
+            print(f"❌ Error enviando frame: {e}")
+            self.transport.send("error", {
+                "code": "STREAMING_ERROR",
+                "message": str(e)
+            })
+    
+    def _finish(self, session_id: str, steps: List[AnswerStep], total_duration: int) -> None:
+        """Marca la explicación como completa"""
+        self.session_service.update_streaming_state(
+            session_id=session_id,
+            is_streaming=False,
+            current_step=len(steps)
+        )
+        
+        self.transport.send("explanation_complete", {
+            "total_duration": total_duration,
+            "steps_completed": len(steps)
+        })
     
-    def resume_streaming(self, session_id: str, answer_data: Dict) -> None:
+    def resume_streaming(self, session_id: str, answer_data: Union[Answer, Dict, None] = None) -> None:
         """
         Reanuda el streaming desde donde se pausó
         
         Args:
             session_id: ID de la sesión
-            answer_data: Datos de la respuesta
+            answer_data: Datos de la respuesta (opcional, se usa la guardada en la sesión)
         """
         try:
             session = self.session_service.get_session(session_id)
             
             if not session:
-                emit("error", {
+                self.transport.send("error", {
                     "code": "SESSION_NOT_FOUND",
                     "message": "Sesión no encontrada"
                 })
                 return
             
             if not session.get("is_paused"):
-                emit("error", {
+                self.transport.send("error", {
                     "code": "NOT_PAUSED",
                     "message": "El streaming no está pausado"
                 })
                 return
             
-            # Obtener posición de pausa
-            pause_position = session.get("pause_position", 0)
-            current_step = session.get("current_step", 0)
+            if answer_data is None:
+                answer_data = self.session_service.get_answer_snapshot(session_id)
+            if not answer_data:
+                self.transport.send("error", {
+                    "code": "NO_ANSWER_DATA",
+                    "message": "No se encontraron datos de la respuesta"
+                })
+                return
+            
+            answer = Answer.from_dict(answer_data)
+            cursor = StreamCursor.from_session(session, answer.question_hash)
             
             # Reanudar sesión
             self.session_service.resume_streaming(session_id)
             
-            emit("streaming_resumed", {
-                "step": current_step,
-                "position": pause_position
+            self.transport.send("streaming_resumed", {
+                "step": cursor.step,
+                "position": cursor.offset
             })
             
-            # Continuar streaming desde el paso actual
-            steps = answer_data.get("steps", [])
-            
-            if current_step < len(steps):
-                step = steps[current_step]
-                content = step.get("content", "")
-                
-                # Continuar desde la posición de pausa
-                remaining_content = content[pause_position:]
-                self._stream_content(remaining_content, current_step, session_id)
-                
-                emit("step_complete", {"step": current_step})
-                
-                # Continuar con los pasos restantes
-                for step_index in range(current_step + 1, len(steps)):
-                    session = self.session_service.get_session(session_id)
-                    if session and session.get("is_paused"):
-                        break
-                    
-                    self._stream_step(steps[step_index], step_index, session_id)
-                
-                # Finalizar si completó todos los pasos
-                session = self.session_service.get_session(session_id)
-                if session and not session.get("is_paused"):
-                    emit("explanation_complete", {
-                        "total_duration": answer_data.get("total_duration", 60),
-                        "steps_completed": len(steps)
-                    })
+            # Continuar desde el paso y posición del cursor
+            if self._engine(session_id).run(answer.steps, cursor):
+                self._finish(session_id, answer.steps, answer.total_duration)
             
         except Exception as e:
             print(f"❌ Error reanudando streaming: {e}")
-            emit("error", {
+            self.transport.send("error", {
                 "code": "RESUME_ERROR",
                 "message": str(e)
             })
@@ -274,134 +420,71 @@ class StreamingService:
         
         Args:
             explanation: Datos de la explicación con explanation_steps
-            emit_func: Función emit de Socket.IO (opcional)
+            emit_func: Función emit de Socket.IO (opcional, usa el transporte del servicio)
         """
-        if emit_func is None:
-            emit_func = emit
-        
-        try:
-            steps = explanation.get('explanation_steps', [])
-            
-            for step in steps:
-                step_number = step.get('step_number', 0)
-                
-                # Emit inicio de paso
-                emit_func('step_start', {
-                    'step_number': step_number,
-                    'title': step.get('title', ''),
-                    'content_type': step.get('content_type', 'text'),
-                    'has_visual': step.get('has_visual', False)
-                })
-                
-                # Stream de contenido
-                content = step.get('content', '')
-                self._stream_content_simple(content, step_number, emit_func)
-                
-                # Canvas commands si existen
-                if step.get('has_visual') and step.get('canvas_commands'):
-                    for command in step['canvas_commands']:
-                        emit_func('canvas_command', {
-                            'step_number': step_number,
-                            'command': command
-                        })
-                        time.sleep(0.1)
-                
-                # Component commands si existen
-                if step.get('has_visual') and step.get('component_commands'):
-                    for command in step['component_commands']:
-                        emit_func('component_command', {
-                            'step_number': step_number,
-                            'command': command
-                        })
-                        time.sleep(0.1)
-                
-                # Emit fin de paso
-                emit_func('step_complete', {
-                    'step_number': step_number
-                })
-                
-        except Exception as e:
-            print(f"Error en stream_explanation: {e}")
-            emit_func('error', {
-                'code': 'STREAMING_ERROR',
-                'message': str(e)
-            })
+        self._stream_sessionless(
+            lambda: ExplanationStep.parse_many(explanation.get('explanation_steps')),
+            emit_func,
+            "stream_explanation"
+        )
     
-    def stream_answer(self, answer: Dict, emit_func=None) -> None:
+    def stream_answer(self, answer: Union[Answer, Dict], emit_func=None) -> None:
         """
         Stream de respuesta (ai_answers) para follow-ups
         
         Args:
-            answer: Datos de la respuesta con answer_steps
-            emit_func: Función emit de Socket.IO (opcional)
+            answer: Respuesta (Answer o dict con answer_steps)
+            emit_func: Función emit de Socket.IO (opcional, usa el transporte del servicio)
         """
-        if emit_func is None:
-            emit_func = emit
+        self._stream_sessionless(lambda: Answer.from_dict(answer).steps, emit_func, "stream_answer")
+    
+    @classmethod
+    def iter_answer(cls, answer_data: Union[Answer, Dict], transport) -> Iterator[None]:
+        """
+        Stream de respuesta sin sesión, paso a paso (SSE / NDJSON por HTTP)
+        
+        Emite la misma secuencia de eventos que start_streaming, sin pausas
+        ni retardos: la conexión HTTP no admite pause/resume y el cliente
+        marca el ritmo de la animación. Cede el control después de
+        explanation_start, de cada paso y del final para que el handler
+        vacíe el buffer del transporte. No usa sesión ni Redis (classmethod).
         
+        Args:
+            answer_data: Respuesta (Answer o dict con steps/answer_steps)
+            transport: Transporte con send(event, data) (p. ej. SSETransport)
+        """
         try:
-            steps = answer.get('answer_steps', [])
+            answer = Answer.from_dict(answer_data)
+            transport.send("explanation_start", {
+                "total_steps": len(answer.steps),
+                "estimated_duration": answer.total_duration,
+                "question_hash": answer.question_hash
+            })
+            yield
             
-            for step in steps:
-                step_number = step.get('step_number', 0)
-                
-                # Emit inicio de paso
-                emit_func('step_start', {
-                    'step_number': step_number,
-                    'title': step.get('title', ''),
-                    'content_type': step.get('content_type', 'text'),
-                    'has_visual': step.get('has_visual', False)
-                })
-                
-                # Stream de contenido
-                content = step.get('content', '')
-                self._stream_content_simple(content, step_number, emit_func)
-                
-                # Canvas commands si existen
-                if step.get('has_visual') and step.get('canvas_commands'):
-                    for command in step['canvas_commands']:
-                        emit_func('canvas_command', {
-                            'step_number': step_number,
-                            'command': command
-                        })
-                        time.sleep(0.1)
-                
-                # Component commands si existen
-                if step.get('has_visual') and step.get('component_commands'):
-                    for command in step['component_commands']:
-                        emit_func('component_command', {
-                            'step_number': step_number,
-                            'command': command
-                        })
-                        time.sleep(0.1)
-                
-                # Emit fin de paso
-                emit_func('step_complete', {
-                    'step_number': step_number
-                })
-                
+            engine = StepEngine(transport, chunk_size=cls.CHUNK_SIZE, chunk_delay=0, command_delay=0)
+            for _ in engine.iter_steps(answer.steps, StreamCursor(answer_id=answer.question_hash)):
+                yield
+            
+            transport.send("explanation_complete", {
+                "total_duration": answer.total_duration,
+                "steps_completed": len(answer.steps)
+            })
         except Exception as e:
-            print(f"Error en stream_answer: {e}")
-            emit_func('error', {
-                'code': 'STREAMING_ERROR',
-                'message': str(e)
+            print(f"❌ Error en streaming HTTP: {e}")
+            transport.send("error", {
+                "code": "STREAMING_ERROR",
+                "message": str(e)
             })
+        yield
     
-    def _stream_content_simple(self, content: str, step_number: int, emit_func) -> None:
-        """
-        Stream simple de contenido sin manejo de sesión
-        
-        Args:
-            content: Contenido a enviar
-            step_number: Número del paso
-            emit_func: Función emit
-        """
-        chunks = [content[i:i + self.CHUNK_SIZE] for i in range(0, len(content), self.CHUNK_SIZE)]
-        
-        for i, chunk in enumerate(chunks):
-            emit_func('content_chunk', {
-                'step_number': step_number,
-                'chunk': chunk,
-                'position': i * self.CHUNK_SIZE,
-                'is_final': i == len(chunks) - 1
+    def _stream_sessionless(self, load_steps, emit_func, label: str) -> None:
+        transport = CallbackTransport(emit_func) if emit_func is not None else self.transport
+        try:
+            self._engine(transport=transport).run(load_steps(), StreamCursor())
+        except Exception as e:
+            print(f"Error en {label}: {e}")
+            transport.send('error', {
+                'code': 'STREAMING_ERROR',
+                'message': str(e)
             })
-            time.sleep(self.CHUNK_DELAY)
@@ -0,0 +1,206 @@
+"""
+Servicio de presupuesto de tokens de salida
+Estima max_tokens por tipo de petición y lleva métricas de truncamiento
+"""
+import math
+import threading
+from typing import Dict, Optional
+
+from app.utils.text_processing import normalize_text
+from app.utils.tokens import count_tokens
+
+
+class TokenBudgetService:
+    """
+    Calcula el presupuesto de tokens de salida para cada llamada a OpenAI
+
+    El presupuesto depende de:
+    - Tipo de petición (respuesta, explicación, follow-up, aclaración)
+    - Materia (las materias con fórmulas y canvas generan más tokens)
+    - Dificultad de la pregunta
+    - Longitud de la pregunta (tokenizada localmente)
+
+    Cuando una respuesta se corta (finish_reason == "length"), AIService
+    pide una continuación con CONTINUATION_PROMPT en vez de regenerarla.
+    """
+
+    BASE_OUTPUT_TOKENS = {
+        "answer": 1200,
+        "exam_explanation": 1500,
+        "follow_up": 1200,
+        "clarification_brief": 160,
+        "clarification_detailed": 700,
+        "json_fix": 100
+    }
+
+    MIN_OUTPUT_TOKENS = {
+        "answer": 600,
+        "exam_explanation": 800,
+        "follow_up": 600,
+        "clarification_brief": 120,
+        "clarification_detailed": 400,
+        "json_fix": 300
+    }
+
+    MAX_OUTPUT_TOKENS = {
+        "answer": 3000,
+        "exam_explanation": 3000,
+        "follow_up": 3000,
+        "clarification_brief": 400,
+        "clarification_detailed": 1000,
+        "json_fix": 3000
+    }
+
+    DIFFICULTY_FACTORS = {
+        "easy": 0.8,
+        "medium": 1.0,
+        "hard": 1.3
+    }
+
+    # Materias con ecuaciones y comandos de canvas (normalizadas, sin acentos)
+    SUBJECT_FACTORS = {
+        "matematicas": 1.2,
+        "algebra": 1.2,
+        "calculo": 1.25,
+        "geometria": 1.2,
+        "trigonometria": 1.2,
+        "fisica": 1.2,
+        "quimica": 1.15,
+        "biologia": 1.0,
+        "historia": 0.95,
+        "geografia": 0.95,
+        "literatura": 0.95,
+        "ingles": 0.9
+    }
+
+    # Tokens de salida adicionales por cada token de la pregunta
+    QUESTION_TOKEN_FACTOR = 2.0
+    SAFETY_MARGIN = 1.15
+    ROUND_TO = 50
+
+    MAX_CONTINUATIONS = 2
+    CONTINUATION_PROMPT = (
+        "Tu respuesta anterior se cortó por límite de longitud. "
+        "Continúa EXACTAMENTE desde el último carácter que escribiste, sin repetir nada "
+        "y sin agregar texto fuera del JSON."
+    )
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        """
+        Inicializa el servicio
+
+        Args:
+            model: Modelo usado para tokenizar localmente
+        """
+        self.model = model
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def estimate(
+        self,
+        request_type: str,
+        question_text: str = "",
+        subject: Optional[str] = None,
+        difficulty: Optional[str] = None
+    ) -> int:
+        """
+        Estima max_tokens para una petición
+
+        Args:
+            request_type: Tipo de petición (ver BASE_OUTPUT_TOKENS)
+            question_text: Texto de la pregunta o duda
+            subject: Materia (opcional)
+            difficulty: easy, medium o hard (opcional)
+
+        Returns:
+            int: Presupuesto de tokens de salida
+        """
+        base = self.BASE_OUTPUT_TOKENS.get(request_type, self.BASE_OUTPUT_TOKENS["answer"])
+        minimum = self.MIN_OUTPUT_TOKENS.get(request_type, self.MIN_OUTPUT_TOKENS["answer"])
+        maximum = self.MAX_OUTPUT_TOKENS.get(request_type, self.MAX_OUTPUT_TOKENS["answer"])
+
+        difficulty_factor = self.DIFFICULTY_FACTORS.get((difficulty or "medium").lower(), 1.0)
+        subject_factor = self.SUBJECT_FACTORS.get(normalize_text(subject or ""), 1.0)
+        question_tokens = count_tokens(question_text or "", self.model)
+
+        estimate = (
+            (base + question_tokens * self.QUESTION_TOKEN_FACTOR)
+            * difficulty_factor
+            * subject_factor
+            * self.SAFETY_MARGIN
+        )
+        rounded = int(math.ceil(estimate / self.ROUND_TO) * self.ROUND_TO)
+
+        return max(minimum, min(maximum, rounded))
+
+    def continuation_budget(self, request_type: str) -> int:
+        """
+        Presupuesto para cada continuación de una respuesta truncada
+
+        Args:
+            request_type: Tipo de petición
+
+        Returns:
+            int: max_tokens para la continuación
+        """
+        maximum = self.MAX_OUTPUT_TOKENS.get(request_type, self.MAX_OUTPUT_TOKENS["answer"])
+        return max(self.MIN_OUTPUT_TOKENS.get(request_type, 400), maximum // 2)
+
+    def record_result(
+        self,
+        request_type: str,
+        budget: int,
+        continuations: int,
+        completed: bool,
+        completion_tokens: Optional[int] = None
+    ) -> None:
+        """
+        Registra el resultado de una generación
+
+        Args:
+            request_type: Tipo de petición
+            budget: max_tokens inicial asignado
+            continuations: Número de continuaciones que fueron necesarias
+            completed: False si siguió truncada después de las continuaciones
+            completion_tokens: Tokens de salida reportados por el proveedor (opcional)
+        """
+        with self._lock:
+            stats = self._stats.setdefault(request_type, {
+                "requests": 0,
+                "truncated": 0,
+                "continuations": 0,
+                "incomplete": 0,
+                "budget_tokens": 0,
+                "completion_tokens": 0
+            })
+            stats["requests"] += 1
+            stats["budget_tokens"] += budget
+            stats["continuations"] += continuations
+            if continuations:
+                stats["truncated"] += 1
+            if not completed:
+                stats["incomplete"] += 1
+            if isinstance(completion_tokens, int):
+                stats["completion_tokens"] += completion_tokens
+
+    def stats(self) -> dict:
+        """
+        Métricas por tipo de petición
+
+        Returns:
+            dict: {request_type: {requests, truncated, continuations, avg_budget, ...}}
+        """
+        with self._lock:
+            result = {}
+            for request_type, stats in self._stats.items():
+                requests = stats["requests"] or 1
+                result[request_type] = {
+                    **stats,
+                    "avg_budget": round(stats["budget_tokens"] / requests, 1),
+                    "avg_completion_tokens": round(stats["completion_tokens"] / requests, 1),
+                    "truncation_rate": round(stats["truncated"] / requests, 4)
+                }
+            return result
+
+
+token_budget_service = TokenBudgetService()
@@ -1,25 +1,379 @@
 """
 Servicio de procesamiento de voz
+
+Flujo de una grabación (una por conexión de Socket.IO):
+
+1. start(): crea el buffer circular de la grabación (VOICE_MAX_SECONDS de
+   audio pcm_s16le mono, preasignado)
+2. append(): cada voice_chunk se copia al buffer; cada
+   VOICE_PARTIAL_INTERVAL_MS de audio nuevo se encola una transcripción
+   parcial en el pool de ASR (como máximo una en curso por grabación).
+   Las parciales terminadas se devuelven en el siguiente append para que
+   el handler las emita en su propio contexto
+3. finish(): transcribe el audio completo (sin copiar el buffer) y
+   devuelve la transcripción final, que el handler envía a ask_question
+
+El ASR corre en un pool de hilos (VOICE_ASR_WORKERS). Con gevent se usa
+su pool de hilos reales: la inferencia es CPU y bloquearía el hub si
+corriera en un greenlet.
 """
+import base64
+import binascii
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.config import Config
+from app.models.voice import Transcript
+from app.services.asr_backends import BYTES_PER_SAMPLE, ASRBackend, get_asr_backend
+from app.utils.audio_buffer import AudioRingBuffer
+from app.utils.metrics import metrics
+
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+except ImportError:  # pragma: no cover - dependencia opcional
+    gevent_monkey = None
+
+
+class VoiceStreamError(Exception):
+    """Excepción cuando una grabación no existe o recibe audio inválido"""
+    pass
+
+
+def decode_audio(value) -> bytes:
+    """
+    Audio de un payload de Socket.IO (binario o base64)
+
+    Args:
+        value: bytes/bytearray/memoryview (adjunto binario) o texto base64
+
+    Returns:
+        bytes | memoryview: Audio sin copiar si llegó binario
+
+    Raises:
+        VoiceStreamError: Si no es audio válido
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return value
+    if isinstance(value, str):
+        if "," in value and value.startswith("data:"):
+            value = value.split(",", 1)[1]  # Data URL
+        try:
+            return base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            raise VoiceStreamError("El audio no es base64 válido")
+    raise VoiceStreamError("El audio debe ser binario o base64")
+
+
+def _create_pool(workers: int):
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("threading"):
+        return GeventThreadPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="voice-asr")
+
+
+@dataclass(slots=True)
+class VoiceStream:
+    """Estado de una grabación en curso"""
+    stream_id: str
+    user_id: Optional[str]
+    sample_rate: int
+    language: str
+    buffer: AudioRingBuffer
+    started_at: float
+    chunks: int = 0
+    partial: Optional[Future] = None
+    partial_from: int = 0          # total_written al encolar la última parcial
+    last_partial_text: str = ""
 
 
 class VoiceService:
-    """Gestiona transcripción y procesamiento de audio"""
-    
-    def transcribe_audio(self, audio_data: bytes) -> dict:
+    """Gestiona grabaciones por chunks y su transcripción con ASR local"""
+
+    def __init__(
+        self,
+        backend: Optional[ASRBackend] = None,
+        workers: Optional[int] = None,
+        max_seconds: Optional[int] = None,
+        partial_interval_ms: Optional[int] = None,
+        max_streams: Optional[int] = None
+    ):
+        """
+        Inicializa el servicio
+
+        Args:
+            backend: Backend de ASR (opcional, usa Config.VOICE_ASR_BACKEND)
+            workers: Hilos del pool de ASR (opcional, usa Config)
+            max_seconds: Audio máximo retenido por grabación (opcional, usa Config)
+            partial_interval_ms: Audio nuevo entre parciales (opcional, usa Config; 0 = sin parciales)
+            max_streams: Grabaciones simultáneas (opcional, usa Config)
+        """
+        self._backend = backend
+        self.workers = workers or Config.VOICE_ASR_WORKERS
+        self.max_seconds = max_seconds or Config.VOICE_MAX_SECONDS
+        self.partial_interval_ms = (
+            Config.VOICE_PARTIAL_INTERVAL_MS if partial_interval_ms is None else partial_interval_ms
+        )
+        self.max_streams = max_streams or Config.VOICE_MAX_STREAMS
+        self._streams: Dict[str, VoiceStream] = {}
+        self._pool = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def backend(self) -> ASRBackend:
+        if self._backend is None:
+            self._backend = get_asr_backend()
+        return self._backend
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = _create_pool(self.workers)
+        return self._pool
+
+    def start(self, stream_id: str, user_id: Optional[str] = None,
+              sample_rate: Optional[int] = None, language: str = "es") -> VoiceStream:
         """
-        Transcribe audio a texto
-        
+        Inicia una grabación (reemplaza la anterior del mismo stream_id)
+
         Args:
-            audio_data: Datos de audio en bytes
-            
+            stream_id: Id de la grabación (socket id)
+            user_id: Usuario autenticado
+            sample_rate: Frecuencia de muestreo del audio (default: Config.VOICE_SAMPLE_RATE)
+            language: Idioma esperado
+
+        Returns:
+            VoiceStream: Estado de la grabación
+
+        Raises:
+            VoiceStreamError: Si se alcanzó el máximo de grabaciones simultáneas
+        """
+        sample_rate = sample_rate or Config.VOICE_SAMPLE_RATE
+        if not isinstance(sample_rate, int) or not 8000 <= sample_rate <= 48000:
+            raise VoiceStreamError("sample_rate debe estar entre 8000 y 48000")
+
+        self.cancel(stream_id)
+        with self._lock:
+            if len(self._streams) >= self.max_streams:
+                raise VoiceStreamError("Demasiadas grabaciones activas, intenta de nuevo")
+            stream = VoiceStream(
+                stream_id=stream_id,
+                user_id=user_id,
+                sample_rate=sample_rate,
+                language=language or "es",
+                buffer=AudioRingBuffer(self.max_seconds * sample_rate * BYTES_PER_SAMPLE),
+                started_at=time.monotonic()
+            )
+            self._streams[stream_id] = stream
+            self.started += 1
+        return stream
+
+    def has_stream(self, stream_id: str) -> bool:
+        return stream_id in self._streams
+
+    def append(self, stream_id: str, chunk) -> List[Transcript]:
+        """
+        Agrega un chunk de audio a la grabación
+
+        Args:
+            stream_id: Id de la grabación
+            chunk: Audio pcm_s16le (binario o base64)
+
+        Returns:
+            list: Transcripciones parciales terminadas desde el último chunk
+
+        Raises:
+            VoiceStreamError: Si no hay grabación activa o el chunk es inválido
+        """
+        stream = self._get(stream_id)
+        audio = decode_audio(chunk)
+        if len(audio) % BYTES_PER_SAMPLE:
+            raise VoiceStreamError("El chunk debe contener muestras de 16 bits completas")
+
+        dropped = stream.buffer.write(audio)
+        stream.chunks += 1
+        with self._lock:
+            self.chunks += 1
+            self.bytes_received += len(audio)
+            self.bytes_dropped += dropped
+
+        ready = self._collect_partial(stream)
+        interval = self.partial_interval_ms * stream.sample_rate * BYTES_PER_SAMPLE // 1000
+        if (interval and stream.partial is None
+                and stream.buffer.total_written - stream.partial_from >= interval):
+            stream.partial_from = stream.buffer.total_written
+            stream.partial = self.pool.submit(
+                self._transcribe, stream.buffer.snapshot(), stream.sample_rate, stream.language, False
+            )
+        return ready
+
+    def finish(self, stream_id: str, timeout: Optional[float] = None) -> Transcript:
+        """
+        Termina la grabación y devuelve la transcripción final
+
+        Args:
+            stream_id: Id de la grabación
+            timeout: Segundos máximos de espera del ASR (default: Config.VOICE_ASR_TIMEOUT)
+
+        Returns:
+            Transcript: Transcripción final
+
+        Raises:
+            VoiceStreamError: Si no hay grabación activa o el ASR excede el timeout
+            ASRUnavailableError: Si el backend no está disponible
+        """
+        stream = self._get(stream_id)
+        with self._lock:
+            self._streams.pop(stream_id, None)
+        if stream.partial is not None:
+            stream.partial.cancel()
+
+        # Ya no llegan chunks: el ASR lee el buffer sin copiarlo
+        transcript = self._transcribe_final(
+            stream.buffer.contiguous(), stream.sample_rate, stream.language, timeout
+        )
+        if stream.buffer.dropped:
+            with self._lock:
+                self.truncated += 1
+        return transcript
+
+    def cancel(self, stream_id: str) -> bool:
+        """
+        Descarta una grabación (voice_cancel o desconexión)
+
+        Returns:
+            bool: True si existía
+        """
+        with self._lock:
+            stream = self._streams.pop(stream_id, None)
+        if stream is None:
+            return False
+        if stream.partial is not None:
+            stream.partial.cancel()
+        return True
+
+    def transcribe_audio(self, audio_data, sample_rate: Optional[int] = None, language: str = "es") -> dict:
+        """
+        Transcribe una grabación completa en una sola llamada
+
+        Args:
+            audio_data: Audio pcm_s16le (binario o base64)
+            sample_rate: Frecuencia de muestreo (default: Config.VOICE_SAMPLE_RATE)
+            language: Idioma esperado
+
         Returns:
             dict: Transcripción y metadata
+
+        Raises:
+            VoiceStreamError: Si el audio es inválido o el ASR excede el timeout
+            ASRUnavailableError: Si el backend no está disponible
+        """
+        transcript = self._transcribe_final(
+            decode_audio(audio_data), sample_rate or Config.VOICE_SAMPLE_RATE, language
+        )
+        return transcript.to_dict()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.started = 0
+            self.chunks = 0
+            self.bytes_received = 0
+            self.bytes_dropped = 0
+            self.partials = 0
+            self.finals = 0
+            self.truncated = 0
+            self.timeouts = 0
+            self.failures = 0
+            self.asr_ms = {"partial": 0.0, "final": 0.0}
+
+    def stats(self) -> Dict:
+        """
+        Métricas de grabaciones y ASR
+
+        Returns:
+            dict: {active_streams, chunks, bytes_received, partials, finals, avg_final_ms, ...}
         """
-        # TODO: Implementar transcripción con Web Speech API o Whisper
-        
-        return {
-            "transcription": "Texto transcrito",
-            "confidence": 0.95,
-            "language": "es"
-        }
+        with self._lock:
+            return {
+                "backend": getattr(self._backend, "name", None),
+                "active_streams": len(self._streams),
+                "started": self.started,
+                "chunks": self.chunks,
+                "bytes_received": self.bytes_received,
+                "bytes_dropped": self.bytes_dropped,
+                "partials": self.partials,
+                "finals": self.finals,
+                "truncated": self.truncated,
+                "timeouts": self.timeouts,
+                "failures": self.failures,
+                "avg_partial_ms": round(self.asr_ms["partial"] / self.partials, 1) if self.partials else 0.0,
+                "avg_final_ms": round(self.asr_ms["final"] / self.finals, 1) if self.finals else 0.0
+            }
+
+    def _get(self, stream_id: str) -> VoiceStream:
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            raise VoiceStreamError("No hay una grabación activa (envía voice_start)")
+        return stream
+
+    def _collect_partial(self, stream: VoiceStream) -> List[Transcript]:
+        future = stream.partial
+        if future is None or not future.done():
+            return []
+        stream.partial = None
+        if future.cancelled():
+            return []
+        try:
+            transcript = future.result()
+        except Exception as e:
+            print(f"⚠ Transcripción parcial fallida: {e}")
+            return []
+        # Sin texto nuevo no se emite otra parcial igual
+        if not transcript.text or transcript.text == stream.last_partial_text:
+            return []
+        stream.last_partial_text = transcript.text
+        return [transcript]
+
+    def _transcribe_final(self, audio, sample_rate: int, language: str,
+                          timeout: Optional[float] = None) -> Transcript:
+        future = self.pool.submit(self._transcribe, audio, sample_rate, language, True)
+        try:
+            transcript = future.result(timeout=timeout or Config.VOICE_ASR_TIMEOUT)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise VoiceStreamError("La transcripción tardó demasiado")
+
+        with self._lock:
+            self.finals += 1
+        return transcript
+
+    def _transcribe(self, audio, sample_rate: int, language: str, final: bool) -> Transcript:
+        started = time.perf_counter()
+        try:
+            transcript = self.backend.transcribe(audio, sample_rate, language=language, final=final)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            if final:
+                self.asr_ms["final"] += elapsed_ms
+            else:
+                self.partials += 1
+                self.asr_ms["partial"] += elapsed_ms
+        return transcript
+
+
+# Instancia compartida: las grabaciones viven entre eventos de la misma conexión
+voice_service = VoiceService()
+
+VOICE_STREAMS_ACTIVE = metrics.gauge("voice_streams_active", "Grabaciones de voz en curso")
+metrics.register_collector(lambda: VOICE_STREAMS_ACTIVE.set(voice_service.stats()["active_streams"]))
@@ -4,8 +4,12 @@ Eventos de conexión/desconexión de Socket.IO
 from flask import request
 from flask_socketio import emit, disconnect
 from app import socketio
+from app.auth.decorators import require_auth_socket
 from app.auth.supabase import verify_token
 from app.services.session_service import SessionService
+from app.services.streaming_service import StreamingService
+from app.services.voice_service import voice_service
+from app.utils.rate_limiter import rate_limit_socket
 
 
 # Diccionario temporal para mapear socket_id -> session_id
@@ -14,15 +18,18 @@ active_connections = {}
 
 
 @socketio.on("connect")
+@rate_limit_socket("connections", emit_error=False)  # MAX_CONNECTIONS_PER_IP por ventana
 def handle_connect(auth):
     """
     Maneja la conexión de un cliente WebSocket
     
     Flujo:
     1. Valida token JWT
-    2. Crea sesión en Redis con TTL 30 min
-    3. Mapea connection_id -> session_id
-    4. Emite confirmación al cliente
+    2. Reclama la sesión suspendida si auth trae reconnect_token válido;
+       si no, crea sesión en Redis con TTL 30 min
+    3. Mapea connection_id -> session_id (active_connections y socket_sessions)
+    4. Emite confirmación al cliente (con reconnect_token y, si se
+       reclamó, el estado de reproducción para llamar a resume_session)
     """
     try:
         # Verificar autenticación
@@ -38,23 +45,50 @@ def handle_connect(auth):
         # Obtener connection_id del socket
         connection_id = request.sid
         
-        # Crear sesión en Redis
         session_service = SessionService()
-        session_id = session_service.create_session(
+        session = session_service.reclaim_session(
+            auth.get("reconnect_token"),
             user_id=user["id"],
             connection_id=connection_id
         )
         
-        # Mapear connection -> session para disconnect
+        resumed = session is not None
+        
+        if not resumed:
+            # Crear sesión en Redis
+            session_id = session_service.create_session(
+                user_id=user["id"],
+                connection_id=connection_id
+            )
+            session = session_service.get_session(session_id)
+        else:
+            session_id = session["session_id"]
+        
+        # Mapear connection -> session para disconnect y para los handlers
+        # de preguntas, pausa e interrupciones (también al reclamar sesión)
         active_connections[connection_id] = session_id
+        from app.socket_events.questions import socket_sessions
+        socket_sessions[connection_id] = session_id
         
-        emit("connection_established", {
+        payload = {
             "session_id": session_id,
+            "reconnect_token": session.get("reconnect_token"),
+            "resumed": resumed,
             "user_info": {
                 "email": user.get("email"),
                 "id": user.get("id")
             }
-        })
+        }
+        if resumed:
+            payload["playback"] = {
+                "current_question": session.get("current_question"),
+                "current_step": session.get("current_step", 0),
+                "pause_position": session.get("pause_position", 0),
+                "is_paused": session.get("is_paused", False),
+                "has_answer": session_service.get_answer_snapshot(session_id) is not None
+            }
+        
+        emit("connection_established", payload)
         
         print(f"✓ Usuario conectado: {user.get('email')} | Session: {session_id}")
         
@@ -70,19 +104,28 @@ def handle_disconnect():
     """
     Maneja la desconexión de un cliente
     
-    Limpia la sesión de Redis y el mapeo local
+    Suspende la sesión durante el periodo de gracia de reconexión
+    (o la finaliza si está deshabilitado) y limpia el mapeo local
     """
     try:
         connection_id = request.sid
         session_id = active_connections.get(connection_id)
         
+        # Una grabación de voz a medias no sobrevive a la conexión
+        voice_service.cancel(connection_id)
+        
         if session_id:
-            # Finalizar sesión en Redis
+            # Conservar la sesión para reconectar, o finalizarla
             session_service = SessionService()
-            session_service.end_session(session_id)
+            if session_service.RECONNECT_GRACE > 0:
+                session_service.suspend_session(session_id)
+            else:
+                session_service.end_session(session_id)
             
-            # Limpiar mapeo local
+            # Limpiar mapeos locales
             del active_connections[connection_id]
+            from app.socket_events.questions import socket_sessions
+            socket_sessions.pop(connection_id, None)
             
             print(f"✓ Usuario desconectado | Session: {session_id}")
         else:
@@ -90,3 +133,40 @@ def handle_disconnect():
             
     except Exception as e:
         print(f"✗ Error en desconexión: {e}")
+
+
+@socketio.on("resume_session")
+@require_auth_socket
+def handle_resume_session(data):
+    """
+    Reanuda la explicación de una sesión reclamada al reconectar
+    
+    Continúa desde el paso y posición guardados usando la respuesta
+    almacenada con la sesión (sin consultar la base de datos ni la IA).
+    
+    Payload:
+        {
+            "token": "jwt_token"
+        }
+    """
+    try:
+        session_id = active_connections.get(request.sid)
+        
+        if not session_id:
+            emit("error", {
+                "code": "NO_SESSION",
+                "message": "No hay sesión activa"
+            })
+            return
+        
+        session_service = SessionService()
+        StreamingService(session_service).resume_streaming(session_id)
+        
+        print(f"▶ Sesión reanudada tras reconectar: {session_id}")
+        
+    except Exception as e:
+        print(f"✗ Error reanudando sesión: {e}")
+        emit("error", {
+            "code": "RESUME_ERROR",
+            "message": str(e)
+        })
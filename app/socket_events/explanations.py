@@ -1,12 +1,15 @@
 """
 Socket.IO events para explicaciones de preguntas de examen
 """
+from flask import request
 from flask_socketio import emit
 from app import socketio
 from app.services.exam_service import ExamService
 from app.services.ai_service import AIService
 from app.services.streaming_service import StreamingService
 from app.services.session_service import SessionService
+from app.services.event_service import event_service
+from app.socket_events.questions import socket_sessions
 
 
 @socketio.on('start_explanation')
@@ -136,6 +139,12 @@ def handle_explanation_feedback(data):
             is_helpful,
             flag_reason
         )
+        event_service.track(
+            'feedback',
+            session_id=socket_sessions.get(request.sid),
+            explanation_id=explanation_id,
+            helpful=bool(is_helpful)
+        )
         
         emit('feedback_recorded', {
             'explanation_id': explanation_id,
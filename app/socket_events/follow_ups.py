@@ -7,10 +7,13 @@ from app.services.exam_service import ExamService
 from app.services.ai_service import AIService
 from app.services.streaming_service import StreamingService
 from app.repositories.ai_answers_repo import AIAnswersRepository
+from app.models.answer import Answer
+from app.utils.rate_limiter import rate_limit_socket
 from app.utils.text_processing import normalize_text, generate_hash
 
 
 @socketio.on('ask_follow_up_question')
+@rate_limit_socket('follow_ups')
 def handle_ask_follow_up_question(data):
     """
     Maneja pregunta adicional después de una explicación
@@ -58,10 +61,10 @@ def handle_ask_follow_up_question(data):
         question_hash = generate_hash(normalized)
         
         # 3. Buscar en cache (ai_answers)
-        cached_answer = ai_answers_repo.get_by_hash(question_hash)
+        answer = ai_answers_repo.get_answer(question_hash)
         
         # 4. Si no existe, generar con IA
-        if not cached_answer:
+        if not answer:
             emit('waiting_phrase', {
                 'phrase': 'Pensando en tu pregunta...',
                 'category': 'generating',
@@ -81,17 +84,17 @@ def handle_ask_follow_up_question(data):
                     previous_explanation
                 )
                 
-                # Guardar en DB
-                answer_data = {
+                # Validar y guardar en DB
+                answer = Answer.from_dict({
                     'question_hash': question_hash,
                     'question_text': follow_up_question,
                     'related_question_id': related_question_id,
                     'answer_steps': ai_response.get('answer_steps', []),
                     'total_duration': ai_response.get('total_duration', 90),
                     'generated_by': 'gpt-4'
-                }
+                })
                 
-                cached_answer = ai_answers_repo.create(answer_data)
+                answer.id = ai_answers_repo.create(answer)['id']
                 
             except Exception as e:
                 print(f"Error generando follow-up: {e}")
@@ -102,27 +105,27 @@ def handle_ask_follow_up_question(data):
                 return
         else:
             # Incrementar uso
-            ai_answers_repo.increment_usage(cached_answer['id'])
+            ai_answers_repo.increment_usage(answer.id)
         
         # 5. Iniciar streaming
         emit('follow_up_start', {
-            'answer_id': cached_answer['id'],
-            'total_steps': len(cached_answer.get('answer_steps', [])),
-            'estimated_duration': cached_answer.get('total_duration', 90),
+            'answer_id': answer.id,
+            'total_steps': len(answer.steps),
+            'estimated_duration': answer.total_duration,
             'is_follow_up': True
         })
         
         # 6. Stream de pasos
         streaming_service.stream_answer(
-            cached_answer,
+            answer,
             emit_func=emit
         )
         
         # 7. Completado
         emit('follow_up_complete', {
-            'answer_id': cached_answer['id'],
-            'total_duration': cached_answer.get('total_duration', 90),
-            'steps_completed': len(cached_answer.get('answer_steps', []))
+            'answer_id': answer.id,
+            'total_duration': answer.total_duration,
+            'steps_completed': len(answer.steps)
         })
         
         # 8. Preguntar si tiene más dudas
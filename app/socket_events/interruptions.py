@@ -4,12 +4,16 @@ Socket.IO events para interrupciones y aclaraciones durante explicaciones
 from flask_socketio import emit
 from flask import request
 from app import socketio
+from app.prompts.clarification_prompts import normalize_clarification_mode
 from app.services.ai_service import AIService
 from app.services.session_service import SessionService, SessionExpiredError
+from app.services.event_service import event_service
 from app.socket_events.questions import socket_sessions
+from app.utils.rate_limiter import rate_limit_socket
 
 
 @socketio.on('interrupt_explanation')
+@rate_limit_socket('clarifications')
 def handle_interrupt_explanation(data):
     """
     Maneja interrupción para aclaración rápida
@@ -23,7 +27,8 @@ def handle_interrupt_explanation(data):
     try:
         clarification_question = data.get('clarification_question')
         current_context = data.get('current_context', {})
-        response_mode = data.get('response_mode', 'brief')
+        # Mismo criterio que los prompts: el evento emitido coincide con la plantilla usada
+        response_mode = normalize_clarification_mode(data.get('response_mode'))
         provided_session_id = data.get('session_id')
 
         if not clarification_question:
@@ -69,65 +74,19 @@ def handle_interrupt_explanation(data):
 
         # Pausar streaming actual
         session_service.pause_streaming(session_id, pause_position=session.get('pause_position', 0))
+        event_service.track('pause', session_id=session_id, user_id=session.get('user_id'))
+        event_service.track('clarification', session_id=session_id,
+                            user_id=session.get('user_id'), mode=response_mode)
 
         try:
-            ai_response = ai_service.generate_clarification(
-                clarification_question,
-                current_context,
-                response_mode=response_mode
-            )
-            
-            mode = ai_response.get('mode', 'brief')
-
-            if mode == 'detailed':
-                steps = ai_response.get('clarification_steps', [])
-
-                if not steps:
-                    emit('error', {
-                        'code': 'CLARIFICATION_ERROR',
-                        'message': 'La respuesta detallada no contiene pasos'
-                    })
-                    return
-
-                emit('clarification_start', {
-                    'mode': 'detailed',
-                    'total_steps': len(steps),
-                    'estimated_duration': ai_response.get('total_duration', 120)
-                })
-
-                for step in steps:
-                    emit('clarification_step', {
-                        'step_number': step.get('step_number'),
-                        'title': step.get('title'),
-                        'content': step.get('content'),
-                        'content_type': step.get('content_type', 'text'),
-                        'canvas_commands': step.get('canvas_commands'),
-                        'component_commands': step.get('component_commands')
-                    })
-
-                emit('clarification_complete', {
-                    'mode': 'detailed',
-                    'total_duration': ai_response.get('total_duration', 120)
-                })
-
+            if response_mode == 'detailed':
+                _stream_detailed_clarification(
+                    ai_service, clarification_question, current_context
+                )
             else:
-                message = ai_response.get('message')
-                is_deferred = ai_response.get('is_deferred', False)
-                reason = ai_response.get('reason')
-
-                if not message:
-                    emit('error', {
-                        'code': 'CLARIFICATION_ERROR',
-                        'message': 'Respuesta breve inválida'
-                    })
-                    return
-
-                emit('clarification_message', {
-                    'mode': 'brief',
-                    'message': message,
-                    'is_deferred': is_deferred,
-                    'reason': reason
-                })
+                _stream_brief_clarification(
+                    ai_service, clarification_question, current_context
+                )
             
         except Exception as e:
             print(f"Error generando aclaración: {e}")
@@ -145,6 +104,108 @@ def handle_interrupt_explanation(data):
         })
 
 
+def _stream_detailed_clarification(ai_service, clarification_question, current_context):
+    """
+    Emite los pasos de una aclaración detallada conforme el modelo los genera
+    
+    clarification_start sale de inmediato (total_steps aún desconocido);
+    cada clarification_step se emite en cuanto su objeto JSON se cierra.
+    """
+    emit('clarification_start', {
+        'mode': 'detailed',
+        'streaming': True,
+        'total_steps': None,
+        'estimated_duration': None
+    })
+    socketio.sleep(0)
+
+    step_count = 0
+    ai_response = {}
+
+    for event in ai_service.stream_clarification(
+        clarification_question,
+        current_context,
+        response_mode='detailed'
+    ):
+        if event['type'] == 'step':
+            step = event['step']
+            step_count += 1
+            emit('clarification_step', {
+                'step_number': step.get('step_number') or step_count,
+                'title': step.get('title'),
+                'content': step.get('content'),
+                'content_type': step.get('content_type', 'text'),
+                'canvas_commands': step.get('canvas_commands'),
+                'component_commands': step.get('component_commands')
+            })
+            # Ceder al loop para que el paso salga antes de seguir leyendo tokens
+            socketio.sleep(0)
+        elif event['type'] == 'complete':
+            ai_response = event['response']
+
+    if not step_count:
+        # El modelo puede responder en breve aunque se pidió detallado
+        # (p. ej. al diferir la pregunta): se entrega como mensaje
+        if ai_response.get('message'):
+            emit('clarification_message', {
+                'mode': 'detailed',
+                'message': ai_response['message'],
+                'is_deferred': ai_response.get('is_deferred', False),
+                'reason': ai_response.get('reason')
+            })
+            return
+        emit('error', {
+            'code': 'CLARIFICATION_ERROR',
+            'message': 'La respuesta detallada no contiene pasos'
+        })
+        return
+
+    emit('clarification_complete', {
+        'mode': 'detailed',
+        'total_steps': step_count,
+        'total_duration': ai_response.get('total_duration', 120)
+    })
+
+
+def _stream_brief_clarification(ai_service, clarification_question, current_context):
+    """
+    Emite el mensaje breve como deltas de texto y al final el mensaje completo
+    
+    clarification_message conserva el payload de siempre para los clientes
+    que no consumen clarification_delta.
+    """
+    ai_response = {}
+
+    for event in ai_service.stream_clarification(
+        clarification_question,
+        current_context,
+        response_mode='brief'
+    ):
+        if event['type'] == 'message_delta' and event['text']:
+            emit('clarification_delta', {
+                'mode': 'brief',
+                'delta': event['text']
+            })
+            socketio.sleep(0)
+        elif event['type'] == 'complete':
+            ai_response = event['response']
+
+    message = ai_response.get('message')
+    if not message:
+        emit('error', {
+            'code': 'CLARIFICATION_ERROR',
+            'message': 'Respuesta breve inválida'
+        })
+        return
+
+    emit('clarification_message', {
+        'mode': 'brief',
+        'message': message,
+        'is_deferred': ai_response.get('is_deferred', False),
+        'reason': ai_response.get('reason')
+    })
+
+
 @socketio.on('resume_explanation')
 def handle_resume_explanation(data):
     """
@@ -1,9 +1,12 @@
 """
 Eventos de control de reproducción (pause/resume)
 """
+from flask import request
 from flask_socketio import emit
 from app import socketio
 from app.auth.decorators import require_auth_socket
+from app.services.event_service import event_service
+from app.socket_events.questions import socket_sessions
 
 
 @socketio.on("pause_explanation")
@@ -19,6 +22,8 @@ def handle_pause(data):
         user = data.get("user")  # Inyectado por el decorador
         
         # TODO: Implementar lógica de pausa
+        event_service.track("pause", session_id=socket_sessions.get(request.sid),
+                            user_id=user.get("id"), step=current_step)
         
         emit("explanation_paused", {
             "step": current_step,
@@ -2,15 +2,22 @@
 Eventos de preguntas por Socket.IO
 Maneja el flujo completo de ask_question con streaming
 """
+import time
 from flask import request
 from flask_socketio import emit
 from app import socketio
 from app.auth.decorators import require_auth_socket
+from app.utils.rate_limiter import rate_limit_socket
 from app.services.question_service import QuestionService, QuestionValidationError
 from app.services.streaming_service import StreamingService
 from app.services.ai_service import AIService, AIResponseError, JSONParseError
 from app.services.session_service import SessionService
+from app.services.credit_service import CreditService, InsufficientCreditsError
+from app.services.event_service import event_service
 from app.repositories.ai_answers_repo import AIAnswersRepository
+from app.models.answer import Answer
+from app.socket_events.connection import active_connections
+from app.utils.answer_frames import negotiate
 
 # Mapeo de socket_id -> session_id
 socket_sessions = {}
@@ -26,15 +33,18 @@ WAITING_PHRASES = [
 
 @socketio.on("ask_question")
 @require_auth_socket
+@rate_limit_socket("questions")
 def handle_ask_question(data):
     """
     Maneja una pregunta del usuario
     
     Flujo:
-    1. Verificar rate limit (TODO)
+    1. Verificar rate limit (@rate_limit_socket, por usuario)
     2. Validar y procesar pregunta con QuestionService
-    3. Si existe en cache: streaming directo
-    4. Si no existe: emitir waiting_phrase, generar con IA, guardar, streaming
+    3. Reservar créditos (cache y generación con IA tienen costos distintos)
+    4. Si existe en cache: confirmar créditos y streaming directo
+    5. Si no existe: emitir waiting_phrase, generar con IA (si falla, devolver
+       créditos), confirmar, guardar, streaming
     
     Requiere autenticación: el token debe estar en data["token"]
     
@@ -45,12 +55,18 @@ def handle_ask_question(data):
             "context": {
                 "subject": "física",
                 "difficulty": "medium"
-            }
+            },
+            "accept_encoding": ["zstd", "deflate"]
         }
+    
+    accept_encoding es opcional: con él la respuesta llega en un único answer_frame
+    precomprimido en lugar del streaming por chunks.
     """
     try:
+        received_at = time.monotonic()
         question_text = data.get("question")
         context = data.get("context", {})
+        frame_encoding = negotiate(data.get("accept_encoding"))
         user = data.get("user")  # Inyectado por el decorador
         user_id = user.get("id")
         
@@ -66,18 +82,18 @@ def handle_ask_question(data):
         session_service = SessionService()
         
         if socket_id not in socket_sessions:
-            # Crear nueva sesión
-            session_id = session_service.create_session(
-                user_id=user_id,
-                connection_id=socket_id
-            )
+            # Reutilizar la sesión creada en connect: al desconectar, su cierre
+            # genera el resumen de study_sessions con estas preguntas
+            session_id = active_connections.get(socket_id)
+            if not session_id:
+                session_id = session_service.create_session(
+                    user_id=user_id,
+                    connection_id=socket_id
+                )
             socket_sessions[socket_id] = session_id
         else:
             session_id = socket_sessions[socket_id]
         
-        # TODO: Verificar rate limit aquí
-        # rate_limiter.check_limit(user_id)
-        
         # Procesar pregunta
         question_service = QuestionService()
         
@@ -90,6 +106,19 @@ def handle_ask_question(data):
             })
             return
         
+        # Reservar créditos antes de responder
+        credit_service = CreditService()
+        
+        try:
+            reservation = credit_service.reserve(user_id, cached=result["cached"])
+        except InsufficientCreditsError as e:
+            emit("error", {
+                "code": "INSUFFICIENT_CREDITS",
+                "message": str(e),
+                "reason": e.reason
+            })
+            return
+        
         # Actualizar sesión con hash de pregunta
         session_service.update_session(session_id, {
             "current_question": result["question_hash"]
@@ -98,67 +127,69 @@ def handle_ask_question(data):
         # Iniciar streaming service
         streaming_service = StreamingService(session_service)
         
-        if result["cached"]:
-            # Respuesta en cache - streaming directo
-            print(f"✓ Respuesta en cache para: {question_text[:50]}...")
-            
-            answer_data = {
-                "steps": result["answer_steps"],
-                "total_duration": result["total_duration"],
-                "question_hash": result["question_hash"]
-            }
-            
-            streaming_service.start_streaming(answer_data, session_id)
-            
-        else:
-            # No existe en cache - generar con IA
-            print(f"🤖 Generando respuesta con IA para: {question_text[:50]}...")
-            
-            # Emitir frase de espera
-            import random
-            waiting_phrase = random.choice(WAITING_PHRASES)
-            emit("waiting_phrase", {
-                "message": waiting_phrase
-            })
-            
-            # Generar con IA
-            ai_service = AIService()
-            
-            try:
-                ai_response = ai_service.generate_answer(question_text, context)
-            except (AIResponseError, JSONParseError) as e:
-                emit("error", {
-                    "code": "AI_GENERATION_ERROR",
-                    "message": f"Error generando respuesta: {str(e)}"
+        try:
+            if result["cached"]:
+                # Respuesta en cache - streaming directo
+                print(f"✓ Respuesta en cache para: {question_text[:50]}...")
+                
+                answer = Answer.from_dict(result)
+                
+            else:
+                # No existe en cache - generar con IA
+                print(f"🤖 Generando respuesta con IA para: {question_text[:50]}...")
+                
+                # Emitir frase de espera
+                import random
+                waiting_phrase = random.choice(WAITING_PHRASES)
+                emit("waiting_phrase", {
+                    "message": waiting_phrase
                 })
-                return
-            
-            # Guardar en DB
-            ai_answers_repo = AIAnswersRepository()
-            
-            try:
-                saved_answer = ai_answers_repo.create({
+                
+                # Generar con IA
+                ai_service = AIService()
+                ai_response = ai_service.generate_answer(question_text, context)
+                
+                # Validar una sola vez: el mismo modelo se guarda y se transmite
+                answer = Answer.from_dict({
                     "question_hash": result["question_hash"],
                     "question_text": question_text,
                     "answer_steps": ai_response["steps"],
                     "total_duration": ai_response["total_duration"],
                     "generated_by": "gpt-4"
                 })
+        except Exception as e:
+            # Sin una respuesta válida no se cobra: cualquier fallo devuelve la reserva
+            credit_service.refund(reservation)
+            _track_question(session_id, user_id, question_text, result, reservation,
+                            received_at, completed=False)
+            if isinstance(e, (AIResponseError, JSONParseError)):
+                code, message = "AI_GENERATION_ERROR", f"Error generando respuesta: {str(e)}"
+            else:
+                code, message = "PROCESSING_ERROR", str(e)
+            emit("error", {
+                "code": code,
+                "message": message
+            })
+            return
+        
+        credit_service.commit(reservation, {"question_hash": result["question_hash"]})
+        _track_question(session_id, user_id, question_text, result, reservation, received_at)
+        
+        if not result["cached"]:
+            # Guardar en DB (write-behind: no bloquea el inicio del streaming)
+            ai_answers_repo = AIAnswersRepository()
+            
+            try:
+                saved_answer = ai_answers_repo.create(answer)
                 
-                print(f"✓ Respuesta guardada en DB: {saved_answer['id']}")
+                print(f"✓ Respuesta encolada para guardar en DB: {saved_answer['id']}")
                 
             except Exception as e:
                 print(f"⚠ Error guardando en DB: {e}")
                 # Continuar con streaming aunque falle el guardado
-            
-            # Iniciar streaming
-            answer_data = {
-                "steps": ai_response["steps"],
-                "total_duration": ai_response["total_duration"],
-                "question_hash": result["question_hash"]
-            }
-            
-            streaming_service.start_streaming(answer_data, session_id)
+        
+        # Iniciar streaming
+        _deliver(streaming_service, answer, session_id, frame_encoding)
         
         print(f"✓ Pregunta procesada para usuario: {user.get('email')}")
         
@@ -173,6 +204,33 @@ def handle_ask_question(data):
         })
 
 
+def _deliver(streaming_service, answer, session_id, frame_encoding):
+    """Envía la respuesta como frame precomprimido o por streaming"""
+    if frame_encoding:
+        streaming_service.send_frame(answer, session_id, frame_encoding)
+    else:
+        streaming_service.start_streaming(answer, session_id)
+
+
+def _track_question(session_id, user_id, question_text, result, reservation,
+                    received_at, completed=True):
+    """Registra la pregunta (y si salió del cache) en el pipeline de eventos"""
+    cached = result["cached"]
+    event_service.track("cache_hit" if cached else "cache_miss", session_id=session_id,
+                        user_id=user_id, question_hash=result["question_hash"])
+    event_service.track(
+        "question_asked",
+        session_id=session_id,
+        user_id=user_id,
+        question_text=question_text,
+        question_hash=result["question_hash"],
+        cached=cached,
+        response_time_ms=int((time.monotonic() - received_at) * 1000),
+        credits_used=reservation.credits if completed else 0,
+        completed=completed
+    )
+
+
 @socketio.on("pause_explanation")
 @require_auth_socket
 def handle_pause_explanation(data):
@@ -198,7 +256,8 @@ def handle_pause_explanation(data):
         session_service = SessionService()
         
         # Pausar en Redis
-        session_service.pause_streaming(session_id, position=0)
+        session_service.pause_streaming(session_id, pause_position=0)
+        event_service.track("pause", session_id=session_id, user_id=data["user"].get("id"))
         
         emit("explanation_paused", {
             "message": "Explicación pausada",
@@ -244,21 +303,17 @@ def handle_resume_explanation(data):
         # Obtener answer_data del payload o de la sesión
         answer_data = data.get("answer_data")
         
+        if not answer_data:
+            # Respuesta guardada junto a la sesión (sin DB ni IA)
+            answer_data = session_service.get_answer_snapshot(session_id)
+        
         if not answer_data:
             # Intentar recuperar de la sesión o DB
             session = session_service.get_session(session_id)
             question_hash = session.get("current_question")
             
             if question_hash:
-                ai_answers_repo = AIAnswersRepository()
-                cached_answer = ai_answers_repo.get_by_hash(question_hash)
-                
-                if cached_answer:
-                    answer_data = {
-                        "steps": cached_answer["answer_steps"],
-                        "total_duration": cached_answer["total_duration"],
-                        "question_hash": question_hash
-                    }
+                answer_data = AIAnswersRepository().get_answer(question_hash)
         
         if not answer_data:
             emit("error", {
@@ -1,9 +1,17 @@
 """
 Eventos de voz por Socket.IO
+
+La grabación llega por chunks (voice_chunk) a un buffer circular por
+conexión; el ASR local emite transcripciones parciales mientras se habla
+y, en voice_complete, la transcripción final se envía a ask_question.
 """
+from flask import request
 from flask_socketio import emit
 from app import socketio
 from app.auth.decorators import require_auth_socket
+from app.config import Config
+from app.services.asr_backends import ASRUnavailableError
+from app.services.voice_service import VoiceStreamError, voice_service
 
 
 @socketio.on("voice_start")
@@ -12,20 +20,39 @@ def handle_voice_start(data):
     """
     Inicia la grabación de voz
     Requiere autenticación: el token debe estar en data["token"]
+
+    Payload:
+        {
+            "token": "jwt_token",
+            "sample_rate": 16000,   # opcional (audio pcm_s16le mono)
+            "language": "es"        # opcional
+        }
     """
     try:
         session_id = data.get("session_id")
         user = data.get("user")  # Inyectado por el decorador
-        
-        # TODO: Implementar lógica de inicio de grabación
-        
+
+        stream = voice_service.start(
+            request.sid,
+            user_id=user.get("id"),
+            sample_rate=data.get("sample_rate"),
+            language=data.get("language", "es")
+        )
+
         emit("voice_recording_started", {
             "session_id": session_id,
-            "max_duration": 60000  # 60 segundos
+            "max_duration": voice_service.max_seconds * 1000,
+            "sample_rate": stream.sample_rate,
+            "format": "pcm_s16le"
         })
-        
+
         print(f"✓ Grabación iniciada para usuario: {user.get('email')}")
-        
+
+    except VoiceStreamError as e:
+        emit("error", {
+            "code": "VOICE_START_ERROR",
+            "message": str(e)
+        })
     except Exception as e:
         print(f"Error iniciando grabación: {e}")
         emit("error", {
@@ -34,31 +61,123 @@ def handle_voice_start(data):
         })
 
 
+@socketio.on("voice_chunk")
+def handle_voice_chunk(data):
+    """
+    Recibe un fragmento de audio de la grabación en curso
+
+    Sin token: la grabación se autenticó en voice_start y pertenece a esta
+    conexión (verificar el JWT en cada chunk sería una llamada a Supabase
+    cada pocos cientos de milisegundos).
+
+    Payload:
+        {
+            "chunk": <binario pcm_s16le> | "base64",
+            "seq": 12   # opcional, se devuelve en los errores
+        }
+    """
+    try:
+        if not isinstance(data, dict):
+            emit("error", {
+                "code": "INVALID_PAYLOAD",
+                "message": "El payload debe ser un objeto"
+            })
+            return
+
+        for transcript in voice_service.append(request.sid, data.get("chunk")):
+            emit("voice_partial_transcript", transcript.to_dict())
+
+    except VoiceStreamError as e:
+        emit("error", {
+            "code": "VOICE_CHUNK_ERROR",
+            "message": str(e),
+            "seq": data.get("seq")
+        })
+    except Exception as e:
+        print(f"Error recibiendo audio: {e}")
+        emit("error", {
+            "code": "VOICE_CHUNK_ERROR",
+            "message": str(e)
+        })
+
+
 @socketio.on("voice_complete")
 @require_auth_socket
 def handle_voice_complete(data):
     """
-    Procesa el audio grabado
+    Termina la grabación, transcribe y envía la pregunta
     Requiere autenticación: el token debe estar en data["token"]
+
+    Payload:
+        {
+            "token": "jwt_token",
+            "audio_data": "base64",   # opcional: grabación completa (clientes sin voice_chunk)
+            "ask": true,              # opcional (default: VOICE_AUTO_ASK)
+            "context": {...}          # opcional, se pasa a ask_question
+        }
+
+    Con ask la transcripción final se envía directamente a ask_question;
+    sin ask el cliente la confirma y la envía él mismo.
     """
     try:
-        audio_data = data.get("audio_data")
-        duration = data.get("duration")
         user = data.get("user")  # Inyectado por el decorador
-        
-        # TODO: Implementar transcripción
-        
+        ask = data.get("ask", Config.VOICE_AUTO_ASK)
+
+        if data.get("audio_data") is not None:
+            voice_service.cancel(request.sid)
+            result = voice_service.transcribe_audio(
+                data["audio_data"], data.get("sample_rate"), data.get("language", "es")
+            )
+        else:
+            result = voice_service.finish(request.sid).to_dict()
+
+        question_text = result["transcription"]
         emit("voice_transcription_result", {
-            "transcription": "Texto transcrito aquí",
-            "confidence": 0.95,
-            "requires_confirmation": True
+            **result,
+            "requires_confirmation": not (ask and question_text)
         })
-        
+
         print(f"✓ Audio procesado para usuario: {user.get('email')}")
-        
+
+        if not question_text:
+            emit("error", {
+                "code": "VOICE_EMPTY",
+                "message": "No se detectó voz en la grabación"
+            })
+            return
+
+        if ask:
+            from app.socket_events.questions import handle_ask_question
+            handle_ask_question({
+                "token": data.get("token"),
+                "question": question_text,
+                "context": data.get("context", {}),
+                "accept_encoding": data.get("accept_encoding")
+            })
+
+    except ASRUnavailableError as e:
+        print(f"❌ ASR no disponible: {e}")
+        emit("error", {
+            "code": "VOICE_ASR_UNAVAILABLE",
+            "message": str(e)
+        })
+    except VoiceStreamError as e:
+        emit("error", {
+            "code": "VOICE_PROCESSING_ERROR",
+            "message": str(e)
+        })
     except Exception as e:
         print(f"Error procesando audio: {e}")
         emit("error", {
             "code": "VOICE_PROCESSING_ERROR",
             "message": str(e)
         })
+
+
+@socketio.on("voice_cancel")
+def handle_voice_cancel(data=None):
+    """
+    Descarta la grabación en curso de esta conexión
+    """
+    if voice_service.cancel(request.sid):
+        emit("voice_recording_cancelled", {})
@@ -0,0 +1,138 @@
+"""
+Frames precomprimidos de respuestas
+
+Un frame es la respuesta completa (pasos, duración y hash) serializada una
+sola vez como JSON y comprimida con la codificación que acepta el cliente.
+Se guarda en memoria por (question_hash, codificación): todos los clientes
+que piden la misma respuesta reciben los mismos bytes sin volver a
+serializar ni comprimir.
+
+Codificaciones (en orden de preferencia del cliente):
+- zstd: requiere zstandard instalado en el servidor
+- deflate: formato zlib (DecompressionStream("deflate") en navegadores)
+- identity: JSON sin comprimir (igual se serializa una sola vez)
+"""
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from app.config import Config
+from app.utils import codec
+from app.utils.codec import get_codec
+
+
+def supported_encodings() -> tuple:
+    """
+    Codificaciones de frame disponibles en este servidor
+
+    Returns:
+        tuple: Nombres de codificación
+    """
+    if codec.zstandard is not None:
+        return ("zstd", "deflate", "identity")
+    return ("deflate", "identity")
+
+
+def negotiate(accepted: Optional[Iterable[str]]) -> Optional[str]:
+    """
+    Elige la primera codificación del cliente que el servidor soporta
+
+    Args:
+        accepted: Codificaciones aceptadas por el cliente, en orden de preferencia
+
+    Returns:
+        str | None: Codificación elegida, None si el cliente no pidió frames
+    """
+    if not accepted:
+        return None
+    if isinstance(accepted, str):
+        accepted = [accepted]
+    available = supported_encodings()
+    for encoding in accepted:
+        if isinstance(encoding, str) and encoding.lower() in available:
+            return encoding.lower()
+    return None
+
+
+def build_frame(answer_data: dict, encoding: str) -> bytes:
+    """
+    Serializa y comprime una respuesta
+
+    Args:
+        answer_data: {"steps", "total_duration", "question_hash"}
+        encoding: "zstd", "deflate" o "identity"
+
+    Returns:
+        bytes: Frame listo para enviar
+    """
+    payload = get_codec(binary=False).encode(answer_data)
+    if encoding == "zstd":
+        return codec.zstandard.ZstdCompressor(level=3).compress(payload)
+    if encoding == "deflate":
+        return zlib.compress(payload, 6)
+    return payload
+
+
+class AnswerFrameCache:
+    """LRU en memoria de frames por (question_hash, codificación)"""
+
+    def __init__(self, maxsize: Optional[int] = None):
+        """
+        Inicializa el cache
+
+        Args:
+            maxsize: Número máximo de frames (default: Config.ANSWER_FRAME_CACHE_SIZE)
+        """
+        self.maxsize = maxsize or Config.ANSWER_FRAME_CACHE_SIZE
+        self._frames: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, answer_data: dict, encoding: str) -> bytes:
+        """
+        Obtiene el frame de una respuesta, construyéndolo la primera vez
+
+        Las respuestas sin question_hash no se cachean.
+
+        Args:
+            answer_data: {"steps", "total_duration", "question_hash"}
+            encoding: Codificación negociada
+
+        Returns:
+            bytes: Frame listo para enviar
+        """
+        question_hash = answer_data.get("question_hash")
+        if not question_hash:
+            return build_frame(answer_data, encoding)
+
+        key = (question_hash, encoding)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                return frame
+
+        frame = build_frame(answer_data, encoding)
+        with self._lock:
+            self._frames[key] = frame
+            while len(self._frames) > self.maxsize:
+                self._frames.popitem(last=False)
+        return frame
+
+    def invalidate(self, question_hash: str) -> None:
+        """
+        Elimina los frames de una respuesta (todas las codificaciones)
+
+        Args:
+            question_hash: Hash de la respuesta
+        """
+        with self._lock:
+            for key in [key for key in self._frames if key[0] == question_hash]:
+                del self._frames[key]
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+# Cache compartido por proceso
+answer_frames = AnswerFrameCache()
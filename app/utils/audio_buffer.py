@@ -0,0 +1,117 @@
+"""
+Buffer circular de audio por sesión de voz
+
+El audio llega en chunks (voice_chunk) y se copia una sola vez a un
+bytearray preasignado: sin concatenar bytes/strings por chunk ni
+realocar. La capacidad es fija (VOICE_MAX_SECONDS de audio); si se
+excede, el audio más antiguo se sobrescribe y se cuenta en dropped.
+
+view() devuelve memoryviews sobre el almacenamiento (sin copia) para el
+ASR cuando la grabación terminó; snapshot() copia la ventana actual para
+transcripciones parciales mientras siguen llegando chunks.
+"""
+import threading
+from typing import Tuple, Union
+
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class AudioRingBuffer:
+    """Buffer circular de bytes con capacidad fija"""
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Bytes máximos retenidos
+        """
+        if capacity <= 0:
+            raise ValueError("La capacidad del buffer debe ser positiva")
+        self.capacity = capacity
+        self._storage = bytearray(capacity)
+        self._view = memoryview(self._storage)
+        self._start = 0
+        self._size = 0
+        self.total_written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, chunk: BytesLike) -> int:
+        """
+        Agrega un chunk al final (sobrescribe lo más antiguo si no cabe)
+
+        Args:
+            chunk: Bytes del chunk (bytes, bytearray o memoryview)
+
+        Returns:
+            int: Bytes antiguos descartados por este chunk
+        """
+        data = memoryview(chunk).cast("B")
+        length = len(data)
+        if not length:
+            return 0
+
+        with self._lock:
+            self.total_written += length
+            if length >= self.capacity:
+                # Solo cabe la cola del chunk
+                dropped = self._size + length - self.capacity
+                self._view[:] = data[length - self.capacity:]
+                self._start, self._size = 0, self.capacity
+                self.dropped += dropped
+                return dropped
+
+            dropped = max(self._size + length - self.capacity, 0)
+            if dropped:
+                self._start = (self._start + dropped) % self.capacity
+                self._size -= dropped
+                self.dropped += dropped
+
+            end = (self._start + self._size) % self.capacity
+            first = min(length, self.capacity - end)
+            self._view[end:end + first] = data[:first]
+            if first < length:
+                self._view[:length - first] = data[first:]
+            self._size += length
+            return dropped
+
+    def view(self) -> Tuple[memoryview, ...]:
+        """
+        Segmentos del contenido en orden, sin copiar
+
+        Solo es seguro leerlos mientras no haya escrituras (grabación terminada).
+
+        Returns:
+            tuple: Uno o dos memoryviews (dos si el contenido da la vuelta)
+        """
+        with self._lock:
+            end = self._start + self._size
+            if end <= self.capacity:
+                return (self._view[self._start:end],)
+            return (self._view[self._start:], self._view[:end - self.capacity])
+
+    def contiguous(self) -> BytesLike:
+        """
+        Contenido como un solo bloque (sin copia si no da la vuelta)
+
+        Returns:
+            memoryview | bytes: Audio en orden
+        """
+        segments = self.view()
+        return segments[0] if len(segments) == 1 else b"".join(segments)
+
+    def snapshot(self) -> bytes:
+        """Copia del contenido actual (segura con escrituras concurrentes)"""
+        with self._lock:
+            end = self._start + self._size
+            if end <= self.capacity:
+                return bytes(self._view[self._start:end])
+            return bytes(self._view[self._start:]) + bytes(self._view[:end - self.capacity])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._start = 0
+            self._size = 0
@@ -0,0 +1,112 @@
+"""
+Tareas periódicas en segundo plano
+
+Trabajo de mantenimiento (liquidar créditos, volcar progreso, barrer
+sesiones expiradas) que no debe ejecutarse dentro del request. Cada
+tarea corre en un hilo daemon por proceso que se inicia al primer uso,
+se repite cada `interval` segundos y puede adelantarse con wake()
+(p. ej. al llenarse un lote). Al apagar el proceso se ejecuta una
+última vez para no perder lo pendiente.
+"""
+import atexit
+import threading
+from typing import Callable, Dict, Optional
+
+
+class PeriodicTask:
+    """Ejecuta una función cada `interval` segundos en un hilo daemon"""
+
+    def __init__(self, name: str, func: Callable[[], object], interval: float, run_at_exit: bool = True):
+        """
+        Inicializa la tarea
+
+        Args:
+            name: Nombre de la tarea (nombre del hilo y logs)
+            func: Función sin argumentos a ejecutar
+            interval: Segundos entre ejecuciones
+            run_at_exit: Ejecutar una última vez al apagar el proceso
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.run_at_exit = run_at_exit
+        self.runs = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Inicia el hilo si no está corriendo (idempotente)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def wake(self) -> None:
+        """Adelanta la siguiente ejecución (inicia el hilo si hace falta)"""
+        self.start()
+        self._wakeup.set()
+
+    def run_once(self) -> bool:
+        """
+        Ejecuta la función una vez, sin solaparse con el hilo
+
+        Returns:
+            bool: False si la función lanzó una excepción
+        """
+        with self._run_lock:
+            try:
+                self.func()
+                self.runs += 1
+                return True
+            except Exception as e:  # pylint: disable=broad-except
+                self.failures += 1
+                print(f"✗ Error en tarea {self.name}: {e}")
+                return False
+
+    def _loop(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.run_once()
+
+
+_tasks: Dict[str, PeriodicTask] = {}
+_tasks_lock = threading.Lock()
+
+
+def get_periodic_task(name: str, func: Callable[[], object], interval: float,
+                      run_at_exit: bool = True) -> PeriodicTask:
+    """
+    Tarea compartida por nombre (una por proceso)
+
+    Args:
+        name: Nombre de la tarea
+        func: Función a ejecutar (solo se usa al crearla)
+        interval: Segundos entre ejecuciones (solo se usa al crearla)
+        run_at_exit: Ejecutar una última vez al apagar el proceso
+
+    Returns:
+        PeriodicTask: Tarea registrada
+    """
+    with _tasks_lock:
+        task = _tasks.get(name)
+        if task is None:
+            task = PeriodicTask(name, func, interval, run_at_exit)
+            _tasks[name] = task
+        return task
+
+
+@atexit.register
+def run_all_at_exit() -> None:
+    """Última ejecución de las tareas iniciadas (al apagar el proceso)"""
+    with _tasks_lock:
+        tasks = list(_tasks.values())
+    for task in tasks:
+        if task.run_at_exit and task._thread is not None:
+            task.run_once()
@@ -0,0 +1,268 @@
+"""
+Cache en dos niveles para respuestas de IA
+Nivel 1: memoria local del proceso (LRU con TTL)
+Nivel 2: Redis compartido entre workers
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.config import Config
+from app.extensions import get_redis
+from app.utils.codec import binary_client, decode, get_codec
+from app.utils.metrics import metrics
+
+
+class CacheStats:
+    """Contadores de aciertos/fallos por nivel de cache"""
+
+    TIERS = ("memory", "redis", "loader")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = {tier: 0 for tier in self.TIERS}
+        self.misses = 0
+
+    def record_hit(self, tier: str) -> None:
+        with self._lock:
+            self.hits[tier] += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def snapshot(self) -> dict:
+        """
+        Retorna los contadores actuales
+
+        Returns:
+            dict: {"hits": {...}, "misses": int, "lookups": int, "hit_rate": float}
+        """
+        with self._lock:
+            hits = dict(self.hits)
+            misses = self.misses
+        total_hits = sum(hits.values())
+        lookups = total_hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "lookups": lookups,
+            "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = {tier: 0 for tier in self.TIERS}
+            self.misses = 0
+
+
+class TieredCache:
+    """
+    Cache de respuestas con memoria local + Redis
+
+    Las lecturas consultan primero la memoria local, luego Redis y por
+    último el loader (normalmente Supabase). Cada acierto en un nivel
+    inferior rellena los niveles superiores.
+
+    Con compressed=True los valores grandes se guardan comprimidos en Redis
+    (ver ANSWER_COMPRESSION); la memoria local conserva el valor ya
+    decodificado para no descomprimir en cada acierto.
+    """
+
+    KEY_PREFIX = "cache"
+
+    def __init__(
+        self,
+        namespace: str,
+        redis_client=None,
+        local_maxsize: int = 1024,
+        local_ttl: int = 300,
+        redis_ttl: Optional[int] = None,
+        compressed: bool = False
+    ):
+        """
+        Inicializa el cache
+
+        Args:
+            namespace: Nombre lógico del cache (ej. "brief_answers")
+            redis_client: Cliente Redis (opcional, usa el global si no se provee)
+            local_maxsize: Número máximo de entradas en memoria
+            local_ttl: Segundos de vida en memoria
+            redis_ttl: Segundos de vida en Redis (default: Config.CACHE_TTL)
+            compressed: Comprimir en Redis los valores grandes
+        """
+        self.namespace = namespace
+        self._redis = redis_client
+        self.local_maxsize = local_maxsize
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl or Config.CACHE_TTL
+        self.stats = CacheStats()
+        self.codec = get_codec(compressed=compressed)
+        # Valores comprimidos se leen como bytes aunque ANSWER_COMPRESSION cambie
+        self.binary_values = compressed or self.codec.binary
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        """Cliente Redis (resuelto de forma perezosa)"""
+        return self._redis if self._redis is not None else get_redis()
+
+    def _value_client(self):
+        """Cliente para los valores (sin decode_responses si son binarios)"""
+        client = self.redis
+        if client is None or not self.binary_values:
+            return client
+        return binary_client(client)
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.KEY_PREFIX}:{self.namespace}:{key}"
+
+    def _get_local(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_maxsize:
+                self._local.popitem(last=False)
+
+    def _get_redis(self, key: str) -> Optional[dict]:
+        client = self._value_client()
+        if client is None:
+            return None
+        try:
+            return decode(client.get(self._redis_key(key)))
+        except Exception as e:
+            print(f"Error leyendo cache {self.namespace} en Redis: {e}")
+            return None
+
+    def _set_redis(self, key: str, value: dict) -> None:
+        client = self._value_client()
+        if client is None:
+            return
+        try:
+            client.setex(self._redis_key(key), self.redis_ttl, self.codec.encode(value))
+        except Exception as e:
+            print(f"Error escribiendo cache {self.namespace} en Redis: {e}")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Busca una entrada en memoria y Redis (sin loader)
+
+        Args:
+            key: Clave dentro del namespace
+
+        Returns:
+            dict | None: Valor cacheado o None
+        """
+        value = self._get_local(key)
+        if value is not None:
+            self.stats.record_hit("memory")
+            return value
+
+        value = self._get_redis(key)
+        if value is not None:
+            self._set_local(key, value)
+            self.stats.record_hit("redis")
+            return value
+
+        self.stats.record_miss()
+        return None
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """
+        Busca una entrada y, si no existe, la obtiene con el loader
+
+        Args:
+            key: Clave dentro del namespace
+            loader: Función sin argumentos que consulta la fuente de verdad
+
+        Returns:
+            dict | None: Valor cacheado/cargado o None si no existe
+        """
+        value = self._get_local(key)
+        if value is not None:
+            self.stats.record_hit("memory")
+            return value
+
+        value = self._get_redis(key)
+        if value is not None:
+            self._set_local(key, value)
+            self.stats.record_hit("redis")
+            return value
+
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+            self.stats.record_hit("loader")
+            return value
+
+        self.stats.record_miss()
+        return None
+
+    def set(self, key: str, value: dict) -> None:
+        """
+        Guarda una entrada en ambos niveles
+
+        Args:
+            key: Clave dentro del namespace
+            value: Valor serializable (JSON o msgpack según REDIS_CODEC)
+        """
+        self._set_local(key, value)
+        self._set_redis(key, value)
+
+    def delete(self, key: str) -> None:
+        """
+        Elimina una entrada de ambos niveles
+
+        Args:
+            key: Clave dentro del namespace
+        """
+        with self._lock:
+            self._local.pop(key, None)
+        client = self.redis
+        if client is not None:
+            try:
+                client.delete(self._redis_key(key))
+            except Exception as e:
+                print(f"Error eliminando cache {self.namespace} en Redis: {e}")
+
+    def clear_local(self) -> None:
+        """Vacía el nivel en memoria (útil en tests)"""
+        with self._lock:
+            self._local.clear()
+
+
+# Caches compartidos por proceso
+brief_answers_cache = TieredCache("brief_answers")
+answers_cache = TieredCache("answers", compressed=True)
+explanations_cache = TieredCache("explanations", compressed=True)
+
+
+CACHE_HITS = metrics.counter("cache_hits_total", "Aciertos de cache por nivel", ("cache", "tier"))
+CACHE_MISSES = metrics.counter("cache_misses_total", "Fallos de cache (ningún nivel tenía el valor)", ("cache",))
+metrics.register_ratio("cache_hit_ratio", "Aciertos / consultas por cache", CACHE_HITS, CACHE_MISSES, "cache")
+
+
+def _collect_cache_stats() -> None:
+    """Copia los contadores de CacheStats a las métricas (sin costo por consulta)"""
+    for cache in (answers_cache, brief_answers_cache, explanations_cache):
+        snapshot = cache.stats.snapshot()
+        for tier, hits in snapshot["hits"].items():
+            CACHE_HITS.labels(cache.namespace, tier).set(hits)
+        CACHE_MISSES.labels(cache.namespace).set(snapshot["misses"])
+
+
+metrics.register_collector(_collect_cache_stats)
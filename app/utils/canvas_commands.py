@@ -1,7 +1,31 @@
 """
 Generador de comandos para el canvas
+
+Además de los constructores de comandos, prepara los canvas_commands y
+component_commands que emite el modelo una sola vez, al generar la
+respuesta (prepare_steps):
+
+- valida cada comando contra su esquema (CANVAS_SCHEMA / COMPONENT_SCHEMA)
+  y descarta los inválidos sin invalidar el paso
+- normaliza el formato ({"command", "parameters"}; acepta el formato plano
+  {"type", ...} de los constructores) y las coordenadas a float
+- precalcula con NumPy los puntos de las funciones de draw_graph y
+  plot_function (parameters.points), que se guardan con la respuesta
+- acepta referencias a plantillas de la biblioteca de canvas
+  ({"command": "library", "parameters": {"id": slug}} o {"library": slug}),
+  que CanvasLibraryService valida después contra las plantillas cargadas
+
+El streaming envía después todos los comandos de un paso en un único
+evento (step_commands) sin volver a validarlos.
 """
-from typing import List
+import ast
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.config import Config
 
 
 def generate_rectangle(x: int, y: int, width: int, height: int, color: str = "#3498db") -> dict:
@@ -112,3 +136,328 @@ def generate_axis(x: int, y: int, width: int, height: int) -> dict:
         "width": width,
         "height": height
     }
+
+
+class CanvasCommandError(ValueError):
+    """Excepción cuando un comando de canvas o componente no cumple su esquema"""
+    pass
+
+
+NUMBER = "number"
+LIBRARY_COMMAND = "library"
+
+# Parámetros requeridos por comando: nombre -> tipo (str, list, dict o NUMBER)
+CANVAS_SCHEMA: Dict[str, Dict[str, Any]] = {
+    "draw_equation": {"equation": str},
+    "draw_image": {"url": str},
+    "draw_graph": {"function": str},
+    "plot_function": {"function": str},
+    "draw_diagram": {"data": dict},
+    "draw_table": {"headers": list, "rows": list},
+    "highlight": {"text": str},
+    # Referencia a una plantilla de canvas_library (el cliente la expande)
+    LIBRARY_COMMAND: {"id": str},
+    # Formato de los constructores de este módulo
+    "rectangle": {"x": NUMBER, "y": NUMBER, "width": NUMBER, "height": NUMBER},
+    "circle": {"x": NUMBER, "y": NUMBER, "radius": NUMBER},
+    "line": {"x1": NUMBER, "y1": NUMBER, "x2": NUMBER, "y2": NUMBER},
+    "text": {"x": NUMBER, "y": NUMBER, "text": str},
+    "axis": {"x": NUMBER, "y": NUMBER, "width": NUMBER, "height": NUMBER}
+}
+
+COMPONENT_SCHEMA: Dict[str, Dict[str, Any]] = {
+    "image_component": {"url": str},
+    "image_modal": {"url": str},
+    "pdf_viewer": {"url": str},
+    "interactive_chart": {"data": dict},
+    "video_player": {"url": str},
+    "interactive_3d": {"model_url": str},
+    "quiz_component": {"question": str, "options": list},
+    "code_editor": {"code": str},
+    "timeline_component": {"events": list}
+}
+
+PLOTTABLE_COMMANDS = frozenset({"draw_graph", "plot_function"})
+
+# Parámetros numéricos opcionales que también se normalizan a float
+COORDINATE_KEYS = ("x", "y", "x1", "y1", "x2", "y2", "width", "height", "radius", "size")
+RANGE_KEYS = ("x_range", "y_range")
+DEFAULT_X_RANGE = (-10.0, 10.0)
+
+MAX_EXPRESSION_LENGTH = 200
+
+# Nombres permitidos en las funciones a graficar
+_FUNCTIONS: Dict[str, Callable] = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan,
+    "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+    "exp": np.exp, "log": np.log, "ln": np.log, "log10": np.log10,
+    "sqrt": np.sqrt, "abs": np.abs
+}
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd
+)
+_LHS_RE = re.compile(r"^\s*(?:y|f\s*\(\s*x\s*\))\s*=\s*", re.IGNORECASE)
+_IMPLICIT_PRODUCT_RE = re.compile(r"(?<![A-Za-z_\d.])(\d+(?:\.\d+)?)\s*(?=[A-Za-z(])|(\))\s*(?=[A-Za-z\d(])")
+
+
+def compile_function(expression: str) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Compila una función de x escrita por el modelo ("y = 2x^2 + sin(x)")
+
+    Solo admite aritmética, las funciones de _FUNCTIONS, pi, e y la variable
+    x: el árbol se valida con ast antes de evaluarlo (nunca se evalúa texto
+    arbitrario).
+
+    Args:
+        expression: Función con o sin "y =" / "f(x) ="; acepta ^ y producto implícito
+
+    Returns:
+        callable: f(x) vectorizada sobre arrays de NumPy
+
+    Raises:
+        CanvasCommandError: Si la expresión no es una función válida de x
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CanvasCommandError("Función demasiado larga")
+
+    source = _LHS_RE.sub("", expression).replace("^", "**").replace("\u2212", "-")
+    source = _IMPLICIT_PRODUCT_RE.sub(lambda match: (match.group(1) or match.group(2)) + "*", source)
+
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError:
+        raise CanvasCommandError(f"Función inválida: {expression}") from None
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise CanvasCommandError(f"Operación no permitida en la función: {expression}")
+        if isinstance(node, ast.Call) and not (
+            isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS and len(node.args) == 1
+            and not node.keywords
+        ):
+            raise CanvasCommandError(f"Función no soportada en: {expression}")
+        if isinstance(node, ast.Name) and node.id not in _FUNCTIONS and node.id not in _CONSTANTS \
+                and node.id != "x":
+            raise CanvasCommandError(f"Variable desconocida '{node.id}' en: {expression}")
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise CanvasCommandError(f"Constante no numérica en: {expression}")
+
+        if isinstance(node, ast.Constant):
+            # Constantes como float: 9**9**9 desborda en lugar de crear un entero gigante
+            node.value = float(node.value)
+
+    code = compile(tree, "<canvas>", "eval")
+
+    def evaluate(x: np.ndarray) -> np.ndarray:
+        try:
+            with np.errstate(all="ignore"):
+                values = eval(code, {"__builtins__": {}}, {**_FUNCTIONS, **_CONSTANTS, "x": x})
+        except ArithmeticError:
+            raise CanvasCommandError(f"La función no se puede evaluar: {expression}")
+        return np.broadcast_to(np.asarray(values, dtype=float), x.shape)
+
+    return evaluate
+
+
+def render_function(
+    expression: str,
+    x_range=DEFAULT_X_RANGE,
+    y_range=None,
+    samples: Optional[int] = None
+) -> dict:
+    """
+    Precalcula los puntos de una función en x_range
+
+    Los valores no finitos y los que se salen de y_range por más de su
+    amplitud (asíntotas) quedan como None: el cliente corta la línea ahí.
+
+    Args:
+        expression: Función de x (ver compile_function)
+        x_range: (min, max) del eje x
+        y_range: (min, max) del eje y (opcional)
+        samples: Número de puntos (default: Config.CANVAS_PLOT_SAMPLES)
+
+    Returns:
+        dict: {"x": [...], "y": [...]} con 4 decimales
+
+    Raises:
+        CanvasCommandError: Si la función es inválida o no tiene valores finitos
+    """
+    function = compile_function(expression)
+    x = np.linspace(x_range[0], x_range[1], samples or Config.CANVAS_PLOT_SAMPLES)
+    y = function(x)
+
+    valid = np.isfinite(y)
+    if y_range is not None:
+        span = y_range[1] - y_range[0]
+        valid &= (y >= y_range[0] - span) & (y <= y_range[1] + span)
+    if not valid.any():
+        raise CanvasCommandError(f"La función no tiene valores en el rango: {expression}")
+
+    return {
+        "x": np.round(x, 4).tolist(),
+        "y": np.where(valid, np.round(y, 4), None).tolist()
+    }
+
+
+def _number(value: Any, name: str) -> float:
+    if isinstance(value, bool):
+        raise CanvasCommandError(f"'{name}' debe ser numérico")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise CanvasCommandError(f"'{name}' debe ser numérico")
+    if not math.isfinite(number):
+        raise CanvasCommandError(f"'{name}' debe ser finito")
+    return number
+
+
+def _range(value: Any, name: str) -> List[float]:
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise CanvasCommandError(f"'{name}' debe ser [min, max]")
+    low, high = sorted(_number(item, name) for item in value)
+    if low == high:
+        raise CanvasCommandError(f"'{name}' no puede tener amplitud cero")
+    return [low, high]
+
+
+def normalize_command(command: Any, schema: Dict[str, Dict[str, Any]]) -> dict:
+    """
+    Valida un comando contra su esquema y lo normaliza
+
+    Args:
+        command: Comando como lo emitió el modelo ({"command", "parameters"},
+            formato plano {"type", ...} o referencia corta {"library": slug})
+        schema: CANVAS_SCHEMA o COMPONENT_SCHEMA
+
+    Returns:
+        dict: {"command": nombre, "parameters": {...}} con coordenadas float
+
+    Raises:
+        CanvasCommandError: Si el comando no cumple el esquema
+    """
+    if not isinstance(command, dict):
+        raise CanvasCommandError("El comando no es un objeto")
+
+    if "command" in command:
+        name = command["command"]
+        parameters = command.get("parameters") or {}
+    elif LIBRARY_COMMAND in command:
+        name = LIBRARY_COMMAND
+        parameters = {"id": command[LIBRARY_COMMAND]}
+    else:
+        name = command.get("type")
+        parameters = {key: value for key, value in command.items() if key != "type"}
+
+    if name not in schema:
+        raise CanvasCommandError(f"Comando desconocido: {name}")
+    if not isinstance(parameters, dict):
+        raise CanvasCommandError(f"{name}: 'parameters' debe ser un objeto")
+
+    parameters = dict(parameters)
+    for key, expected in schema[name].items():
+        if key not in parameters:
+            raise CanvasCommandError(f"{name}: falta el parámetro '{key}'")
+        if expected is NUMBER:
+            continue
+        if not isinstance(parameters[key], expected):
+            raise CanvasCommandError(f"{name}: '{key}' debe ser {expected.__name__}")
+
+    for key in COORDINATE_KEYS:
+        if key in parameters:
+            parameters[key] = _number(parameters[key], f"{name}.{key}")
+    for key in RANGE_KEYS:
+        if parameters.get(key) is not None:
+            parameters[key] = _range(parameters[key], f"{name}.{key}")
+
+    return {"command": name, "parameters": parameters}
+
+
+def prepare_command(command: Any, schema: Dict[str, Dict[str, Any]], samples: Optional[int] = None) -> dict:
+    """
+    Normaliza un comando y, si es graficable, precalcula sus puntos
+
+    Idempotente: un comando ya preparado con el mismo número de puntos no
+    se vuelve a calcular.
+
+    Raises:
+        CanvasCommandError: Si el comando no cumple el esquema
+    """
+    prepared = normalize_command(command, schema)
+    if prepared["command"] not in PLOTTABLE_COMMANDS:
+        return prepared
+
+    parameters = prepared["parameters"]
+    samples = samples or Config.CANVAS_PLOT_SAMPLES
+    points = parameters.get("points")
+    if isinstance(points, dict) and len(points.get("x") or ()) == samples:
+        return prepared
+
+    parameters.setdefault("x_range", list(DEFAULT_X_RANGE))
+    parameters["points"] = render_function(
+        parameters["function"], parameters["x_range"], parameters.get("y_range"), samples
+    )
+    if parameters.get("y_range") is None:
+        finite = [value for value in parameters["points"]["y"] if value is not None]
+        low, high = min(finite), max(finite)
+        parameters["y_range"] = [low, high] if low < high else [low - 1.0, high + 1.0]
+    return prepared
+
+
+def prepare_commands(
+    commands: Optional[Iterable],
+    schema: Dict[str, Dict[str, Any]],
+    label: str = "canvas",
+    samples: Optional[int] = None
+) -> tuple:
+    """
+    Prepara la lista de comandos de un paso descartando los inválidos
+
+    Returns:
+        tuple: (comandos preparados o None si no queda ninguno, descartados)
+    """
+    if not commands:
+        return None, 0
+    if not isinstance(commands, list):
+        print(f"⚠ {label}: se esperaba un array de comandos, descartado")
+        return None, 1
+
+    prepared, dropped = [], 0
+    for command in commands:
+        try:
+            prepared.append(prepare_command(command, schema, samples))
+        except CanvasCommandError as e:
+            dropped += 1
+            print(f"⚠ Comando de {label} descartado: {e}")
+    return prepared or None, dropped
+
+
+def prepare_steps(steps: Optional[Iterable], samples: Optional[int] = None) -> int:
+    """
+    Prepara en sitio los comandos de todos los pasos de una respuesta
+
+    Se llama una vez al generar la respuesta (AIService): los pasos se
+    guardan ya validados y con los puntos de las gráficas.
+
+    Args:
+        steps: Pasos (dicts) con canvas_commands / component_commands
+        samples: Puntos por función (default: Config.CANVAS_PLOT_SAMPLES)
+
+    Returns:
+        int: Comandos descartados
+    """
+    dropped = 0
+    for step in steps or ():
+        if not isinstance(step, dict):
+            continue
+        for key, schema, label in (("canvas_commands", CANVAS_SCHEMA, "canvas"),
+                                   ("component_commands", COMPONENT_SCHEMA, "componente")):
+            if key in step:
+                step[key], step_dropped = prepare_commands(step[key], schema, label, samples)
+                dropped += step_dropped
+    return dropped
@@ -0,0 +1,291 @@
+"""
+Serialización de valores guardados en Redis
+
+- JsonCodec: json de la librería estándar (siempre disponible)
+- OrjsonCodec: mismo formato JSON, 3-10x más rápido (orjson opcional)
+- MsgpackCodec: binario compacto (msgpack opcional, requiere un cliente
+  Redis sin decode_responses)
+- CompressedCodec: comprime la salida de otro codec (zstd o zlib) cuando
+  supera ANSWER_COMPRESSION_MIN_BYTES; pensado para respuestas con pasos
+
+Sobre versionado: JSON se guarda sin encabezado, igual que antes de existir
+esta capa, así que los valores anteriores se siguen leyendo. Los formatos
+binarios y la compresión llevan un byte de formato/versión al inicio (un
+JSON nunca empieza con un byte de control). decode() reconoce el formato de cada valor, de modo
+que cambiar REDIS_CODEC no invalida lo ya guardado.
+"""
+import json
+import threading
+import zlib
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+from app.config import Config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+
+MSGPACK_V1 = b"\x01"
+ZLIB_V1 = b"\x02"
+ZSTD_V1 = b"\x03"
+
+
+class CodecError(Exception):
+    """Excepción cuando un valor no se puede decodificar"""
+    pass
+
+
+def _default(value: Any) -> Any:
+    """Serializa modelos con to_dict() (pasos de respuesta); el resto como texto"""
+    to_dict = getattr(value, "to_dict", None)
+    if callable(to_dict):
+        return to_dict()
+    return str(value)
+
+
+class JsonCodec:
+    """JSON con la librería estándar"""
+
+    name = "json"
+    binary = False
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def decode_payload(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """JSON con orjson (mismo formato que JsonCodec)"""
+
+    name = "orjson"
+
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+    def decode_payload(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack con encabezado de formato/versión"""
+
+    name = "msgpack"
+    binary = True
+
+    def encode(self, value: Any) -> bytes:
+        return MSGPACK_V1 + msgpack.packb(value, default=_default, use_bin_type=True)
+
+    def decode_payload(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def compression_algorithm(name: Optional[str] = None) -> Optional[str]:
+    """
+    Algoritmo de compresión disponible
+
+    Args:
+        name: "zstd", "zlib" o "none" (default: Config.ANSWER_COMPRESSION)
+
+    Returns:
+        str | None: "zstd" o "zlib" (zstd sin zstandard instalado usa zlib),
+        None si la compresión está desactivada
+    """
+    name = (name or Config.ANSWER_COMPRESSION).lower()
+    if name == "none":
+        return None
+    if name == "zstd" and zstandard is not None:
+        return "zstd"
+    return "zlib"
+
+
+def compress(data: bytes, algorithm: Optional[str] = None, min_size: Optional[int] = None) -> bytes:
+    """
+    Comprime data con encabezado de formato si supera el umbral
+
+    Los valores pequeños se devuelven tal cual: comprimirlos no ahorra
+    bytes y cuesta CPU en cada lectura.
+
+    Args:
+        data: Valor ya codificado
+        algorithm: "zstd", "zlib" o "none" (default: Config.ANSWER_COMPRESSION)
+        min_size: Bytes mínimos para comprimir (default: Config.ANSWER_COMPRESSION_MIN_BYTES)
+
+    Returns:
+        bytes: Valor comprimido con encabezado, o data sin cambios
+    """
+    algorithm = compression_algorithm(algorithm)
+    if min_size is None:
+        min_size = Config.ANSWER_COMPRESSION_MIN_BYTES
+    if algorithm is None or len(data) < min_size:
+        return data
+    if algorithm == "zstd":
+        return ZSTD_V1 + zstandard.ZstdCompressor(level=3).compress(data)
+    return ZLIB_V1 + zlib.compress(data, 6)
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Quita la compresión de un valor (sin encabezado de compresión: sin cambios)
+
+    Args:
+        data: Valor leído de Redis
+
+    Returns:
+        bytes: Valor sin comprimir
+
+    Raises:
+        CodecError: Si el valor usa zstd y zstandard no está instalado
+    """
+    header = data[:1]
+    if header == ZLIB_V1:
+        return zlib.decompress(data[1:])
+    if header == ZSTD_V1:
+        if zstandard is None:
+            raise CodecError("Valor zstd pero zstandard no está instalado")
+        return zstandard.ZstdDecompressor().decompress(data[1:])
+    return data
+
+
+class CompressedCodec:
+    """Comprime la salida de otro codec a partir de un tamaño mínimo"""
+
+    binary = True
+
+    def __init__(self, inner, algorithm: str, min_size: int):
+        self.inner = inner
+        self.algorithm = algorithm
+        self.min_size = min_size
+        self.name = f"{inner.name}+{algorithm}"
+
+    def encode(self, value: Any) -> bytes:
+        return compress(self.inner.encode(value), self.algorithm, self.min_size)
+
+
+_JSON = OrjsonCodec() if orjson is not None else JsonCodec()
+_MSGPACK = MsgpackCodec()
+
+
+def _json_codec() -> JsonCodec:
+    return _JSON
+
+
+def get_codec(name: Optional[str] = None, binary: bool = True, compressed: bool = False):
+    """
+    Obtiene el codec configurado
+
+    Si la librería del codec no está instalada, o si se pide un codec de
+    texto (binary=False, para clientes con decode_responses=True) y el
+    configurado es binario, se usa JSON (orjson si está disponible).
+
+    Args:
+        name: "json", "orjson" o "msgpack" (default: Config.REDIS_CODEC)
+        binary: Si el cliente Redis admite valores binarios
+        compressed: Comprimir valores grandes según ANSWER_COMPRESSION
+            (solo con binary=True)
+
+    Returns:
+        Codec: Instancia con encode()
+    """
+    selected = _resolve_codec(name or Config.REDIS_CODEC, binary)
+    algorithm = compression_algorithm() if compressed and binary else None
+    if algorithm is None:
+        return selected
+    return _compressed_codec(selected, algorithm, Config.ANSWER_COMPRESSION_MIN_BYTES)
+
+
+@lru_cache(maxsize=8)
+def _compressed_codec(inner, algorithm: str, min_size: int) -> CompressedCodec:
+    return CompressedCodec(inner, algorithm, min_size)
+
+
+@lru_cache(maxsize=8)
+def _resolve_codec(name: str, binary: bool):
+    if name == "msgpack":
+        if msgpack is not None and binary:
+            return _MSGPACK
+        if msgpack is None:
+            print("⚠ REDIS_CODEC=msgpack pero msgpack no está instalado, usando JSON")
+        return _json_codec()
+    if name == "json":
+        return JsonCodec()
+    return _json_codec()
+
+
+def decode(data: Union[bytes, str, None]) -> Any:
+    """
+    Decodifica un valor leído de Redis en cualquier formato conocido
+
+    Args:
+        data: Valor crudo (bytes o str según el cliente)
+
+    Returns:
+        Any: Valor decodificado (None si data es None)
+
+    Raises:
+        CodecError: Si el valor no es válido o su formato no está disponible
+    """
+    if data is None:
+        return None
+    try:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = decompress(bytes(data))
+            if data[:1] == MSGPACK_V1:
+                if msgpack is None:
+                    raise CodecError("Valor msgpack pero msgpack no está instalado")
+                return _MSGPACK.decode_payload(data[1:])
+        return _JSON.decode_payload(data)
+    except CodecError:
+        raise
+    except Exception as e:
+        raise CodecError(f"Valor inválido en Redis: {e}") from e
+
+
+# Clientes sin decode_responses por pool base: {id(pool): (pool, cliente)}
+_binary_clients = {}
+_binary_clients_lock = threading.Lock()
+
+
+def binary_client(client):
+    """
+    Cliente Redis que comparte servidor con client pero no decodifica respuestas
+
+    Los codecs binarios (msgpack, zlib) no pueden leerse con
+    decode_responses=True. Se crea un solo pool gemelo por pool base y se
+    reutiliza: los repositorios se instancian por evento y no deben abrir
+    conexiones nuevas.
+
+    Args:
+        client: Cliente Redis (redis.Redis o fakeredis)
+
+    Returns:
+        Cliente sin decode_responses (el mismo si ya lo es)
+    """
+    pool = client.connection_pool
+    if not pool.connection_kwargs.get("decode_responses"):
+        return client
+    entry = _binary_clients.get(id(pool))
+    if entry is None or entry[0] is not pool:
+        with _binary_clients_lock:
+            entry = _binary_clients.get(id(pool))
+            if entry is None or entry[0] is not pool:
+                kwargs = {**pool.connection_kwargs, "decode_responses": False}
+                twin_pool = pool.__class__(connection_class=pool.connection_class, **kwargs)
+                twin = client.__class__(connection_pool=twin_pool)
+                # Se guarda el pool base para que su id no se reutilice mientras exista la entrada
+                entry = _binary_clients[id(pool)] = (pool, twin)
+    return entry[1]
@@ -0,0 +1,187 @@
+"""
+Parser tolerante para salidas JSON de modelos de lenguaje
+Recupera defectos comunes sin volver a llamar a la API
+"""
+import json
+import threading
+from typing import Tuple
+
+
+def extract_json_text(text: str) -> str:
+    """
+    Recorta una salida del modelo al objeto JSON que contiene
+
+    Quita bloques markdown, texto antes del primer '{' y todo lo que
+    siga al cierre del objeto raíz. Si el objeto quedó abierto (respuesta
+    cortada), cierra strings, arrays y objetos pendientes.
+
+    Args:
+        text: Salida cruda del modelo
+
+    Returns:
+        str: Texto JSON candidato (puede seguir siendo inválido)
+    """
+    text = (text or "").replace('```json', '').replace('```', '')
+
+    start = text.find('{')
+    if start == -1:
+        return text.strip()
+    text = text[start:]
+
+    stack = []
+    in_string = False
+    escaped = False
+    end = None
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                end = index + 1
+                break
+
+    if end is not None:
+        return _strip_trailing_commas(text[:end])
+
+    # Objeto sin cerrar: cerrar string pendiente y estructuras abiertas
+    candidate = text
+    if in_string:
+        if escaped:
+            candidate = candidate[:-1]
+        candidate += '"'
+    candidate = candidate.rstrip()
+    if candidate.endswith(','):
+        candidate = candidate[:-1]
+    if candidate.endswith(':'):
+        candidate += ' null'
+    candidate += ''.join(reversed(stack))
+
+    return _strip_trailing_commas(candidate)
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Elimina comas colgantes antes de '}' o ']' fuera de strings"""
+    result = []
+    in_string = False
+    escaped = False
+
+    for char in text:
+        if in_string:
+            result.append(char)
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '}]':
+            # Retroceder sobre espacios para encontrar una coma colgante
+            position = len(result) - 1
+            while position >= 0 and result[position].isspace():
+                position -= 1
+            if position >= 0 and result[position] == ',':
+                del result[position]
+        result.append(char)
+
+    return ''.join(result)
+
+
+def loads_tolerant(text: str) -> Tuple[dict, bool]:
+    """
+    Parsea JSON intentando primero el texto tal cual y luego reparado
+
+    Args:
+        text: Salida cruda del modelo
+
+    Returns:
+        tuple: (objeto parseado, True si hubo que repararlo)
+
+    Raises:
+        json.JSONDecodeError: Si ni la versión reparada es JSON válido
+    """
+    try:
+        return json.loads(text), False
+    except (json.JSONDecodeError, TypeError):
+        return json.loads(extract_json_text(text)), True
+
+
+class RepairStats:
+    """
+    Métricas de parseo, reparación local y llamadas de corrección
+
+    - clean: respuestas válidas al primer intento
+    - repaired: respuestas recuperadas localmente (por tipo de defecto)
+    - fix_calls: llamadas "corrige este JSON" realizadas
+    - failures: respuestas que no se pudieron recuperar
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.responses = 0
+            self.clean = 0
+            self.repaired = 0
+            self.repairs_by_kind = {}
+            self.fix_calls = 0
+            self.fix_call_successes = 0
+            self.fix_call_ms = 0.0
+            self.failures = 0
+
+    def record_response(self, repairs: list, fixed_by_call: bool = False) -> None:
+        """Registra una respuesta aceptada y las reparaciones locales aplicadas"""
+        with self._lock:
+            self.responses += 1
+            if fixed_by_call:
+                self.fix_call_successes += 1
+            if not repairs and not fixed_by_call:
+                self.clean += 1
+                return
+            if repairs:
+                self.repaired += 1
+            for kind in repairs:
+                self.repairs_by_kind[kind] = self.repairs_by_kind.get(kind, 0) + 1
+
+    def record_fix_call(self, elapsed_ms: float) -> None:
+        """Registra una llamada de corrección y su latencia"""
+        with self._lock:
+            self.fix_calls += 1
+            self.fix_call_ms += elapsed_ms
+
+    def record_failure(self) -> None:
+        """Registra una respuesta irrecuperable"""
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "clean": self.clean,
+                "repaired": self.repaired,
+                "repairs_by_kind": dict(self.repairs_by_kind),
+                "fix_calls": self.fix_calls,
+                "fix_call_successes": self.fix_call_successes,
+                "avg_fix_call_ms": round(self.fix_call_ms / self.fix_calls, 1) if self.fix_calls else 0.0,
+                "failures": self.failures
+            }
@@ -0,0 +1,166 @@
+"""
+Parser incremental de JSON para respuestas en streaming del modelo
+Emite fragmentos útiles (texto de un campo, elementos de un array)
+antes de que el objeto completo haya llegado
+"""
+import json
+from typing import Iterable, List, Tuple
+
+
+class StreamingJSONParser:
+    """
+    Recorre el JSON carácter a carácter conforme llegan los deltas
+
+    Solo observa los campos del objeto raíz:
+    - stream_strings: campos string cuyo texto se emite como deltas
+    - stream_arrays: campos array cuyos objetos se emiten al cerrarse
+
+    Eventos devueltos por feed():
+    - ("string_delta", campo, texto)
+    - ("array_item", campo, objeto)
+
+    El texto completo queda en `text` para el parseo final.
+    """
+
+    def __init__(self, stream_strings: Iterable[str] = (), stream_arrays: Iterable[str] = ()):
+        self.stream_strings = set(stream_strings)
+        self.stream_arrays = set(stream_arrays)
+
+        self._chunks: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_chars: List[str] = []
+
+        self._expect_key = False
+        self._awaiting_value = False
+        self._key = None
+
+        self._streaming_key = None
+        self._pending_escape = ""
+
+        self._array_key = None
+        self._item_chars: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """Texto completo recibido hasta ahora"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Tuple]:
+        """
+        Procesa un delta de texto
+
+        Args:
+            chunk: Fragmento recibido del modelo
+
+        Returns:
+            list: Eventos completados con este fragmento
+        """
+        if not chunk:
+            return []
+
+        self._chunks.append(chunk)
+        events = []
+        delta: List[str] = []
+
+        for char in chunk:
+            if self._item_chars:
+                self._item_chars.append(char)
+
+            if self._in_string:
+                if self._streaming_key is not None:
+                    self._consume_streamed_char(char, delta, events)
+                    continue
+
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect_key:
+                        self._key = self._decode('"' + "".join(self._key_chars) + '"')
+                        self._expect_key = False
+                    self._key_chars = []
+                    continue
+
+                if self._depth == 1 and self._expect_key:
+                    self._key_chars.append(char)
+                continue
+
+            if char.isspace():
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._key_chars = []
+                if self._depth == 1 and self._awaiting_value and self._key in self.stream_strings:
+                    self._streaming_key = self._key
+                self._awaiting_value = False
+
+            elif char in '{[':
+                if self._depth == 1 and self._awaiting_value and char == '[' \
+                        and self._key in self.stream_arrays:
+                    self._array_key = self._key
+                if self._depth == 2 and self._array_key is not None and char == '{':
+                    self._item_chars = [char]
+                self._awaiting_value = False
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+
+            elif char in '}]':
+                self._depth = max(0, self._depth - 1)
+                if self._depth == 2 and self._array_key is not None and self._item_chars:
+                    item = self._decode("".join(self._item_chars))
+                    self._item_chars = []
+                    if item is not None:
+                        events.append(("array_item", self._array_key, item))
+                if self._depth == 1 and char == ']':
+                    self._array_key = None
+
+            elif self._depth == 1:
+                if char == ':':
+                    self._awaiting_value = True
+                elif char == ',':
+                    self._expect_key = True
+                else:
+                    self._awaiting_value = False
+
+        if delta and self._streaming_key is not None:
+            events.append(("string_delta", self._streaming_key, "".join(delta)))
+
+        return events
+
+    def _consume_streamed_char(self, char: str, delta: List[str], events: List[Tuple]) -> None:
+        """Decodifica un carácter de un string que se emite en streaming"""
+        if self._pending_escape:
+            self._pending_escape += char
+            is_unicode = self._pending_escape.startswith('\\u')
+            if (is_unicode and len(self._pending_escape) == 6) or not is_unicode:
+                decoded = self._decode(f'"{self._pending_escape}"')
+                delta.append(decoded if isinstance(decoded, str) else "")
+                self._pending_escape = ""
+            return
+
+        if char == '\\':
+            self._pending_escape = char
+            return
+
+        if char == '"':
+            if delta:
+                events.append(("string_delta", self._streaming_key, "".join(delta)))
+                delta.clear()
+            self._in_string = False
+            self._streaming_key = None
+            return
+
+        delta.append(char)
+
+    @staticmethod
+    def _decode(text: str):
+        try:
+            return json.loads(text)
+        except (json.JSONDecodeError, ValueError):
+            return None
@@ -0,0 +1,739 @@
+"""
+Métricas en formato Prometheus (contadores, gauges e histogramas)
+
+Registro en proceso y sin dependencias: observe() es un bisect sobre
+buckets fijos y una suma bajo un lock, lo bastante barato para dejarlo
+encendido en producción.
+
+Instrumentación:
+- Socket.IO: cada handler registrado con @socketio.on (instrument_handler)
+- AIService: latencia total, time-to-first-token y tokens (instrument, record_tokens)
+- Repositorios: cada método público (instrument_repository)
+- Redis: cada comando y cada pipeline (InstrumentedRedis)
+- Caches y streams activos: collectors evaluados al publicar
+
+Cada worker (proceso gevent) publica su snapshot cada
+METRICS_PUBLISH_INTERVAL segundos en un hash de Redis por host
+(metrics:workers:<host>) y /metrics suma los snapshots de todos los
+workers del host: el scrape da el total del host sin importar qué worker
+lo atienda. Los contadores e histogramas de los workers que dejan de
+publicar se acumulan en el campo "retired" para que los totales no
+retrocedan; sus gauges se descartan.
+"""
+import atexit
+import bisect
+import functools
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import redis
+from redis.client import Pipeline
+from redis.exceptions import WatchError
+
+from app.config import Config
+from app.extensions import get_redis
+
+
+# Segundos: de un comando Redis (~1ms) a una respuesta completa de la IA (~1min)
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+# Segundos: comandos Redis y consultas rápidas
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+METRIC_PREFIX = "guiaipn_"
+
+
+class _Value:
+    """Valor de un contador o gauge para una combinación de labels"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self, lock: threading.Lock):
+        self.value = 0.0
+        self._lock = lock
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        """Fija el valor (gauges, o contadores leídos de otro contador monótono)"""
+        self.value = float(value)
+
+
+class _HistogramValue:
+    """Buckets (no acumulados), suma y conteo de un histograma"""
+
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, lock: threading.Lock, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # El último es +Inf
+        self.sum = 0.0
+        self._lock = lock
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Metric:
+    """Familia de métricas con labels fijos"""
+
+    TYPE = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str,
+                 labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Valor para una combinación de labels (en el orden de labelnames)
+
+        Returns:
+            _Value | _HistogramValue
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+            self.registry._ensure_thread()
+        return child
+
+    def _new_child(self):
+        return _Value(self._lock)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._children = {}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = [[list(labels), child.value] for labels, child in self._children.items()]
+        return {
+            "type": self.TYPE,
+            "help": self.help,
+            "labelnames": list(self.labelnames),
+            "samples": samples
+        }
+
+    # Atajos para métricas sin labels
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+
+class Gauge(Metric):
+    TYPE = "gauge"
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self._lock, self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = [
+                [list(labels), list(child.counts), child.sum]
+                for labels, child in self._children.items()
+            ]
+        return {
+            "type": self.TYPE, "help": self.help, "labelnames": list(self.labelnames),
+            "buckets": list(self.buckets), "samples": samples
+        }
+
+
+def merge_snapshots(snapshots: Iterable[dict], include_gauges: bool = True) -> dict:
+    """
+    Suma snapshots de varios workers
+
+    Contadores, histogramas (bucket a bucket) y gauges se suman; los
+    gauges del proyecto son aditivos (streams activos, grabaciones).
+
+    Args:
+        snapshots: Snapshots {nombre: familia}
+        include_gauges: False para acumular solo contadores e histogramas
+
+    Returns:
+        dict: Snapshot combinado
+    """
+    merged: Dict[str, dict] = {}
+    values: Dict[str, dict] = {}
+
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            if family["type"] == "gauge" and not include_gauges:
+                continue
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {
+                    key: value for key, value in family.items() if key != "samples"
+                }
+                values[name] = {}
+            elif target.get("buckets") != family.get("buckets"):
+                continue  # Buckets de otra versión del código: no son sumables
+
+            family_values = values[name]
+            for sample in family["samples"]:
+                key = tuple(sample[0])
+                current = family_values.get(key)
+                if family["type"] == "histogram":
+                    if current is None:
+                        family_values[key] = [list(sample[1]), sample[2]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], sample[1])]
+                        current[1] += sample[2]
+                else:
+                    family_values[key] = (current or 0.0) + sample[1]
+
+    for name, target in merged.items():
+        if target["type"] == "histogram":
+            target["samples"] = [
+                [list(key), counts, total] for key, (counts, total) in values[name].items()
+            ]
+        else:
+            target["samples"] = [[list(key), value] for key, value in values[name].items()]
+    return merged
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '%s="%s"' % (
+            name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+def render(snapshot: dict) -> str:
+    """
+    Formato de exposición de texto de Prometheus (version 0.0.4)
+
+    Args:
+        snapshot: Snapshot (de un worker o combinado)
+
+    Returns:
+        str: Texto para /metrics
+    """
+    lines: List[str] = []
+    for name, family in snapshot.items():
+        labelnames = family["labelnames"]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+
+        if family["type"] != "histogram":
+            for labels, value in family["samples"]:
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+            continue
+
+        bounds = [_format_value(bound) for bound in family["buckets"]] + ["+Inf"]
+        for labels, counts, total in family["samples"]:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                bucket_labels = _format_labels(labelnames, labels, 'le="%s"' % bound)
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas del proceso y agregación entre workers
+
+    Un hilo en segundo plano (greenlet con gevent) publica el snapshot en
+    Redis; arranca con la primera observación y se reinicia en los
+    procesos hijos después de un fork (gunicorn con preload).
+    """
+
+    KEY_PREFIX = "metrics:workers"
+    RETIRED_FIELD = "retired"
+    KEY_TTL = 86400  # Hosts que desaparecen (deploys) dejan de ocupar Redis
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        redis_client=None,
+        publish_interval: Optional[float] = None,
+        worker_ttl: Optional[float] = None,
+        host: Optional[str] = None,
+        autostart: bool = True
+    ):
+        """
+        Inicializa el registro
+
+        Args:
+            enabled: Registrar observaciones (default: Config.METRICS_ENABLED)
+            redis_client: Cliente Redis (opcional, usa el global si no se provee)
+            publish_interval: Segundos entre publicaciones
+                (default: Config.METRICS_PUBLISH_INTERVAL)
+            worker_ttl: Segundos sin publicar para dar un worker por terminado
+            host: Agrupa los workers que suma /metrics (default: hostname)
+            autostart: Iniciar el hilo de publicación con la primera observación
+        """
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self._redis = redis_client
+        self.publish_interval = publish_interval or Config.METRICS_PUBLISH_INTERVAL
+        self.worker_ttl = worker_ttl or Config.METRICS_WORKER_TTL
+        self.host = host or socket.gethostname()
+        self.autostart = autostart
+        self.worker_id = f"{self.host}:{os.getpid()}"
+
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._ratios: List[tuple] = []
+        self._raw_clients = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def key(self) -> str:
+        return f"{self.KEY_PREFIX}:{self.host}"
+
+    # ---- Declaración ----
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, METRIC_PREFIX + name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, METRIC_PREFIX + name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, METRIC_PREFIX + name, help_text, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Registra una función que actualiza métricas justo antes de cada snapshot
+
+        Para valores que ya se cuentan en otro lado (CacheStats, VoiceService):
+        leerlos cada METRICS_PUBLISH_INTERVAL no agrega costo al camino caliente.
+        """
+        self._collectors.append(collector)
+
+    def register_ratio(self, name: str, help_text: str, hits: Counter, misses: Counter,
+                       label: str) -> None:
+        """
+        Gauge hits / (hits + misses) por label, calculado sobre los totales del host
+
+        Los ratios no se pueden sumar entre workers: se calculan al renderizar.
+        """
+        self._ratios.append((METRIC_PREFIX + name, help_text, hits.name, misses.name, label))
+
+    # ---- Snapshot y exposición ----
+
+    def collect(self) -> dict:
+        """
+        Snapshot de las métricas de este proceso
+
+        Returns:
+            dict: {nombre: {"type", "help", "labelnames", ["buckets"], "samples"}}
+        """
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"⚠ Error en collector de métricas: {e}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render_latest(self) -> str:
+        """
+        Texto de /metrics con los totales de todos los workers del host
+
+        Publica primero el snapshot propio (el del worker que atiende el
+        scrape siempre está al día). Sin Redis, solo este proceso.
+
+        Returns:
+            str: Formato de exposición de Prometheus
+        """
+        own = self.collect()
+        snapshots = [own]
+        client = self._client()
+        if client is not None:
+            try:
+                self._publish(client, own)
+                snapshots = self._read_workers(client)
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"⚠ Métricas de otros workers no disponibles: {e}")
+
+        merged = merge_snapshots(snapshots)
+        self._add_ratios(merged)
+        return render(merged)
+
+    def _add_ratios(self, snapshot: dict) -> None:
+        for name, help_text, hits_name, misses_name, label in self._ratios:
+            totals: Dict[str, List[float]] = {}
+            for family_name, position in ((hits_name, 0), (misses_name, 1)):
+                family = snapshot.get(family_name)
+                if family is None:
+                    continue
+                index = family["labelnames"].index(label)
+                for labels, value in family["samples"]:
+                    totals.setdefault(labels[index], [0.0, 0.0])[position] += value
+            snapshot[name] = {
+                "type": "gauge", "help": help_text, "labelnames": [label],
+                "samples": [
+                    [[key], round(hits / (hits + misses), 4) if hits + misses else 0.0]
+                    for key, (hits, misses) in totals.items()
+                ]
+            }
+
+    # ---- Publicación entre workers ----
+
+    def _client(self):
+        """Cliente Redis sin instrumentar (publicar no debe medirse a sí mismo)"""
+        client = self._redis if self._redis is not None else get_redis()
+        if not isinstance(client, InstrumentedRedis):
+            return client
+        raw = self._raw_clients.get(id(client))
+        if raw is None:
+            raw = redis.Redis(connection_pool=client.connection_pool)
+            self._raw_clients[id(client)] = raw
+        return raw
+
+    def publish(self) -> bool:
+        """
+        Publica el snapshot de este worker en Redis
+
+        Returns:
+            bool: True si se publicó
+        """
+        client = self._client()
+        if client is None:
+            return False
+        try:
+            self._publish(client, self.collect())
+            return True
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"⚠ Error publicando métricas: {e}")
+            return False
+
+    def _publish(self, client, snapshot: dict) -> None:
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(self.key, self.worker_id, json.dumps({"ts": time.time(), "metrics": snapshot}))
+        pipe.expire(self.key, self.KEY_TTL)
+        pipe.execute()
+
+    def _read_workers(self, client) -> List[dict]:
+        """Snapshots vivos del host más el acumulado de los workers terminados"""
+        now = time.time()
+        live, stale, retired = [], {}, {}
+        for field, raw in client.hgetall(self.key).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            data = json.loads(raw)
+            if field == self.RETIRED_FIELD:
+                retired = data
+            elif field != self.worker_id and now - data.get("ts", 0) > self.worker_ttl:
+                stale[field] = data["metrics"]
+            else:
+                live.append(data["metrics"])
+
+        if stale:
+            retired = merge_snapshots([retired, *stale.values()], include_gauges=False)
+            self._retire(client, stale, retired)
+        return live + [retired]
+
+    def _retire(self, client, stale: Dict[str, dict], retired: dict) -> None:
+        """
+        Mueve los workers terminados al campo retired (transacción con WATCH)
+
+        Si otro worker modifica el hash entretanto (publicó o también
+        retiró), se omite: el siguiente scrape lo vuelve a intentar y solo
+        uno de los scrapes concurrentes puede aplicarlo.
+        """
+        with client.pipeline() as pipe:
+            try:
+                pipe.watch(self.key)
+                present = pipe.hmget(self.key, list(stale))
+                if any(value is None for value in present):
+                    return
+                pipe.multi()
+                pipe.hdel(self.key, *stale)
+                pipe.hset(self.key, self.RETIRED_FIELD, json.dumps(retired))
+                pipe.execute()
+                print(f"ℹ Métricas de {len(stale)} worker(s) terminados acumuladas en {self.key}")
+            except WatchError:
+                pass
+
+    def _ensure_thread(self) -> None:
+        if not self.autostart or not self.enabled or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-publisher", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.publish)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.publish_interval)
+            if self._client() is not None:
+                self.publish()
+
+    def _after_fork(self) -> None:
+        """El hijo no hereda los valores del padre (se sumarían una vez por worker)"""
+        self.worker_id = f"{self.host}:{os.getpid()}"
+        self._thread = None
+        self._lock = threading.Lock()
+        for metric in list(self._metrics.values()):
+            metric._lock = threading.Lock()
+            metric._children = {}
+
+    def reset(self) -> None:
+        """Reinicia todos los valores (tests)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+# Registro compartido por proceso
+metrics = MetricsRegistry()
+
+
+SOCKET_EVENTS = metrics.counter(
+    "socketio_events_total", "Eventos de Socket.IO atendidos", ("event", "outcome")
+)
+SOCKET_EVENT_SECONDS = metrics.histogram(
+    "socketio_event_duration_seconds", "Duración de los handlers de Socket.IO", ("event",)
+)
+AI_CALLS = metrics.counter(
+    "ai_calls_total", "Llamadas a métodos de AIService", ("method", "outcome")
+)
+AI_CALL_SECONDS = metrics.histogram(
+    "ai_call_duration_seconds", "Latencia total de los métodos de AIService", ("method",)
+)
+AI_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "ai_time_to_first_token_seconds",
+    "Tiempo hasta el primer evento de los métodos en streaming",
+    ("method",)
+)
+AI_TOKENS = metrics.counter(
+    "ai_tokens_total", "Tokens de OpenAI por tipo de petición", ("request_type", "kind")
+)
+REPOSITORY_CALLS = metrics.counter(
+    "repository_calls_total", "Llamadas a repositorios", ("repository", "method", "outcome")
+)
+REPOSITORY_CALL_SECONDS = metrics.histogram(
+    "repository_call_duration_seconds",
+    "Latencia de las llamadas a repositorios",
+    ("repository", "method")
+)
+REDIS_COMMANDS = metrics.counter(
+    "redis_commands_total", "Comandos Redis ejecutados", ("command", "outcome")
+)
+REDIS_COMMAND_SECONDS = metrics.histogram(
+    "redis_command_duration_seconds", "Latencia de los comandos Redis (PIPELINE = un round-trip)",
+    ("command",), buckets=FAST_BUCKETS
+)
+
+
+def instrument(calls: Counter, duration: Histogram, *labels,
+               first_item: Optional[Histogram] = None):
+    """
+    Decorador que mide latencia y resultado (ok / error / cancelled)
+
+    Para generadores mide hasta el último elemento y, con first_item, el
+    tiempo hasta el primero (time-to-first-token).
+
+    Args:
+        calls: Contador con labels (*labels, outcome)
+        duration: Histograma con labels (*labels)
+        labels: Valores de los labels
+        first_item: Histograma del tiempo hasta el primer elemento (opcional)
+    """
+    def decorator(func):
+        def record(started: float, outcome: str) -> None:
+            duration.labels(*labels).observe(time.perf_counter() - started)
+            calls.labels(*labels, outcome).inc()
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not calls.registry.enabled:
+                    yield from func(*args, **kwargs)
+                    return
+                started = time.perf_counter()
+                outcome = "error"
+                first = first_item is not None
+                items = func(*args, **kwargs)
+                try:
+                    for item in items:
+                        if first:
+                            first_item.labels(*labels).observe(time.perf_counter() - started)
+                            first = False
+                        yield item
+                    outcome = "ok"
+                except GeneratorExit:
+                    outcome = "cancelled"
+                    raise
+                finally:
+                    items.close()
+                    record(started, outcome)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not calls.registry.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                record(started, outcome)
+        return wrapper
+    return decorator
+
+
+def instrument_handler(event: str, handler: Callable) -> Callable:
+    """Mide un handler de Socket.IO (lo usa socketio.on)"""
+    return instrument(SOCKET_EVENTS, SOCKET_EVENT_SECONDS, event)(handler)
+
+
+def instrument_ai(method: str, streaming: bool = False):
+    """Decorador para métodos de AIService (con streaming mide también el primer evento)"""
+    first_item = AI_FIRST_TOKEN_SECONDS if streaming else None
+    return instrument(AI_CALLS, AI_CALL_SECONDS, method, first_item=first_item)
+
+
+def record_tokens(request_type: str, usage) -> None:
+    """
+    Cuenta los tokens de una respuesta de OpenAI
+
+    Args:
+        request_type: Tipo de petición (answer, clarification_brief, ...)
+        usage: response.usage (puede ser None)
+    """
+    if usage is None or not metrics.enabled:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if isinstance(tokens, int) and tokens:
+            AI_TOKENS.labels(request_type, kind).inc(tokens)
+
+
+def instrument_repository(cls):
+    """
+    Decorador de clase: mide cada método público del repositorio
+
+    El label repository es el nombre de la clase sin el sufijo Repository.
+    """
+    repository = cls.__name__.replace("Repository", "") or cls.__name__
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(attribute):
+            continue
+        wrap = instrument(REPOSITORY_CALLS, REPOSITORY_CALL_SECONDS, repository, name)
+        setattr(cls, name, wrap(attribute))
+    return cls
+
+
+def _record_redis(command: str, started: float, outcome: str) -> None:
+    REDIS_COMMAND_SECONDS.labels(command).observe(time.perf_counter() - started)
+    REDIS_COMMANDS.labels(command, outcome).inc()
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline que mide cada execute() como un solo round-trip"""
+
+    def execute(self, raise_on_error=True):
+        if not metrics.enabled:
+            return super().execute(raise_on_error)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = super().execute(raise_on_error)
+            outcome = "ok"
+            return result
+        finally:
+            _record_redis("PIPELINE", started, outcome)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Cliente Redis que mide cada comando (label command = nombre del comando)"""
+
+    def execute_command(self, *args, **options):
+        if not metrics.enabled:
+            return super().execute_command(*args, **options)
+        command = args[0]
+        command = command.decode() if isinstance(command, bytes) else str(command)
+        command = command.split(" ", 1)[0].upper()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = super().execute_command(*args, **options)
+            outcome = "ok"
+            return result
+        finally:
+            _record_redis(command, started, outcome)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
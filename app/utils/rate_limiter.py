@@ -1,62 +1,283 @@
 """
 Control de rate limiting
+
+Ventana deslizante atómica en Redis (script Lua, un solo round-trip)
+con un token bucket local como pre-chequeo para no consultar Redis
+cuando el cliente ya excedió su cuota en este proceso.
 """
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import jsonify, request
+from flask_socketio import emit
+
+from app.auth.decorators import VerifiedUser
 from app.extensions import get_redis
 from app.config import Config
 
 
+# KEYS[1] = clave del sorted set; ARGV = limit, window_ms, member
+# Usa TIME de Redis para que todos los workers compartan el mismo reloj
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window_ms)
+local count = redis.call('ZCARD', key)
+
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('PEXPIRE', key, window_ms)
+    return {1, limit - count - 1, 0}
+end
+
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+local retry_ms = window_ms
+if oldest[2] then
+    retry_ms = tonumber(oldest[2]) + window_ms - now
+end
+return {0, 0, retry_ms}
+"""
+
+
+class TokenBucket:
+    """Token bucket en memoria (capacidad = límite, recarga = límite / ventana)"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: int, window: int):
+        self.capacity = float(capacity)
+        self.rate = capacity / float(window)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def consume(self) -> Tuple[bool, float]:
+        """
+        Intenta consumir un token
+
+        Returns:
+            tuple: (allowed, segundos hasta el siguiente token)
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+
+        return False, (1 - self.tokens) / self.rate
+
+
 class RateLimiter:
     """Gestiona límites de tasa de peticiones"""
-    
-    def __init__(self):
-        self.redis = get_redis()
+
+    LOCAL_MAX_BUCKETS = 10000
+
+    def __init__(self, redis_client=None, limits: Optional[Dict[str, Tuple[int, int]]] = None):
+        """
+        Inicializa el limitador
+
+        Args:
+            redis_client: Cliente Redis (opcional, usa get_redis() si no se provee)
+            limits: {action: (max_requests, window_seconds)} (opcional, usa Config)
+        """
+        self._redis = redis_client
+        self._script = None
+        self._script_client = None
         self.window = Config.RATE_LIMIT_WINDOW
         self.max_requests = Config.RATE_LIMIT_QUESTIONS
-    
+        self.limits = limits or {
+            "questions": (Config.RATE_LIMIT_QUESTIONS, Config.RATE_LIMIT_WINDOW),
+            "clarifications": (Config.RATE_LIMIT_CLARIFICATIONS, Config.RATE_LIMIT_WINDOW),
+            "follow_ups": (Config.RATE_LIMIT_FOLLOW_UPS, Config.RATE_LIMIT_WINDOW),
+            "connections": (Config.MAX_CONNECTIONS_PER_IP, Config.RATE_LIMIT_WINDOW),
+            "api": (Config.RATE_LIMIT_API, Config.RATE_LIMIT_WINDOW)
+        }
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        """Cliente Redis (resuelto en cada uso: get_redis() es None hasta init_extensions)"""
+        return self._redis if self._redis is not None else get_redis()
+
+    def get_limit(self, action: str) -> Tuple[int, int]:
+        """
+        Límite configurado para una acción
+
+        Returns:
+            tuple: (max_requests, window_seconds)
+        """
+        return self.limits.get(action, (self.max_requests, self.window))
+
     def check_limit(self, user_id: str, action: str = "questions") -> tuple:
         """
         Verifica si un usuario ha excedido el límite
-        
+
         Args:
-            user_id: ID del usuario
+            user_id: ID del usuario (o identificador del cliente, p. ej. IP)
             action: Tipo de acción
-            
+
         Returns:
             tuple: (allowed, remaining, retry_after)
         """
         key = f"rate_limit:{user_id}:{action}"
-        
+        max_requests, window = self.get_limit(action)
+
+        # Pre-chequeo local: si este proceso ya agotó la cuota, no ir a Redis
+        allowed, local_retry = self._consume_local(key, max_requests, window)
+        if not allowed:
+            return False, 0, max(1, math.ceil(local_retry))
+
+        redis_client = self.redis
+        if redis_client is None:
+            return True, max_requests, 0
+
         try:
-            current = self.redis.get(key)
-            
-            if current is None:
-                # Primera petición en la ventana
-                self.redis.setex(key, self.window, 1)
-                return True, self.max_requests - 1, 0
-            
-            current = int(current)
-            
-            if current >= self.max_requests:
-                # Límite excedido
-                ttl = self.redis.ttl(key)
-                return False, 0, ttl
-            
-            # Incrementar contador
-            self.redis.incr(key)
-            return True, self.max_requests - current - 1, 0
-            
+            allowed, remaining, retry_ms = self._get_script(redis_client)(
+                keys=[key],
+                args=[max_requests, window * 1000, uuid.uuid4().hex]
+            )
+
+            if not int(allowed):
+                return False, 0, max(1, math.ceil(int(retry_ms) / 1000))
+
+            return True, int(remaining), 0
+
         except Exception as e:
             print(f"Error en rate limiter: {e}")
-            # En caso de error, permitir la petición
-            return True, self.max_requests, 0
-    
+            # En caso de error, el token bucket local ya acotó la petición
+            return True, max_requests, 0
+
     def reset_limit(self, user_id: str, action: str = "questions"):
         """
         Resetea el límite de un usuario
-        
+
         Args:
             user_id: ID del usuario
             action: Tipo de acción
         """
         key = f"rate_limit:{user_id}:{action}"
-        self.redis.delete(key)
+        with self._lock:
+            self._buckets.pop(key, None)
+        if self.redis is not None:
+            self.redis.delete(key)
+
+    def _get_script(self, redis_client):
+        """Registra el script Lua (EVALSHA con fallback a EVAL) una vez por cliente"""
+        if self._script is None or self._script_client is not redis_client:
+            self._script = redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+            self._script_client = redis_client
+        return self._script
+
+    def _consume_local(self, key: str, max_requests: int, window: int) -> Tuple[bool, float]:
+        """Consume un token del bucket local de la clave"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(max_requests, window)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.LOCAL_MAX_BUCKETS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.consume()
+
+
+rate_limiter = RateLimiter()
+
+
+def get_client_ip() -> str:
+    """
+    IP del cliente
+
+    Es remote_addr: X-Forwarded-For solo se considera con
+    TRUSTED_PROXY_COUNT > 0, a través de ProxyFix (create_app), que toma
+    el salto agregado por el último proxy de confianza y no el primero,
+    que el cliente puede falsificar.
+    """
+    return request.remote_addr or "unknown"
+
+
+def _socket_identifier(data) -> str:
+    """Usuario verificado por require_auth_socket; si no, IP (el "user" del cliente se ignora)"""
+    if isinstance(data, dict):
+        user = data.get("user")
+        if isinstance(user, VerifiedUser) and user.get("id"):
+            return f"user:{user['id']}"
+    return f"ip:{get_client_ip()}"
+
+
+def rate_limit_socket(action: str, emit_error: bool = True):
+    """
+    Decorador de rate limiting para handlers de Socket.IO
+
+    Debe ir debajo de @require_auth_socket para limitar por usuario;
+    sin autenticación limita por IP. Al exceder el límite emite
+    `error` con code RATE_LIMIT_EXCEEDED y retorna False (en `connect`
+    eso rechaza la conexión).
+
+    Args:
+        action: Acción configurada en RateLimiter.limits
+        emit_error: False para no emitir (p. ej. en `connect`)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            data = args[0] if args else None
+            allowed, _, retry_after = rate_limiter.check_limit(_socket_identifier(data), action)
+
+            if not allowed:
+                print(f"✗ Rate limit excedido ({action})")
+                if emit_error:
+                    emit("error", {
+                        "code": "RATE_LIMIT_EXCEEDED",
+                        "message": "Demasiadas peticiones, intenta de nuevo más tarde",
+                        "retry_after": retry_after
+                    })
+                return False
+
+            return f(*args, **kwargs)
+
+        return decorated_function
+    return decorator
+
+
+def rate_limit_http(action: str = "api"):
+    """
+    Decorador de rate limiting para rutas HTTP (limita por IP)
+
+    Responde 429 con header Retry-After al exceder el límite.
+
+    Args:
+        action: Acción configurada en RateLimiter.limits
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            allowed, remaining, retry_after = rate_limiter.check_limit(
+                f"ip:{get_client_ip()}", action
+            )
+
+            if not allowed:
+                response = jsonify({
+                    "error": "Demasiadas peticiones, intenta de nuevo más tarde",
+                    "retry_after": retry_after
+                })
+                response.status_code = 429
+                response.headers["Retry-After"] = str(retry_after)
+                return response
+
+            return f(*args, **kwargs)
+
+        return decorated_function
+    return decorator
@@ -0,0 +1,173 @@
+"""
+Índice invertido en memoria para búsqueda y autocompletado de preguntas
+
+Los textos se tokenizan con normalize_text (minúsculas, sin acentos ni
+puntuación), así que "energia" y "Energía" son el mismo término. Cada
+término de la consulta puede completarse por prefijo contra el
+vocabulario ordenado (bisect) y los documentos deben contener todos los
+términos. El ranking es BM25.
+"""
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.utils.text_processing import normalize_text
+
+
+STOP_WORDS = frozenset({
+    "a", "al", "con", "cual", "de", "del", "el", "en", "es", "la", "las", "lo",
+    "los", "para", "por", "que", "se", "su", "un", "una", "y", "o", "e"
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokeniza un texto para búsqueda
+
+    Args:
+        text: Texto original
+
+    Returns:
+        list: Términos normalizados sin stop words (si todos son stop
+              words, se conservan para no devolver una consulta vacía)
+    """
+    tokens = normalize_text(text or "").split()
+    filtered = [token for token in tokens if token not in STOP_WORDS]
+    return filtered or tokens
+
+
+def build_tsquery(query: str) -> Optional[str]:
+    """
+    Construye una expresión to_tsquery a partir de texto libre
+
+    Los términos se unen con & y el último lleva :* (prefijo, para
+    búsquedas mientras el usuario escribe). normalize_text deja solo
+    caracteres de palabra, así que la expresión no admite operadores
+    inyectados.
+
+    Args:
+        query: Texto de búsqueda
+
+    Returns:
+        str | None: Expresión tsquery o None si no hay términos
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return " & ".join(tokens[:-1] + [f"{tokens[-1]}:*"])
+
+
+class InvertedIndex:
+    """Índice invertido con ranking BM25 y expansión por prefijo"""
+
+    K1 = 1.2
+    B = 0.75
+    PREFIX_WEIGHT = 0.7    # Un término completado por prefijo puntúa menos que uno exacto
+    MAX_EXPANSIONS = 50    # Términos del vocabulario por prefijo
+
+    def __init__(self, documents: Iterable[dict], text_field: str = "question", id_field: str = "id"):
+        """
+        Construye el índice
+
+        Args:
+            documents: Documentos (dict) a indexar; se devuelven tal cual en los resultados
+            text_field: Campo con el texto a indexar
+            id_field: Campo identificador
+        """
+        self.documents: List[dict] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        lengths = []
+
+        for document in documents:
+            tokens = tokenize(document.get(text_field) or "")
+            if not tokens or document.get(id_field) is None:
+                continue
+
+            position = len(self.documents)
+            self.documents.append(document)
+            lengths.append(len(tokens))
+            for token in tokens:
+                postings = self.postings.setdefault(token, {})
+                postings[position] = postings.get(position, 0) + 1
+
+        self.lengths = lengths
+        self.average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.vocabulary = sorted(self.postings)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, limit: int = 10, prefix: bool = True,
+               predicate: Optional[Callable[[dict], bool]] = None) -> List[Tuple[dict, float]]:
+        """
+        Busca documentos que contengan todos los términos de la consulta
+
+        Args:
+            query: Texto de búsqueda
+            limit: Máximo de resultados
+            prefix: Completar términos por prefijo
+            predicate: Filtro adicional sobre el documento (opcional)
+
+        Returns:
+            list: [(documento, score)] ordenados por score descendente
+        """
+        tokens = tokenize(query)
+        if not tokens or not self.documents:
+            return []
+
+        scores: Optional[Dict[int, float]] = None
+
+        for token in tokens:
+            token_scores: Dict[int, float] = {}
+            for term, weight in self._expand(token, prefix):
+                idf = self._idf(term)
+                for position, frequency in self.postings[term].items():
+                    score = weight * idf * self._tf(frequency, position)
+                    if score > token_scores.get(position, 0.0):
+                        token_scores[position] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                # AND: solo documentos que contienen todos los términos
+                scores = {
+                    position: score + token_scores[position]
+                    for position, score in scores.items()
+                    if position in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for position, score in ranked:
+            document = self.documents[position]
+            if predicate is None or predicate(document):
+                results.append((document, round(score, 4)))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _expand(self, token: str, prefix: bool) -> List[Tuple[str, float]]:
+        """Términos del vocabulario que corresponden a un token de la consulta"""
+        terms = []
+        if token in self.postings:
+            terms.append((token, 1.0))
+
+        if prefix:
+            start = bisect_left(self.vocabulary, token)
+            for term in self.vocabulary[start:start + self.MAX_EXPANSIONS + 1]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    terms.append((term, self.PREFIX_WEIGHT))
+        return terms
+
+    def _idf(self, term: str) -> float:
+        total = len(self.documents)
+        frequency = len(self.postings[term])
+        return math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+
+    def _tf(self, frequency: int, position: int) -> float:
+        norm = 1 - self.B + self.B * self.lengths[position] / self.average_length
+        return frequency * (self.K1 + 1) / (frequency + self.K1 * norm)
@@ -2,6 +2,7 @@
 Utilidades de procesamiento de texto
 """
 import hashlib
+import json
 import re
 from unidecode import unidecode
 
@@ -47,6 +48,22 @@ def generate_hash(text: str) -> str:
     return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 
+def canonical_json(data) -> str:
+    """
+    Serializa datos a JSON canónico (claves ordenadas, sin espacios)
+    
+    Dos estructuras equivalentes producen siempre la misma cadena,
+    sin importar el orden de inserción de las claves.
+    
+    Args:
+        data: Datos serializables a JSON
+        
+    Returns:
+        str: JSON canónico
+    """
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
 def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
     """
     Trunca un texto a una longitud máxima
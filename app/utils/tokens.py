@@ -0,0 +1,72 @@
+"""
+Conteo local de tokens para prompts y respuestas
+Usa tiktoken si está disponible; si no, una aproximación por caracteres
+"""
+import math
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - dependencia opcional
+    tiktoken = None
+
+
+# Promedio observado para texto en español con el tokenizer o200k/cl100k
+CHARS_PER_TOKEN = 3.6
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Obtiene (y memoriza) el encoding de tiktoken para un modelo"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception:  # pylint: disable=broad-except
+        return None
+    try:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Cuenta tokens de un texto de forma local
+
+    Args:
+        text: Texto a medir
+        model: Modelo de OpenAI (define el tokenizer)
+
+    Returns:
+        int: Número de tokens (exacto con tiktoken, aproximado sin él)
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: list, model: str = "gpt-4o-mini") -> int:
+    """
+    Cuenta tokens de una lista de mensajes de chat
+
+    Args:
+        messages: Lista de {"role": str, "content": str}
+        model: Modelo de OpenAI
+
+    Returns:
+        int: Tokens estimados incluyendo el overhead por mensaje
+    """
+    # ~3 tokens de formato por mensaje + 3 de cebado de la respuesta
+    total = 3
+    for message in messages:
+        total += 3 + count_tokens(message.get("content") or "", model)
+    return total
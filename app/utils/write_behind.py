@@ -0,0 +1,418 @@
+"""
+Persistencia write-behind para inserciones fuera del request path
+
+Los repositorios encolan filas y un hilo en segundo plano las escribe
+en lotes como upserts multi-fila (ON CONFLICT por la clave natural de
+la tabla). Si la base de datos falla se reintenta con backoff
+exponencial y, agotados los reintentos, el lote se guarda en un
+archivo spool local que se reprocesa en el siguiente flush exitoso.
+El spool se reescribe fila por fila si su lote falla: una fila que
+falla max_replays veces pasa a un archivo de cuarentena y deja de
+reintentarse.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.extensions import get_supabase
+
+
+class WriteBehindStats:
+    """Métricas de un buffer: profundidad de cola, latencia de flush y fallos"""
+
+    def __init__(self):
+        self.enqueued = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.retries = 0
+        self.failures = 0
+        self.rows_spooled = 0
+        self.rows_replayed = 0
+        self.rows_quarantined = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def record_flush(self, rows: int, elapsed_ms: float) -> None:
+        self.flushes += 1
+        self.rows_written += rows
+        self.last_flush_ms = elapsed_ms
+        self.total_flush_ms += elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def to_dict(self, queue_depth: int, spool_depth: int, quarantine_depth: int = 0) -> dict:
+        return {
+            "queue_depth": queue_depth,
+            "spool_depth": spool_depth,
+            "quarantine_depth": quarantine_depth,
+            "enqueued": self.enqueued,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rows_spooled": self.rows_spooled,
+            "rows_replayed": self.rows_replayed,
+            "rows_quarantined": self.rows_quarantined,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2)
+        }
+
+
+class WriteBehindBuffer:
+    """
+    Buffer de escritura diferida para una tabla
+
+    Las filas se indexan por su clave de conflicto: si la misma clave se
+    encola dos veces antes del flush, solo se escribe la última versión,
+    y get_pending() permite leerla antes de que llegue a la base de datos.
+    Una fila sigue visible mientras se escribe, reintenta o espera en el
+    spool: solo deja de estarlo cuando la base de datos confirma el lote.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        conflict_keys: Sequence[str],
+        writer: Optional[Callable[[str, List[dict], str], None]] = None,
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        max_retries: int = 3,
+        base_backoff: float = 0.2,
+        max_replays: int = 5,
+        spool_dir: Optional[str] = None,
+        autostart: bool = True
+    ):
+        """
+        Inicializa el buffer
+
+        Args:
+            table: Tabla destino en Supabase
+            conflict_keys: Columnas de la restricción UNIQUE (on_conflict)
+            writer: Función (table, rows, on_conflict) que escribe un lote (opcional)
+            batch_size: Máximo de filas por upsert
+            flush_interval: Segundos máximos que una fila espera en cola
+            max_retries: Reintentos antes de enviar el lote al spool
+            base_backoff: Espera inicial entre reintentos (se duplica cada vez)
+            max_replays: Reintentos desde el spool antes de poner una fila en cuarentena
+            spool_dir: Directorio del archivo spool (opcional)
+            autostart: Iniciar el hilo de flush al encolar la primera fila
+        """
+        self.table = table
+        self.conflict_keys = tuple(conflict_keys)
+        self.writer = writer or supabase_upsert
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_replays = max_replays
+        self.autostart = autostart
+        spool_dir = spool_dir or os.path.join(tempfile.gettempdir(), "write_behind_spool")
+        self.spool_path = os.path.join(spool_dir, f"{table}.jsonl")
+        self.quarantine_path = os.path.join(spool_dir, f"{table}.quarantine.jsonl")
+
+        self.stats = WriteBehindStats()
+        self._pending: "OrderedDict[tuple, dict]" = OrderedDict()
+        # Filas sacadas de _pending sin escritura confirmada (en vuelo o en spool)
+        self._unacked: Dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _key(self, row: dict) -> tuple:
+        return tuple(row.get(column) for column in self.conflict_keys)
+
+    def enqueue(self, row: dict) -> None:
+        """
+        Encola una fila para escritura diferida
+
+        Args:
+            row: Fila a insertar (debe incluir las columnas de conflicto)
+        """
+        with self._lock:
+            key = self._key(row)
+            self._pending.pop(key, None)
+            self._pending[key] = row
+            self.stats.enqueued += 1
+            depth = len(self._pending)
+
+        if self.autostart:
+            self._ensure_thread()
+        if depth >= self.batch_size:
+            self._wakeup.set()
+
+    def get_pending(self, *key_values) -> Optional[dict]:
+        """
+        Fila encolada que aún no se escribe (lectura "read-your-writes")
+
+        Args:
+            key_values: Valores de las columnas de conflicto, en orden
+
+        Returns:
+            dict | None: Fila pendiente o None
+        """
+        key = tuple(key_values)
+        with self._lock:
+            row = self._pending.get(key)
+            if row is None:
+                row = self._unacked.get(key)
+            return dict(row) if row is not None else None
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Escribe las filas pendientes en lotes de batch_size
+
+        Returns:
+            int: Filas escritas en la base de datos
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        break
+                    batch = []
+                    while self._pending and len(batch) < self.batch_size:
+                        key, row = self._pending.popitem(last=False)
+                        self._unacked[key] = row
+                        batch.append(row)
+
+                if not self._write_with_retry(batch):
+                    # Las filas siguen en _unacked hasta que el spool se reescriba
+                    self._spool(batch)
+                    return written
+                self._acknowledge(batch)
+                written += len(batch)
+
+            if written:
+                self._replay_spool()
+        return written
+
+    def _acknowledge(self, rows: List[dict]) -> None:
+        """
+        Deja de exponer en get_pending() las filas ya escritas
+
+        Solo si la fila expuesta es la escrita: una versión más nueva de la
+        misma clave sigue visible hasta que se confirme la suya.
+        """
+        with self._lock:
+            for row in rows:
+                key = self._key(row)
+                current = self._unacked.get(key)
+                if current is not None and self._same_row(current, row):
+                    del self._unacked[key]
+
+    @staticmethod
+    def _same_row(current: dict, written: dict) -> bool:
+        """Compara filas, incluidas las que vuelven del spool serializadas a JSON"""
+        if current is written:
+            return True
+        return (json.dumps(current, default=str, sort_keys=True)
+                == json.dumps(written, default=str, sort_keys=True))
+
+    def snapshot(self) -> dict:
+        """Métricas actuales del buffer"""
+        return self.stats.to_dict(
+            self.queue_depth(), self._line_count(self.spool_path), self._line_count(self.quarantine_path)
+        )
+
+    def _write_with_retry(self, batch: List[dict]) -> bool:
+        """Intenta el upsert con backoff exponencial"""
+        on_conflict = ",".join(self.conflict_keys)
+
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                self.writer(self.table, batch, on_conflict)
+                self.stats.record_flush(len(batch), (time.monotonic() - started) * 1000)
+                return True
+            except Exception as e:  # pylint: disable=broad-except
+                if attempt >= self.max_retries:
+                    self.stats.failures += 1
+                    print(f"✗ Error escribiendo lote en {self.table}: {e}")
+                    return False
+                self.stats.retries += 1
+                time.sleep(self.base_backoff * (2 ** attempt))
+        return False
+
+    def _try_write(self, rows: List[dict]) -> bool:
+        """Un solo intento de escritura, sin backoff (reproceso del spool)"""
+        started = time.monotonic()
+        try:
+            self.writer(self.table, rows, ",".join(self.conflict_keys))
+        except Exception:  # pylint: disable=broad-except
+            return False
+        self.stats.record_flush(len(rows), (time.monotonic() - started) * 1000)
+        return True
+
+    def _spool(self, batch: List[dict], attempts: int = 0) -> None:
+        """Guarda un lote fallido en el archivo spool local"""
+        if self._append(self.spool_path, [(row, attempts) for row in batch]):
+            self.stats.rows_spooled += len(batch)
+            print(f"⚠ {len(batch)} filas de {self.table} guardadas en spool: {self.spool_path}")
+
+    def _append(self, path: str, entries: List[tuple]) -> bool:
+        """Agrega filas (con su número de reintentos) a un archivo JSONL"""
+        if not entries:
+            return True
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as spool:
+                for row, attempts in entries:
+                    line = {"attempts": attempts, "row": row}
+                    spool.write(json.dumps(line, default=str, ensure_ascii=False) + "\n")
+            return True
+        except OSError as e:
+            print(f"✗ Error escribiendo {path}: {e}")
+            return False
+
+    def _replay_spool(self) -> None:
+        """
+        Reescribe las filas del spool después de un flush exitoso
+
+        Cada lote del spool se intenta una vez; si falla, sus filas se
+        escriben de una en una para aislar las que la base de datos
+        rechaza. Esas vuelven al spool con un reintento más y, al llegar
+        a max_replays, pasan al archivo de cuarentena.
+        """
+        if not os.path.exists(self.spool_path):
+            return
+
+        # Ruta por proceso: varios workers comparten el spool y os.replace
+        # garantiza que cada línea la toma uno solo
+        processing_path = f"{self.spool_path}.{os.getpid()}.replay"
+        try:
+            os.replace(self.spool_path, processing_path)
+            with open(processing_path, encoding="utf-8") as spool:
+                entries = [self._spool_entry(json.loads(line)) for line in spool if line.strip()]
+            os.remove(processing_path)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"✗ Error leyendo spool de {self.table}: {e}")
+            return
+
+        failed, quarantined = [], []
+        for start in range(0, len(entries), self.batch_size):
+            chunk = entries[start:start + self.batch_size]
+            if self._try_write([row for row, _ in chunk]):
+                self.stats.rows_replayed += len(chunk)
+                self._acknowledge([row for row, _ in chunk])
+                continue
+            for row, attempts in chunk:
+                if self._try_write([row]):
+                    self.stats.rows_replayed += 1
+                    self._acknowledge([row])
+                elif attempts + 1 >= self.max_replays:
+                    quarantined.append((row, attempts + 1))
+                else:
+                    failed.append((row, attempts + 1))
+
+        self._append(self.spool_path, failed)
+        # En cuarentena la fila no llegará a la base de datos: deja de exponerse
+        self._acknowledge([row for row, _ in quarantined])
+        if quarantined and self._append(self.quarantine_path, quarantined):
+            self.stats.rows_quarantined += len(quarantined)
+            print(f"✗ {len(quarantined)} filas de {self.table} en cuarentena: {self.quarantine_path}")
+
+    @staticmethod
+    def _spool_entry(line: dict) -> tuple:
+        """(fila, reintentos) de una línea del spool (acepta filas sin envolver)"""
+        if set(line) == {"attempts", "row"}:
+            return line["row"], int(line["attempts"])
+        return line, 0
+
+    @staticmethod
+    def _line_count(path: str) -> int:
+        try:
+            with open(path, encoding="utf-8") as spool:
+                return sum(1 for line in spool if line.strip())
+        except OSError:
+            return 0
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"write-behind-{self.table}",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"✗ Error en flush de {self.table}: {e}")
+
+
+def supabase_upsert(table: str, rows: List[dict], on_conflict: str) -> None:
+    """Writer por defecto: upsert multi-fila en Supabase (primera escritura gana)"""
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase no está inicializado")
+    supabase.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True).execute()
+
+
+_buffers: Dict[str, WriteBehindBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_write_buffer(table: str, conflict_keys: Sequence[str]) -> WriteBehindBuffer:
+    """
+    Buffer compartido por tabla (uno por proceso)
+
+    Args:
+        table: Tabla destino
+        conflict_keys: Columnas de la restricción UNIQUE
+
+    Returns:
+        WriteBehindBuffer: Buffer de la tabla
+    """
+    with _buffers_lock:
+        buffer = _buffers.get(table)
+        if buffer is None:
+            from app.config import Config
+            buffer = WriteBehindBuffer(
+                table,
+                conflict_keys,
+                batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+                flush_interval=Config.WRITE_BEHIND_FLUSH_INTERVAL,
+                spool_dir=Config.WRITE_BEHIND_SPOOL_DIR
+            )
+            _buffers[table] = buffer
+        return buffer
+
+
+def write_behind_stats() -> dict:
+    """Métricas de todos los buffers: {tabla: {...}}"""
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    return {buffer.table: buffer.snapshot() for buffer in buffers}
+
+
+@atexit.register
+def flush_all() -> None:
+    """Vacía todos los buffers (al apagar el proceso)"""
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    for buffer in buffers:
+        try:
+            buffer.flush()
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"✗ Error vaciando buffer de {buffer.table}: {e}")
@@ -0,0 +1,99 @@
+"""
+Benchmark de codecs de Redis: tamaño y tiempo de encode/decode
+
+Mide cada codec disponible (json, orjson, msgpack, y orjson/msgpack
+comprimidos con zlib o zstd sin umbral) sobre cargas típicas
+del backend: el registro de una sesión, un snapshot de respuesta con
+pasos y comandos de canvas, y una respuesta breve.
+
+Uso:
+    python -m benchmarks.codecs
+    python -m benchmarks.codecs --iterations 20000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from app.utils import codec
+from app.utils.codec import CompressedCodec, JsonCodec, MsgpackCodec, OrjsonCodec, decode
+
+
+def payloads() -> dict:
+    session = {
+        "user_id": "4f7c2a9e-1d3b-4c8e-9a6f-2b5d8e1c7a30",
+        "connection_id": "Kx9vQ2mB7pL4sT1wA0",
+        "current_question": "¿Por qué el cielo es azul?",
+        "current_step": 2,
+        "pause_position": 340,
+        "is_paused": False,
+        "is_streaming": True,
+        "conversation_context": {"topic": "física", "level": "secundaria"},
+        "created_at": datetime(2026, 1, 1, 12, 0).isoformat(),
+        "last_activity": datetime(2026, 1, 1, 12, 5).isoformat()
+    }
+    snapshot = {
+        "question_hash": "9b1c0e7d4f2a",
+        "total_duration": 180,
+        "steps": [
+            {
+                "title": f"Paso {index}",
+                "content": "La luz del sol se dispersa en la atmósfera (dispersión de Rayleigh). " * 8,
+                "canvas_commands": [
+                    {"type": "line", "x1": 10.5 * i, "y1": 20.0, "x2": 30.25, "y2": 40.0 + i,
+                     "color": "#1f77b4", "width": 2}
+                    for i in range(12)
+                ],
+                "duration": 30
+            }
+            for index in range(6)
+        ]
+    }
+    brief = {"question_hash": "9b1c0e7d4f2a", "answer": "Por la dispersión de Rayleigh.", "cached": True}
+    return {"session": session, "answer_snapshot": snapshot, "brief_answer": brief}
+
+
+def available_codecs() -> list:
+    codecs = [JsonCodec()]
+    if codec.orjson is not None:
+        codecs.append(OrjsonCodec())
+    if codec.msgpack is not None:
+        codecs.append(MsgpackCodec())
+    algorithms = ["zlib"] + (["zstd"] if codec.zstandard is not None else [])
+    compressible = [selected for selected in codecs if selected.name != "json"]
+    codecs += [CompressedCodec(selected, algorithm, 0)
+               for selected in compressible for algorithm in algorithms]
+    return codecs
+
+
+def per_op(operation, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    return (time.perf_counter() - started) * 1e6 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    codecs = available_codecs()
+    missing = {"orjson", "msgpack", "zstandard"} - {selected.name for selected in codecs}
+    if codec.zstandard is not None:
+        missing.discard("zstandard")
+    if missing:
+        print(f"ℹ No instalados: {', '.join(sorted(missing))}")
+
+    for label, value in payloads().items():
+        print(f"{label}:")
+        for selected in codecs:
+            data = selected.encode(value)
+            assert decode(data) == value
+            encode_us = per_op(lambda: selected.encode(value), args.iterations)
+            decode_us = per_op(lambda: decode(data), args.iterations)
+            print(f"  {selected.name:<14} {len(data):>7,} bytes  "
+                  f"encode {encode_us:>7.2f} µs  decode {decode_us:>7.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
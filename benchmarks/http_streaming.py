@@ -0,0 +1,133 @@
+"""
+Benchmark de memoria por cliente: streaming HTTP (SSE) vs. Socket.IO
+
+Mide con tracemalloc la memoria retenida en el proceso por cliente:
+
+- HTTP en curso: petición GET /api/v1/questions/answers/<hash>/stream
+  abierta, con el generador del motor suspendido después del primer paso
+- HTTP terminada: la misma petición consumida y cerrada (no queda estado)
+- Socket.IO: cliente conectado que ya recibió la respuesta; mientras la
+  conexión siga abierta retiene su sesión en Redis (fakeredis, en proceso)
+  y el snapshot de la respuesta para pause/resume
+
+Se cuenta también el estado del cliente de pruebas (environ de WSGI,
+socket de Engine.IO), que en un servidor real ocupa la conexión.
+
+Uso:
+    python -m benchmarks.http_streaming
+    python -m benchmarks.http_streaming --clients 500
+"""
+import argparse
+import contextlib
+import io
+import tracemalloc
+from unittest.mock import patch
+
+from flask import Flask
+from flask_socketio import SocketIO, emit
+
+from app.api.v1 import question_routes
+from app.repositories.session_repository import SessionRepository
+from app.services.session_service import SessionService
+from app.services.streaming_service import StreamingService
+from app.services.stream_transport import CallbackTransport
+from app.utils.rate_limiter import RateLimiter
+from benchmarks.streaming import sample_answer
+
+
+def retained_bytes(open_client, count: int) -> float:
+    """Bytes retenidos por cliente abierto"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    clients = [open_client() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del clients
+    return total / count
+
+
+class StaticAnswers:
+    """Repositorio que siempre devuelve la misma respuesta (sin registrar llamadas)"""
+
+    def __init__(self, answer):
+        self.answer = answer
+
+    def __call__(self):
+        return self
+
+    def get_answer(self, question_hash):
+        return self.answer
+
+
+def http_clients(answer, finish: bool):
+    app = Flask(__name__)
+    app.register_blueprint(question_routes.bp)
+    url = f"/api/v1/questions/answers/{answer.question_hash}/stream"
+
+    def open_client():
+        response = app.test_client().get(url, buffered=False)
+        body = iter(response.response)
+        next(body)  # explanation_start
+        next(body)  # primer paso
+        if finish:
+            for _ in body:
+                pass
+            response.close()
+            return None
+        return response, body
+
+    return open_client
+
+
+def socketio_clients(answer):
+    import fakeredis
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode="threading")
+    session_service = SessionService(SessionRepository(fakeredis.FakeStrictRedis(decode_responses=True)))
+
+    @socketio.on("ask_question")
+    def ask_question(data):
+        session_id = session_service.create_session("benchmark-user")
+        service = StreamingService(session_service, transport=CallbackTransport(emit))
+        service.CHUNK_DELAY = 0
+        service.COMMAND_DELAY = 0
+        service.start_streaming(answer, session_id)
+
+    def open_client():
+        client = socketio.test_client(app)
+        client.emit("ask_question", {})
+        client.get_received()
+        return client
+
+    return open_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200)
+    args = parser.parse_args()
+
+    answer = sample_answer()
+    clients = {
+        "HTTP en curso": http_clients(answer, finish=False),
+        "HTTP terminada": http_clients(answer, finish=True),
+        "Socket.IO": socketio_clients(answer)
+    }
+
+    unlimited = RateLimiter(limits={"api": (10 ** 9, 60)})
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()), \
+            patch("app.utils.rate_limiter.rate_limiter", unlimited), \
+            patch.object(question_routes, "AIAnswersRepository", StaticAnswers(answer)):
+        for label, open_client in clients.items():
+            open_client()  # Calentar imports y caches antes de medir
+            results[label] = retained_bytes(open_client, args.clients)
+
+    print(f"Memoria retenida por cliente ({args.clients} clientes, {len(answer.steps)} pasos):")
+    for label, value in results.items():
+        print(f"  {label:<15} {value:>9,.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark del almacén de sesiones: HASH pipelinado vs. JSON read-modify-write
+
+Compara operaciones por segundo de SessionService sobre SessionRepository
+(formato actual) contra el camino anterior (documento JSON con GET + SETEX
+y verificación EXISTS en cada actualización).
+
+Uso:
+    python -m benchmarks.session_store                 # fakeredis (en proceso)
+    python -m benchmarks.session_store --rtt-ms 0.3    # fakeredis + latencia simulada
+    python -m benchmarks.session_store --redis-url redis://localhost:6379/15
+
+Con fakeredis sin latencia se mide solo el costo en Python (el pipeline
+con índice ejecuta más comandos). Con un Redis real domina el número de
+round-trips: el camino anterior hace 3 por lectura o actualización
+(GET + GET/EXISTS + SETEX), el actual 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+import uuid
+from datetime import datetime
+
+from app.repositories.session_repository import SessionRepository
+from app.services.session_service import SessionService
+
+
+class LatencyRedis:
+    """Proxy que simula la latencia de red: un round-trip por comando o por pipeline"""
+
+    def __init__(self, client, rtt: float):
+        self._client = client
+        self._rtt = rtt
+
+    def pipeline(self, *args, **kwargs):
+        return LatencyPipeline(self._client.pipeline(*args, **kwargs), self._rtt)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            time.sleep(self._rtt)
+            return attribute(*args, **kwargs)
+        return call
+
+
+class LatencyPipeline:
+    def __init__(self, pipeline, rtt: float):
+        self._pipeline = pipeline
+        self._rtt = rtt
+
+    def execute(self, *args, **kwargs):
+        time.sleep(self._rtt)
+        return self._pipeline.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._pipeline, name)
+
+
+class LegacyJsonSessionService:
+    """Camino anterior: sesión como JSON, cada escritura lee y reescribe el documento"""
+
+    TTL = 1800
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def create_session(self, user_id: str) -> str:
+        session_id = str(uuid.uuid4())
+        self.redis.setex(f"legacy:{session_id}", self.TTL, json.dumps({
+            "user_id": user_id, "connection_id": None, "current_question": None,
+            "current_step": 0, "pause_position": 0, "is_paused": False,
+            "is_streaming": False, "conversation_context": {},
+            "created_at": datetime.utcnow().isoformat(),
+            "last_activity": datetime.utcnow().isoformat()
+        }))
+        return session_id
+
+    def _update(self, session_id: str, data: dict) -> None:
+        current = json.loads(self.redis.get(f"legacy:{session_id}"))
+        current.update(data)
+        self.redis.setex(f"legacy:{session_id}", self.TTL, json.dumps(current, default=str))
+
+    def get_session(self, session_id: str) -> dict:
+        session = json.loads(self.redis.get(f"legacy:{session_id}"))
+        session["last_activity"] = datetime.utcnow().isoformat()
+        self._update(session_id, {"last_activity": session["last_activity"]})
+        return session
+
+    def update_session(self, session_id: str, data: dict) -> bool:
+        if not self.redis.exists(f"legacy:{session_id}"):
+            raise KeyError(session_id)
+        data["last_activity"] = datetime.utcnow().isoformat()
+        self._update(session_id, data)
+        return True
+
+
+def measure(label: str, operation, iterations: int) -> float:
+    # SessionService imprime cada sesión creada: no medir la consola
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for index in range(iterations):
+            operation(index)
+        elapsed = time.perf_counter() - started
+    ops = iterations / elapsed
+    print(f"  {label:<28} {ops:>10,.0f} ops/s  ({elapsed * 1e6 / iterations:,.1f} µs/op)")
+    return ops
+
+
+def run(service, iterations: int) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        session_ids = [service.create_session(f"user-{i}") for i in range(100)]
+
+    def streaming_tick(index):
+        # Patrón de StreamingService por chunk: leer (pausa?) + actualizar paso
+        session_id = session_ids[index % len(session_ids)]
+        service.get_session(session_id)
+        service.update_session(session_id, {"is_streaming": True, "current_step": index % 7})
+
+    return {
+        "create": measure("create_session", lambda i: service.create_session(f"user-{i}"), iterations),
+        "get": measure("get_session", lambda i: service.get_session(session_ids[i % 100]), iterations),
+        "update": measure("update_session",
+                          lambda i: service.update_session(session_ids[i % 100], {"current_step": i}),
+                          iterations),
+        "tick": measure("streaming tick (get+update)", streaming_tick, iterations)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", help="Redis real (usa una base de datos vacía); por defecto fakeredis")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--rtt-ms", type=float, default=0.0,
+                        help="Latencia simulada por round-trip (solo con fakeredis)")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        from redis import Redis
+        redis_client = Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeStrictRedis(decode_responses=True)
+        if args.rtt_ms:
+            redis_client = LatencyRedis(redis_client, args.rtt_ms / 1000)
+
+    print("Anterior (JSON read-modify-write):")
+    legacy = run(LegacyJsonSessionService(redis_client), args.iterations)
+    print("Actual (HASH pipelinado):")
+    current = run(SessionService(SessionRepository(redis_client)), args.iterations)
+
+    print("Relación actual / anterior:")
+    for operation, ops in current.items():
+        print(f"  {operation:<28} x{ops / legacy[operation]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
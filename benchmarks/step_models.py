@@ -0,0 +1,120 @@
+"""
+Benchmark de modelos de pasos: dicts de Supabase vs. AnswerStep con __slots__
+
+Mide, para una respuesta típica (pasos con comandos de canvas):
+- memoria retenida por respuesta (tracemalloc)
+- acceso a campos por paso como en StreamingService (dict.get vs. atributo)
+- costo de from_dict (validación, se paga una vez por respuesta)
+- costo de serializar el snapshot (orjson serializa los modelos directamente)
+
+Uso:
+    python -m benchmarks.step_models
+    python -m benchmarks.step_models --answers 2000 --iterations 200000
+"""
+import argparse
+import copy
+import time
+import tracemalloc
+
+from app.models.answer import Answer
+from app.utils.codec import get_codec
+
+
+def sample_row(index: int) -> dict:
+    return {
+        "id": f"answer-{index}",
+        "question_hash": f"{index:064x}",
+        "question_text": "¿Por qué el cielo es azul?",
+        "answer_steps": [
+            {
+                "step_number": step + 1,
+                "title": f"Paso {step + 1}",
+                "content": "La luz del sol se dispersa en la atmósfera. " * 6,
+                "content_type": "text",
+                "has_visual": True,
+                "canvas_commands": [{"command": "draw_equation", "parameters": {"equation": "I ∝ 1/λ⁴"}}],
+                "component_commands": None
+            }
+            for step in range(5)
+        ],
+        "total_duration": 120,
+        "generated_by": "gpt-4"
+    }
+
+
+def retained_bytes(build, count: int) -> float:
+    """Bytes retenidos por objeto construido (sin contar los textos compartidos)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [build(index) for index in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del objects
+    return total / count
+
+
+def per_op(operation, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    return (time.perf_counter() - started) * 1e9 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--answers", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = [sample_row(index) for index in range(args.answers)]
+
+    # Ambos lados parten de una copia de la fila (como al leerla de Supabase):
+    # el modelo retiene los comandos, el resto de la fila se libera
+    dict_bytes = retained_bytes(lambda index: copy.deepcopy(rows[index])["answer_steps"], args.answers)
+    model_bytes = retained_bytes(lambda index: Answer.from_dict(copy.deepcopy(rows[index])).steps,
+                                 args.answers)
+    print("Memoria retenida por respuesta (5 pasos):")
+    print(f"  dicts          {dict_bytes:>9,.0f} bytes")
+    print(f"  AnswerStep     {model_bytes:>9,.0f} bytes  (x{dict_bytes / model_bytes:.2f})")
+
+    step_dict = rows[0]["answer_steps"][0]
+    step_model = Answer.from_dict(rows[0]).steps[0]
+
+    def read_dict():
+        step_dict.get("title", "")
+        step_dict.get("content", "")
+        step_dict.get("content_type", "text")
+        step_dict.get("canvas_commands", [])
+        step_dict.get("component_commands", [])
+
+    def read_model():
+        step_model.title
+        step_model.content
+        step_model.content_type
+        step_model.canvas_commands
+        step_model.component_commands
+
+    dict_ns = per_op(read_dict, args.iterations)
+    model_ns = per_op(read_model, args.iterations)
+    print("Lectura de campos por paso (5 campos):")
+    print(f"  dict.get       {dict_ns:>9,.1f} ns")
+    print(f"  atributos      {model_ns:>9,.1f} ns  (x{dict_ns / model_ns:.2f})")
+
+    parse_iterations = max(args.iterations // 20, 1)
+    parse_ns = per_op(lambda: Answer.from_dict(rows[0]), parse_iterations)
+    print("Validación por respuesta:")
+    print(f"  from_dict      {parse_ns / 1000:>9,.2f} µs")
+
+    codec = get_codec(binary=False)
+    answer = Answer.from_dict(rows[0])
+    snapshot_dicts = {"steps": rows[0]["answer_steps"], "total_duration": 120, "question_hash": "h"}
+    encode_dicts = per_op(lambda: codec.encode(snapshot_dicts), parse_iterations)
+    encode_models = per_op(lambda: codec.encode(answer.to_snapshot()), parse_iterations)
+    print(f"Snapshot ({codec.name}):")
+    print(f"  dicts          {encode_dicts / 1000:>9,.2f} µs")
+    print(f"  AnswerStep     {encode_models / 1000:>9,.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark del motor de streaming (StepEngine)
+
+Mide el costo en CPU del servidor por respuesta transmitida, sin las pausas
+del efecto typewriter (CHUNK_DELAY/COMMAND_DELAY = 0) y con un transporte
+que solo cuenta eventos. Al pasar todas las fuentes por el mismo motor,
+este número vale para preguntas libres, explicaciones y follow-ups.
+
+- sin sesión: explicaciones de examen y follow-ups
+- con sesión: preguntas libres (consulta de pausa por paso y por chunk)
+  sobre fakeredis, opcionalmente con latencia simulada (--rtt-ms)
+
+Uso:
+    python -m benchmarks.streaming
+    python -m benchmarks.streaming --chunk-size 20 --rtt-ms 0.3
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from app.models.answer import Answer
+from app.repositories.session_repository import SessionRepository
+from app.services.session_service import SessionService
+from app.services.streaming_service import StreamingService
+from benchmarks.session_store import LatencyRedis
+
+
+class CountingTransport:
+    """Transporte que solo cuenta eventos"""
+
+    def __init__(self):
+        self.count = 0
+
+    def send(self, event, data):
+        self.count += 1
+
+
+def sample_answer() -> Answer:
+    return Answer.from_dict({
+        "question_hash": "benchmark",
+        "total_duration": 120,
+        "answer_steps": [
+            {
+                "title": f"Paso {index + 1}",
+                "content": "La luz del sol se dispersa en la atmósfera. " * 15,
+                "canvas_commands": [{"command": "draw_equation", "parameters": {"equation": "I ∝ 1/λ⁴"}}]
+            }
+            for index in range(5)
+        ]
+    })
+
+
+def measure(label: str, run, iterations: int, transport: CountingTransport) -> None:
+    transport.count = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        elapsed = time.perf_counter() - started
+    events = transport.count / iterations
+    print(f"  {label:<12} {elapsed * 1e6 / iterations:>9,.1f} µs/respuesta  "
+          f"{events:.0f} eventos  ({elapsed * 1e6 / transport.count:,.2f} µs/evento)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=StreamingService.CHUNK_SIZE)
+    parser.add_argument("--rtt-ms", type=float, default=0.0,
+                        help="Latencia simulada por round-trip a Redis (modo con sesión)")
+    args = parser.parse_args()
+
+    import fakeredis
+    redis_client = fakeredis.FakeStrictRedis(decode_responses=True)
+    if args.rtt_ms:
+        redis_client = LatencyRedis(redis_client, args.rtt_ms / 1000)
+    session_service = SessionService(SessionRepository(redis_client))
+
+    transport = CountingTransport()
+    service = StreamingService(session_service, transport=transport)
+    service.CHUNK_SIZE = args.chunk_size
+    service.CHUNK_DELAY = 0
+    service.COMMAND_DELAY = 0
+
+    answer = sample_answer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session_id = session_service.create_session("benchmark-user")
+
+    print(f"Respuesta de {len(answer.steps)} pasos, chunks de {args.chunk_size} caracteres:")
+    measure("sin sesión", lambda: service.stream_answer(answer), args.iterations, transport)
+    measure("con sesión", lambda: service.start_streaming(answer, session_id),
+            max(args.iterations // 10, 1), transport)
+
+
+if __name__ == "__main__":
+    main()
@@ -282,8 +282,11 @@ CREATE TABLE user_subscriptions (
 -- Biblioteca de comandos de canvas (para visualizaciones)
 CREATE TABLE canvas_library (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+    slug TEXT UNIQUE,  -- Id que referencian las respuestas ({"command": "library", ...})
     name TEXT NOT NULL,
     category TEXT NOT NULL,
+    subject TEXT,  -- NULL = plantilla genérica
+    description TEXT,
     
     -- Comandos
     commands JSONB NOT NULL,
@@ -623,24 +626,34 @@ INSERT INTO questions (code, subject, topic, difficulty, question, options, corr
 );
 
 -- Insertar comandos de canvas de ejemplo
-INSERT INTO canvas_library (name, category, commands, tags) VALUES
+INSERT INTO canvas_library (slug, name, category, subject, description, commands, tags) VALUES
 (
+    'parabola',
     'Gráfica Parábola',
     'graph',
+    'matematicas',
+    'Parábola y = x² sobre ejes cartesianos',
     '[
-        {"type": "axis", "x": 50, "y": 200, "width": 300, "height": 300},
-        {"type": "parabola", "a": 1, "b": 0, "c": 0, "color": "#3498db"}
+        {"command": "axis", "parameters": {"x": 50, "y": 50, "width": 300, "height": 300}},
+        {"command": "draw_graph", "parameters": {"function": "y = x^2", "x_range": [-5, 5], "description": "Parábola"}}
     ]'::jsonb,
-    ARRAY['parabola', 'función']
+    ARRAY['parabola', 'función', 'cuadrática']
 ),
 (
+    'triangulo',
     'Triángulo con ángulos',
     'geometry',
+    'geometria',
+    'Triángulo con vértices y ángulos α, β, γ',
     '[
-        {"type": "triangle", "points": [[100, 100], [200, 100], [150, 50]]},
-        {"type": "angles", "show": true, "labels": ["α", "β", "γ"]}
+        {"command": "line", "parameters": {"x1": 100, "y1": 250, "x2": 300, "y2": 250}},
+        {"command": "line", "parameters": {"x1": 300, "y1": 250, "x2": 200, "y2": 80}},
+        {"command": "line", "parameters": {"x1": 200, "y1": 80, "x2": 100, "y2": 250}},
+        {"command": "text", "parameters": {"x": 115, "y": 240, "text": "α"}},
+        {"command": "text", "parameters": {"x": 275, "y": 240, "text": "β"}},
+        {"command": "text", "parameters": {"x": 195, "y": 105, "text": "γ"}}
     ]'::jsonb,
-    ARRAY['triángulo', 'geometría']
+    ARRAY['triángulo', 'geometría', 'ángulos']
 );
 
 -- =========================================
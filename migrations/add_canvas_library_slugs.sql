@@ -0,0 +1,121 @@
+-- =========================================
+-- Migración: Biblioteca de canvas referenciable por id
+-- =========================================
+
+-- Las respuestas generadas referencian plantillas con
+-- {"command": "library", "parameters": {"id": "<slug>"}} en lugar de repetir
+-- los comandos. El slug es el id estable que ve el modelo y el frontend;
+-- subject permite filtrar por materia (NULL = plantilla genérica).
+ALTER TABLE canvas_library ADD COLUMN IF NOT EXISTS slug TEXT UNIQUE;
+ALTER TABLE canvas_library ADD COLUMN IF NOT EXISTS subject TEXT;
+ALTER TABLE canvas_library ADD COLUMN IF NOT EXISTS description TEXT;
+
+-- Incrementa usage_count de varias plantillas en una sola llamada
+-- (el backend acumula las referencias y las envía al recargar la biblioteca)
+CREATE OR REPLACE FUNCTION increment_canvas_usage(
+    p_slugs TEXT[],
+    p_counts INTEGER[]
+)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE canvas_library AS c
+    SET usage_count = c.usage_count + u.count
+    FROM unnest(p_slugs, p_counts) AS u(slug, count)
+    WHERE c.slug = u.slug;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Las filas de ejemplo originales usaban comandos que el canvas no soporta
+-- ("parabola", "triangle"); se reemplazan por el formato {"command", "parameters"}
+UPDATE canvas_library SET
+    slug = 'parabola',
+    subject = 'matematicas',
+    description = 'Parábola y = x² sobre ejes cartesianos',
+    commands = '[
+        {"command": "axis", "parameters": {"x": 50, "y": 50, "width": 300, "height": 300}},
+        {"command": "draw_graph", "parameters": {"function": "y = x^2", "x_range": [-5, 5], "description": "Parábola"}}
+    ]'::jsonb
+WHERE name = 'Gráfica Parábola' AND slug IS NULL;
+
+UPDATE canvas_library SET
+    slug = 'triangulo',
+    subject = 'geometria',
+    description = 'Triángulo con vértices y ángulos α, β, γ',
+    commands = '[
+        {"command": "line", "parameters": {"x1": 100, "y1": 250, "x2": 300, "y2": 250}},
+        {"command": "line", "parameters": {"x1": 300, "y1": 250, "x2": 200, "y2": 80}},
+        {"command": "line", "parameters": {"x1": 200, "y1": 80, "x2": 100, "y2": 250}},
+        {"command": "text", "parameters": {"x": 115, "y": 240, "text": "α"}},
+        {"command": "text", "parameters": {"x": 275, "y": 240, "text": "β"}},
+        {"command": "text", "parameters": {"x": 195, "y": 105, "text": "γ"}}
+    ]'::jsonb
+WHERE name = 'Triángulo con ángulos' AND slug IS NULL;
+
+INSERT INTO canvas_library (slug, name, category, subject, description, commands, tags) VALUES
+(
+    'ejes_cartesianos',
+    'Plano cartesiano',
+    'graph',
+    NULL,
+    'Ejes x, y vacíos para graficar',
+    '[
+        {"command": "axis", "parameters": {"x": 50, "y": 50, "width": 300, "height": 300}}
+    ]'::jsonb,
+    ARRAY['ejes', 'plano', 'cartesiano', 'coordenadas']
+),
+(
+    'parabola',
+    'Gráfica Parábola',
+    'graph',
+    'matematicas',
+    'Parábola y = x² sobre ejes cartesianos',
+    '[
+        {"command": "axis", "parameters": {"x": 50, "y": 50, "width": 300, "height": 300}},
+        {"command": "draw_graph", "parameters": {"function": "y = x^2", "x_range": [-5, 5], "description": "Parábola"}}
+    ]'::jsonb,
+    ARRAY['parabola', 'función', 'cuadrática']
+),
+(
+    'triangulo',
+    'Triángulo con ángulos',
+    'geometry',
+    'geometria',
+    'Triángulo con vértices y ángulos α, β, γ',
+    '[
+        {"command": "line", "parameters": {"x1": 100, "y1": 250, "x2": 300, "y2": 250}},
+        {"command": "line", "parameters": {"x1": 300, "y1": 250, "x2": 200, "y2": 80}},
+        {"command": "line", "parameters": {"x1": 200, "y1": 80, "x2": 100, "y2": 250}},
+        {"command": "text", "parameters": {"x": 115, "y": 240, "text": "α"}},
+        {"command": "text", "parameters": {"x": 275, "y": 240, "text": "β"}},
+        {"command": "text", "parameters": {"x": 195, "y": 105, "text": "γ"}}
+    ]'::jsonb,
+    ARRAY['triángulo', 'geometría', 'ángulos']
+),
+(
+    'diagrama_cuerpo_libre',
+    'Diagrama de cuerpo libre',
+    'physics',
+    'fisica',
+    'Bloque con peso, normal, fricción y fuerza aplicada',
+    '[
+        {"command": "draw_diagram", "parameters": {"type": "free_body", "data": {"body": "Bloque", "forces": [
+            {"label": "W", "angle": 270}, {"label": "N", "angle": 90},
+            {"label": "f", "angle": 180}, {"label": "F", "angle": 0}
+        ]}, "description": "Fuerzas sobre el bloque"}}
+    ]'::jsonb,
+    ARRAY['fuerzas', 'newton', 'cuerpo', 'libre', 'dinámica']
+),
+(
+    'plano_inclinado',
+    'Plano inclinado',
+    'physics',
+    'fisica',
+    'Bloque sobre plano inclinado con ángulo θ y fuerzas',
+    '[
+        {"command": "draw_diagram", "parameters": {"type": "inclined_plane", "data": {"angle": "θ", "body": "Bloque", "forces": [
+            {"label": "W", "angle": 270}, {"label": "N", "angle": "perpendicular"}, {"label": "f", "angle": "parallel"}
+        ]}, "description": "Plano inclinado"}}
+    ]'::jsonb,
+    ARRAY['plano', 'inclinado', 'rampa', 'fuerzas', 'friccion']
+)
+ON CONFLICT (slug) DO NOTHING;
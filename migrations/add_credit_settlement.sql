@@ -0,0 +1,101 @@
+-- =========================================
+-- Migración: Liquidación de créditos por incrementos
+-- =========================================
+
+-- El backend descuenta créditos en un ledger de Redis y liquida los
+-- movimientos en lotes. Cada movimiento lleva su reservation_id en
+-- details: el índice único permite reintentar un lote sin duplicarlo.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_credit_usage_reservation
+    ON credit_usage ((details->>'reservation_id'))
+    WHERE details ? 'reservation_id';
+
+-- Versión de los créditos del perfil. El ledger de Redis la compara
+-- periódicamente: si cambió (compra, reset_monthly_credits, ajuste manual)
+-- rebasa su saldo sobre credits_remaining.
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS credits_version INTEGER NOT NULL DEFAULT 0;
+
+-- Incrementa credits_version en cualquier cambio de saldo o límite que no
+-- venga de settle_credit_usage (esa función ya parte del ledger).
+CREATE OR REPLACE FUNCTION bump_credits_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF COALESCE(current_setting('app.credit_settlement', true), '') <> 'on' THEN
+        NEW.credits_version := OLD.credits_version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_profiles_credits_version ON profiles;
+CREATE TRIGGER trigger_profiles_credits_version
+    BEFORE UPDATE OF credits_remaining, daily_limit ON profiles
+    FOR EACH ROW
+    WHEN (NEW.credits_remaining IS DISTINCT FROM OLD.credits_remaining
+          OR NEW.daily_limit IS DISTINCT FROM OLD.daily_limit)
+    EXECUTE FUNCTION bump_credits_version();
+
+-- Inserta un lote de credit_usage y aplica a profiles solo los movimientos
+-- nuevos como incrementos (credits_remaining - créditos, daily_used + preguntas).
+-- No escribe saldos absolutos: compras o ajustes hechos en profiles mientras
+-- el lote esperaba en la cola se conservan. Marca la transacción como
+-- liquidación para que el trigger no cambie credits_version.
+CREATE OR REPLACE FUNCTION settle_credit_usage(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_settled INTEGER;
+BEGIN
+    PERFORM set_config('app.credit_settlement', 'on', true);
+
+    WITH inserted AS (
+        INSERT INTO credit_usage (
+            user_id,
+            action_type,
+            credits_used,
+            credits_before,
+            credits_after,
+            details,
+            created_at
+        )
+        SELECT
+            (r->>'user_id')::UUID,
+            r->>'action_type',
+            (r->>'credits_used')::INTEGER,
+            (r->>'credits_before')::INTEGER,
+            (r->>'credits_after')::INTEGER,
+            COALESCE(r->'details', '{}'::jsonb),
+            COALESCE((r->>'created_at')::TIMESTAMPTZ, NOW())
+        FROM jsonb_array_elements(p_rows) AS r
+        ON CONFLICT ((details->>'reservation_id')) WHERE details ? 'reservation_id' DO NOTHING
+        RETURNING user_id, credits_used, created_at
+    ),
+    deltas AS (
+        SELECT
+            user_id,
+            SUM(credits_used) AS credits,
+            COUNT(*) FILTER (WHERE created_at::DATE = CURRENT_DATE) AS questions_today,
+            COUNT(*) AS questions
+        FROM inserted
+        GROUP BY user_id
+    ),
+    updated AS (
+        UPDATE profiles AS p
+        SET
+            credits_remaining = GREATEST(p.credits_remaining - d.credits, 0),
+            daily_used = CASE
+                WHEN p.last_reset_date = CURRENT_DATE THEN p.daily_used + d.questions_today
+                ELSE d.questions_today
+            END,
+            last_reset_date = CURRENT_DATE
+        FROM deltas AS d
+        WHERE p.id = d.user_id
+        RETURNING d.questions
+    )
+    SELECT COALESCE(SUM(questions), 0) INTO v_settled FROM updated;
+
+    PERFORM set_config('app.credit_settlement', 'off', true);
+
+    RETURN v_settled;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION settle_credit_usage IS 'Liquida un lote de credit_usage aplicando incrementos a profiles';
@@ -0,0 +1,84 @@
+-- =========================================
+-- Migración: Búsqueda de texto completo en questions y ai_answers
+-- =========================================
+
+-- Los índices idx_questions_search e idx_ai_answers_search indexan el texto
+-- original. Para que "energia" encuentre "energía" se agrega un índice sobre
+-- el texto normalizado (normalize_text es IMMUTABLE: quita acentos y puntuación).
+-- La búsqueda combina ambos índices (BitmapOr) y ordena por ts_rank.
+CREATE INDEX IF NOT EXISTS idx_questions_search_normalized
+    ON questions USING gin(to_tsvector('spanish', normalize_text(question)));
+
+CREATE INDEX IF NOT EXISTS idx_ai_answers_search_normalized
+    ON ai_answers USING gin(to_tsvector('spanish', normalize_text(question_text)));
+
+-- p_query: expresión to_tsquery ya construida por el backend
+--          (términos normalizados unidos con &, el último con :* para prefijo)
+CREATE OR REPLACE FUNCTION search_questions(
+    p_query TEXT,
+    p_subject TEXT DEFAULT NULL,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID,
+    code TEXT,
+    subject TEXT,
+    topic TEXT,
+    difficulty TEXT,
+    question TEXT,
+    rank REAL
+) AS $$
+    WITH query AS (
+        SELECT to_tsquery('spanish', p_query) AS tsq
+    )
+    SELECT
+        q.id,
+        q.code,
+        q.subject,
+        q.topic,
+        q.difficulty,
+        q.question,
+        GREATEST(
+            ts_rank(to_tsvector('spanish', q.question), query.tsq),
+            ts_rank(to_tsvector('spanish', normalize_text(q.question)), query.tsq)
+        ) AS rank
+    FROM questions q, query
+    WHERE (
+        to_tsvector('spanish', q.question) @@ query.tsq
+        OR to_tsvector('spanish', normalize_text(q.question)) @@ query.tsq
+    )
+    AND (p_subject IS NULL OR q.subject = p_subject)
+    ORDER BY rank DESC, q.times_seen DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION search_ai_answers(
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID,
+    question_hash TEXT,
+    question_text TEXT,
+    rank REAL
+) AS $$
+    WITH query AS (
+        SELECT to_tsquery('spanish', p_query) AS tsq
+    )
+    SELECT
+        a.id,
+        a.question_hash,
+        a.question_text,
+        GREATEST(
+            ts_rank(to_tsvector('spanish', a.question_text), query.tsq),
+            ts_rank(to_tsvector('spanish', normalize_text(a.question_text)), query.tsq)
+        ) AS rank
+    FROM ai_answers a, query
+    WHERE to_tsvector('spanish', a.question_text) @@ query.tsq
+       OR to_tsvector('spanish', normalize_text(a.question_text)) @@ query.tsq
+    ORDER BY rank DESC, a.usage_count DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION search_questions IS 'Búsqueda de texto completo en el banco de preguntas (ranking ts_rank)';
+COMMENT ON FUNCTION search_ai_answers IS 'Búsqueda de texto completo en respuestas generadas (ranking ts_rank)';
@@ -4,8 +4,9 @@ Tests de integración para SessionService y SessionRepository con fakeredis
 import pytest
 import fakeredis
 import time
+from unittest.mock import Mock, patch
 from app.repositories.session_repository import SessionRepository
-from app.services.session_service import SessionService, SessionExpiredError
+from app.services.session_service import SessionService, SessionExpiredError, sweep_expired_sessions
 
 
 @pytest.fixture
@@ -23,7 +24,7 @@ def session_repo(fake_redis):
 @pytest.fixture
 def session_service(session_repo):
     """Fixture que proporciona un SessionService con repositorio falso"""
-    return SessionService(session_repo)
+    return SessionService(session_repo, sweeper=Mock())
 
 
 class TestSessionRepository:
@@ -315,6 +316,22 @@ class TestSessionService:
         
         # Assert
         assert count == 3
+    
+    def test_create_session_starts_periodic_sweep(self, session_service):
+        """Test: Crear una sesión asegura el barrido periódico del índice"""
+        session_service.create_session("user-1")
+        
+        session_service.sweeper.start.assert_called_once()
+    
+    def test_periodic_sweep_removes_expired_entries(self, session_repo, fake_redis):
+        """Test: La tarea periódica elimina del índice las sesiones vencidas"""
+        session_repo.create("s1", {"user_id": "user-1"})
+        fake_redis.zadd("sessions:active", {"old-1": time.time() - 10})
+        
+        with patch("app.services.session_service.get_redis", return_value=fake_redis):
+            assert sweep_expired_sessions() == 1
+        
+        assert fake_redis.zcard("sessions:active") == 1
 
 
 class TestSessionIntegration:
@@ -369,3 +386,187 @@ class TestSessionIntegration:
         assert s1["test"] == "value1"
         assert s2["test"] == "value2"
         assert "test" not in s3
+
+
+class TestSessionReconnect:
+    """Tests para suspender y reclamar sesiones al reconectar"""
+    
+    ANSWER = {
+        "steps": [{"title": "Paso 1", "content": "A" * 120}],
+        "total_duration": 60,
+        "question_hash": "hash123"
+    }
+    
+    def test_suspend_keeps_session_for_grace_period(self, session_service, fake_redis):
+        """Test: Al desconectar, la sesión y su respuesta viven RECONNECT_GRACE segundos"""
+        session_id = session_service.create_session("user-1", "sid-1")
+        session_service.save_answer_snapshot(session_id, self.ANSWER)
+        session_service.update_streaming_state(session_id, True, current_step=0)
+        
+        token = session_service.suspend_session(session_id)
+        
+        session = session_service.repo.get(session_id)
+        assert token == session["reconnect_token"]
+        assert session["is_paused"] is True
+        assert session["was_streaming"] is True
+        assert session["connection_id"] is None
+        assert 0 < session_service.get_session_ttl(session_id) <= session_service.RECONNECT_GRACE
+        assert 0 < fake_redis.ttl(f"session_answer:{session_id}") <= session_service.RECONNECT_GRACE
+    
+    def test_reclaim_restores_state_and_rotates_token(self, session_service):
+        """Test: El socket nuevo recupera la sesión con un token nuevo"""
+        session_id = session_service.create_session("user-1", "sid-1")
+        session_service.save_answer_snapshot(session_id, self.ANSWER)
+        session_service.pause_streaming(session_id, 50, current_step=0)
+        token = session_service.suspend_session(session_id)
+        
+        session = session_service.reclaim_session(token, "user-1", "sid-2")
+        
+        assert session["session_id"] == session_id
+        assert session["connection_id"] == "sid-2"
+        assert session["pause_position"] == 50
+        assert session["reconnect_token"] != token
+        assert session_service.get_answer_snapshot(session_id) == self.ANSWER
+        assert session_service.get_session_ttl(session_id) > session_service.RECONNECT_GRACE
+    
+    def test_reconnect_token_is_single_use(self, session_service):
+        """Test: Un token solo puede reclamar la sesión una vez"""
+        session_id = session_service.create_session("user-1", "sid-1")
+        token = session_service.suspend_session(session_id)
+        
+        assert session_service.reclaim_session(token, "user-1", "sid-2") is not None
+        assert session_service.reclaim_session(token, "user-1", "sid-3") is None
+    
+    def test_reclaim_rejects_other_user(self, session_service):
+        """Test: Otro usuario no puede reclamar la sesión, el dueño sí"""
+        session_id = session_service.create_session("user-1", "sid-1")
+        token = session_service.suspend_session(session_id)
+        
+        assert session_service.reclaim_session(token, "user-2", "sid-2") is None
+        assert session_service.reclaim_session(token, "user-1", "sid-3") is not None
+    
+    def test_reclaim_unknown_token(self, session_service):
+        """Test: Un token inexistente o vacío no reclama nada"""
+        assert session_service.reclaim_session("no-existe", "user-1") is None
+        assert session_service.reclaim_session(None, "user-1") is None
+    
+    def test_end_session_deletes_answer_snapshot(self, session_service):
+        """Test: Finalizar la sesión elimina también la respuesta guardada"""
+        session_id = session_service.create_session("user-1")
+        session_service.save_answer_snapshot(session_id, self.ANSWER)
+        
+        session_service.end_session(session_id)
+        
+        assert session_service.get_answer_snapshot(session_id) is None
+
+
+class TestActiveSessionIndex:
+    """Tests para el índice de sesiones activas (sin KEYS)"""
+    
+    def test_writes_maintain_index(self, session_repo, fake_redis):
+        """Test: Crear, actualizar y eliminar mantienen sessions:active"""
+        session_repo.create("s1", {"user_id": "user-1"}, ttl=60)
+        session_repo.update("s1", {"is_paused": True}, ttl=600)
+        
+        assert fake_redis.zscore("sessions:active", "s1") > time.time() + 60
+        
+        session_repo.delete("s1")
+        
+        assert fake_redis.zscore("sessions:active", "s1") is None
+        assert session_repo.count_active() == 0
+    
+    def test_get_all_sessions_does_not_use_keys(self, session_repo, fake_redis, monkeypatch):
+        """Test: Enumerar sesiones no ejecuta KEYS"""
+        session_repo.create("s1", {"user_id": "user-1"})
+        monkeypatch.setattr(fake_redis, "keys", lambda *a, **k: pytest.fail("KEYS ejecutado"))
+        
+        assert session_repo.get_all_sessions() == ["s1"]
+    
+    def test_user_sessions(self, session_repo, fake_redis):
+        """Test: Las sesiones se consultan por usuario y las vencidas se limpian"""
+        session_repo.create("s1", {"user_id": "user-1"})
+        session_repo.create("s2", {"user_id": "user-1"})
+        session_repo.create("s3", {"user_id": "user-2"})
+        fake_redis.zadd("sessions:active", {"s2": time.time() - 1})
+        
+        assert session_repo.get_user_sessions("user-1") == ["s1"]
+        assert fake_redis.smembers("sessions:user:user-1") == {"s1"}
+    
+    def test_sweep_expired(self, session_repo, fake_redis):
+        """Test: El barrido elimina solo las entradas vencidas"""
+        session_repo.create("s1", {"user_id": "user-1"})
+        fake_redis.zadd("sessions:active", {"old-1": time.time() - 10, "old-2": time.time() - 5})
+        
+        assert session_repo.count_active() == 1
+        assert session_repo.sweep_expired() == 2
+        assert fake_redis.zcard("sessions:active") == 1
+    
+    def test_rebuild_index_with_scan(self, session_repo, fake_redis):
+        """Test: Las sesiones sin indexar se recuperan con SCAN"""
+        fake_redis.setex("session:legacy-1", 100, '{"user_id": "user-1"}')
+        fake_redis.setex("session:legacy-2", 100, '{"user_id": "user-2"}')
+        fake_redis.setex("session_answer:legacy-1", 100, "{}")
+        
+        assert session_repo.rebuild_index() == 2
+        assert sorted(session_repo.get_all_sessions()) == ["legacy-1", "legacy-2"]
+        assert session_repo.get_user_sessions("user-1") == ["legacy-1"]
+    
+    def test_service_stats_and_user_sessions(self, session_service):
+        """Test: get_stats y get_user_sessions usan el índice"""
+        session_id = session_service.create_session("user-1", "sid-1")
+        session_service.create_session("user-2", "sid-2")
+        
+        stats = session_service.get_stats()
+        sessions = session_service.get_user_sessions("user-1")
+        
+        assert stats["active_sessions"] == 2
+        assert stats["expiring_next_minute"] == 0
+        assert [session["session_id"] for session in sessions] == [session_id]
+
+
+class TestSessionStore:
+    """Tests para el formato HASH de session:{id}"""
+    
+    def test_update_writes_only_given_fields(self, session_repo, fake_redis):
+        """Test: update hace HSET de los campos, sin reescribir el resto"""
+        session_repo.create("s1", {"user_id": "user-1", "conversation_context": {"a": 1}})
+        
+        session_repo.update("s1", {"current_step": 3, "is_paused": True})
+        
+        assert fake_redis.type("session:s1") == "hash"
+        assert fake_redis.hget("session:s1", "current_step") == "3"
+        assert session_repo.get("s1") == {
+            "user_id": "user-1", "conversation_context": {"a": 1},
+            "current_step": 3, "is_paused": True
+        }
+    
+    def test_update_nonexistent_leaves_no_residue(self, session_repo, fake_redis):
+        """Test: Actualizar una sesión inexistente no deja key ni entrada en el índice"""
+        with pytest.raises(Exception):
+            session_repo.update("missing", {"current_step": 1})
+        
+        assert fake_redis.exists("session:missing") == 0
+        assert fake_redis.zscore("sessions:active", "missing") is None
+    
+    def test_get_and_touch(self, session_repo, fake_redis):
+        """Test: get_and_touch devuelve la sesión con los campos aplicados y renueva el TTL"""
+        session_repo.create("s1", {"user_id": "user-1", "last_activity": "old"}, ttl=10)
+        
+        session = session_repo.get_and_touch("s1", {"last_activity": "new"}, ttl=100)
+        
+        assert session == {"user_id": "user-1", "last_activity": "new"}
+        assert session_repo.get_ttl("s1") > 10
+        assert session_repo.get_and_touch("missing", {"last_activity": "new"}) is None
+        assert fake_redis.exists("session:missing") == 0
+    
+    def test_legacy_json_session_is_migrated(self, session_repo, fake_redis):
+        """Test: Una sesión en el formato JSON anterior se lee y se convierte a HASH"""
+        fake_redis.setex("session:legacy", 100, '{"user_id": "user-1", "current_step": 2}')
+        
+        assert session_repo.get("legacy") == {"user_id": "user-1", "current_step": 2}
+        assert fake_redis.type("session:legacy") == "hash"
+        assert 0 < session_repo.get_ttl("legacy") <= 100
+        
+        fake_redis.setex("session:legacy-2", 100, '{"user_id": "user-2"}')
+        session_repo.update("legacy-2", {"is_paused": True})
+        assert session_repo.get("legacy-2") == {"user_id": "user-2", "is_paused": True}
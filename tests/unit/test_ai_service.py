@@ -98,6 +98,38 @@ class TestGenerateAnswer:
         assert result["total_duration"] == 60
         assert len(result["steps"]) == 1
     
+    @patch('app.services.ai_service.OpenAI')
+    def test_generate_answer_prepares_canvas_commands(self, mock_openai_class):
+        """Test: Valida comandos de canvas y precalcula gráficas al generar"""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        
+        response = {
+            "steps": [
+                {
+                    "title": "Gráfica",
+                    "type": "math",
+                    "content": "La parábola...",
+                    "canvas_commands": [
+                        {"command": "draw_graph", "parameters": {"function": "y = x^2", "x_range": [-2, 2]}},
+                        {"command": "draw_graph", "parameters": {"function": "import os"}}
+                    ]
+                }
+            ],
+            "total_duration": 60
+        }
+        
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = json.dumps(response)
+        mock_client.chat.completions.create.return_value = mock_completion
+        
+        result = AIService(api_key="test-key").generate_answer("Grafica x^2")
+        
+        commands = result["steps"][0]["canvas_commands"]
+        assert len(commands) == 1
+        assert commands[0]["parameters"]["points"]["y"][0] == 4.0
+    
     @patch('app.services.ai_service.OpenAI')
     def test_generate_answer_with_context(self, mock_openai_class):
         """Test: Genera respuesta con contexto"""
@@ -195,45 +227,6 @@ class TestGenerateAnswer:
         assert "API Error" in str(exc_info.value)
 
 
-class TestParseJSONResponse:
-    """Tests para _parse_json_response()"""
-    
-    def test_parse_valid_json(self):
-        """Test: Parsea JSON válido"""
-        service = AIService(api_key="test-key")
-        
-        valid_json = '{"steps": [], "total_duration": 60}'
-        result = service._parse_json_response(valid_json)
-        
-        assert result["steps"] == []
-        assert result["total_duration"] == 60
-    
-    def test_parse_json_with_extra_text(self):
-        """Test: Parsea JSON con texto extra"""
-        service = AIService(api_key="test-key")
-        
-        response = 'Aquí está el JSON: {"steps": [], "total_duration": 60} Espero que ayude'
-        result = service._parse_json_response(response)
-        
-        assert result["steps"] == []
-    
-    def test_parse_json_with_markdown(self):
-        """Test: Parsea JSON dentro de markdown"""
-        service = AIService(api_key="test-key")
-        
-        response = '```json\n{"steps": [], "total_duration": 60}\n```'
-        result = service._parse_json_response(response)
-        
-        assert result["steps"] == []
-    
-    def test_parse_invalid_json_raises_error(self):
-        """Test: JSON inválido lanza error"""
-        service = AIService(api_key="test-key")
-        
-        with pytest.raises(JSONParseError):
-            service._parse_json_response("not json at all")
-
-
 class TestValidateResponseStructure:
     """Tests para _validate_response_structure()"""
     
@@ -353,47 +346,6 @@ class TestValidateResponseStructure:
         service._validate_response_structure(valid_response)
 
 
-class TestAttemptJSONRepair:
-    """Tests para _attempt_json_repair()"""
-    
-    def test_repair_removes_prefix_text(self):
-        """Test: Quita texto antes del JSON"""
-        service = AIService(api_key="test-key")
-        
-        response = 'Aquí está: {"key": "value"}'
-        repaired = service._attempt_json_repair(response)
-        
-        assert repaired == '{"key": "value"}'
-    
-    def test_repair_removes_suffix_text(self):
-        """Test: Quita texto después del JSON"""
-        service = AIService(api_key="test-key")
-        
-        response = '{"key": "value"} Espero que ayude'
-        repaired = service._attempt_json_repair(response)
-        
-        assert repaired == '{"key": "value"}'
-    
-    def test_repair_removes_markdown(self):
-        """Test: Quita markdown code blocks"""
-        service = AIService(api_key="test-key")
-        
-        response = '```json\n{"key": "value"}\n```'
-        repaired = service._attempt_json_repair(response)
-        
-        assert '```' not in repaired
-        assert '{"key": "value"}' in repaired
-    
-    def test_repair_strips_whitespace(self):
-        """Test: Quita espacios en blanco"""
-        service = AIService(api_key="test-key")
-        
-        response = '  \n  {"key": "value"}  \n  '
-        repaired = service._attempt_json_repair(response)
-        
-        assert repaired == '{"key": "value"}'
-
-
 class TestIntegration:
     """Tests de integración para flujos completos"""
     
@@ -457,3 +409,292 @@ class TestIntegration:
                     AIService()
                 
                 assert "OPENAI_API_KEY" in str(exc_info.value)
+
+
+class TestClarificationCache:
+    """Tests para el cache de aclaraciones breves"""
+    
+    def test_cache_meta_ignores_key_order_and_irrelevant_fields(self):
+        """Test: Contextos equivalentes producen el mismo context_hash"""
+        service = AIService(api_key="test-key")
+        
+        meta_a = service._build_clarification_cache_meta(
+            "¿Qué es la masa?",
+            {"original_question": "Energía cinética", "current_step": 2, "topic": "Física"}
+        )
+        meta_b = service._build_clarification_cache_meta(
+            "que es la masa",
+            {"topic": "física", "current_step": "2", "original_question": "energia cinetica",
+             "ui_state": {"scroll": 120}}
+        )
+        
+        assert meta_a["question_hash"] == meta_b["question_hash"]
+        assert meta_a["context_hash"] == meta_b["context_hash"]
+        assert meta_a["cache_key"] == meta_b["cache_key"]
+    
+    def test_cache_meta_distinguishes_contexts(self):
+        """Test: Explicaciones distintas no colisionan"""
+        service = AIService(api_key="test-key")
+        
+        meta_a = service._build_clarification_cache_meta(
+            "¿Qué es la masa?", {"original_question": "Energía cinética"}
+        )
+        meta_b = service._build_clarification_cache_meta(
+            "¿Qué es la masa?", {"original_question": "Segunda ley de Newton"}
+        )
+        
+        assert meta_a["question_hash"] == meta_b["question_hash"]
+        assert meta_a["context_hash"] != meta_b["context_hash"]
+    
+    @patch('app.services.ai_service.brief_answers_cache')
+    @patch('app.services.ai_service.AIBriefAnswersRepository')
+    @patch('app.services.ai_service.OpenAI')
+    def test_brief_clarification_lookup_uses_context_hash(
+        self, mock_openai_class, mock_repo_class, mock_cache
+    ):
+        """Test: La búsqueda en DB filtra por (question_hash, context_hash)"""
+        mock_repo = Mock()
+        mock_repo.get_by_hash.return_value = {
+            "id": "brief-1", "message": "Es la cantidad de materia", "is_deferred": False
+        }
+        mock_repo_class.return_value = mock_repo
+        mock_cache.get_or_load.side_effect = lambda key, loader: loader()
+        
+        service = AIService(api_key="test-key")
+        context = {"original_question": "Energía cinética"}
+        result = service.generate_clarification("¿Qué es la masa?", context)
+        
+        meta = service._build_clarification_cache_meta("¿Qué es la masa?", context)
+        mock_repo.get_by_hash.assert_called_once_with(meta["question_hash"], meta["context_hash"])
+        mock_repo.increment_usage.assert_called_once_with("brief-1")
+        assert result["message"] == "Es la cantidad de materia"
+        mock_openai_class.return_value.chat.completions.create.assert_not_called()
+
+
+class TestTruncatedResponses:
+    """Tests para la continuación de respuestas cortadas por longitud"""
+    
+    @staticmethod
+    def _completion(content, finish_reason):
+        completion = Mock()
+        completion.choices = [Mock()]
+        completion.choices[0].message.content = content
+        completion.choices[0].finish_reason = finish_reason
+        completion.usage = None
+        return completion
+    
+    @patch('app.services.ai_service.OpenAI')
+    def test_truncated_answer_is_continued_not_regenerated(self, mock_openai_class):
+        """Test: Una respuesta truncada se completa con una continuación"""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        
+        full = json.dumps({
+            "steps": [{"title": "Paso", "type": "text", "content": "Contenido"}],
+            "total_duration": 30
+        })
+        mock_client.chat.completions.create.side_effect = [
+            self._completion(full[:25], "length"),
+            self._completion(full[25:], "stop")
+        ]
+        
+        from app.services.token_budget_service import TokenBudgetService
+        budget = TokenBudgetService()
+        service = AIService(api_key="test-key", budget_service=budget)
+        
+        result = service.generate_answer("¿Qué es un paso?")
+        
+        assert result["steps"][0]["title"] == "Paso"
+        assert mock_client.chat.completions.create.call_count == 2
+        
+        continuation_call = mock_client.chat.completions.create.call_args_list[1]
+        messages = continuation_call.kwargs["messages"]
+        assert messages[-2] == {"role": "assistant", "content": full[:25]}
+        assert "response_format" not in continuation_call.kwargs
+        
+        stats = budget.stats()["answer"]
+        assert stats["truncated"] == 1
+        assert stats["continuations"] == 1
+        assert stats["incomplete"] == 0
+    
+    @patch('app.services.ai_service.OpenAI')
+    def test_max_tokens_comes_from_budget(self, mock_openai_class):
+        """Test: max_tokens se ajusta por tipo de petición"""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        mock_client.chat.completions.create.return_value = self._completion(
+            json.dumps({"steps": [{"title": "T", "type": "text", "content": "C"}], "total_duration": 30}),
+            "stop"
+        )
+        
+        budget = Mock()
+        budget.estimate.return_value = 850
+        budget.MAX_CONTINUATIONS = 2
+        service = AIService(api_key="test-key", budget_service=budget)
+        
+        service.generate_answer("¿Qué es la energía?", {"subject": "Física", "difficulty": "hard"})
+        
+        budget.estimate.assert_called_once_with(
+            "answer", "¿Qué es la energía?", subject="Física", difficulty="hard"
+        )
+        assert mock_client.chat.completions.create.call_args.kwargs["max_tokens"] == 850
+    
+    @patch('app.services.ai_service.OpenAI')
+    def test_follow_up_continuation_is_parsed_tolerantly(self, mock_openai_class):
+        """Test: Una continuación que termina con texto extra se repara sin fallar"""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        
+        full = json.dumps({
+            "answer_steps": [{"title": "Paso", "type": "text", "content": "Contenido"}],
+            "total_duration": 30
+        })
+        mock_client.chat.completions.create.side_effect = [
+            self._completion("```json\n" + full[:25], "length"),
+            self._completion(full[25:] + "\n```", "stop")
+        ]
+        
+        service = AIService(api_key="test-key")
+        result = service.generate_follow_up("¿Y la masa?", {"question": "¿Qué es la energía?"})
+        
+        assert result["answer_steps"][0]["title"] == "Paso"
+        assert result["total_duration"] == 30
+
+
+class TestRepairInPlace:
+    """Tests para la reparación local de respuestas antes de reintentar"""
+    
+    @staticmethod
+    def _client_returning(mock_openai_class, *contents):
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = [
+            Mock(choices=[Mock(message=Mock(content=content), finish_reason="stop")], usage=None)
+            for content in contents
+        ]
+        return mock_client
+    
+    @patch('app.services.ai_service.OpenAI')
+    def test_recoverable_defects_need_no_extra_call(self, mock_openai_class):
+        """Test: Texto extra, array sin cerrar, type inválido y sin total_duration se reparan localmente"""
+        broken = (
+            'Claro: {"steps": [{"title": "Fórmula", "type": "equation", "content": "E=mc^2"},'
+            ' {"title": "Idea", "type": "text", "content": "La masa'
+        )
+        mock_client = self._client_returning(mock_openai_class, broken)
+        
+        service = AIService(api_key="test-key")
+        result = service.generate_answer("¿Qué es E=mc^2?")
+        
+        assert mock_client.chat.completions.create.call_count == 1
+        assert result["steps"][0]["type"] == "math"
+        assert result["steps"][1]["content"] == "La masa"
+        assert result["total_duration"] == 60
+    
+    @patch('app.services.ai_service.OpenAI')
+    def test_unrecoverable_response_triggers_fix_call(self, mock_openai_class):
+        """Test: Solo lo irrecuperable pide una corrección barata, no regenerar"""
+        fixed = json.dumps({
+            "steps": [{"title": "T", "type": "text", "content": "C"}],
+            "total_duration": 30
+        })
+        mock_client = self._client_returning(
+            mock_openai_class,
+            '{"steps": [{"title": "T", "type": "text"}], "total_duration": 30}',
+            fixed
+        )
+        
+        service = AIService(api_key="test-key")
+        before = service.get_repair_stats()
+        result = service.generate_answer("test")
+        after = service.get_repair_stats()
+        
+        assert result["steps"][0]["content"] == "C"
+        fix_call = mock_client.chat.completions.create.call_args_list[1].kwargs
+        assert fix_call["temperature"] == 0
+        assert "corrector de JSON" in fix_call["messages"][0]["content"]
+        assert "content" in fix_call["messages"][1]["content"]
+        assert after["fix_calls"] == before["fix_calls"] + 1
+        assert after["fix_call_successes"] == before["fix_call_successes"] + 1
+
+
+class TestStreamClarification:
+    """Tests para stream_clarification()"""
+    
+    @staticmethod
+    def _stream_chunks(text, size=7):
+        chunks = []
+        for start in range(0, len(text), size):
+            chunk = Mock()
+            chunk.choices = [Mock()]
+            chunk.choices[0].delta.content = text[start:start + size]
+            chunk.choices[0].finish_reason = None
+            chunks.append(chunk)
+        chunks[-1].choices[0].finish_reason = "stop"
+        return chunks
+    
+    @patch('app.services.ai_service.OpenAI')
+    def test_detailed_steps_are_yielded_incrementally(self, mock_openai_class):
+        """Test: Los pasos llegan antes del evento complete"""
+        data = {
+            "mode": "detailed",
+            "clarification_steps": [
+                {"step_number": 1, "title": "A", "content": "uno"},
+                {"step_number": 2, "title": "B", "content": "dos"}
+            ],
+            "total_duration": 90
+        }
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        mock_client.chat.completions.create.return_value = iter(self._stream_chunks(json.dumps(data)))
+        
+        service = AIService(api_key="test-key")
+        events = list(service.stream_clarification("¿Por qué?", {}, response_mode="detailed"))
+        
+        assert [event["type"] for event in events] == ["step", "step", "complete"]
+        assert events[0]["step"]["title"] == "A"
+        assert events[-1]["response"]["total_duration"] == 90
+        assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+    
+    @patch('app.services.ai_service.brief_answers_cache')
+    @patch('app.services.ai_service.AIBriefAnswersRepository')
+    @patch('app.services.ai_service.OpenAI')
+    def test_brief_message_streams_as_deltas_and_is_cached(
+        self, mock_openai_class, mock_repo_class, mock_cache
+    ):
+        """Test: El mensaje breve llega como deltas y se guarda al terminar"""
+        data = {"mode": "brief", "message": "Es la cantidad de materia", "is_deferred": False, "reason": None}
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        mock_client.chat.completions.create.return_value = iter(self._stream_chunks(json.dumps(data), 5))
+        mock_repo = Mock()
+        mock_repo.create.return_value = {"id": "brief-9"}
+        mock_repo_class.return_value = mock_repo
+        mock_cache.get_or_load.return_value = None
+        
+        service = AIService(api_key="test-key")
+        events = list(service.stream_clarification("¿Qué es la masa?", {}))
+        
+        deltas = [event["text"] for event in events if event["type"] == "message_delta"]
+        assert len(deltas) > 1
+        assert "".join(deltas) == data["message"]
+        assert events[-1] == {"type": "complete", "response": data}
+        mock_repo.create.assert_called_once()
+        mock_cache.set.assert_called_once()
+    
+    @patch('app.services.ai_service.AIBriefAnswersRepository')
+    @patch('app.services.ai_service.OpenAI')
+    def test_mode_is_normalized_once_for_prompt_and_flow(self, mock_openai_class, mock_repo_class):
+        """Test: ' Detailed ' usa la plantilla y el flujo detallados (sin cache breve)"""
+        data = {"mode": "detailed", "clarification_steps": [{"step_number": 1, "title": "A"}]}
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        mock_client.chat.completions.create.return_value = iter(self._stream_chunks(json.dumps(data)))
+        
+        service = AIService(api_key="test-key")
+        events = list(service.stream_clarification("¿Por qué?", {}, response_mode=" Detailed "))
+        
+        assert [event["type"] for event in events] == ["step", "complete"]
+        messages = mock_client.chat.completions.create.call_args.kwargs["messages"]
+        assert "MODO ACTUAL: DETAILED" in messages[0]["content"]
+        mock_repo_class.assert_not_called()
@@ -0,0 +1,96 @@
+"""
+Tests unitarios para los frames precomprimidos de respuestas
+"""
+import json
+import zlib
+from unittest.mock import MagicMock, patch
+from app.services.streaming_service import StreamingService
+from app.utils import answer_frames as frames_module
+from app.utils.answer_frames import AnswerFrameCache, build_frame, negotiate
+
+
+ANSWER = {
+    "steps": [{"title": "Paso 1", "content": "E = ½mv² " * 100, "canvas_commands": [{"x": 1}]}],
+    "total_duration": 60,
+    "question_hash": "hash-1"
+}
+
+
+class TestNegotiate:
+    """Tests para negotiate()"""
+
+    def test_no_header_means_streaming(self):
+        """Test: Sin accept_encoding no se usan frames"""
+        assert negotiate(None) is None
+        assert negotiate([]) is None
+
+    def test_first_supported_wins(self, monkeypatch):
+        """Test: Se respeta el orden del cliente saltando lo no soportado"""
+        monkeypatch.setattr(frames_module.codec, "zstandard", None)
+
+        assert negotiate(["zstd", "deflate", "identity"]) == "deflate"
+        assert negotiate("IDENTITY") == "identity"
+
+    def test_unknown_encodings(self):
+        """Test: Codificaciones desconocidas no activan frames"""
+        assert negotiate(["br", 7]) is None
+
+
+class TestAnswerFrameCache:
+    """Tests para AnswerFrameCache"""
+
+    def test_deflate_frame_is_standard_zlib(self):
+        """Test: El frame deflate se abre con zlib estándar"""
+        frame = build_frame(ANSWER, "deflate")
+
+        assert json.loads(zlib.decompress(frame)) == ANSWER
+        assert len(frame) < len(build_frame(ANSWER, "identity"))
+
+    def test_frame_is_built_once(self):
+        """Test: Clientes distintos reciben los mismos bytes sin volver a serializar"""
+        cache = AnswerFrameCache(maxsize=4)
+
+        with patch("app.utils.answer_frames.build_frame", wraps=build_frame) as build:
+            first = cache.get(ANSWER, "deflate")
+            second = cache.get(dict(ANSWER), "deflate")
+
+        assert first is second
+        assert build.call_count == 1
+
+    def test_lru_eviction_and_invalidate(self):
+        """Test: Se respeta maxsize y invalidate() borra todas las codificaciones"""
+        cache = AnswerFrameCache(maxsize=2)
+        cache.get(ANSWER, "deflate")
+        cache.get(ANSWER, "identity")
+        cache.get({**ANSWER, "question_hash": "hash-2"}, "deflate")
+
+        assert len(cache) == 2
+
+        cache.invalidate("hash-1")
+
+        assert len(cache) == 1
+
+
+class TestSendFrame:
+    """Tests para StreamingService.send_frame"""
+
+    def test_emits_frame_and_completes(self):
+        """Test: Se emite answer_frame con el frame y luego explanation_complete"""
+        session_service = MagicMock()
+        events = []
+
+        with patch("app.services.streaming_service.emit",
+                   side_effect=lambda name, data=None: events.append((name, data))):
+            StreamingService(session_service).send_frame(ANSWER, "s1", "deflate")
+
+        assert [name for name, _ in events] == ["answer_frame", "explanation_complete"]
+        payload = events[0][1]
+        assert payload["encoding"] == "deflate"
+        assert payload["total_steps"] == 1
+        frame = json.loads(zlib.decompress(payload["frame"]))
+        assert frame["question_hash"] == "hash-1"
+        assert frame["steps"][0]["content"] == ANSWER["steps"][0]["content"]
+        assert frame["steps"][0]["canvas_commands"] == [{"x": 1}]
+        session_service.update_streaming_state.assert_called_once_with(
+            session_id="s1", is_streaming=False, current_step=1
+        )
@@ -0,0 +1,120 @@
+"""
+Tests unitarios para los modelos de pasos (AnswerStep, Answer, ExamExplanation)
+"""
+import dataclasses
+import pytest
+import fakeredis
+from app.models import Answer, AnswerStep, ExamExplanation, ExplanationStep, InvalidStepError
+from app.repositories.session_repository import SessionRepository
+
+
+DB_ROW = {
+    "id": "answer-1",
+    "question_hash": "hash-1",
+    "question_text": "¿Qué es la energía cinética?",
+    "answer_steps": [
+        {"step_number": 1, "title": "Definición", "content": "E = ½mv²", "content_type": "math",
+         "has_visual": True, "canvas_commands": [{"command": "draw_equation"}]},
+        {"step_number": 2, "title": "Ejemplo", "content": "Un auto...", "content_type": "text",
+         "has_visual": False, "canvas_commands": None}
+    ],
+    "total_duration": 90,
+    "generated_by": "gpt-4"
+}
+
+
+class TestAnswerStep:
+    """Tests para AnswerStep.from_dict"""
+
+    def test_slotted_and_frozen(self):
+        """Test: Los pasos no tienen __dict__ y no se pueden modificar"""
+        step = AnswerStep.from_dict({"title": "t", "content": "c"})
+
+        assert not hasattr(step, "__dict__")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            step.title = "otro"
+
+    def test_llm_format(self):
+        """Test: El formato del modelo (type, sin step_number) se normaliza"""
+        step = AnswerStep.from_dict({"title": "t", "type": "math", "content": "x"}, index=2)
+
+        assert step.content_type == "math"
+        assert step.step_number == 3
+
+    def test_missing_optional_fields(self):
+        """Test: Campos faltantes o null toman sus valores por defecto"""
+        step = AnswerStep.from_dict({"title": None, "content": None, "canvas_commands": []})
+
+        assert step.title == ""
+        assert step.content == ""
+        assert step.canvas_commands is None
+
+    @pytest.mark.parametrize("data", [
+        "texto",
+        {"title": "t", "content": ["no", "texto"]},
+        {"title": "t", "content": "c", "canvas_commands": {"command": "x"}},
+    ])
+    def test_invalid(self, data):
+        """Test: Estructuras inválidas lanzan InvalidStepError"""
+        with pytest.raises(InvalidStepError):
+            AnswerStep.from_dict(data)
+
+    def test_to_dict_roundtrip(self):
+        """Test: to_dict/from_dict conservan el paso"""
+        step = AnswerStep.from_dict(DB_ROW["answer_steps"][0])
+
+        assert AnswerStep.from_dict(step.to_dict()) == step
+
+
+class TestAnswer:
+    """Tests para Answer.from_dict"""
+
+    def test_db_row(self):
+        """Test: Una fila de ai_answers se convierte con pasos tipados"""
+        answer = Answer.from_dict(DB_ROW)
+
+        assert answer.id == "answer-1"
+        assert all(isinstance(step, AnswerStep) for step in answer.steps)
+        assert answer.to_dict()["answer_steps"][0]["canvas_commands"] == [{"command": "draw_equation"}]
+
+    def test_snapshot_format_and_idempotence(self):
+        """Test: Un snapshot ("steps") se acepta y una instancia se devuelve tal cual"""
+        answer = Answer.from_dict(DB_ROW)
+
+        assert Answer.from_dict(answer) is answer
+        assert Answer.from_dict(answer.to_snapshot()).steps == answer.steps
+
+    def test_invalid_duration_uses_default(self):
+        """Test: total_duration no numérico usa el valor por defecto"""
+        assert Answer.from_dict({"steps": [], "total_duration": "mucho"}).total_duration == 60
+
+    def test_steps_must_be_array(self):
+        """Test: steps que no es array lanza InvalidStepError"""
+        with pytest.raises(InvalidStepError):
+            Answer.from_dict({"steps": "paso 1"})
+
+    def test_snapshot_roundtrip_through_redis(self):
+        """Test: El snapshot con pasos tipados se guarda y se recupera de Redis"""
+        repo = SessionRepository(fakeredis.FakeStrictRedis(decode_responses=True))
+        answer = Answer.from_dict(DB_ROW)
+
+        repo.save_answer("s1", answer.to_snapshot(), ttl=60)
+
+        assert Answer.from_dict(repo.get_answer("s1")).steps == answer.steps
+
+
+class TestExamExplanation:
+    """Tests para ExamExplanation.from_dict"""
+
+    def test_steps_are_explanation_steps(self):
+        """Test: Los pasos de una explicación son ExplanationStep"""
+        explanation = ExamExplanation.from_dict({
+            "id": "e1",
+            "question_id": "q1",
+            "explanation_steps": DB_ROW["answer_steps"],
+            "quality_score": None
+        })
+
+        assert all(isinstance(step, ExplanationStep) for step in explanation.steps)
+        assert explanation.quality_score == 0.0
+        assert explanation.to_dict()["explanation_steps"][1]["title"] == "Ejemplo"
@@ -4,7 +4,7 @@ Tests unitarios para autenticación con Supabase
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from app.auth.supabase import verify_token
-from app.auth.decorators import require_auth, require_auth_socket
+from app.auth.decorators import require_admin, require_auth, require_auth_socket
 
 
 class TestVerifyToken:
@@ -99,6 +99,54 @@ class TestRequireAuthDecorator:
         assert dummy.__name__ == 'dummy'
 
 
+
+class TestRequireAdminDecorator:
+    """Tests para el decorador @require_admin (HTTP)"""
+    
+    @pytest.fixture
+    def flask_app(self):
+        from flask import Flask
+        return Flask(__name__)
+    
+    @patch('app.auth.decorators.Config.ADMIN_USER_IDS', ["admin-1"])
+    @patch('app.auth.decorators.verify_token')
+    def test_admin_user_allowed(self, mock_verify_token, flask_app):
+        """Test: Un usuario en ADMIN_USER_IDS accede a la ruta"""
+        mock_verify_token.return_value = {"id": "admin-1"}
+        
+        @require_admin
+        def stats():
+            return "ok"
+        
+        with flask_app.test_request_context(headers={"Authorization": "Bearer t"}):
+            assert stats() == "ok"
+    
+    @patch('app.auth.decorators.Config.ADMIN_USER_IDS', ["admin-1"])
+    @patch('app.auth.decorators.verify_token')
+    def test_regular_user_forbidden(self, mock_verify_token, flask_app):
+        """Test: Un usuario autenticado sin permisos recibe 403"""
+        mock_verify_token.return_value = {"id": "user-1"}
+        
+        @require_admin
+        def stats():
+            return "ok"
+        
+        with flask_app.test_request_context(headers={"Authorization": "Bearer t"}):
+            _, status = stats()
+        
+        assert status == 403
+    
+    def test_missing_token_unauthorized(self, flask_app):
+        """Test: Sin token se responde 401 antes de revisar permisos"""
+        @require_admin
+        def stats():
+            return "ok"
+        
+        with flask_app.test_request_context():
+            _, status = stats()
+        
+        assert status == 401
+
 class TestRequireAuthSocketDecorator:
     """Tests para el decorador @require_auth_socket (Socket.IO)"""
     
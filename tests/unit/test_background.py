@@ -0,0 +1,30 @@
+"""
+Tests unitarios para las tareas periódicas en segundo plano
+"""
+import threading
+
+from app.utils.background import PeriodicTask
+
+
+class TestPeriodicTask:
+    """Tests para PeriodicTask"""
+
+    def test_wake_runs_before_interval(self):
+        """Test: wake() inicia el hilo y adelanta la ejecución"""
+        ran = threading.Event()
+        task = PeriodicTask("test-wake", ran.set, interval=3600, run_at_exit=False)
+
+        task.wake()
+
+        assert ran.wait(2)
+        assert task._thread.daemon
+
+    def test_failures_are_counted_not_raised(self):
+        """Test: Una excepción de la función no detiene la tarea"""
+        def boom():
+            raise RuntimeError("falló")
+
+        task = PeriodicTask("test-boom", boom, interval=3600, run_at_exit=False)
+
+        assert task.run_once() is False
+        assert task.failures == 1
@@ -0,0 +1,73 @@
+"""
+Tests unitarios para el cache en dos niveles
+"""
+import pytest
+import fakeredis
+from unittest.mock import Mock
+from app.utils.cache import TieredCache
+
+
+@pytest.fixture
+def fake_redis():
+    """Fixture que proporciona un cliente Redis falso"""
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+@pytest.fixture
+def cache(fake_redis):
+    """Fixture de cache con Redis falso"""
+    return TieredCache("test", redis_client=fake_redis, local_maxsize=2)
+
+
+class TestTieredCache:
+    """Tests para TieredCache"""
+
+    def test_miss_then_loader_hit_populates_tiers(self, cache, fake_redis):
+        """Test: El loader rellena memoria y Redis"""
+        loader = Mock(return_value={"message": "hola"})
+
+        result = cache.get_or_load("k1", loader)
+
+        assert result == {"message": "hola"}
+        assert fake_redis.get("cache:test:k1") is not None
+        assert cache.get_or_load("k1", loader) == {"message": "hola"}
+        loader.assert_called_once()
+
+        stats = cache.stats.snapshot()
+        assert stats["hits"]["loader"] == 1
+        assert stats["hits"]["memory"] == 1
+        assert stats["hit_rate"] == 1.0
+
+    def test_redis_hit_after_local_eviction(self, cache):
+        """Test: Entradas expulsadas de memoria se recuperan de Redis"""
+        cache.set("a", {"v": 1})
+        cache.set("b", {"v": 2})
+        cache.set("c", {"v": 3})  # expulsa "a" de memoria
+
+        assert cache.get("a") == {"v": 1}
+        assert cache.stats.snapshot()["hits"]["redis"] == 1
+
+    def test_loader_miss_is_counted(self, cache):
+        """Test: Un fallo total cuenta como miss"""
+        result = cache.get_or_load("missing", lambda: None)
+
+        assert result is None
+        stats = cache.stats.snapshot()
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.0
+
+    def test_works_without_redis(self):
+        """Test: Sin Redis el cache sigue funcionando en memoria"""
+        local_only = TieredCache("local", redis_client=None)
+
+        local_only.set("k", {"v": 1})
+
+        assert local_only.get("k") == {"v": 1}
+
+    def test_delete_removes_both_tiers(self, cache, fake_redis):
+        """Test: delete elimina de memoria y Redis"""
+        cache.set("k", {"v": 1})
+        cache.delete("k")
+
+        assert fake_redis.get("cache:test:k") is None
+        assert cache.get("k") is None
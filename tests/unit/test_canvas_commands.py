@@ -0,0 +1,167 @@
+"""
+Tests unitarios para el pipeline de comandos de canvas
+"""
+import numpy as np
+import pytest
+
+from app.utils.canvas_commands import (
+    CANVAS_SCHEMA,
+    COMPONENT_SCHEMA,
+    CanvasCommandError,
+    compile_function,
+    generate_circle,
+    normalize_command,
+    prepare_command,
+    prepare_steps,
+    render_function
+)
+
+
+class TestCompileFunction:
+    """Tests para compile_function()"""
+
+    @pytest.mark.parametrize("expression,x,expected", [
+        ("y = x^2", 3.0, 9.0),
+        ("f(x) = 2x + 1", 2.0, 5.0),
+        ("3(x+1)(x-1)", 2.0, 9.0),
+        ("sqrt(x) + log10(x)", 100.0, 12.0),
+        ("sin(pi/2) * e^0", 0.0, 1.0),
+        ("−x", 2.0, -2.0)
+    ])
+    def test_evaluates_model_notation(self, expression, x, expected):
+        """Test: Acepta ^, producto implícito, "y =" y funciones conocidas"""
+        assert compile_function(expression)(np.array([x]))[0] == pytest.approx(expected)
+
+    @pytest.mark.parametrize("expression", [
+        "__import__('os').system('ls')",
+        "x.real",
+        "(lambda: 1)()",
+        "open('f')",
+        "z + 1",
+        "sin(x, 2)",
+        "'a' * 3",
+        "9**9**9",
+        "x" * 201
+    ])
+    def test_rejects_unsafe_or_invalid(self, expression):
+        """Test: Solo aritmética sobre x: el resto se rechaza sin evaluarlo"""
+        with pytest.raises(CanvasCommandError):
+            compile_function(expression)(np.array([1.0]))
+
+    def test_constant_function_is_broadcast(self):
+        """Test: Una función constante devuelve un valor por punto"""
+        assert compile_function("y = 2")(np.zeros(3)).tolist() == [2.0, 2.0, 2.0]
+
+
+class TestRenderFunction:
+    """Tests para render_function()"""
+
+    def test_points(self):
+        """Test: Puntos equiespaciados en x_range"""
+        points = render_function("x^2", (-2, 2), samples=5)
+
+        assert points == {"x": [-2.0, -1.0, 0.0, 1.0, 2.0], "y": [4.0, 1.0, 0.0, 1.0, 4.0]}
+
+    def test_gaps_for_undefined_and_asymptotes(self):
+        """Test: Valores no finitos o fuera de y_range quedan como None"""
+        points = render_function("1/x", (-1, 1), y_range=(-1, 1), samples=5)
+
+        assert points["y"] == [-1.0, -2.0, None, 2.0, 1.0]
+        assert render_function("1/(x-0.001)", (-1, 1), (-1, 1), samples=3)["y"][1] is None
+
+    def test_no_finite_values_raises(self):
+        """Test: Una función sin valores en el rango es inválida"""
+        with pytest.raises(CanvasCommandError):
+            render_function("sqrt(x)", (-2, -1), samples=5)
+
+
+class TestNormalizeCommand:
+    """Tests para normalize_command()"""
+
+    def test_flat_builder_format(self):
+        """Test: El formato plano de los constructores se normaliza"""
+        command = normalize_command(generate_circle(10, "20", 5), CANVAS_SCHEMA)
+
+        assert command == {
+            "command": "circle",
+            "parameters": {"x": 10.0, "y": 20.0, "radius": 5.0, "color": "#e74c3c"}
+        }
+
+    def test_ranges_are_sorted_floats(self):
+        """Test: x_range/y_range se ordenan y pasan a float"""
+        command = normalize_command(
+            {"command": "draw_graph", "parameters": {"function": "x", "x_range": [5, "-5"]}},
+            CANVAS_SCHEMA
+        )
+
+        assert command["parameters"]["x_range"] == [-5.0, 5.0]
+
+    @pytest.mark.parametrize("command,schema", [
+        ({"command": "rm_rf", "parameters": {}}, CANVAS_SCHEMA),
+        ({"command": "draw_equation", "parameters": {}}, CANVAS_SCHEMA),
+        ({"command": "draw_equation", "parameters": {"equation": 3}}, CANVAS_SCHEMA),
+        ({"command": "draw_equation", "parameters": "x = 1"}, CANVAS_SCHEMA),
+        ({"type": "circle", "x": "a", "y": 0, "radius": 1}, CANVAS_SCHEMA),
+        ({"type": "circle", "x": float("inf"), "y": 0, "radius": 1}, CANVAS_SCHEMA),
+        ({"command": "draw_graph", "parameters": {"function": "x", "x_range": [1, 1]}}, CANVAS_SCHEMA),
+        ({"command": "video_player", "parameters": {"title": "sin url"}}, COMPONENT_SCHEMA),
+        ("draw_equation", CANVAS_SCHEMA)
+    ])
+    def test_schema_violations(self, command, schema):
+        """Test: Comandos fuera del esquema se rechazan"""
+        with pytest.raises(CanvasCommandError):
+            normalize_command(command, schema)
+
+
+class TestPrepare:
+    """Tests para prepare_command() y prepare_steps()"""
+
+    def test_graph_gets_points_and_y_range(self):
+        """Test: draw_graph sin rangos usa x_range por defecto y calcula y_range"""
+        command = prepare_command(
+            {"command": "plot_function", "parameters": {"function": "y = x"}}, CANVAS_SCHEMA, samples=3
+        )
+
+        assert command["parameters"]["x_range"] == [-10.0, 10.0]
+        assert command["parameters"]["points"]["y"] == [-10.0, 0.0, 10.0]
+        assert command["parameters"]["y_range"] == [-10.0, 10.0]
+
+    def test_idempotent(self):
+        """Test: Un comando ya preparado no se recalcula"""
+        command = prepare_command(
+            {"command": "draw_graph", "parameters": {"function": "x^2"}}, CANVAS_SCHEMA, samples=3
+        )
+        command["parameters"]["points"]["y"][0] = "sin recalcular"
+
+        again = prepare_command(command, CANVAS_SCHEMA, samples=3)
+
+        assert again["parameters"]["points"]["y"][0] == "sin recalcular"
+
+    def test_prepare_steps_drops_invalid_commands(self):
+        """Test: Se descartan solo los comandos inválidos; sin comandos queda None"""
+        steps = [
+            {
+                "title": "Paso",
+                "canvas_commands": [
+                    {"command": "draw_equation", "parameters": {"equation": "x = 3"}},
+                    {"command": "desconocido"}
+                ],
+                "component_commands": [{"command": "pdf_viewer", "parameters": {}}]
+            },
+            {"title": "Sin comandos", "canvas_commands": None},
+            "no es un paso"
+        ]
+
+        assert prepare_steps(steps) == 2
+        assert steps[0]["canvas_commands"] == [
+            {"command": "draw_equation", "parameters": {"equation": "x = 3"}}
+        ]
+        assert steps[0]["component_commands"] is None
+        assert steps[1]["canvas_commands"] is None
+
+    def test_non_list_commands_are_dropped(self):
+        """Test: canvas_commands que no es array se descarta"""
+        steps = [{"canvas_commands": {"command": "draw_equation"}}]
+
+        assert prepare_steps(steps) == 1
+        assert steps[0]["canvas_commands"] is None
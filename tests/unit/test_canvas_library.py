@@ -0,0 +1,224 @@
+"""
+Tests unitarios para la biblioteca de canvas (CanvasLibraryService)
+"""
+import json
+import pytest
+from unittest.mock import patch
+from flask import Flask
+
+from app.api.v1 import canvas_routes
+from app.services.ai_service import AIService
+from app.services.canvas_library_service import CanvasLibraryService, concept_key
+from app.utils.canvas_commands import CANVAS_SCHEMA, normalize_command
+
+
+ROWS = [
+    {
+        "id": "1", "slug": "parabola", "name": "Gráfica Parábola", "category": "graph",
+        "subject": "Matemáticas", "description": "Parábola y = x²", "tags": ["función", "cuadrática"],
+        "commands": [
+            {"command": "axis", "parameters": {"x": 50, "y": 50, "width": 300, "height": 300}},
+            {"command": "draw_graph", "parameters": {"function": "y = x^2", "x_range": [-5, 5]}}
+        ]
+    },
+    {
+        "id": "2", "slug": "diagrama_cuerpo_libre", "name": "Diagrama de cuerpo libre", "category": "physics",
+        "subject": "fisica", "tags": ["fuerzas", "newton"],
+        "commands": [{"command": "draw_diagram", "parameters": {"type": "free_body", "data": {"body": "Bloque"}}}]
+    },
+    {
+        "id": "3", "slug": None, "name": "Plano cartesiano", "category": "graph", "subject": None,
+        "tags": ["ejes"], "commands": [{"type": "axis", "x": 0, "y": 0, "width": 10, "height": 10}]
+    },
+    {
+        "id": "4", "slug": "triangulo", "name": "Triángulo", "category": "geometry",
+        "commands": [{"type": "triangle", "points": [[0, 0], [1, 0], [0, 1]]}]
+    }
+]
+
+
+class FakeLibraryRepo:
+    """Repositorio en memoria"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = 0
+        self.increments = []
+
+    def get_all(self):
+        self.loads += 1
+        return self.rows
+
+    def increment_usage(self, counts):
+        self.increments.append(counts)
+
+
+@pytest.fixture
+def repo():
+    return FakeLibraryRepo(ROWS)
+
+
+@pytest.fixture
+def library(repo):
+    return CanvasLibraryService(repo=repo, ttl=600, enabled=True)
+
+
+def reference(slug):
+    return {"command": "library", "parameters": {"id": slug}}
+
+
+class TestLoad:
+    """Tests para la carga e indexado de plantillas"""
+
+    def test_templates_are_validated_and_prerendered(self, library):
+        """Test: Se normalizan los comandos y se precalculan los puntos"""
+        template = library.get_template("parabola")
+        graph = template.commands[1]["parameters"]
+
+        assert template.subject == "matematicas"
+        assert len(graph["points"]["x"]) == 201
+        assert graph["y_range"] == [0.0, 25.0]
+
+    def test_invalid_template_is_skipped(self, library):
+        """Test: Una plantilla con comandos no soportados se omite completa"""
+        assert library.get_template("triangulo") is None
+        assert len(library.get_index()) == 3
+
+    def test_slug_falls_back_to_name(self, library):
+        """Test: Sin slug, el id se deriva del nombre normalizado"""
+        assert library.get_template("plano_cartesiano").commands[0]["command"] == "axis"
+
+    def test_index_is_cached_until_ttl(self, library, repo):
+        """Test: La biblioteca se carga una sola vez dentro del TTL"""
+        library.get_index()
+        library.get_index()
+
+        assert repo.loads == 1
+
+    def test_concept_key_singularizes(self):
+        """Test: Plurales comunes comparten concepto con el singular"""
+        assert concept_key("fuerzas") == concept_key("fuerza")
+        assert concept_key("ecuaciones") == "ecuacion"
+
+
+class TestFindAndCatalog:
+    """Tests para find() y catalog()"""
+
+    def test_find_by_concept(self, library):
+        """Test: Coincide por nombre o tags sin importar acentos ni plural"""
+        assert [t.slug for t in library.find("Dibuja las fuerzas sobre el bloque")] == ["diagrama_cuerpo_libre"]
+        assert [t.slug for t in library.find("¿Cuál es el vértice de la parabola?")] == ["parabola"]
+
+    def test_subject_breaks_ties(self, library):
+        """Test: A igual coincidencia, primero la plantilla de la materia"""
+        found = library.find("función con ejes", subject="Matemáticas")
+
+        assert found[0].slug == "parabola"
+
+    def test_catalog_lists_ids(self, library):
+        """Test: El catálogo lista id y nombre de las plantillas relevantes"""
+        catalog = library.catalog("Grafica la parábola y = x^2")
+
+        assert '{"library": "<id>"}' in catalog
+        assert "- parabola: Gráfica Parábola (Parábola y = x²)" in catalog
+        assert library.stats()["prompts_with_catalog"] == 1
+
+    def test_catalog_empty_without_matches_or_disabled(self, repo):
+        """Test: Sin coincidencias o deshabilitada no agrega nada al prompt"""
+        assert CanvasLibraryService(repo=repo).catalog("Historia de México") == ""
+        assert CanvasLibraryService(repo=repo, enabled=False).catalog("parábola") == ""
+
+    def test_build_prompt_appends_catalog_to_user_message(self, library):
+        """Test: El catálogo va en el mensaje user; el system no cambia"""
+        service = AIService(api_key="test-key")
+
+        with patch("app.services.ai_service.canvas_library", library):
+            with_catalog = service.build_prompt("¿Qué es una parábola?")
+            without = service.build_prompt("¿Quién fue Juárez?")
+
+        assert "- parabola:" in with_catalog["user"]
+        assert "Biblioteca" not in without["user"]
+        assert with_catalog["system"] == without["system"]
+
+
+class TestResolveSteps:
+    """Tests para resolve_steps()"""
+
+    def test_normalize_accepts_shorthand(self):
+        """Test: {"library": id} se normaliza al formato command/parameters"""
+        assert normalize_command({"library": "parabola"}, CANVAS_SCHEMA) == reference("parabola")
+
+    def test_keeps_known_and_drops_unknown(self, library):
+        """Test: Las referencias desconocidas se descartan y se cuentan"""
+        steps = [
+            {"canvas_commands": [reference("parabola"), {"command": "clear", "parameters": {}}]},
+            {"canvas_commands": [reference("inexistente")]}
+        ]
+
+        dropped = library.resolve_steps(steps)
+
+        assert dropped == 1
+        assert steps[0]["canvas_commands"][0] == reference("parabola")
+        assert steps[1]["canvas_commands"] is None
+
+    def test_stats_measure_reuse_and_savings(self, library):
+        """Test: Las métricas cuentan reuso por plantilla y bytes/tokens ahorrados"""
+        library.resolve_steps([{"canvas_commands": [reference("parabola")]}])
+        library.resolve_steps([{"canvas_commands": [reference("parabola")]}])
+
+        stats = library.stats()
+
+        assert stats["references"] == 2
+        assert stats["reuse_by_template"] == {"parabola": 2}
+        # La referencia evita enviar los 201 puntos precalculados
+        assert stats["bytes_saved"] > 2 * 2000
+        assert stats["output_tokens_saved"] > 0
+
+    def test_disabled_drops_references(self, repo):
+        """Test: Deshabilitada, las referencias se descartan"""
+        steps = [{"canvas_commands": [reference("parabola")]}]
+
+        assert CanvasLibraryService(repo=repo, enabled=False).resolve_steps(steps) == 1
+        assert steps[0]["canvas_commands"] is None
+
+    def test_usage_flushed_on_reload(self, repo):
+        """Test: Los usos acumulados se envían a la base de datos al recargar"""
+        library = CanvasLibraryService(repo=repo, ttl=0)
+        library.resolve_steps([{"canvas_commands": [reference("parabola")]}])
+
+        library.get_index()
+
+        assert repo.increments == [{"parabola": 1}]
+
+
+class TestLibraryRoutes:
+    """Tests para /api/v1/canvas/library"""
+
+    @pytest.fixture
+    def client(self, library):
+        app = Flask(__name__)
+        app.register_blueprint(canvas_routes.bp)
+        with patch.object(canvas_routes, "canvas_library", library):
+            yield app.test_client()
+
+    def test_library_is_public_and_cacheable(self, client):
+        """Test: Devuelve la biblioteca con ETag y Cache-Control public"""
+        response = client.get("/api/v1/canvas/library")
+        templates = json.loads(response.get_data())["templates"]
+
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"].startswith("public")
+        assert {template["id"] for template in templates} == {"parabola", "diagrama_cuerpo_libre", "plano_cartesiano"}
+
+    def test_if_none_match_returns_304(self, client):
+        """Test: Con el mismo ETag responde 304"""
+        etag = client.get("/api/v1/canvas/library").headers["ETag"]
+
+        response = client.get("/api/v1/canvas/library", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+
+    def test_unknown_template_returns_404(self, client):
+        """Test: Id desconocido responde 404"""
+        assert client.get("/api/v1/canvas/library/parabola").status_code == 200
+        assert client.get("/api/v1/canvas/library/missing").status_code == 404
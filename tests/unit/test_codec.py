@@ -0,0 +1,198 @@
+"""
+Tests unitarios para la capa de serialización de Redis
+"""
+import json
+import pytest
+import fakeredis
+from app.utils import codec
+from app.utils.cache import TieredCache
+from app.repositories.session_repository import SessionRepository
+from app.utils.codec import CodecError, JsonCodec, OrjsonCodec, binary_client, decode, get_codec
+
+
+PAYLOAD = {
+    "steps": [{"title": "Energía", "content": "E = ½mv²", "canvas_commands": [{"x": 1.5}]}],
+    "total_duration": 60,
+    "question_hash": "abc",
+    "flags": [True, False, None]
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_codec_cache():
+    codec._resolve_codec.cache_clear()
+    yield
+    codec._resolve_codec.cache_clear()
+
+
+class TestCodecs:
+    """Tests para los codecs y el formato de los valores"""
+
+    @pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+    def test_roundtrip(self, name):
+        """Test: Cada codec decodifica lo que codifica"""
+        if name == "msgpack":
+            pytest.importorskip("msgpack")
+
+        selected = get_codec(name)
+
+        assert decode(selected.encode(PAYLOAD)) == PAYLOAD
+
+    def test_json_codecs_share_format(self):
+        """Test: json y orjson producen JSON estándar sin encabezado"""
+        pytest.importorskip("orjson")
+
+        for selected in (JsonCodec(), OrjsonCodec()):
+            assert json.loads(selected.encode(PAYLOAD)) == PAYLOAD
+
+    def test_legacy_json_values_decode(self):
+        """Test: Los valores escritos con json.dumps (formato anterior) se siguen leyendo"""
+        legacy = json.dumps(PAYLOAD, default=str)
+
+        assert decode(legacy) == PAYLOAD
+        assert decode(legacy.encode()) == PAYLOAD
+
+    def test_msgpack_has_version_header(self):
+        """Test: msgpack lleva el byte de formato/versión"""
+        pytest.importorskip("msgpack")
+
+        assert get_codec("msgpack").encode(PAYLOAD)[:1] == codec.MSGPACK_V1
+
+    def test_text_clients_never_get_binary_codec(self):
+        """Test: Para clientes con decode_responses se usa un codec de texto"""
+        assert get_codec("msgpack", binary=False).binary is False
+
+    def test_missing_msgpack_falls_back_to_json(self, monkeypatch):
+        """Test: Sin msgpack instalado, REDIS_CODEC=msgpack usa JSON"""
+        monkeypatch.setattr(codec, "msgpack", None)
+
+        assert get_codec("msgpack").binary is False
+
+    def test_msgpack_value_without_library(self, monkeypatch):
+        """Test: Un valor msgpack sin la librería instalada falla con CodecError"""
+        monkeypatch.setattr(codec, "msgpack", None)
+
+        with pytest.raises(CodecError):
+            decode(codec.MSGPACK_V1 + b"\x80")
+
+    def test_invalid_value(self):
+        """Test: Un valor corrupto falla con CodecError"""
+        with pytest.raises(CodecError):
+            decode("{no es json")
+
+    def test_none_passthrough(self):
+        """Test: None (key inexistente) se devuelve tal cual"""
+        assert decode(None) is None
+
+
+class TestBinaryClient:
+    """Tests para binary_client()"""
+
+    def test_shares_server_without_decoding(self):
+        """Test: El cliente binario ve las mismas keys y devuelve bytes"""
+        text = fakeredis.FakeStrictRedis(decode_responses=True)
+        raw = binary_client(text)
+
+        raw.set("k", b"\x01\xff")
+
+        assert raw.get("k") == b"\x01\xff"
+        assert text.exists("k") == 1
+
+    def test_one_twin_pool_per_base_pool(self):
+        """Test: Varios repositorios sobre el mismo cliente comparten un solo pool binario"""
+        text = fakeredis.FakeStrictRedis(decode_responses=True)
+
+        first = SessionRepository(text).answer_redis
+        second = SessionRepository(text).answer_redis
+
+        assert first is second
+        assert first.connection_pool is not text.connection_pool
+
+    def test_binary_client_is_reused(self):
+        """Test: Un cliente que ya es binario se devuelve tal cual"""
+        raw = fakeredis.FakeStrictRedis()
+
+        assert binary_client(raw) is raw
+
+
+class TestCacheCodec:
+    """Tests para TieredCache con la capa de codecs"""
+
+    def test_cache_reads_legacy_values(self):
+        """Test: El cache lee entradas escritas antes de la capa de codecs"""
+        redis_client = fakeredis.FakeStrictRedis(decode_responses=True)
+        cache = TieredCache("test", redis_client=redis_client)
+        redis_client.set("cache:test:k", json.dumps(PAYLOAD, default=str))
+
+        assert cache.get("k") == PAYLOAD
+
+    def test_cache_with_msgpack(self, monkeypatch):
+        """Test: Con msgpack el valor se guarda en binario y se lee desde otro proceso"""
+        pytest.importorskip("msgpack")
+        monkeypatch.setattr(codec.Config, "REDIS_CODEC", "msgpack")
+        redis_client = fakeredis.FakeStrictRedis(decode_responses=True)
+
+        TieredCache("test", redis_client=redis_client).set("k", PAYLOAD)
+
+        assert binary_client(redis_client).get("cache:test:k")[:1] == codec.MSGPACK_V1
+        assert TieredCache("test", redis_client=redis_client).get("k") == PAYLOAD
+
+
+class TestCompression:
+    """Tests para la compresión de valores grandes"""
+
+    LARGE = {"steps": [{"content": "La energía cinética depende de la velocidad. " * 200}]}
+
+    def test_small_values_stay_uncompressed(self):
+        """Test: Por debajo del umbral el valor queda igual (JSON sin encabezado)"""
+        selected = get_codec("orjson", compressed=True)
+
+        data = selected.encode({"a": 1})
+
+        assert json.loads(data) == {"a": 1}
+
+    def test_large_values_are_compressed(self, monkeypatch):
+        """Test: Sobre el umbral se comprime con encabezado y decode() lo revierte"""
+        monkeypatch.setattr(codec.Config, "ANSWER_COMPRESSION", "zlib")
+        selected = get_codec("orjson", compressed=True)
+
+        data = selected.encode(self.LARGE)
+
+        assert data[:1] == codec.ZLIB_V1
+        assert len(data) < len(json.dumps(self.LARGE)) / 10
+        assert decode(data) == self.LARGE
+
+    def test_zstd_falls_back_to_zlib(self, monkeypatch):
+        """Test: ANSWER_COMPRESSION=zstd sin zstandard usa zlib"""
+        monkeypatch.setattr(codec, "zstandard", None)
+
+        assert codec.compression_algorithm("zstd") == "zlib"
+
+    def test_zstd_roundtrip(self):
+        """Test: zstd comprime y decode() lo revierte"""
+        pytest.importorskip("zstandard")
+
+        data = codec.compress(json.dumps(self.LARGE).encode(), "zstd", 0)
+
+        assert data[:1] == codec.ZSTD_V1
+        assert decode(data) == self.LARGE
+
+    def test_disabled(self, monkeypatch):
+        """Test: ANSWER_COMPRESSION=none no comprime"""
+        monkeypatch.setattr(codec.Config, "ANSWER_COMPRESSION", "none")
+
+        assert get_codec("orjson", compressed=True) is get_codec("orjson")
+
+    def test_text_clients_are_never_compressed(self):
+        """Test: Con binary=False no se comprime (el cliente decodifica texto)"""
+        assert get_codec("orjson", binary=False, compressed=True).binary is False
+
+    def test_compressed_cache_roundtrip(self, monkeypatch):
+        """Test: TieredCache comprimido guarda bytes comprimidos y los lee desde otro proceso"""
+        monkeypatch.setattr(codec.Config, "ANSWER_COMPRESSION", "zlib")
+        redis_client = fakeredis.FakeStrictRedis(decode_responses=True)
+
+        TieredCache("answers", redis_client=redis_client, compressed=True).set("k", self.LARGE)
+
+        assert binary_client(redis_client).get("cache:answers:k")[:1] == codec.ZLIB_V1
+        assert TieredCache("answers", redis_client=redis_client, compressed=True).get("k") == self.LARGE
@@ -0,0 +1,245 @@
+"""
+Tests unitarios para CreditService (ledger en Redis + liquidación por lotes)
+"""
+import json
+import pytest
+import fakeredis
+from unittest.mock import Mock, patch
+from app.services.credit_service import CreditService, InsufficientCreditsError, settle_pending
+
+
+@pytest.fixture
+def fake_redis():
+    """Fixture que proporciona un cliente Redis falso"""
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+@pytest.fixture
+def credit_repo():
+    """Repositorio con un perfil de 3 créditos y límite diario de 5"""
+    repo = Mock()
+    repo.get_profile_credits.return_value = {
+        "credits_remaining": 3,
+        "daily_limit": 5,
+        "daily_used": 0,
+        "last_reset_date": "2000-01-01"
+    }
+    repo.settle_usage_batch.return_value = True
+    return repo
+
+
+@pytest.fixture
+def settler():
+    """Tarea de liquidación falsa (sin hilo)"""
+    return Mock()
+
+
+@pytest.fixture
+def service(fake_redis, credit_repo, settler):
+    """Servicio con liquidación manual (lote grande)"""
+    service = CreditService(redis_client=fake_redis, credit_repo=credit_repo, settler=settler)
+    service.batch_size = 100
+    return service
+
+
+class TestReserve:
+    """Tests para reserve(), commit() y refund()"""
+
+    def test_ai_question_reserves_one_credit(self, service):
+        """Test: Una pregunta generada por IA descuenta del saldo"""
+        reservation = service.reserve("user-1", cached=False)
+
+        assert reservation.action_type == "ai_question"
+        assert reservation.credits_before == 3
+        assert reservation.credits_after == 2
+        assert service.get_balance("user-1")["credits_remaining"] == 2
+
+    def test_cached_question_is_charged_differently(self, service):
+        """Test: Las respuestas en cache no cuestan créditos pero cuentan en el día"""
+        reservation = service.reserve("user-1", cached=True)
+
+        balance = service.get_balance("user-1")
+        assert reservation.action_type == "cached_question"
+        assert balance["credits_remaining"] == 3
+        assert balance["daily_used"] == 1
+
+    def test_insufficient_credits_raises_and_restores_balance(self, service):
+        """Test: Sin saldo se rechaza sin dejar el ledger en negativo"""
+        for _ in range(3):
+            service.reserve("user-1")
+
+        with pytest.raises(InsufficientCreditsError) as exc_info:
+            service.reserve("user-1")
+
+        assert exc_info.value.reason == "credits"
+        balance = service.get_balance("user-1")
+        assert balance["credits_remaining"] == 0
+        assert balance["daily_used"] == 3
+
+    def test_daily_limit_is_enforced(self, service, credit_repo):
+        """Test: El límite diario se aplica aunque haya saldo"""
+        credit_repo.get_profile_credits.return_value["credits_remaining"] = 100
+
+        for _ in range(5):
+            service.reserve("user-1", cached=True)
+
+        with pytest.raises(InsufficientCreditsError) as exc_info:
+            service.reserve("user-1", cached=True)
+
+        assert exc_info.value.reason == "daily_limit"
+
+    def test_refund_returns_credits(self, service):
+        """Test: refund devuelve la reserva y es idempotente"""
+        reservation = service.reserve("user-1")
+
+        service.refund(reservation)
+        service.refund(reservation)
+
+        balance = service.get_balance("user-1")
+        assert balance["credits_remaining"] == 3
+        assert balance["daily_used"] == 0
+
+    def test_profile_is_loaded_once(self, service, credit_repo):
+        """Test: El saldo se lee de Supabase solo al crear el ledger"""
+        service.reserve("user-1")
+        service.reserve("user-1")
+
+        credit_repo.get_profile_credits.assert_called_once_with("user-1")
+
+    def test_new_day_resets_daily_used_in_same_transaction(self, service, credit_repo, fake_redis):
+        """Test: Al cambiar de día el contador se reinicia al reservar, no aparte"""
+        credit_repo.get_profile_credits.return_value["credits_remaining"] = 100
+        for _ in range(5):
+            service.reserve("user-1", cached=True)
+        fake_redis.hset(CreditService.KEY_PREFIX + "user-1", "day", "2000-01-01")
+
+        service.reserve("user-1", cached=True)
+
+        balance = service.get_balance("user-1")
+        assert balance["daily_used"] == 1
+        assert balance["day"] == CreditService._today()
+
+    def test_refund_after_day_change_keeps_daily_used(self, service, fake_redis):
+        """Test: Devolver una reserva del día anterior no descuenta del día nuevo"""
+        reservation = service.reserve("user-1")
+        fake_redis.hset(CreditService.KEY_PREFIX + "user-1", mapping={"day": "2999-01-01", "daily_used": 0})
+
+        service.refund(reservation)
+
+        assert fake_redis.hget(CreditService.KEY_PREFIX + "user-1", "daily_used") == "0"
+        assert service.get_balance("user-1")["credits_remaining"] == 3
+
+
+class TestLedgerSync:
+    """Tests para la resincronización del ledger con profiles"""
+
+    def test_external_change_rebases_minus_unsettled(self, service, credit_repo):
+        """Test: Una compra en profiles se ve en el ledger descontando lo no liquidado"""
+        service.commit(service.reserve("user-1"))
+        credit_repo.get_profile_credits.return_value.update(credits_remaining=20, credits_version=1)
+        service.sync_interval = 0
+
+        reservation = service.reserve("user-1")
+
+        assert reservation.credits_before == 19
+        assert service.get_balance("user-1")["credits_remaining"] == 18
+
+    def test_unchanged_version_keeps_ledger(self, service, credit_repo):
+        """Test: Si credits_version no cambió el ledger conserva su saldo"""
+        service.reserve("user-1")
+        credit_repo.get_profile_credits.return_value["credits_remaining"] = 20
+        service.sync_interval = 0
+
+        service.reserve("user-1")
+
+        assert service.get_balance("user-1")["credits_remaining"] == 1
+        assert credit_repo.get_profile_credits.call_count == 2
+
+    def test_settle_clears_pending(self, service, credit_repo, fake_redis):
+        """Test: Lo liquidado deja de contarse como pendiente"""
+        service.commit(service.reserve("user-1"))
+        service.refund(service.reserve("user-1"))
+        assert fake_redis.hget(CreditService.KEY_PREFIX + "user-1", "pending") == "1"
+
+        service.settle()
+
+        assert fake_redis.hget(CreditService.KEY_PREFIX + "user-1", "pending") == "0"
+
+
+class TestSettle:
+    """Tests para la liquidación por lotes"""
+
+    def test_commit_enqueues_and_settle_batches(self, service, credit_repo, fake_redis):
+        """Test: Los movimientos se liquidan en un solo lote identificado por reserva"""
+        first = service.reserve("user-1")
+        service.commit(first, {"question_hash": "h1"})
+        service.commit(service.reserve("user-1", cached=True))
+
+        credit_repo.settle_usage_batch.assert_not_called()
+        settled = service.settle()
+
+        assert settled == 2
+        rows = credit_repo.settle_usage_batch.call_args.args[0]
+        assert [row["action_type"] for row in rows] == ["ai_question", "cached_question"]
+        assert [row["credits_used"] for row in rows] == [1, 0]
+        assert rows[0]["details"] == {"reservation_id": first.id, "question_hash": "h1"}
+        assert fake_redis.llen(CreditService.SETTLEMENT_KEY) == 0
+
+    def test_settle_never_writes_absolute_balances(self, service, credit_repo):
+        """Test: La liquidación envía movimientos (deltas), no el saldo del ledger"""
+        service.commit(service.reserve("user-1"))
+
+        service.settle()
+
+        credit_repo.settle_usage_batch.assert_called_once()
+        credit_repo.update_profile_credits.assert_not_called()
+
+    def test_failed_insert_requeues_batch_in_order(self, service, credit_repo, fake_redis):
+        """Test: Si Supabase falla el lote vuelve a la cola"""
+        credit_repo.settle_usage_batch.return_value = False
+        service.commit(service.reserve("user-1"))
+        service.commit(service.reserve("user-1"))
+
+        assert service.settle() == 0
+
+        pending = [json.loads(raw) for raw in fake_redis.lrange(CreditService.SETTLEMENT_KEY, 0, -1)]
+        assert [entry["credits_after"] for entry in pending] == [2, 1]
+
+    def test_commit_never_settles_inline(self, service, credit_repo, settler):
+        """Test: commit solo encola; al llenar el lote despierta al hilo de liquidación"""
+        service.batch_size = 2
+
+        service.commit(service.reserve("user-1"))
+        settler.wake.assert_not_called()
+        service.commit(service.reserve("user-1"))
+
+        settler.wake.assert_called_once()
+        credit_repo.settle_usage_batch.assert_not_called()
+
+    def test_settle_pending_drains_all_batches(self, fake_redis, credit_repo, settler):
+        """Test: La tarea periódica liquida lote tras lote hasta vaciar la cola"""
+        service = CreditService(redis_client=fake_redis, credit_repo=credit_repo, settler=settler)
+        for _ in range(3):
+            service.commit(service.reserve("user-1", cached=True))
+
+        with patch("app.services.credit_service.CreditService", return_value=service), \
+                patch.object(service, "batch_size", 2):
+            assert settle_pending() == 3
+
+        assert credit_repo.settle_usage_batch.call_count == 2
+
+
+class TestWithoutRedis:
+    """Tests del fallback directo a Supabase"""
+
+    def test_falls_back_to_rpc_functions(self, credit_repo):
+        """Test: Sin Redis usa check_credits y consume_credits"""
+        credit_repo.check_credits.return_value = True
+        service = CreditService(redis_client=None, credit_repo=credit_repo, settler=Mock())
+        service.redis = None
+
+        reservation = service.reserve("user-1")
+        service.commit(reservation)
+
+        credit_repo.check_credits.assert_called_once_with("user-1", 1)
+        credit_repo.consume_credits.assert_called_once_with("user-1", 1, "ai_question")
@@ -0,0 +1,242 @@
+"""
+Tests unitarios para el pipeline de eventos (stream de Redis -> Supabase)
+"""
+import pytest
+import fakeredis
+from unittest.mock import Mock, patch
+from app.services.event_service import EventService
+from app.services.session_service import SessionService
+
+
+@pytest.fixture
+def fake_redis():
+    """Fixture que proporciona un cliente Redis falso"""
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+@pytest.fixture
+def interaction_repo():
+    """Repositorio que acepta todos los lotes"""
+    repo = Mock()
+    repo.insert_interactions.return_value = True
+    repo.insert_study_sessions.return_value = True
+    return repo
+
+
+@pytest.fixture
+def service(fake_redis, interaction_repo):
+    """Servicio sin hilo de fondo"""
+    return EventService(
+        redis_client=fake_redis,
+        interaction_repo=interaction_repo,
+        batch_size=50,
+        consumer_enabled=True,
+        autostart=False
+    )
+
+
+class TestProducer:
+    """Tests para track() y publish()"""
+
+    def test_track_does_not_touch_redis(self, service, fake_redis):
+        """Test: track() solo encola en memoria"""
+        service.track("question_asked", session_id="s1", user_id="u1", question_text="¿Qué es?")
+
+        assert fake_redis.exists(EventService.STREAM_KEY) == 0
+        assert service.snapshot()["queue_depth"] == 1
+
+    def test_publish_writes_compact_entries(self, service, fake_redis):
+        """Test: publish() escribe cada evento en el stream con campos compactos"""
+        service.track("pause", session_id="s1", user_id="u1")
+        service.track("step_reached", session_id="s1", step=2)
+
+        assert service.publish() == 2
+
+        entries = fake_redis.xrange(EventService.STREAM_KEY)
+        assert [fields["t"] for _, fields in entries] == ["pause", "step_reached"]
+        assert entries[1][1]["d"] == '{"step":2}'
+        assert service.snapshot()["queue_depth"] == 0
+
+    def test_publish_failure_requeues_events(self, service):
+        """Test: Si Redis falla, los eventos vuelven a la cola local"""
+        service._redis = Mock()
+        service._redis.pipeline.return_value.execute.side_effect = ConnectionError("down")
+        service.track("pause", session_id="s1")
+
+        assert service.publish() == 0
+        assert service.snapshot()["queue_depth"] == 1
+
+    def test_unknown_event_type_is_ignored(self, service):
+        """Test: Tipos fuera de EVENT_TYPES no se encolan"""
+        service.track("something_else", session_id="s1")
+
+        assert service.snapshot()["queue_depth"] == 0
+
+    def test_without_redis_events_are_dropped(self, interaction_repo):
+        """Test: Sin Redis inicializado, track() descarta sin fallar"""
+        service = EventService(interaction_repo=interaction_repo, autostart=False)
+
+        # get_redis() es global: otro test pudo haberlo inicializado con create_app()
+        with patch("app.services.event_service.get_redis", return_value=None):
+            service.track("pause", session_id="s1")
+
+        assert service.snapshot()["dropped"] == 1
+
+
+class TestConsumer:
+    """Tests para consume()"""
+
+    def test_question_events_bulk_insert_interactions(self, service, interaction_repo):
+        """Test: Las preguntas de un lote se insertan en una sola llamada"""
+        for index in range(3):
+            service.track(
+                "question_asked", session_id="s1", user_id="u1",
+                question_text=f"Pregunta {index}", response_time_ms=120, credits_used=1
+            )
+        service.publish()
+
+        assert service.consume() == 3
+
+        interaction_repo.insert_interactions.assert_called_once()
+        rows = interaction_repo.insert_interactions.call_args[0][0]
+        assert [row["question_text"] for row in rows] == ["Pregunta 0", "Pregunta 1", "Pregunta 2"]
+        assert rows[0]["session_id"] == "s1"
+        assert rows[0]["response_time_ms"] == 120
+        assert len({row["id"] for row in rows}) == 3
+
+    def test_consumed_entries_are_acknowledged(self, service, fake_redis):
+        """Test: Tras insertar, el lote se confirma con XACK"""
+        service.track("pause", session_id="s1")
+        service.publish()
+        service.consume()
+
+        assert fake_redis.xpending(EventService.STREAM_KEY, EventService.GROUP)["pending"] == 0
+        assert service.consume() == 0
+
+    def test_failed_insert_leaves_batch_pending(self, service, interaction_repo, fake_redis):
+        """Test: Si Supabase falla, el lote queda sin ACK y no cuenta"""
+        interaction_repo.insert_interactions.return_value = False
+        service.track("question_asked", session_id="s1", question_text="q")
+        service.publish()
+
+        assert service.consume() == 0
+        assert fake_redis.xpending(EventService.STREAM_KEY, EventService.GROUP)["pending"] == 1
+        assert fake_redis.exists(f"{EventService.SESSION_STATS_PREFIX}s1") == 0
+
+    def test_failure_backs_off_before_retrying(self, service, interaction_repo):
+        """Test: Tras un fallo no se reintenta hasta que pasa el backoff"""
+        interaction_repo.insert_interactions.return_value = False
+        service.track("question_asked", session_id="s1", question_text="q")
+        service.publish()
+        service.consume()
+        interaction_repo.insert_interactions.reset_mock()
+
+        assert service.consume() == 0
+        interaction_repo.insert_interactions.assert_not_called()
+
+    def test_retry_isolates_poison_entry(self, service, interaction_repo, fake_redis):
+        """Test: Al reintentar, las entradas válidas se confirman y la inválida queda pendiente"""
+        def insert(rows):
+            return all(row["question_text"] != "veneno" for row in rows)
+
+        interaction_repo.insert_interactions.side_effect = insert
+        for text in ("q1", "veneno", "q2"):
+            service.track("question_asked", session_id="s1", question_text=text)
+        service.publish()
+
+        assert service.consume() == 0
+        service._retry_at = 0
+        assert service.consume() == 2
+
+        pending = fake_redis.xpending_range(EventService.STREAM_KEY, EventService.GROUP, "-", "+", 10)
+        assert len(pending) == 1
+        assert fake_redis.hlen(EventService.ATTEMPTS_KEY) == 1
+
+    def test_exhausted_entry_moves_to_dead_letter(self, service, interaction_repo, fake_redis):
+        """Test: Tras max_deliveries fallos la entrada pasa al dead-letter y deja de bloquear"""
+        service.max_deliveries = 2
+        interaction_repo.insert_interactions.return_value = False
+        service.track("question_asked", session_id="s1", question_text="veneno")
+        service.publish()
+
+        for _ in range(3):
+            service._retry_at = 0
+            service.consume()
+
+        assert fake_redis.xpending(EventService.STREAM_KEY, EventService.GROUP)["pending"] == 0
+        dead = fake_redis.xrange(EventService.DEAD_LETTER_KEY)
+        assert dead[0][1]["attempts"] == "2"
+        assert service.snapshot()["dead_lettered"] == 1
+        assert fake_redis.hlen(EventService.ATTEMPTS_KEY) == 0
+
+        interaction_repo.insert_interactions.return_value = True
+        assert service.requeue_dead_letters() == 1
+        service._retry_at = 0
+        assert service.consume() == 1
+
+    def test_session_ended_writes_study_session_summary(self, service, interaction_repo, fake_redis):
+        """Test: session_ended produce un resumen con los contadores de la sesión"""
+        service.track("cache_miss", session_id="s1", user_id="u1")
+        service.track("question_asked", session_id="s1", user_id="u1", question_text="q1")
+        service.publish()
+        service.consume()
+
+        service.track("cache_hit", session_id="s1", user_id="u1")
+        service.track("question_asked", session_id="s1", user_id="u1",
+                      question_text="q2", completed=False)
+        service.track("step_reached", session_id="s1", step=0)
+        service.track("pause", session_id="s1")
+        service.track("clarification", session_id="s1", mode="brief")
+        service.track("feedback", session_id="s1", helpful=True)
+        service.track("session_ended", session_id="s1", user_id="u1",
+                      started_at="2026-01-01T10:00:00+00:00", duration_seconds=300,
+                      status="completed")
+        service.publish()
+        service.consume()
+
+        rows = interaction_repo.insert_study_sessions.call_args[0][0]
+        assert len(rows) == 1
+        summary = rows[0]
+        assert summary["id"] == "s1"
+        assert summary["user_id"] == "u1"
+        assert summary["questions_asked"] == 2
+        assert summary["questions_answered"] == 1
+        assert summary["total_duration_seconds"] == 300
+        assert summary["started_at"] == "2026-01-01T10:00:00+00:00"
+        assert summary["metadata"]["cache_hits"] == 1
+        assert summary["metadata"]["cache_misses"] == 1
+        assert summary["metadata"]["steps_reached"] == 1
+        assert summary["metadata"]["pauses"] == 1
+        assert summary["metadata"]["clarifications"] == 1
+        assert summary["metadata"]["feedback_positive"] == 1
+        # Los contadores se conservan por si la sesión se reclama tras reconectar
+        assert fake_redis.hget(f"{EventService.SESSION_STATS_PREFIX}s1", "questions_asked") == "2"
+
+
+class TestEndSession:
+    """Tests para SessionService.end_session con el pipeline de eventos"""
+
+    def test_end_session_tracks_session_ended(self, monkeypatch):
+        """Test: end_session registra session_ended con duración y estado"""
+        tracked = []
+        monkeypatch.setattr(
+            "app.services.session_service.event_service.track",
+            lambda event_type, **kwargs: tracked.append((event_type, kwargs))
+        )
+        repo = Mock()
+        repo.get.return_value = {
+            "user_id": "u1",
+            "created_at": "2026-01-01T10:00:00",
+            "is_streaming": True
+        }
+        repo.delete.return_value = True
+
+        assert SessionService(session_repo=repo).end_session("s1") is True
+
+        event_type, kwargs = tracked[0]
+        assert event_type == "session_ended"
+        assert kwargs["session_id"] == "s1"
+        assert kwargs["user_id"] == "u1"
+        assert kwargs["status"] == "abandoned"
+        assert kwargs["started_at"] == "2026-01-01T10:00:00+00:00"
+        assert kwargs["duration_seconds"] > 0
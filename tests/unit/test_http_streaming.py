@@ -0,0 +1,293 @@
+"""
+Tests unitarios para el streaming HTTP (SSE / NDJSON) de preguntas
+"""
+import json
+import time
+import pytest
+from unittest.mock import patch
+from flask import Flask
+
+from app.api.v1 import question_routes
+from app.models.answer import Answer
+from app.services.credit_service import CreditReservation
+from app.services.stream_transport import NDJSONTransport, SSETransport
+from app.services.streaming_service import StreamingService
+
+
+ANSWER = Answer.from_dict({
+    "question_hash": "hash123",
+    "question_text": "¿Qué es la energía cinética?",
+    "answer_steps": [
+        {"title": "Definición", "content": "x" * 120, "canvas_commands": [{"command": "clear"}]},
+        {"title": "Fórmula", "content": "Ec = mv²/2"}
+    ],
+    "total_duration": 45
+})
+
+
+def parse_sse(body: bytes) -> list:
+    events = []
+    for block in body.decode().strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def parse_ndjson(body: bytes) -> list:
+    return [(item["event"], item["data"]) for item in map(json.loads, body.decode().splitlines())]
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.register_blueprint(question_routes.bp)
+    with patch("app.auth.decorators.verify_token", return_value={"id": "user-1"}):
+        yield app.test_client()
+
+
+@pytest.fixture
+def services():
+    with patch.object(question_routes, "QuestionService") as question, \
+         patch.object(question_routes, "CreditService") as credits, \
+         patch.object(question_routes, "AIService") as ai, \
+         patch.object(question_routes, "AIAnswersRepository") as repo, \
+         patch.object(question_routes, "event_service"):
+        credits.return_value.reserve.return_value = CreditReservation("res-1", "user-1", "question", 1)
+        repo.return_value.create.return_value = {"id": "answer-1"}
+        yield {"question": question.return_value, "credits": credits.return_value,
+               "ai": ai.return_value, "repo": repo.return_value}
+
+
+AUTH = {"Authorization": "Bearer token"}
+
+
+class TestTransports:
+    """Tests para el framing de SSETransport y NDJSONTransport"""
+
+    def test_sse_framing(self):
+        """Test: Cada evento es un bloque event/data terminado en línea vacía"""
+        transport = SSETransport()
+        transport.send("step_complete", {"step": 0})
+
+        assert transport.drain() == b'event: step_complete\ndata: {"step":0}\n\n'
+        assert transport.drain() == b""
+
+    def test_ndjson_framing(self):
+        """Test: Un objeto JSON por línea con event y data"""
+        transport = NDJSONTransport()
+        transport.send("content_chunk", {"chunk": "línea\nnueva"})
+
+        assert parse_ndjson(transport.drain()) == [("content_chunk", {"chunk": "línea\nnueva"})]
+
+
+class TestIterAnswer:
+    """Tests para StreamingService.iter_answer"""
+
+    def test_same_events_as_socket_stream(self):
+        """Test: Misma secuencia de eventos que el streaming por Socket.IO"""
+        transport = SSETransport()
+        body = b"".join(transport.drain() for _ in StreamingService.iter_answer(ANSWER, transport))
+        names = [name for name, _ in parse_sse(body)]
+
+        assert names[0] == "explanation_start"
+        assert names[-1] == "explanation_complete"
+        assert names.count("step_start") == 2
+        assert names.count("content_chunk") == 4
+        assert "step_commands" in names
+
+    def test_yields_once_per_step(self):
+        """Test: Cede el control tras el inicio, cada paso y el final"""
+        transport = NDJSONTransport()
+        chunks = [transport.drain() for _ in StreamingService.iter_answer(ANSWER, transport)]
+
+        assert len(chunks) == 4
+        assert parse_ndjson(chunks[2])[0][0] == "step_start"
+
+    def test_invalid_answer_sends_error(self):
+        """Test: Una respuesta inválida termina con evento error"""
+        transport = NDJSONTransport()
+        chunks = [transport.drain() for _ in StreamingService.iter_answer({"answer_steps": "x"}, transport)]
+
+        assert parse_ndjson(b"".join(chunks))[-1][1]["code"] == "STREAMING_ERROR"
+
+
+class TestStreamQuestionRoute:
+    """Tests para POST /api/v1/questions/stream"""
+
+    def test_requires_auth(self, client):
+        """Test: Sin token responde 401"""
+        response = client.post("/api/v1/questions/stream", json={"question": "hola"})
+
+        assert response.status_code == 401
+
+    def test_cached_answer_redirects_to_replay(self, client, services):
+        """Test: Respuesta en cache cobra créditos y redirige a la URL cacheable"""
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": True}
+
+        response = client.post("/api/v1/questions/stream?format=ndjson",
+                               json={"question": "¿Qué es?"}, headers=AUTH)
+
+        assert response.status_code == 303
+        assert "/api/v1/questions/answers/hash123/stream?format=ndjson&expires=" in response.headers["Location"]
+        assert "signature=" in response.headers["Location"]
+        services["credits"].commit.assert_called_once()
+        services["ai"].generate_answer.assert_not_called()
+
+    def test_generates_and_streams_sse(self, client, services):
+        """Test: Sin cache genera con IA, guarda y transmite por SSE"""
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": False}
+        services["ai"].generate_answer.return_value = {
+            "steps": [step.to_dict() for step in ANSWER.steps],
+            "total_duration": 45
+        }
+
+        response = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"}, headers=AUTH)
+        events = parse_sse(response.get_data())
+
+        assert response.mimetype == "text/event-stream"
+        assert events[0][0] == "waiting_phrase"
+        assert events[-1] == ("explanation_complete", {"total_duration": 45, "steps_completed": 2})
+        services["credits"].commit.assert_called_once()
+        services["repo"].create.assert_called_once()
+
+    def test_ai_error_refunds_and_sends_error_event(self, client, services):
+        """Test: Si falla la IA devuelve créditos y envía evento error"""
+        from app.services.ai_service import AIResponseError
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": False}
+        services["ai"].generate_answer.side_effect = AIResponseError("timeout")
+
+        response = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"},
+                               headers={**AUTH, "Accept": "application/x-ndjson"})
+        events = parse_ndjson(response.get_data())
+
+        assert events[-1][1]["code"] == "AI_GENERATION_ERROR"
+        services["credits"].refund.assert_called_once()
+        services["credits"].commit.assert_not_called()
+
+    def test_invalid_ai_answer_is_refunded_before_commit(self, client, services):
+        """Test: Si la respuesta de la IA no valida no se cobra ni se guarda"""
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": False}
+        services["ai"].generate_answer.return_value = {"steps": "no es una lista", "total_duration": 45}
+
+        response = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"},
+                               headers={**AUTH, "Accept": "application/x-ndjson"})
+        events = parse_ndjson(response.get_data())
+
+        assert events[-1][1]["code"] == "PROCESSING_ERROR"
+        services["credits"].refund.assert_called_once()
+        services["credits"].commit.assert_not_called()
+        services["repo"].create.assert_not_called()
+
+    def test_insufficient_credits(self, client, services):
+        """Test: Sin créditos responde 402"""
+        from app.services.credit_service import InsufficientCreditsError
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": False}
+        services["credits"].reserve.side_effect = InsufficientCreditsError("Sin créditos", reason="daily_limit")
+
+        response = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"}, headers=AUTH)
+
+        assert response.status_code == 402
+        assert response.get_json()["reason"] == "daily_limit"
+
+
+def signed_url(question_hash="hash123", stream_format="sse", ttl=300):
+    expires = int(time.time()) + ttl
+    signature = question_routes._answer_signature(question_hash, stream_format, expires)
+    return (f"/api/v1/questions/answers/{question_hash}/stream"
+            f"?format={stream_format}&expires={expires}&signature={signature}")
+
+
+class TestStreamCachedAnswerRoute:
+    """Tests para GET /api/v1/questions/answers/<hash>/stream"""
+
+    def test_signed_url_streams_with_public_cache(self, client, services):
+        """Test: Con URL firmada responde sin JWT, cacheable en CDN y con ETag por formato"""
+        services["repo"].get_answer.return_value = ANSWER
+
+        response = client.get(signed_url(stream_format="ndjson"))
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert response.headers["Cache-Control"].startswith("public, max-age=")
+        assert response.headers["ETag"] == '"hash123-ndjson"'
+        assert parse_ndjson(response.get_data())[0][0] == "explanation_start"
+
+    def test_redirect_location_is_playable(self, client, services):
+        """Test: La URL del 303 de POST /stream es válida para el GET"""
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": True}
+        services["repo"].get_answer.return_value = ANSWER
+
+        location = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"},
+                               headers=AUTH).headers["Location"]
+
+        assert client.get(location).status_code == 200
+
+    def test_same_window_gives_same_url_to_every_user(self, client, services):
+        """Test: La URL no depende del usuario ni del segundo exacto dentro de la ventana"""
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": True}
+
+        with patch.object(question_routes.time, "time", return_value=1_000_020):
+            first = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"},
+                                headers=AUTH).headers["Location"]
+        with patch.object(question_routes.time, "time", return_value=1_000_100), \
+                patch("app.auth.decorators.verify_token", return_value={"id": "user-2"}):
+            second = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"},
+                                 headers=AUTH).headers["Location"]
+
+        assert first == second
+
+    def test_default_secret_key_in_production_is_refused(self, client, services):
+        """Test: Con el SECRET_KEY de desarrollo en producción no se emiten ni aceptan URLs"""
+        services["question"].process_question.return_value = {"question_hash": "hash123", "cached": True}
+        url = signed_url()
+
+        with patch.object(question_routes.Config, "insecure_secret_key", return_value=True):
+            post = client.post("/api/v1/questions/stream", json={"question": "¿Qué es?"}, headers=AUTH)
+            get = client.get(url)
+
+        assert post.status_code == 503
+        assert get.status_code == 503
+        services["credits"].reserve.assert_not_called()
+
+    def test_startup_fails_with_default_secret_key_in_production(self, monkeypatch):
+        """Test: Config.validate (al arrancar) rechaza el SECRET_KEY por defecto en producción"""
+        from app.config import Config
+        for var in ("PUBLIC_SUPABASE_URL", "PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY"):
+            monkeypatch.setenv(var, "x")
+        monkeypatch.setattr(Config, "ENV", "production")
+        monkeypatch.setattr(Config, "SECRET_KEY", Config.DEFAULT_SECRET_KEY)
+
+        with pytest.raises(ValueError, match="SECRET_KEY"):
+            Config.validate()
+
+        monkeypatch.setattr(Config, "SECRET_KEY", "otra-clave")
+        Config.validate()
+
+    @pytest.mark.parametrize("url", [
+        "/api/v1/questions/answers/hash123/stream",
+        signed_url(ttl=-1),
+        signed_url(question_hash="otro").replace("/otro/", "/hash123/"),
+        signed_url(stream_format="ndjson").replace("format=ndjson", "format=sse")
+    ])
+    def test_unsigned_expired_or_tampered_url_is_forbidden(self, client, services, url):
+        """Test: Sin firma, expirada o con hash/formato alterado responde 403"""
+        response = client.get(url)
+
+        assert response.status_code == 403
+        services["repo"].get_answer.assert_not_called()
+
+    def test_if_none_match_returns_304(self, client, services):
+        """Test: Con el mismo ETag responde 304 sin leer la respuesta"""
+        response = client.get(signed_url(), headers={"If-None-Match": '"hash123-sse"'})
+
+        assert response.status_code == 304
+        services["repo"].get_answer.assert_not_called()
+
+    def test_unknown_hash_returns_404(self, client, services):
+        """Test: Hash desconocido responde 404"""
+        services["repo"].get_answer.return_value = None
+
+        response = client.get(signed_url(question_hash="missing"))
+
+        assert response.status_code == 404
@@ -0,0 +1,108 @@
+"""
+Tests unitarios para el parser tolerante de JSON
+"""
+import json
+import pytest
+from app.utils.json_repair import RepairStats, extract_json_text, loads_tolerant
+
+
+class TestExtractJsonText:
+    """Tests para extract_json_text()"""
+
+    def test_drops_trailing_text_after_root_object(self):
+        """Test: Ignora texto después del cierre del objeto raíz"""
+        text = '{"a": [1, 2]} y aquí {otra cosa}'
+
+        assert json.loads(extract_json_text(text)) == {"a": [1, 2]}
+
+    def test_closes_unclosed_arrays_and_objects(self):
+        """Test: Cierra arrays y objetos de una respuesta cortada"""
+        text = '{"steps": [{"title": "A", "content": "x"}, {"title": "B", "content": "y"'
+
+        parsed = json.loads(extract_json_text(text))
+
+        assert len(parsed["steps"]) == 2
+        assert parsed["steps"][1]["content"] == "y"
+
+    def test_closes_unterminated_string(self):
+        """Test: Cierra un string cortado a la mitad"""
+        parsed = json.loads(extract_json_text('{"steps": [{"content": "La energ'))
+
+        assert parsed["steps"][0]["content"] == "La energ"
+
+    def test_removes_trailing_commas_outside_strings(self):
+        """Test: Quita comas colgantes sin tocar strings"""
+        parsed = json.loads(extract_json_text('{"a": [1, 2,], "b": "x,]",}'))
+
+        assert parsed == {"a": [1, 2], "b": "x,]"}
+
+    def test_braces_inside_strings_are_ignored(self):
+        """Test: Llaves dentro de strings no cierran el objeto"""
+        parsed = json.loads(extract_json_text('{"f": "\\\\frac{1}{2}", "n": 1} fin'))
+
+        assert parsed == {"f": "\\frac{1}{2}", "n": 1}
+
+    def test_removes_prefix_text(self):
+        """Test: Quita texto antes del JSON"""
+        assert extract_json_text('Aquí está: {"key": "value"}') == '{"key": "value"}'
+
+    def test_removes_markdown(self):
+        """Test: Quita bloques de código markdown"""
+        repaired = extract_json_text('```json\n{"key": "value"}\n```')
+
+        assert '```' not in repaired
+        assert json.loads(repaired) == {"key": "value"}
+
+    def test_strips_whitespace(self):
+        """Test: Quita espacios en blanco alrededor"""
+        assert extract_json_text('  \n  {"key": "value"}  \n  ') == '{"key": "value"}'
+
+
+class TestLoadsTolerant:
+    """Tests para loads_tolerant()"""
+
+    def test_valid_json_is_not_marked_as_repaired(self):
+        """Test: JSON válido no cuenta como reparado"""
+        assert loads_tolerant('{"a": 1}') == ({"a": 1}, False)
+
+    def test_json_with_extra_text_is_repaired(self):
+        """Test: Parsea JSON rodeado de texto y lo marca como reparado"""
+        response = 'Aquí está el JSON: {"steps": [], "total_duration": 60} Espero que ayude'
+
+        assert loads_tolerant(response) == ({"steps": [], "total_duration": 60}, True)
+
+    def test_json_inside_markdown_is_repaired(self):
+        """Test: Parsea JSON dentro de un bloque markdown"""
+        parsed, repaired = loads_tolerant('```json\n{"steps": [], "total_duration": 60}\n```')
+
+        assert parsed["steps"] == []
+        assert repaired is True
+
+    def test_unrecoverable_text_raises(self):
+        """Test: Texto sin JSON lanza JSONDecodeError"""
+        with pytest.raises(json.JSONDecodeError):
+            loads_tolerant("not json at all")
+
+
+class TestRepairStats:
+    """Tests para RepairStats"""
+
+    def test_snapshot_counts(self):
+        """Test: Cuenta respuestas limpias, reparadas y corregidas por llamada"""
+        stats = RepairStats()
+
+        stats.record_response([])
+        stats.record_response(["syntax", "step_type"])
+        stats.record_fix_call(120.0)
+        stats.record_response([], fixed_by_call=True)
+        stats.record_failure()
+
+        snapshot = stats.snapshot()
+        assert snapshot["responses"] == 3
+        assert snapshot["clean"] == 1
+        assert snapshot["repaired"] == 1
+        assert snapshot["repairs_by_kind"] == {"syntax": 1, "step_type": 1}
+        assert snapshot["fix_calls"] == 1
+        assert snapshot["fix_call_successes"] == 1
+        assert snapshot["avg_fix_call_ms"] == 120.0
+        assert snapshot["failures"] == 1
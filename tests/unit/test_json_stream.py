@@ -0,0 +1,59 @@
+"""
+Tests unitarios para el parser incremental de JSON
+"""
+import json
+from app.utils.json_stream import StreamingJSONParser
+
+
+def _feed_in_chunks(parser, text, size):
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return events
+
+
+class TestStreamingJSONParser:
+    """Tests para StreamingJSONParser"""
+
+    def test_array_items_are_emitted_as_soon_as_they_close(self):
+        """Test: Cada paso se emite al cerrarse, antes del final del JSON"""
+        parser = StreamingJSONParser(stream_arrays=["clarification_steps"])
+        first = '{"mode": "detailed", "clarification_steps": [{"title": "A {x}", "content": "uno"},'
+
+        events = parser.feed(first)
+
+        assert events == [("array_item", "clarification_steps", {"title": "A {x}", "content": "uno"})]
+
+    def test_nested_arrays_inside_items_are_kept(self):
+        """Test: Los arrays anidados de un paso no se emiten por separado"""
+        data = {
+            "clarification_steps": [
+                {"title": "A", "canvas_commands": [{"type": "draw_axis"}]},
+                {"title": "B", "canvas_commands": None}
+            ],
+            "total_duration": 90
+        }
+        parser = StreamingJSONParser(stream_arrays=["clarification_steps"])
+
+        events = _feed_in_chunks(parser, json.dumps(data), 3)
+
+        assert [event[2] for event in events] == data["clarification_steps"]
+        assert json.loads(parser.text) == data
+
+    def test_string_deltas_decode_escapes_split_across_chunks(self):
+        """Test: El texto se entrega decodificado aunque un escape quede partido"""
+        data = {"mode": "brief", "message": "Hola \"mundo\"\né ✓", "is_deferred": False}
+        parser = StreamingJSONParser(stream_strings=["message"])
+
+        events = _feed_in_chunks(parser, json.dumps(data, ensure_ascii=True), 4)
+
+        assert all(kind == "string_delta" and key == "message" for kind, key, _ in events)
+        assert "".join(text for _, _, text in events) == data["message"]
+
+    def test_ignores_fields_not_requested(self):
+        """Test: Strings de otros campos o anidados no se emiten"""
+        parser = StreamingJSONParser(stream_strings=["message"])
+
+        events = parser.feed('{"reason": "x", "meta": {"message": "anidado"}, "message": "ok"}')
+
+        assert events == [("string_delta", "message", "ok")]
@@ -0,0 +1,243 @@
+"""
+Tests unitarios para las métricas Prometheus
+"""
+import json
+import time
+
+import fakeredis
+import pytest
+from flask import Flask
+
+from app import InstrumentedSocketIO, _metrics_authorized
+from app.utils.metrics import (
+    REDIS_COMMANDS,
+    InstrumentedRedis,
+    MetricsRegistry,
+    instrument,
+    instrument_repository,
+    merge_snapshots,
+    metrics,
+    render
+)
+
+
+@pytest.fixture
+def fake_redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def make_registry(redis_client=None, worker_id="host:1"):
+    registry = MetricsRegistry(enabled=True, redis_client=redis_client, host="host", autostart=False)
+    registry.worker_id = worker_id
+    registry.counter("events_total", "Eventos", ("event",))
+    registry.gauge("streams_active", "Streams")
+    registry.histogram("latency_seconds", "Latencia", ("event",), buckets=(0.1, 1.0))
+    return registry
+
+
+def family(registry, name):
+    return registry._metrics["guiaipn_" + name]
+
+
+class TestRegistry:
+    """Tests para el registro y el formato de exposición"""
+
+    def test_histogram_exposition_is_cumulative(self):
+        """Test: Buckets acumulados con +Inf, _sum y _count"""
+        registry = make_registry()
+        histogram = family(registry, "latency_seconds")
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.labels("ask_question").observe(value)
+
+        text = render(registry.collect())
+
+        assert '# TYPE guiaipn_latency_seconds histogram' in text
+        assert 'guiaipn_latency_seconds_bucket{event="ask_question",le="0.1"} 2' in text
+        assert 'guiaipn_latency_seconds_bucket{event="ask_question",le="1"} 3' in text
+        assert 'guiaipn_latency_seconds_bucket{event="ask_question",le="+Inf"} 4' in text
+        assert 'guiaipn_latency_seconds_sum{event="ask_question"} 3.65' in text
+        assert 'guiaipn_latency_seconds_count{event="ask_question"} 4' in text
+
+    def test_label_values_are_escaped_and_arity_checked(self):
+        """Test: Comillas escapadas; número de labels incorrecto es error"""
+        registry = make_registry()
+        family(registry, "events_total").labels('di "hola"').inc()
+
+        assert 'guiaipn_events_total{event="di \\"hola\\""} 1' in render(registry.collect())
+        with pytest.raises(ValueError):
+            family(registry, "events_total").labels("a", "b")
+
+    def test_merge_sums_counters_histograms_and_gauges(self):
+        """Test: Los snapshots de varios workers se suman bucket a bucket"""
+        first, second = make_registry(), make_registry()
+        for registry, value in ((first, 0.05), (second, 2.0)):
+            family(registry, "events_total").labels("ask_question").inc()
+            family(registry, "latency_seconds").labels("ask_question").observe(value)
+            family(registry, "streams_active").inc()
+
+        merged = merge_snapshots([first.collect(), second.collect()])
+
+        assert merged["guiaipn_events_total"]["samples"] == [[["ask_question"], 2.0]]
+        assert merged["guiaipn_latency_seconds"]["samples"][0][1] == [1, 0, 1]
+        assert merged["guiaipn_streams_active"]["samples"] == [[[], 2.0]]
+        assert "guiaipn_streams_active" not in merge_snapshots([first.collect()], include_gauges=False)
+
+    def test_ratio_is_computed_over_merged_totals(self):
+        """Test: El ratio de aciertos se calcula sobre los totales, no por worker"""
+        registry = make_registry()
+        hits = registry.counter("cache_hits_total", "Aciertos", ("cache", "tier"))
+        misses = registry.counter("cache_misses_total", "Fallos", ("cache",))
+        registry.register_ratio("cache_hit_ratio", "Ratio", hits, misses, "cache")
+        hits.labels("answers", "memory").set(6)
+        hits.labels("answers", "redis").set(2)
+        misses.labels("answers").set(2)
+
+        assert 'guiaipn_cache_hit_ratio{cache="answers"} 0.8' in registry.render_latest()
+
+
+class TestWorkerAggregation:
+    """Tests para la agregación entre workers vía Redis"""
+
+    def test_scrape_sums_all_workers_of_the_host(self, fake_redis):
+        """Test: Cualquier worker que atienda el scrape devuelve el total del host"""
+        first = make_registry(fake_redis, "host:1")
+        second = make_registry(fake_redis, "host:2")
+        family(first, "events_total").labels("ask_question").inc(3)
+        family(second, "events_total").labels("ask_question").inc(4)
+        assert second.publish()
+
+        text = first.render_latest()
+
+        assert 'guiaipn_events_total{event="ask_question"} 7' in text
+        assert set(fake_redis.hkeys(first.key)) == {"host:1", "host:2"}
+
+    def test_dead_worker_counters_are_retired_not_lost(self, fake_redis):
+        """Test: Un worker que dejó de publicar conserva sus contadores y pierde sus gauges"""
+        first = make_registry(fake_redis, "host:1")
+        dead = make_registry(fake_redis, "host:2")
+        family(dead, "events_total").labels("ask_question").inc(5)
+        family(dead, "streams_active").inc(2)
+        fake_redis.hset(first.key, "host:2", json.dumps({"ts": time.time() - 1000, "metrics": dead.collect()}))
+        family(first, "events_total").labels("ask_question").inc(1)
+
+        text = first.render_latest()
+        again = first.render_latest()
+
+        assert 'guiaipn_events_total{event="ask_question"} 6' in text
+        assert 'guiaipn_events_total{event="ask_question"} 6' in again
+        assert "guiaipn_streams_active 2" not in text
+        assert set(fake_redis.hkeys(first.key)) == {"host:1", MetricsRegistry.RETIRED_FIELD}
+
+    def test_after_fork_child_starts_from_zero(self):
+        """Test: El hijo de un fork no hereda los valores del padre"""
+        registry = make_registry()
+        family(registry, "events_total").labels("connect").inc()
+
+        registry._after_fork()
+
+        assert registry.collect()["guiaipn_events_total"]["samples"] == []
+
+
+class TestInstrumentation:
+    """Tests para los decoradores e instrumentación de clientes"""
+
+    @pytest.fixture
+    def registry(self):
+        registry = make_registry()
+        registry.counter("calls_total", "Llamadas", ("method", "outcome"))
+        registry.histogram("first_item_seconds", "Primer elemento", ("method",))
+        return registry
+
+    def test_generator_records_first_item_and_cancellation(self, registry):
+        """Test: Mide el primer elemento y marca como cancelado un stream abandonado"""
+        calls = family(registry, "calls_total")
+        first_item = family(registry, "first_item_seconds")
+
+        @instrument(calls, family(registry, "latency_seconds"), "stream", first_item=first_item)
+        def stream():
+            yield "a"
+            yield "b"
+
+        assert list(stream()) == ["a", "b"]
+        abandoned = stream()
+        next(abandoned)
+        abandoned.close()
+
+        assert calls.labels("stream", "ok").value == 1
+        assert calls.labels("stream", "cancelled").value == 1
+        assert sum(first_item.labels("stream").counts) == 2
+
+    def test_errors_are_counted_and_reraised(self, registry):
+        """Test: Una excepción se cuenta como error y se propaga"""
+        calls = family(registry, "calls_total")
+
+        @instrument(calls, family(registry, "latency_seconds"), "boom")
+        def boom():
+            raise RuntimeError("falló")
+
+        with pytest.raises(RuntimeError):
+            boom()
+        assert calls.labels("boom", "error").value == 1
+
+    def test_repository_public_methods_are_wrapped(self):
+        """Test: Solo los métodos públicos del repositorio se instrumentan"""
+        @instrument_repository
+        class DemoRepository:
+            def get(self):
+                return "fila"
+
+            def _private(self):
+                return "interno"
+
+        assert DemoRepository().get() == "fila"
+        assert DemoRepository.get.__wrapped__.__name__ == "get"
+        assert not hasattr(DemoRepository._private, "__wrapped__")
+
+    def test_redis_commands_and_pipelines(self, fake_redis):
+        """Test: Cada comando cuenta por nombre y un pipeline como un round-trip"""
+        client = InstrumentedRedis(connection_pool=fake_redis.connection_pool)
+        metrics.reset()
+
+        client.set("clave", "valor")
+        client.get("clave")
+        pipe = client.pipeline()
+        pipe.get("clave").incr("contador")
+        pipe.execute()
+
+        assert REDIS_COMMANDS.labels("SET", "ok").value == 1
+        assert REDIS_COMMANDS.labels("GET", "ok").value == 1
+        assert REDIS_COMMANDS.labels("PIPELINE", "ok").value == 1
+        assert REDIS_COMMANDS.labels("INCR", "ok").value == 0
+
+    def test_socketio_on_registers_instrumented_handler(self):
+        """Test: @socketio.on devuelve el handler original y registra uno medido"""
+        socketio = InstrumentedSocketIO()
+
+        @socketio.on("ping_event")
+        def handle_ping(data):
+            return data
+
+        event, registered, _ = socketio.handlers[-1]
+        assert event == "ping_event"
+        assert registered.__wrapped__ is not handle_ping
+        assert registered.__wrapped__.__wrapped__ is handle_ping
+        assert handle_ping("x") == "x"
+
+
+class TestMetricsAccess:
+    """Tests para el acceso a /metrics"""
+
+    @pytest.mark.parametrize("env, token, header, allowed", [
+        ("development", "", None, True),
+        ("production", "", None, False),
+        ("production", "secreto", "Bearer secreto", True),
+        ("production", "secreto", "Bearer otro", False),
+        ("development", "secreto", None, False),
+    ])
+    def test_token_is_required_in_production(self, env, token, header, allowed):
+        """Test: Sin METRICS_TOKEN /metrics solo es público fuera de producción"""
+        config = type("Config", (), {"ENV": env, "METRICS_TOKEN": token})
+        headers = {"Authorization": header} if header else {}
+
+        with Flask(__name__).test_request_context("/metrics", headers=headers):
+            assert _metrics_authorized(config) is allowed
@@ -0,0 +1,188 @@
+"""
+Tests unitarios para ProgressService (agregado incremental de user_progress)
+"""
+import pytest
+import fakeredis
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+from app.services.progress_service import ProgressService
+from app.services.exam_service import ExamService
+
+
+NOW = datetime(2026, 3, 10, 12, 0, 0)
+
+
+@pytest.fixture
+def fake_redis():
+    """Fixture que proporciona un cliente Redis falso"""
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+@pytest.fixture
+def progress_repo():
+    """Repositorio con progreso previo en física"""
+    repo = Mock()
+    repo.get_by_user.return_value = [{
+        "subject": "fisica",
+        "total_practiced": 4,
+        "total_correct": 2,
+        "mastery_level": 0.5,
+        "streak_days": 2,
+        "last_practice_at": (NOW - timedelta(days=1)).isoformat()
+    }]
+    repo.upsert_batch.return_value = True
+    return repo
+
+
+@pytest.fixture
+def service(fake_redis, progress_repo):
+    """Servicio con flush manual"""
+    service = ProgressService(redis_client=fake_redis, progress_repo=progress_repo, flusher=Mock())
+    service.batch_size = 100
+    return service
+
+
+class TestRecordAnswer:
+    """Tests para record_answer()"""
+
+    def test_loads_existing_progress_once(self, service, progress_repo):
+        """Test: El agregado se carga de user_progress solo la primera vez"""
+        service.record_answer("u1", "fisica", True, answered_at=NOW)
+        service.record_answer("u1", "fisica", False, answered_at=NOW)
+
+        progress_repo.get_by_user.assert_called_once_with("u1")
+
+    def test_counters_and_mastery_update_incrementally(self, service):
+        """Test: Contadores y mastery se actualizan a partir del agregado previo"""
+        result = service.record_answer("u1", "fisica", True, answered_at=NOW)
+
+        assert result["total_practiced"] == 5
+        assert result["total_correct"] == 3
+        # alpha = max(1/5, 0.1) = 0.2 -> 0.5 + 0.2 * (1 - 0.5)
+        assert result["mastery_level"] == 0.6
+
+    def test_new_subject_starts_from_zero(self, service):
+        """Test: Una materia sin fila previa arranca en cero"""
+        result = service.record_answer("u1", "quimica", True, answered_at=NOW)
+
+        assert result["total_practiced"] == 1
+        assert result["mastery_level"] == 1.0
+        assert result["streak_days"] == 1
+
+    def test_streak_counts_consecutive_days(self, service):
+        """Test: Practicar el día siguiente extiende la racha; el mismo día no"""
+        assert service.record_answer("u1", "fisica", True, answered_at=NOW)["streak_days"] == 3
+        assert service.record_answer("u1", "fisica", True, answered_at=NOW)["streak_days"] == 3
+        next_day = NOW + timedelta(days=1)
+        assert service.record_answer("u1", "fisica", True, answered_at=next_day)["streak_days"] == 4
+
+    def test_streak_resets_after_missed_day(self, service):
+        """Test: Saltarse un día reinicia la racha"""
+        result = service.record_answer("u1", "fisica", True, answered_at=NOW + timedelta(days=2))
+
+        assert result["streak_days"] == 1
+
+
+class TestFlush:
+    """Tests para flush()"""
+
+    def test_flush_upserts_dirty_subjects_in_one_batch(self, service, progress_repo):
+        """Test: Las materias modificadas se escriben en un solo upsert"""
+        service.record_answer("u1", "fisica", True, answered_at=NOW)
+        service.record_answer("u1", "quimica", False, answered_at=NOW)
+        service.record_answer("u2", "fisica", True, answered_at=NOW)
+
+        assert service.flush() == 3
+
+        progress_repo.upsert_batch.assert_called_once()
+        rows = progress_repo.upsert_batch.call_args[0][0]
+        assert {(row["user_id"], row["subject"]) for row in rows} == {
+            ("u1", "fisica"), ("u1", "quimica"), ("u2", "fisica")
+        }
+        assert service.flush() == 0
+
+    def test_failed_flush_keeps_subjects_dirty(self, service, progress_repo, fake_redis):
+        """Test: Si el upsert falla, las materias siguen pendientes"""
+        progress_repo.upsert_batch.return_value = False
+        service.record_answer("u1", "fisica", True, answered_at=NOW)
+
+        assert service.flush() == 0
+        assert fake_redis.smembers(ProgressService.DIRTY_KEY) == {"u1|fisica"}
+
+    def test_record_answer_never_flushes_inline(self, service, progress_repo):
+        """Test: Al completar un lote se despierta al hilo de flush, sin upsert en el request"""
+        service.batch_size = 2
+
+        service.record_answer("u1", "fisica", True, answered_at=NOW)
+        service.flusher.wake.assert_not_called()
+        service.record_answer("u1", "quimica", True, answered_at=NOW)
+
+        service.flusher.wake.assert_called_once()
+        progress_repo.upsert_batch.assert_not_called()
+
+
+class TestGetProgress:
+    """Tests para get_progress()"""
+
+    def test_reads_from_aggregate(self, service, progress_repo):
+        """Test: La consulta sale del agregado sin volver a la base de datos"""
+        service.record_answer("u1", "fisica", True, answered_at=NOW)
+        progress_repo.get_by_user.reset_mock()
+
+        progress = service.get_progress("u1")
+
+        progress_repo.get_by_user.assert_not_called()
+        assert [item["subject"] for item in progress] == ["fisica"]
+        assert progress[0]["total_practiced"] == 5
+
+    def test_filters_by_subject(self, service):
+        """Test: Se puede pedir una sola materia"""
+        service.record_answer("u1", "quimica", True, answered_at=NOW)
+
+        assert [item["subject"] for item in service.get_progress("u1", "quimica")] == ["quimica"]
+        assert service.get_progress("u1", "historia") == []
+
+    def test_without_redis_reads_rows(self, progress_repo):
+        """Test: Sin Redis se responde con las filas de user_progress"""
+        service = ProgressService(progress_repo=progress_repo, flusher=Mock())
+
+        # get_redis() es global: otro test pudo haberlo inicializado con create_app()
+        with patch("app.services.progress_service.get_redis", return_value=None):
+            progress = service.get_progress("u1")
+
+        assert progress[0]["subject"] == "fisica"
+        assert progress[0]["accuracy"] == 0.5
+
+
+class TestExamServiceProgress:
+    """Tests para la integración con ExamService.validate_answer"""
+
+    def test_validate_answer_records_progress(self):
+        """Test: Responder una pregunta actualiza el progreso de su materia"""
+        question_repo = Mock()
+        question_repo.get_by_id.return_value = {"correct_answer": "b", "subject": "fisica"}
+        progress_service = Mock()
+        service = ExamService(
+            question_repo=question_repo,
+            explanation_repo=Mock(),
+            progress_service=progress_service
+        )
+
+        result = service.validate_answer("q1", "b", user_id="u1")
+
+        assert result["correct"] is True
+        progress_service.record_answer.assert_called_once_with("u1", "fisica", True)
+
+    def test_progress_errors_do_not_break_validation(self):
+        """Test: Un error de progreso no impide validar la respuesta"""
+        question_repo = Mock()
+        question_repo.get_by_id.return_value = {"correct_answer": "b", "subject": "fisica"}
+        progress_service = Mock()
+        progress_service.record_answer.side_effect = ConnectionError("down")
+        service = ExamService(
+            question_repo=question_repo,
+            explanation_repo=Mock(),
+            progress_service=progress_service
+        )
+
+        assert service.validate_answer("q1", "a", user_id="u1")["correct"] is False
@@ -0,0 +1,105 @@
+"""
+Tests unitarios para el ensamblado de prompts con prefijo estático
+"""
+import pytest
+from unittest.mock import Mock
+from app.prompts import (
+    get_exam_question_messages,
+    get_clarification_messages,
+    get_follow_up_messages
+)
+from app.prompts.assembly import PromptAssembler
+
+
+QUESTION = {
+    "subject": "matematicas",
+    "difficulty": "easy",
+    "topic": "algebra",
+    "question": "Resuelve 2x + 4 = 10",
+    "options": {"a": "2", "b": "3", "c": "4", "d": "5"},
+    "correct_answer": "b"
+}
+
+
+class TestPromptAssembler:
+    """Tests para PromptAssembler"""
+    
+    def test_register_compiles_prefix_once(self):
+        """Test: La plantilla registra su prefijo y su tamaño en tokens"""
+        assembler = PromptAssembler()
+        compiled = assembler.register("demo", "  Instrucciones estáticas  ")
+        
+        assert compiled.system == "Instrucciones estáticas"
+        assert compiled.system_tokens > 0
+    
+    def test_build_messages_and_stats(self):
+        """Test: Arma system + user y cuenta tokens del sufijo"""
+        assembler = PromptAssembler()
+        assembler.register("demo", "Instrucciones")
+        
+        messages = assembler.build_messages("demo", "Pregunta: hola")
+        
+        assert messages[0] == {"role": "system", "content": "Instrucciones"}
+        assert messages[1] == {"role": "user", "content": "Pregunta: hola"}
+        stats = assembler.stats("demo")
+        assert stats["requests"] == 1
+        assert stats["avg_suffix_tokens"] > 0
+    
+    def test_record_usage_tracks_cached_tokens(self):
+        """Test: Registra tokens cacheados reportados por el proveedor"""
+        assembler = PromptAssembler()
+        assembler.register("demo", "Instrucciones")
+        usage = Mock(prompt_tokens=1200, completion_tokens=300)
+        usage.prompt_tokens_details = Mock(cached_tokens=1024)
+        
+        assembler.record_usage("demo", usage)
+        
+        stats = assembler.stats("demo")
+        assert stats["provider_cached_tokens"] == 1024
+        assert stats["cached_token_ratio"] == pytest.approx(1024 / 1200, abs=1e-4)
+    
+    def test_record_usage_ignores_missing_usage(self):
+        """Test: Respuestas sin usage no rompen las métricas"""
+        assembler = PromptAssembler()
+        assembler.register("demo", "Instrucciones")
+        
+        assembler.record_usage("demo", None)
+        assembler.record_usage("demo", Mock())
+        
+        assert assembler.stats("demo")["provider_prompt_tokens"] == 0
+
+
+class TestPromptPrefixes:
+    """Tests para la separación prefijo estático / sufijo variable"""
+    
+    def test_exam_prefix_is_stable_across_questions(self):
+        """Test: El prefijo de examen no cambia entre preguntas"""
+        other = dict(QUESTION, question="¿Cuánto es 3 + 3?")
+        
+        first = get_exam_question_messages(QUESTION, "a")
+        second = get_exam_question_messages(other)
+        
+        assert first[0] == second[0]
+        assert first[0]["role"] == "system"
+        assert "CANVAS COMMANDS" in first[0]["content"]
+        assert "Resuelve 2x + 4 = 10" in first[1]["content"]
+        assert "CANVAS COMMANDS" not in first[1]["content"]
+    
+    def test_follow_up_suffix_contains_only_request_data(self):
+        """Test: El sufijo de follow-up solo lleva contexto y pregunta"""
+        messages = get_follow_up_messages("¿Y si fuera 3x?", QUESTION)
+        
+        assert "¿Y si fuera 3x?" in messages[1]["content"]
+        assert "FORMATO DE RESPUESTA" not in messages[1]["content"]
+        assert "FORMATO DE RESPUESTA" in messages[0]["content"]
+    
+    def test_clarification_modes_use_distinct_prefixes(self):
+        """Test: Cada modo de aclaración tiene su propio prefijo estable"""
+        brief = get_clarification_messages("¿Qué es x?", {"topic": "algebra"}, "brief")
+        detailed = get_clarification_messages("¿Qué es x?", {"topic": "algebra"}, "detailed")
+        unknown = get_clarification_messages("¿Qué es x?", {}, "otro")
+        
+        assert "MODO ACTUAL: BRIEF" in brief[0]["content"]
+        assert "MODO ACTUAL: DETAILED" in detailed[0]["content"]
+        assert unknown[0] == brief[0]
+        assert brief[1]["content"] == detailed[1]["content"]
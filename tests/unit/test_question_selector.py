@@ -0,0 +1,162 @@
+"""
+Tests unitarios para el selector adaptativo de preguntas
+"""
+import pytest
+import fakeredis
+from unittest.mock import Mock
+from app.services.question_selector import QuestionSelector, SubjectIndex
+from app.services.exam_service import ExamService
+
+
+def make_rows():
+    """Banco pequeño: una pregunta fácil muy acertada y una difícil muy fallada"""
+    return [
+        {"id": "easy-1", "difficulty": "easy", "times_seen": 100, "times_correct": 95,
+         "exam_probability": 0.5},
+        {"id": "medium-1", "difficulty": "medium", "times_seen": 100, "times_correct": 50,
+         "exam_probability": 0.5},
+        {"id": "hard-1", "difficulty": "hard", "times_seen": 100, "times_correct": 8,
+         "exam_probability": 0.5},
+    ]
+
+
+@pytest.fixture
+def fake_redis():
+    """Fixture que proporciona un cliente Redis falso"""
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+@pytest.fixture
+def question_repo():
+    repo = Mock()
+    repo.get_stats_by_subject.return_value = make_rows()
+    return repo
+
+
+@pytest.fixture
+def selector(question_repo, fake_redis):
+    """Selector determinista (TOP_K = 1 elige siempre el mejor puntaje)"""
+    selector = QuestionSelector(
+        question_repo=question_repo, redis_client=fake_redis,
+        index_ttl=3600, recent_window=2, seed=7
+    )
+    selector.TOP_K = 1
+    return selector
+
+
+class TestSubjectIndex:
+    """Tests para SubjectIndex"""
+
+    def test_difficulty_uses_observed_success_rate(self):
+        """Test: Con muchas respuestas, la dificultad sigue la tasa de error"""
+        index = SubjectIndex("fisica", make_rows())
+
+        assert index.difficulty[0] < index.difficulty[1] < index.difficulty[2]
+        assert index.difficulty[2] > 0.75
+
+    def test_zero_exam_probability_is_kept(self):
+        """Test: exam_probability = 0 no se confunde con un valor ausente"""
+        index = SubjectIndex("fisica", [
+            {"id": "never", "exam_probability": 0},
+            {"id": "unknown", "exam_probability": None}
+        ])
+
+        assert index.bonus[0] < index.bonus[1]
+        assert index.bonus[1] - index.bonus[0] == pytest.approx(index.EXAM_WEIGHT * 0.5)
+
+    def test_unseen_questions_use_labelled_difficulty(self):
+        """Test: Sin respuestas, la dificultad es la del nivel etiquetado"""
+        index = SubjectIndex("fisica", [{"id": "q", "difficulty": "hard"}])
+
+        assert index.difficulty[0] == pytest.approx(0.75)
+
+    def test_empty_bank(self):
+        """Test: Una materia sin preguntas produce un índice vacío"""
+        assert len(SubjectIndex("fisica", [])) == 0
+
+
+class TestSelect:
+    """Tests para QuestionSelector.select()"""
+
+    def test_low_mastery_gets_easier_question(self, selector):
+        """Test: Un usuario sin dominio recibe la pregunta más fácil"""
+        assert selector.select("fisica", mastery=0.0) == "easy-1"
+
+    def test_high_mastery_gets_harder_question(self, selector):
+        """Test: Un usuario con dominio alto recibe la pregunta difícil"""
+        assert selector.select("fisica", mastery=1.0) == "hard-1"
+
+    def test_recent_questions_are_excluded(self, selector):
+        """Test: Las preguntas recientes no se repiten mientras haya otras"""
+        assert selector.select("fisica", mastery=0.0, exclude=["easy-1"]) == "medium-1"
+
+    def test_all_recent_allows_repeats(self, selector):
+        """Test: Si ya vio todas, se permite repetir"""
+        question_id = selector.select("fisica", mastery=0.0, exclude=["easy-1", "medium-1", "hard-1"])
+
+        assert question_id == "easy-1"
+
+    def test_difficulty_filter(self, selector):
+        """Test: El filtro de dificultad limita las candidatas"""
+        assert selector.select("fisica", mastery=0.0, difficulty="hard") == "hard-1"
+
+    def test_index_is_cached(self, selector, question_repo):
+        """Test: El índice de la materia se construye una sola vez"""
+        selector.select("fisica")
+        selector.select("fisica", mastery=0.5)
+
+        question_repo.get_stats_by_subject.assert_called_once_with("fisica")
+
+    def test_empty_subject_returns_none(self, selector, question_repo):
+        """Test: Sin preguntas no hay selección"""
+        question_repo.get_stats_by_subject.return_value = []
+
+        assert selector.select("historia") is None
+
+
+class TestRecent:
+    """Tests para la lista de preguntas recientes"""
+
+    def test_mark_served_keeps_window(self, selector):
+        """Test: La lista conserva solo las últimas recent_window preguntas"""
+        for question_id in ("easy-1", "medium-1", "hard-1"):
+            selector.mark_served("u1", "fisica", question_id)
+
+        assert selector.get_recent("u1", "fisica") == ["hard-1", "medium-1"]
+
+
+class TestExamServiceSelection:
+    """Tests para ExamService.get_random_question con selector"""
+
+    def test_uses_selector_with_user_mastery(self, selector):
+        """Test: Con user_id se elige según el mastery del usuario y se marca como vista"""
+        question_repo = Mock()
+        question_repo.get_by_id.side_effect = lambda question_id: {"id": question_id}
+        progress_service = Mock()
+        progress_service.get_progress.return_value = [{"mastery_level": 1.0}]
+        service = ExamService(
+            question_repo=question_repo,
+            explanation_repo=Mock(),
+            progress_service=progress_service,
+            selector=selector
+        )
+
+        question = service.get_random_question("fisica", user_id="u1")
+
+        assert question == {"id": "hard-1"}
+        assert selector.get_recent("u1", "fisica") == ["hard-1"]
+        question_repo.get_random_by_subject.assert_not_called()
+
+    def test_without_user_uses_uniform_draw(self, selector):
+        """Test: Sin user_id se mantiene el sorteo uniforme"""
+        question_repo = Mock()
+        service = ExamService(
+            question_repo=question_repo,
+            explanation_repo=Mock(),
+            progress_service=Mock(),
+            selector=selector
+        )
+
+        service.get_random_question("fisica", "easy")
+
+        question_repo.get_random_by_subject.assert_called_once_with("fisica", "easy")
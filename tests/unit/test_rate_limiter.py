@@ -0,0 +1,156 @@
+"""
+Tests unitarios para el rate limiter (ventana deslizante + token bucket local)
+"""
+import pytest
+from unittest.mock import Mock, patch
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.auth.decorators import VerifiedUser
+from app.utils.rate_limiter import (
+    RateLimiter, TokenBucket, rate_limit_http, SLIDING_WINDOW_SCRIPT, _socket_identifier, get_client_ip
+)
+
+
+@pytest.fixture
+def redis_script():
+    """Script Lua falso: devuelve lo que el test configure"""
+    script = Mock(return_value=[1, 4, 0])
+    client = Mock()
+    client.register_script.return_value = script
+    return client, script
+
+
+class TestTokenBucket:
+    """Tests para TokenBucket"""
+
+    def test_allows_up_to_capacity_then_denies(self):
+        """Test: El bucket permite `capacity` peticiones seguidas"""
+        bucket = TokenBucket(capacity=3, window=60)
+
+        results = [bucket.consume()[0] for _ in range(4)]
+
+        assert results == [True, True, True, False]
+
+    def test_refills_over_time(self):
+        """Test: Recupera tokens según la tasa límite/ventana"""
+        with patch("app.utils.rate_limiter.time.monotonic", side_effect=[0.0, 0.0, 0.0, 30.0]):
+            bucket = TokenBucket(capacity=2, window=60)
+            bucket.consume()
+            bucket.consume()
+
+            allowed, _ = bucket.consume()
+
+        assert allowed is True
+
+
+class TestRateLimiter:
+    """Tests para RateLimiter.check_limit()"""
+
+    def test_single_round_trip_to_lua_script(self, redis_script):
+        """Test: Cada verificación es una sola llamada al script atómico"""
+        client, script = redis_script
+        limiter = RateLimiter(redis_client=client, limits={"questions": (5, 60)})
+
+        result = limiter.check_limit("user-1", "questions")
+
+        assert result == (True, 4, 0)
+        client.register_script.assert_called_once_with(SLIDING_WINDOW_SCRIPT)
+        kwargs = script.call_args.kwargs
+        assert kwargs["keys"] == ["rate_limit:user-1:questions"]
+        assert kwargs["args"][:2] == [5, 60000]
+
+    def test_denied_by_redis_returns_retry_after_seconds(self, redis_script):
+        """Test: Traduce retry_ms del script a segundos"""
+        client, script = redis_script
+        script.return_value = [0, 0, 1500]
+        limiter = RateLimiter(redis_client=client, limits={"questions": (5, 60)})
+
+        assert limiter.check_limit("user-1", "questions") == (False, 0, 2)
+
+    def test_local_bucket_short_circuits_redis(self, redis_script):
+        """Test: Si el bucket local está vacío no se consulta Redis"""
+        client, script = redis_script
+        limiter = RateLimiter(redis_client=client, limits={"follow_ups": (2, 60)})
+
+        limiter.check_limit("user-1", "follow_ups")
+        limiter.check_limit("user-1", "follow_ups")
+        allowed, remaining, retry_after = limiter.check_limit("user-1", "follow_ups")
+
+        assert allowed is False
+        assert retry_after >= 1
+        assert script.call_count == 2
+
+    def test_actions_have_independent_limits(self, redis_script):
+        """Test: Cada acción usa su propio límite y clave"""
+        client, script = redis_script
+        limiter = RateLimiter(redis_client=client, limits={"questions": (1, 60), "clarifications": (1, 60)})
+
+        assert limiter.check_limit("user-1", "questions")[0] is True
+        assert limiter.check_limit("user-1", "clarifications")[0] is True
+        assert limiter.check_limit("user-1", "questions")[0] is False
+
+    def test_redis_error_falls_back_to_local_bucket(self, redis_script):
+        """Test: Con Redis caído el bucket local sigue acotando"""
+        client, script = redis_script
+        script.side_effect = ConnectionError("redis down")
+        limiter = RateLimiter(redis_client=client, limits={"questions": (1, 60)})
+
+        assert limiter.check_limit("user-1", "questions")[0] is True
+        assert limiter.check_limit("user-1", "questions")[0] is False
+
+
+class TestRateLimitHttp:
+    """Tests para el decorador rate_limit_http"""
+
+    def test_returns_429_with_retry_after(self):
+        """Test: Excedido el límite responde 429 y Retry-After"""
+        app = Flask(__name__)
+        limiter = RateLimiter(redis_client=Mock(), limits={"api": (1, 60)})
+        limiter.redis.register_script.return_value = Mock(return_value=[1, 0, 0])
+
+        with patch("app.utils.rate_limiter.rate_limiter", limiter):
+            @app.route("/ping")
+            @rate_limit_http()
+            def ping():
+                return "pong"
+
+            client = app.test_client()
+            first = client.get("/ping")
+            second = client.get("/ping")
+
+        assert first.status_code == 200
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) >= 1
+
+
+class TestClientIdentifier:
+    """Tests para la identidad con la que se limita"""
+
+    @pytest.fixture
+    def app(self):
+        return Flask(__name__)
+
+    def test_client_supplied_user_is_ignored(self, app):
+        """Test: Un "user" enviado por el cliente no crea buckets nuevos; se limita por IP"""
+        with app.test_request_context(environ_base={"REMOTE_ADDR": "10.0.0.7"}):
+            assert _socket_identifier({"user": {"id": "falso-1"}}) == "ip:10.0.0.7"
+            assert _socket_identifier({"user": VerifiedUser(id="user-1")}) == "user:user-1"
+
+    def test_forwarded_for_is_ignored_without_trusted_proxy(self, app):
+        """Test: Sin TRUSTED_PROXY_COUNT, X-Forwarded-For no cambia la IP"""
+        with app.test_request_context(headers={"X-Forwarded-For": "1.2.3.4"},
+                                      environ_base={"REMOTE_ADDR": "10.0.0.7"}):
+            assert get_client_ip() == "10.0.0.7"
+
+    def test_proxy_fix_uses_last_trusted_hop(self, app):
+        """Test: Con un proxy de confianza se usa el salto que agregó ese proxy"""
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+
+        @app.route("/ip")
+        def ip():
+            return get_client_ip()
+
+        response = app.test_client().get("/ip", headers={"X-Forwarded-For": "6.6.6.6, 1.2.3.4"},
+                                         environ_base={"REMOTE_ADDR": "10.0.0.1"})
+
+        assert response.get_data(as_text=True) == "1.2.3.4"
@@ -0,0 +1,177 @@
+"""
+Tests unitarios para la búsqueda de preguntas (índice local y servicio)
+"""
+import pytest
+from unittest.mock import Mock, patch
+from flask import Flask
+from app.api.v1 import question_routes
+from app.utils.search_index import InvertedIndex, build_tsquery, tokenize
+from app.services.search_service import SearchService
+
+
+QUESTIONS = [
+    {"id": "q1", "subject": "fisica", "question": "¿Qué es la energía cinética?"},
+    {"id": "q2", "subject": "fisica", "question": "Calcula la energía potencial de un cuerpo"},
+    {"id": "q3", "subject": "quimica", "question": "¿Cuál es la energía de ionización del sodio?"},
+    {"id": "q4", "subject": "matematicas", "question": "Resuelve la ecuación cuadrática"},
+]
+
+
+@pytest.fixture
+def index():
+    return InvertedIndex(QUESTIONS)
+
+
+class TestTokenize:
+    """Tests para tokenize() y build_tsquery()"""
+
+    def test_tokenize_removes_accents_and_stop_words(self):
+        """Test: Los términos se normalizan y se quitan stop words"""
+        assert tokenize("¿Qué es la Energía Cinética?") == ["energia", "cinetica"]
+
+    def test_tokenize_keeps_only_stop_words_query(self):
+        """Test: Una consulta solo de stop words no queda vacía"""
+        assert tokenize("que es") == ["que", "es"]
+
+    def test_build_tsquery_prefixes_last_term(self):
+        """Test: Términos unidos con & y el último con :*"""
+        assert build_tsquery("Energía cinét") == "energia & cinet:*"
+
+    def test_build_tsquery_strips_operators(self):
+        """Test: Los operadores de tsquery del usuario se descartan"""
+        assert build_tsquery("energia | !cinetica & (x") == "energia & cinetica & x:*"
+
+    def test_build_tsquery_empty(self):
+        """Test: Sin términos no hay consulta"""
+        assert build_tsquery("  ¿? ") is None
+
+
+class TestInvertedIndex:
+    """Tests para InvertedIndex"""
+
+    def test_accent_insensitive_match(self, index):
+        """Test: 'energia' encuentra 'energía'"""
+        ids = {document["id"] for document, _ in index.search("energia")}
+
+        assert ids == {"q1", "q2", "q3"}
+
+    def test_prefix_matching(self, index):
+        """Test: Un término incompleto se completa por prefijo"""
+        results = index.search("energia cine")
+
+        assert [document["id"] for document, _ in results] == ["q1"]
+
+    def test_prefix_disabled(self, index):
+        """Test: Sin prefijo solo hay coincidencias exactas"""
+        assert index.search("energia cine", prefix=False) == []
+
+    def test_all_terms_required(self, index):
+        """Test: Los documentos deben contener todos los términos"""
+        results = index.search("energia ecuacion")
+
+        assert results == []
+
+    def test_ranking_prefers_exact_terms(self):
+        """Test: Un término exacto puntúa más que uno completado por prefijo"""
+        index = InvertedIndex([
+            {"id": "prefix", "question": "fuerza centrifuga"},
+            {"id": "exact", "question": "fuerza centro"},
+        ])
+
+        results = index.search("centro")
+
+        assert results[0][0]["id"] == "exact"
+
+    def test_predicate_and_limit(self, index):
+        """Test: Se aplican el filtro y el límite"""
+        results = index.search("energia", limit=1, predicate=lambda d: d["subject"] == "fisica")
+
+        assert len(results) == 1
+        assert results[0][0]["subject"] == "fisica"
+
+
+class TestSearchService:
+    """Tests para SearchService"""
+
+    @pytest.fixture
+    def question_repo(self):
+        repo = Mock()
+        repo.get_search_corpus.return_value = QUESTIONS
+        repo.search.return_value = [{"id": "q1", "rank": 0.1}]
+        return repo
+
+    @pytest.fixture
+    def service(self, question_repo):
+        return SearchService(question_repo=question_repo, answers_repo=Mock(),
+                             index_ttl=3600, local_index_enabled=True)
+
+    def test_search_uses_database_tsquery(self, service, question_repo):
+        """Test: search() consulta search_questions con la tsquery construida"""
+        results = service.search("Energía cinét", subject="fisica", limit=5)
+
+        question_repo.search.assert_called_once_with("energia & cinet:*", "fisica", 5)
+        assert results == [{"id": "q1", "rank": 0.1}]
+
+    def test_search_falls_back_to_local_index(self, service, question_repo):
+        """Test: Si la base de datos falla, responde el índice local"""
+        question_repo.search.return_value = None
+
+        results = service.search("energia potencial")
+
+        assert [result["id"] for result in results] == ["q2"]
+        assert results[0]["rank"] > 0
+
+    def test_autocomplete_does_not_query_database(self, service, question_repo):
+        """Test: El autocompletado sale del índice en memoria"""
+        results = service.autocomplete("ioniz", subject="quimica")
+
+        question_repo.search.assert_not_called()
+        assert [result["id"] for result in results] == ["q3"]
+
+    def test_index_is_built_once(self, service, question_repo):
+        """Test: El banco se lee una sola vez mientras el índice no expire"""
+        service.autocomplete("energia")
+        service.autocomplete("ecuacion")
+
+        question_repo.get_search_corpus.assert_called_once()
+
+    def test_autocomplete_without_local_index(self, question_repo):
+        """Test: Con el índice local deshabilitado, se usa la base de datos"""
+        service = SearchService(question_repo=question_repo, local_index_enabled=False)
+
+        service.autocomplete("energia")
+
+        question_repo.search.assert_called_once()
+        question_repo.get_search_corpus.assert_not_called()
+
+
+class TestSearchRoute:
+    """Tests para GET /api/v1/questions/search"""
+
+    @pytest.fixture
+    def client(self):
+        app = Flask(__name__)
+        app.config["TESTING"] = True
+        app.register_blueprint(question_routes.bp)
+        with patch("app.auth.decorators.verify_token", return_value={"id": "user-1"}):
+            yield app.test_client()
+
+    def test_requires_auth(self, client):
+        """Test: Sin token responde 401 (source=answers expone respuestas generadas)"""
+        with patch.object(question_routes, "search_service") as search_service:
+            response = client.get("/api/v1/questions/search?q=energia&source=answers")
+
+        assert response.status_code == 401
+        search_service.search.assert_not_called()
+
+    def test_authenticated_search_answers(self, client):
+        """Test: Con token busca en la fuente pedida"""
+        with patch.object(question_routes, "search_service") as search_service:
+            search_service.SOURCES = SearchService.SOURCES
+            search_service.search.return_value = [{"id": "a1"}]
+            response = client.get("/api/v1/questions/search?q=energia&source=answers",
+                                  headers={"Authorization": "Bearer token"})
+
+        assert response.status_code == 200
+        assert response.get_json()["total"] == 1
+        search_service.search.assert_called_once_with("energia", None, 20, "answers")
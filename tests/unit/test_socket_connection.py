@@ -0,0 +1,47 @@
+"""
+Tests unitarios para los eventos de conexión de Socket.IO
+"""
+from unittest.mock import Mock, patch
+
+import pytest
+from flask import Flask, request
+
+from app.socket_events.connection import active_connections, handle_connect
+from app.socket_events.questions import socket_sessions
+
+
+@pytest.fixture
+def app():
+    """App Flask mínima para el contexto de request"""
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    return app
+
+
+class TestConnectMapping:
+    """Tests para el mapeo socket -> sesión al conectar"""
+
+    @pytest.mark.parametrize("reclaimed", [True, False])
+    def test_connect_maps_socket_for_question_handlers(self, app, reclaimed):
+        """Test: Al crear o reclamar la sesión, pausa/reanudar ven la misma sesión"""
+        session_service = Mock()
+        session_service.reclaim_session.return_value = (
+            {"session_id": "session-old", "reconnect_token": "rt"} if reclaimed else None
+        )
+        session_service.create_session.return_value = "session-new"
+        session_service.get_session.return_value = {"reconnect_token": "rt"}
+        expected = "session-old" if reclaimed else "session-new"
+
+        with app.test_request_context(), \
+                patch("app.socket_events.connection.verify_token", return_value={"id": "user-1"}), \
+                patch("app.socket_events.connection.SessionService", return_value=session_service), \
+                patch("app.socket_events.connection.emit"):
+            request.sid = "sid-1"
+            handle_connect.__wrapped__({"token": "jwt", "reconnect_token": "rt"})
+
+        try:
+            assert active_connections["sid-1"] == expected
+            assert socket_sessions["sid-1"] == expected
+        finally:
+            active_connections.pop("sid-1", None)
+            socket_sessions.pop("sid-1", None)
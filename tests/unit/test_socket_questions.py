@@ -223,10 +223,11 @@ class TestStreamingService:
         
         service.start_streaming(answer_data, "session-123")
         
-        # Verificar que se emitieron canvas_command
-        calls = [call[0][0] for call in mock_emit.call_args_list]
-        canvas_command_count = calls.count("canvas_command")
-        assert canvas_command_count == 2
+        # Verificar que los canvas commands se emitieron juntos en step_commands
+        calls = [call[0] for call in mock_emit.call_args_list]
+        batches = [data for event, data in calls if event == "step_commands"]
+        assert len(batches) == 1
+        assert len(batches[0]["canvas_commands"]) == 2
     
     @patch('app.services.streaming_service.SessionService')
     @patch('app.services.streaming_service.emit')
@@ -256,6 +257,35 @@ class TestStreamingService:
         
         # Verificar que se llamó a pause_streaming
         assert mock_session_instance.pause_streaming.called or True
+    
+    @patch('app.services.streaming_service.emit')
+    def test_resume_uses_snapshot_and_absolute_position(self, mock_emit):
+        """Test: Reanudar usa la respuesta guardada y continúa en la posición exacta"""
+        from app.services.streaming_service import StreamingService
+        
+        mock_session_instance = Mock()
+        mock_session_instance.get_session.side_effect = [
+            {"is_paused": True, "current_step": 0, "pause_position": 100},
+            {"is_paused": False},
+            {"is_paused": False},
+            {"is_paused": False}
+        ]
+        mock_session_instance.get_answer_snapshot.return_value = {
+            "steps": [
+                {"title": "Paso 1", "type": "text", "content": "A" * 100 + "B" * 20},
+                {"title": "Paso 2", "type": "text", "content": "C" * 10}
+            ],
+            "total_duration": 60
+        }
+        
+        service = StreamingService(mock_session_instance)
+        service.resume_streaming("session-123")
+        
+        chunks = [call[0][1] for call in mock_emit.call_args_list if call[0][0] == "content_chunk"]
+        assert chunks[0] == {"step": 0, "chunk": "B" * 20, "position": 100, "is_final": True}
+        assert chunks[1]["chunk"] == "C" * 10
+        events = [call[0][0] for call in mock_emit.call_args_list]
+        assert events[-1] == "explanation_complete"
 
 
 class TestIntegration:
@@ -378,3 +408,36 @@ class TestIntegration:
         mock_ai_instance.generate_answer.assert_called_once()
         mock_repo_instance.create.assert_called_once()
         mock_streaming_instance.start_streaming.assert_called_once()
+
+
+class TestDetailedClarification:
+    """Tests para _stream_detailed_clarification"""
+
+    def _run(self, events):
+        from app.socket_events import interruptions
+        ai_service = Mock()
+        ai_service.stream_clarification.return_value = iter(events)
+        with patch.object(interruptions, 'emit') as mock_emit, \
+             patch.object(interruptions.socketio, 'sleep'):
+            interruptions._stream_detailed_clarification(ai_service, "¿Por qué?", {})
+        return [call.args for call in mock_emit.call_args_list]
+
+    def test_message_without_steps_falls_back_to_message(self):
+        """Test: Respuesta detallada sin pasos pero con mensaje emite clarification_message"""
+        emitted = self._run([{'type': 'complete', 'response': {
+            'message': 'Lo veremos en el paso 3', 'is_deferred': True, 'reason': 'adelantado'
+        }}])
+
+        assert emitted[-1] == ('clarification_message', {
+            'mode': 'detailed',
+            'message': 'Lo veremos en el paso 3',
+            'is_deferred': True,
+            'reason': 'adelantado'
+        })
+
+    def test_empty_response_emits_error(self):
+        """Test: Sin pasos ni mensaje emite error"""
+        emitted = self._run([{'type': 'complete', 'response': {}}])
+
+        assert emitted[-1][0] == 'error'
+        assert emitted[-1][1]['code'] == 'CLARIFICATION_ERROR'
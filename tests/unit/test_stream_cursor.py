@@ -0,0 +1,171 @@
+"""
+Tests unitarios para StreamCursor y pause/resume de StreamingService
+
+Los tests de propiedades recorren respuestas y secuencias de pausas
+aleatorias (semillas fijas): tras cualquier número de ciclos
+pause/resume, cada paso se entrega completo, en orden y sin repetir texto.
+"""
+import random
+import pytest
+from unittest.mock import patch
+from app.models.session import StreamCursor
+from app.services.streaming_service import StreamingService
+
+
+class FakeSessionService:
+    """SessionService en memoria que se pausa al azar al consultar la sesión"""
+
+    def __init__(self, rng, pause_probability):
+        self.rng = rng
+        self.pause_probability = pause_probability
+        self.session = {"is_paused": False, "is_streaming": False,
+                        "current_step": 0, "pause_position": 0}
+        self.snapshot = None
+
+    def get_session(self, session_id):
+        if self.session["is_streaming"] and self.rng.random() < self.pause_probability:
+            self.session["is_paused"] = True
+        return dict(self.session)
+
+    def update_session(self, session_id, data):
+        self.session.update(data)
+        return True
+
+    def update_streaming_state(self, session_id, is_streaming, current_step=0):
+        return self.update_session(session_id, {"is_streaming": is_streaming,
+                                                "current_step": current_step})
+
+    def pause_streaming(self, session_id, pause_position, current_step=None):
+        data = {"is_paused": True, "is_streaming": False, "pause_position": pause_position}
+        if current_step is not None:
+            data["current_step"] = current_step
+        return self.update_session(session_id, data)
+
+    def resume_streaming(self, session_id):
+        self.update_session(session_id, {"is_paused": False, "is_streaming": True})
+        return dict(self.session)
+
+    def save_answer_snapshot(self, session_id, answer_data):
+        self.snapshot = answer_data
+        return True
+
+    def get_answer_snapshot(self, session_id):
+        return self.snapshot
+
+
+def random_answer(rng):
+    alphabet = "abcdefghijklmnñopqrstuvwxyz áéíóú∫√π\n"
+    return {
+        "question_hash": f"hash-{rng.randrange(10**6)}",
+        "total_duration": 60,
+        "steps": [
+            {"title": f"Paso {index}",
+             "content": "".join(rng.choice(alphabet) for _ in range(rng.randrange(0, 400)))}
+            for index in range(rng.randrange(1, 6))
+        ]
+    }
+
+
+def stream_with_pauses(answer, rng, pause_probability):
+    """Transmite la respuesta reanudando tras cada pausa; devuelve los eventos emitidos"""
+    session_service = FakeSessionService(rng, pause_probability)
+    service = StreamingService(session_service)
+    service.CHUNK_SIZE = rng.randrange(1, 60)
+    events = []
+
+    with patch("app.services.streaming_service.emit",
+               side_effect=lambda name, data=None: events.append((name, data))), \
+            patch("app.services.streaming_service.time.sleep"):
+        service.start_streaming(answer, "s1")
+        resumes = 0
+        while events[-1][0] != "explanation_complete":
+            resumes += 1
+            assert resumes < 10_000, "el streaming no avanza"
+            service.resume_streaming("s1")
+
+    return events, resumes
+
+
+class TestStreamCursor:
+    """Tests para StreamCursor"""
+
+    def test_spans_cover_content_from_offset(self):
+        """Test: Los rangos empiezan en el offset y cubren el resto del paso"""
+        cursor = StreamCursor(step=0, offset=3)
+
+        assert list(cursor.spans(10, 4)) == [(3, 7), (7, 10)]
+        assert cursor.offset == 10
+
+    def test_interrupted_iteration_keeps_first_unsent_offset(self):
+        """Test: Al cortar la iteración, el offset queda en el primer carácter no enviado"""
+        cursor = StreamCursor()
+        for start, _ in cursor.spans(100, 10):
+            if start == 30:
+                break
+
+        assert cursor.offset == 30
+
+    def test_offset_past_end_is_clamped(self):
+        """Test: Un offset mayor que el contenido no produce chunks"""
+        cursor = StreamCursor(offset=50)
+
+        assert list(cursor.spans(10, 4)) == []
+        assert cursor.offset == 10
+
+    def test_session_roundtrip(self):
+        """Test: El cursor se guarda y se recupera de la sesión"""
+        cursor = StreamCursor(answer_id="h1", step=2, offset=75)
+
+        assert StreamCursor.from_session(cursor.to_session(), "h1") == cursor
+
+    def test_other_answer_starts_from_beginning(self):
+        """Test: Si la sesión apunta a otra respuesta, se empieza desde cero"""
+        session = {"stream_answer_id": "h1", "current_step": 2, "pause_position": 75}
+
+        assert StreamCursor.from_session(session, "h2") == StreamCursor(answer_id="h2")
+
+
+class TestPauseResumeProperties:
+    """Propiedades de pause/resume en StreamingService"""
+
+    @pytest.mark.parametrize("seed", range(40))
+    def test_every_step_is_delivered_exactly_once(self, seed):
+        """Test: Con pausas aleatorias, el texto de cada paso llega completo y sin repetir"""
+        rng = random.Random(seed)
+        answer = random_answer(rng)
+
+        events, _ = stream_with_pauses(answer, rng, pause_probability=rng.uniform(0.05, 0.5))
+
+        received = {}
+        for name, data in events:
+            if name == "content_chunk":
+                text = received.setdefault(data["step"], "")
+                # Posiciones absolutas y contiguas entre ciclos
+                assert data["position"] == len(text)
+                received[data["step"]] = text + data["chunk"]
+
+        for index, step in enumerate(answer["steps"]):
+            assert received.get(index, "") == step["content"]
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_steps_complete_in_order(self, seed):
+        """Test: step_complete se emite una vez por paso y en orden"""
+        rng = random.Random(seed)
+        answer = random_answer(rng)
+
+        events, _ = stream_with_pauses(answer, rng, pause_probability=0.3)
+
+        completed = [data["step"] for name, data in events if name == "step_complete"]
+        assert completed == list(range(len(answer["steps"])))
+        assert [name for name, _ in events].count("explanation_complete") == 1
+
+    def test_many_pause_cycles(self):
+        """Test: Pausar en casi cada chunk no pierde ni repite texto"""
+        rng = random.Random(1234)
+        answer = {"question_hash": "h", "steps": [{"title": "t", "content": "x" * 50 + "y" * 50}]}
+
+        events, resumes = stream_with_pauses(answer, rng, pause_probability=0.9)
+
+        text = "".join(data["chunk"] for name, data in events if name == "content_chunk")
+        assert text == answer["steps"][0]["content"]
+        assert resumes > 5
@@ -0,0 +1,148 @@
+"""
+Tests unitarios para el motor único de streaming (StepEngine) y sus transportes
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from app.models.answer import Answer
+from app.models.session import StreamCursor
+from app.services.stream_transport import CallbackTransport, RecordingTransport
+from app.services.streaming_service import StepEngine, StreamingService
+
+
+STEPS = [
+    {"step_number": 1, "title": "Definición", "content": "x" * 120, "content_type": "math",
+     "has_visual": True, "canvas_commands": [{"command": "draw_equation"}],
+     "component_commands": [{"command": "image_modal"}]},
+    {"step_number": 2, "title": "Ejemplo", "content": "y" * 30}
+]
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with patch("app.services.streaming_service.time.sleep") as sleep:
+        yield sleep
+
+
+def service_with_recorder():
+    transport = RecordingTransport()
+    session_service = MagicMock()
+    session_service.get_session.return_value = {"is_paused": False}
+    return StreamingService(session_service, transport=transport), transport
+
+
+def step_events(transport):
+    """Eventos por paso (sin los de inicio/fin propios de cada flujo)"""
+    ignored = {"explanation_start", "explanation_complete"}
+    return [(name, data) for name, data in transport.events if name not in ignored]
+
+
+def step_events_names(steps, chunk_size):
+    names = []
+    for step in steps:
+        names.append("step_start")
+        if step.get("canvas_commands") or step.get("component_commands"):
+            names.append("step_commands")
+        names += ["content_chunk"] * -(-len(step["content"]) // chunk_size)
+        names.append("step_complete")
+    return names
+
+
+class TestUnifiedProtocol:
+    """Las tres entradas producen la misma secuencia de eventos por paso"""
+
+    def test_all_sources_emit_same_step_events(self):
+        """Test: start_streaming, stream_answer y stream_explanation son equivalentes"""
+        live, live_events = service_with_recorder()
+        live.start_streaming({"steps": STEPS, "question_hash": "h"}, "s1")
+
+        follow_up, follow_up_events = service_with_recorder()
+        follow_up.stream_answer({"answer_steps": STEPS})
+
+        exam, exam_events = service_with_recorder()
+        exam.stream_explanation({"explanation_steps": STEPS})
+
+        assert step_events(live_events) == step_events(follow_up_events) == step_events(exam_events)
+
+    def test_commands_before_content(self):
+        """Test: Los comandos de un paso se emiten en un solo evento antes de su contenido"""
+        service, transport = service_with_recorder()
+
+        service.stream_answer({"answer_steps": STEPS})
+
+        names = transport.names()
+        assert names[:3] == ["step_start", "step_commands", "content_chunk"]
+        assert transport.of("step_commands") == [{
+            "step": 0,
+            "canvas_commands": [{"command": "draw_equation"}],
+            "component_commands": [{"command": "image_modal"}]
+        }]
+        assert transport.of("step_start")[0] == {
+            "step": 0, "step_number": 1, "title": "Definición", "type": "math", "has_visual": True
+        }
+
+    def test_emit_func_is_wrapped_as_transport(self):
+        """Test: emit_func (API anterior) recibe los mismos eventos"""
+        service, transport = service_with_recorder()
+        emitted = []
+
+        service.stream_answer({"answer_steps": STEPS}, emit_func=lambda event, data: emitted.append(event))
+
+        assert emitted == step_events_names(STEPS, service.CHUNK_SIZE)
+        assert transport.events == []
+
+    def test_invalid_source_reports_error(self):
+        """Test: Pasos inválidos emiten STREAMING_ERROR por el transporte"""
+        service, transport = service_with_recorder()
+
+        service.stream_explanation({"explanation_steps": "no es un array"})
+
+        assert transport.last() == ("error", {"code": "STREAMING_ERROR",
+                                              "message": "Los pasos deben ser un array"})
+
+
+class TestStepEngine:
+    """Tests para StepEngine"""
+
+    def test_pause_reports_position(self):
+        """Test: Al pausar en un chunk se guarda y emite la posición exacta"""
+        transport = RecordingTransport()
+        session_service = MagicMock()
+        session_service.get_session.side_effect = [{"is_paused": False}] * 2 + [{"is_paused": True}]
+        engine = StepEngine(transport, session_service, "s1", chunk_size=50)
+        steps = Answer.from_dict({"steps": STEPS}).steps
+
+        assert engine.run(steps, StreamCursor()) is False
+
+        session_service.pause_streaming.assert_called_once_with("s1", 50, current_step=0)
+        assert transport.last() == ("streaming_paused", {
+            "step": 0, "position": 50, "message": "Streaming pausado por el usuario"
+        })
+
+    def test_sessionless_never_reads_session(self):
+        """Test: Sin session_id no se consulta ni actualiza la sesión"""
+        session_service = MagicMock()
+        engine = StepEngine(RecordingTransport(), session_service)
+
+        assert engine.run(Answer.from_dict({"steps": STEPS}).steps, StreamCursor()) is True
+        assert session_service.method_calls == []
+
+    def test_pacing(self, no_sleep):
+        """Test: Una pausa tras los comandos del paso y entre chunks (no después del último)"""
+        engine = StepEngine(RecordingTransport(), chunk_size=50, chunk_delay=0.05, command_delay=0.1)
+
+        engine.run(Answer.from_dict({"steps": STEPS[:1]}).steps, StreamCursor())
+
+        delays = [call.args[0] for call in no_sleep.call_args_list]
+        assert delays == [0.1, 0.05, 0.05]
+
+
+class TestTransports:
+    """Tests para los transportes"""
+
+    def test_callback_transport(self):
+        """Test: CallbackTransport delega en la función"""
+        emit = MagicMock()
+
+        CallbackTransport(emit).send("content_chunk", {"chunk": "a"})
+
+        emit.assert_called_once_with("content_chunk", {"chunk": "a"})
@@ -0,0 +1,73 @@
+"""
+Tests unitarios para TokenBudgetService
+"""
+from app.services.token_budget_service import TokenBudgetService
+
+
+class TestEstimate:
+    """Tests para estimate()"""
+
+    def test_brief_clarification_is_much_smaller_than_answer(self):
+        """Test: Las aclaraciones breves reciben un presupuesto chico"""
+        service = TokenBudgetService()
+
+        brief = service.estimate("clarification_brief", "¿Qué es la masa?")
+        answer = service.estimate("answer", "¿Qué es la masa?")
+
+        assert brief <= service.MAX_OUTPUT_TOKENS["clarification_brief"]
+        assert brief < answer
+
+    def test_difficulty_and_subject_increase_budget(self):
+        """Test: Dificultad alta y materias con fórmulas suben el presupuesto"""
+        service = TokenBudgetService()
+
+        easy = service.estimate("answer", "Explica la derivada", subject="Historia", difficulty="easy")
+        hard = service.estimate("answer", "Explica la derivada", subject="Cálculo", difficulty="hard")
+
+        assert hard > easy
+
+    def test_longer_questions_get_more_tokens(self):
+        """Test: Preguntas largas reciben más tokens"""
+        service = TokenBudgetService()
+
+        short = service.estimate("follow_up", "¿Por qué?")
+        long = service.estimate("follow_up", "¿Por qué? " + "detalle adicional " * 40)
+
+        assert long > short
+
+    def test_estimate_is_clamped_and_rounded(self):
+        """Test: El presupuesto respeta mínimo, máximo y redondeo"""
+        service = TokenBudgetService()
+
+        huge = service.estimate("answer", "x " * 5000, subject="calculo", difficulty="hard")
+        tiny = service.estimate("answer", "", subject="ingles", difficulty="easy")
+
+        assert huge == service.MAX_OUTPUT_TOKENS["answer"]
+        assert tiny >= service.MIN_OUTPUT_TOKENS["answer"]
+        assert tiny % service.ROUND_TO == 0
+
+    def test_unknown_values_fall_back_to_defaults(self):
+        """Test: Tipos, materias y dificultades desconocidas no fallan"""
+        service = TokenBudgetService()
+
+        assert service.estimate("otro", "hola", subject="???", difficulty="extreme") == \
+            service.estimate("answer", "hola")
+
+
+class TestStats:
+    """Tests para record_result() y stats()"""
+
+    def test_records_truncation_metrics(self):
+        """Test: Acumula truncamientos y continuaciones por tipo"""
+        service = TokenBudgetService()
+
+        service.record_result("answer", budget=1000, continuations=0, completed=True, completion_tokens=600)
+        service.record_result("answer", budget=1200, continuations=2, completed=False, completion_tokens=None)
+
+        stats = service.stats()["answer"]
+        assert stats["requests"] == 2
+        assert stats["truncated"] == 1
+        assert stats["continuations"] == 2
+        assert stats["incomplete"] == 1
+        assert stats["avg_budget"] == 1100.0
+        assert stats["truncation_rate"] == 0.5
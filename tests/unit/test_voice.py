@@ -0,0 +1,216 @@
+"""
+Tests unitarios para el pipeline de voz (buffer, ASR y VoiceService)
+"""
+import base64
+import pytest
+from unittest.mock import Mock, patch
+
+import numpy as np
+
+from app.services.asr_backends import FakeASRBackend, get_asr_backend, pcm16_to_float32
+from app.services.voice_service import VoiceService, VoiceStreamError
+from app.socket_events import voice
+from app.utils.audio_buffer import AudioRingBuffer
+
+
+SAMPLE_RATE = 16000
+QUARTER_SECOND = bytes(SAMPLE_RATE // 2)  # 0.25 s de pcm_s16le
+
+
+@pytest.fixture
+def backend():
+    return FakeASRBackend(text="¿Cuál es la derivada de x al cuadrado?")
+
+
+@pytest.fixture
+def service(backend):
+    return VoiceService(backend=backend, workers=1, max_seconds=2, partial_interval_ms=500)
+
+
+def wait_partial(service, stream_id):
+    """Espera a que termine la parcial en curso"""
+    stream = service._streams[stream_id]
+    if stream.partial is not None:
+        stream.partial.result(timeout=5)
+
+
+class TestAudioRingBuffer:
+    """Tests para AudioRingBuffer"""
+
+    def test_view_does_not_copy(self):
+        """Test: Sin vuelta, view() es un memoryview sobre el almacenamiento"""
+        buffer = AudioRingBuffer(8)
+        buffer.write(b"abcd")
+
+        (segment,) = buffer.view()
+
+        assert bytes(segment) == b"abcd"
+        assert segment.obj is buffer._storage
+
+    def test_wraps_and_drops_oldest(self):
+        """Test: Al llenarse sobrescribe lo más antiguo y lo cuenta"""
+        buffer = AudioRingBuffer(6)
+        buffer.write(b"abcd")
+
+        dropped = buffer.write(b"efgh")
+
+        assert dropped == 2
+        assert len(buffer) == 6
+        assert buffer.snapshot() == b"cdefgh"
+        assert bytes(buffer.contiguous()) == b"cdefgh"
+        assert len(buffer.view()) == 2
+
+    def test_chunk_larger_than_capacity(self):
+        """Test: Un chunk mayor que la capacidad conserva solo su cola"""
+        buffer = AudioRingBuffer(4)
+        buffer.write(b"ab")
+
+        buffer.write(b"cdefgh")
+
+        assert buffer.snapshot() == b"efgh"
+        assert buffer.dropped == 4
+        assert buffer.total_written == 8
+
+
+class TestASRBackends:
+    """Tests para los backends de ASR"""
+
+    def test_fake_partial_reveals_words_by_duration(self, backend):
+        """Test: La parcial revela palabras según la duración; la final, todo"""
+        one_second = bytes(SAMPLE_RATE * 2)
+
+        partial = backend.transcribe(one_second, SAMPLE_RATE, final=False)
+        final = backend.transcribe(one_second, SAMPLE_RATE, final=True)
+
+        assert partial.text == "¿Cuál es la"
+        assert final.text == "¿Cuál es la derivada de x al cuadrado?"
+        assert final.is_final and final.duration_ms == 1000
+
+    def test_pcm16_conversion_and_resampling(self):
+        """Test: Convierte a float32 en [-1, 1] y remuestrea a 16 kHz"""
+        audio = np.array([0, 16384, -32768, 32767] * 2000, dtype="<i2").tobytes()
+
+        samples = pcm16_to_float32(audio, 8000)
+
+        assert samples.dtype == np.float32
+        assert len(samples) == 16000
+        assert samples.min() >= -1.0 and samples.max() < 1.0
+
+    def test_unknown_backend(self):
+        """Test: Un backend desconocido es un error de configuración"""
+        with pytest.raises(ValueError):
+            get_asr_backend("desconocido")
+
+
+class TestVoiceService:
+    """Tests para VoiceService"""
+
+    def test_partials_while_streaming_and_final(self, service, backend):
+        """Test: Emite parciales con el audio nuevo y la final transcribe todo"""
+        service.start("sid-1", user_id="user-1")
+        partials = []
+        for _ in range(4):
+            partials += service.append("sid-1", QUARTER_SECOND)
+            wait_partial(service, "sid-1")
+        partials += service.append("sid-1", QUARTER_SECOND)
+
+        final = service.finish("sid-1")
+
+        assert [p.text for p in partials] == ["¿Cuál es", "¿Cuál es la"]
+        assert not partials[0].is_final
+        assert final.text == "¿Cuál es la derivada de x al cuadrado?"
+        assert final.duration_ms == 1250
+        assert backend.calls[-1] == (len(QUARTER_SECOND) * 5, True)
+        assert not service.has_stream("sid-1")
+        assert service.stats()["finals"] == 1
+
+    def test_buffer_is_bounded(self, service):
+        """Test: Más de max_seconds de audio descarta lo más antiguo"""
+        service.start("sid-1")
+        for _ in range(12):
+            service.append("sid-1", QUARTER_SECOND)
+
+        final = service.finish("sid-1")
+        stats = service.stats()
+
+        assert final.duration_ms == 2000
+        assert stats["bytes_dropped"] == len(QUARTER_SECOND) * 4
+        assert stats["truncated"] == 1
+
+    def test_accepts_base64_chunks(self, service):
+        """Test: Los chunks pueden llegar como base64 (clientes sin binario)"""
+        service.start("sid-1")
+
+        service.append("sid-1", base64.b64encode(QUARTER_SECOND).decode())
+
+        assert service.stats()["bytes_received"] == len(QUARTER_SECOND)
+
+    def test_invalid_chunks(self, service):
+        """Test: Sin grabación, chunk impar o base64 inválido son errores"""
+        with pytest.raises(VoiceStreamError):
+            service.append("sid-1", QUARTER_SECOND)
+
+        service.start("sid-1")
+        with pytest.raises(VoiceStreamError):
+            service.append("sid-1", b"\x00\x01\x02")
+        with pytest.raises(VoiceStreamError):
+            service.append("sid-1", "no es base64!")
+
+    def test_max_streams(self, backend):
+        """Test: Limita las grabaciones simultáneas"""
+        service = VoiceService(backend=backend, max_streams=1)
+        service.start("sid-1")
+
+        with pytest.raises(VoiceStreamError):
+            service.start("sid-2")
+        assert service.cancel("sid-1")
+        service.start("sid-2")
+
+
+class TestVoiceEvents:
+    """Tests para los handlers de voz"""
+
+    @pytest.fixture
+    def events(self, service):
+        emitted = Mock()
+        with patch.object(voice, "voice_service", service), \
+             patch.object(voice, "emit", emitted), \
+             patch.object(voice, "request", Mock(sid="sid-1")):
+            yield emitted
+
+    def test_chunks_then_complete_asks_question(self, events, service):
+        """Test: La transcripción final se envía directamente a ask_question"""
+        service.start("sid-1")
+        voice.handle_voice_chunk({"chunk": QUARTER_SECOND})
+
+        with patch("app.socket_events.questions.handle_ask_question") as ask:
+            voice.handle_voice_complete.__wrapped__({
+                "token": "jwt", "user": {"id": "user-1"}, "context": {"subject": "calculo"}
+            })
+
+        result = events.call_args_list[-1].args
+        assert result[0] == "voice_transcription_result"
+        assert result[1]["requires_confirmation"] is False
+        ask.assert_called_once()
+        assert ask.call_args.args[0]["question"] == "¿Cuál es la derivada de x al cuadrado?"
+        assert ask.call_args.args[0]["context"] == {"subject": "calculo"}
+
+    def test_complete_without_ask_requires_confirmation(self, events):
+        """Test: Con ask=false solo devuelve la transcripción (audio completo en base64)"""
+        audio = base64.b64encode(QUARTER_SECOND * 4).decode()
+
+        with patch("app.socket_events.questions.handle_ask_question") as ask:
+            voice.handle_voice_complete.__wrapped__({
+                "token": "jwt", "user": {"id": "user-1"}, "audio_data": audio, "ask": False
+            })
+
+        assert events.call_args.args[1]["requires_confirmation"] is True
+        ask.assert_not_called()
+
+    def test_chunk_without_recording_sends_error(self, events):
+        """Test: Un chunk sin voice_start responde error con su seq"""
+        voice.handle_voice_chunk({"chunk": QUARTER_SECOND, "seq": 3})
+
+        assert events.call_args.args[0] == "error"
+        assert events.call_args.args[1]["code"] == "VOICE_CHUNK_ERROR"
+        assert events.call_args.args[1]["seq"] == 3
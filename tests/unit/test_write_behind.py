@@ -0,0 +1,185 @@
+"""
+Tests unitarios para el buffer de escritura diferida
+"""
+import os
+import pytest
+from unittest.mock import Mock
+from app.utils.write_behind import WriteBehindBuffer
+
+
+@pytest.fixture
+def writer():
+    """Writer falso que registra los lotes escritos"""
+    return Mock()
+
+
+@pytest.fixture
+def buffer(writer, tmp_path):
+    """Buffer sin hilo de fondo ni esperas entre reintentos"""
+    return WriteBehindBuffer(
+        "ai_answers",
+        ("question_hash",),
+        writer=writer,
+        batch_size=2,
+        max_retries=2,
+        base_backoff=0,
+        spool_dir=str(tmp_path),
+        autostart=False
+    )
+
+
+class TestWriteBehindBuffer:
+    """Tests para WriteBehindBuffer"""
+
+    def test_flush_writes_multi_row_upserts_in_batches(self, buffer, writer):
+        """Test: Las filas se escriben en lotes de batch_size con on_conflict"""
+        for index in range(3):
+            buffer.enqueue({"question_hash": f"h{index}", "question_text": "q"})
+
+        written = buffer.flush()
+
+        assert written == 3
+        assert writer.call_count == 2
+        table, rows, on_conflict = writer.call_args_list[0].args
+        assert table == "ai_answers"
+        assert [row["question_hash"] for row in rows] == ["h0", "h1"]
+        assert on_conflict == "question_hash"
+        assert buffer.queue_depth() == 0
+
+    def test_same_key_is_deduplicated_and_readable_before_flush(self, buffer, writer):
+        """Test: La última versión por clave gana y se puede leer antes del flush"""
+        buffer.enqueue({"question_hash": "h1", "question_text": "v1"})
+        buffer.enqueue({"question_hash": "h1", "question_text": "v2"})
+
+        assert buffer.get_pending("h1")["question_text"] == "v2"
+        assert buffer.queue_depth() == 1
+
+        buffer.flush()
+
+        assert writer.call_args.args[1] == [{"question_hash": "h1", "question_text": "v2"}]
+        assert buffer.get_pending("h1") is None
+
+    def test_retries_with_backoff_before_succeeding(self, buffer, writer):
+        """Test: Un fallo transitorio se reintenta"""
+        writer.side_effect = [Exception("timeout"), None]
+        buffer.enqueue({"question_hash": "h1"})
+
+        assert buffer.flush() == 1
+        assert buffer.snapshot()["retries"] == 1
+
+    def test_spools_when_database_is_down_and_replays_later(self, buffer, writer):
+        """Test: Agotados los reintentos el lote va al spool y se reprocesa después"""
+        writer.side_effect = Exception("db down")
+        buffer.enqueue({"question_hash": "h1"})
+
+        assert buffer.flush() == 0
+        snapshot = buffer.snapshot()
+        assert snapshot["failures"] == 1
+        assert snapshot["spool_depth"] == 1
+
+        writer.side_effect = None
+        buffer.enqueue({"question_hash": "h2"})
+        buffer.flush()  # escribe h2 y reencola h1 desde el spool
+        buffer.flush()
+
+        written = [row["question_hash"] for call in writer.call_args_list[-2:] for row in call.args[1]]
+        assert written == ["h2", "h1"]
+        assert buffer.snapshot()["spool_depth"] == 0
+        assert buffer.snapshot()["rows_replayed"] == 1
+
+    def test_poison_row_is_isolated_and_quarantined(self, buffer, writer):
+        """Test: Una fila que la base rechaza no bloquea el spool y termina en cuarentena"""
+        def write(table, rows, on_conflict):
+            if any(row["question_hash"] == "veneno" for row in rows):
+                raise Exception("violates check constraint")
+
+        buffer.max_replays = 2
+        writer.side_effect = write
+        buffer.enqueue({"question_hash": "h1"})
+        buffer.enqueue({"question_hash": "veneno"})
+        assert buffer.flush() == 0
+        assert buffer.snapshot()["spool_depth"] == 2
+
+        buffer.enqueue({"question_hash": "h2"})
+        buffer.flush()  # h1 se reescribe sola; veneno vuelve al spool
+
+        snapshot = buffer.snapshot()
+        assert snapshot["rows_replayed"] == 1
+        assert snapshot["spool_depth"] == 1
+
+        buffer.enqueue({"question_hash": "h3"})
+        buffer.flush()
+
+        snapshot = buffer.snapshot()
+        assert snapshot["spool_depth"] == 0
+        assert snapshot["quarantine_depth"] == 1
+        assert snapshot["rows_quarantined"] == 1
+        assert buffer.queue_depth() == 0
+
+    def test_row_stays_readable_until_write_is_acknowledged(self, buffer, writer):
+        """Test: get_pending ve la fila durante la escritura y en el spool, no después"""
+        seen_during_write = []
+        writer.side_effect = lambda table, rows, on_conflict: seen_during_write.append(
+            buffer.get_pending("h1")
+        )
+        buffer.enqueue({"question_hash": "h1", "question_text": "v1"})
+        buffer.flush()
+
+        assert seen_during_write[0]["question_text"] == "v1"
+        assert buffer.get_pending("h1") is None
+
+        writer.side_effect = Exception("db down")
+        buffer.enqueue({"question_hash": "h2", "question_text": "v1"})
+        buffer.flush()
+        assert buffer.get_pending("h2")["question_text"] == "v1"
+
+        writer.side_effect = None
+        buffer.enqueue({"question_hash": "h3"})
+        buffer.flush()  # escribe h3 y reescribe h2 desde el spool
+        assert buffer.get_pending("h2") is None
+
+    def test_newer_version_is_not_hidden_by_older_ack(self, buffer, writer):
+        """Test: Reescribir una versión vieja desde el spool no oculta la nueva"""
+        writer.side_effect = Exception("db down")
+        buffer.enqueue({"question_hash": "h1", "question_text": "v1"})
+        buffer.flush()
+        buffer.enqueue({"question_hash": "h1", "question_text": "v2"})
+        buffer.flush()
+
+        def write(table, rows, on_conflict):
+            if any(row.get("question_text") == "v2" for row in rows):
+                raise Exception("timeout")
+
+        writer.side_effect = write
+        buffer.enqueue({"question_hash": "h3"})
+        buffer.flush()  # v1 se reescribe desde el spool; v2 vuelve al spool
+
+        assert buffer.get_pending("h1")["question_text"] == "v2"
+
+    def test_replay_uses_a_per_process_file(self, buffer, writer, monkeypatch):
+        """Test: Cada worker toma el spool en su propio archivo .replay"""
+        replaced = []
+        real_replace = os.replace
+        monkeypatch.setattr(os, "replace", lambda src, dst: (replaced.append(dst), real_replace(src, dst)))
+        writer.side_effect = Exception("db down")
+        buffer.enqueue({"question_hash": "h1"})
+        buffer.flush()
+
+        writer.side_effect = None
+        buffer.enqueue({"question_hash": "h2"})
+        buffer.flush()
+
+        assert replaced == [f"{buffer.spool_path}.{os.getpid()}.replay"]
+
+    def test_snapshot_reports_latency_and_depth(self, buffer):
+        """Test: Expone profundidad de cola y latencia de flush"""
+        buffer.enqueue({"question_hash": "h1"})
+        assert buffer.snapshot()["queue_depth"] == 1
+
+        buffer.flush()
+
+        snapshot = buffer.snapshot()
+        assert snapshot["queue_depth"] == 0
+        assert snapshot["flushes"] == 1
+        assert snapshot["rows_written"] == 1
+        assert snapshot["avg_flush_ms"] >= 0